@@ -4,45 +4,34 @@ Check ALL OTP email events vs profile emails (not just suspicious domains)
 """
 
 from db_connection import get_connection
-import re
+from fraudmonitor_scan import days_ago
+from otp_event_store import open_otp_store
 
 conn = get_connection()
 cursor = conn.cursor()
 
-def extract_otp_email(event_data):
-    match = re.search(r'"email",\s*"([^"]+)"', str(event_data))
-    if match:
-        return match.group(1)
-    return None
-
 # Get recent OTP events to email (last 60 days)
 print("Finding OTP events sent to email (last 60 days)...")
 print("=" * 70)
 
-cursor.execute("""
-    SELECT muid, userName, eventData, activityDate
-    FROM fraudmonitor
-    WHERE eventCategory = 'OTP Authentication'
-    AND eventData LIKE '%%"email"%%'
-    AND activityDate > DATE_SUB(NOW(), INTERVAL 60 DAY)
-    ORDER BY activityDate DESC
-    LIMIT 500
-""")
-otp_events = cursor.fetchall()
+otp_start = days_ago(60)
+otp_store = open_otp_store(since=otp_start)
+otp_events = otp_store.email_events(start=otp_start, newest_first=True, limit=500)
+otp_store.close()
 print(f"Found {len(otp_events)} OTP email events\n")
 
 # Build list of unique muid/email combinations
 otp_cases = {}
-for muid, username, event_data, activity_date in otp_events:
-    otp_email = extract_otp_email(event_data)
-    if otp_email and muid:
-        key = (muid, otp_email)
+for event in otp_events:
+    otp_email = event.masked_contact
+    if otp_email and event.muid:
+        key = (event.muid, otp_email)
         if key not in otp_cases:
             otp_cases[key] = {
-                'muid': muid,
-                'username': username,
+                'muid': event.muid,
+                'username': event.userName,
                 'otp_email': otp_email,
-                'date': activity_date
+                'date': event.activityDate
             }
 
 print(f"Unique muid/email combinations: {len(otp_cases)}\n")
@@ -10,12 +10,13 @@ Generates comprehensive audit report for upper management investigating:
 4. Complete timeline of all member activity in PST
 """
 
-import json
-import time
-import requests
+from event_data import parse_event
+from ip_geolocation import geolocate_ips, geolocate_ip
 from datetime import datetime, timedelta
 from collections import defaultdict
 from db_connection import get_connection
+from member_timeline import open_timeline_store
+from sessionizer import sessionize
 
 MUID = '00638242923564062860'
 OUTPUT_FILE = 'AUDIT_REPORT_00638242923564062860.md'
@@ -30,111 +31,58 @@ def utc_to_pst(utc_dt):
     pst_dt = utc_dt + PST_OFFSET
     return pst_dt.strftime('%Y-%m-%d %H:%M:%S PST')
 
+def to_audit_geo(record):
+    """Reduce a shared geolocation record to the fields used in the audit report"""
+    return {
+        'country': record['country'],
+        'region': record['region'],
+        'city': record['city'],
+        'isp': record['isp'],
+        'proxy': record['proxy']
+    }
+
 def get_ip_geolocation(ip_address):
     """Get geolocation info for an IP address using ip-api.com"""
     if not ip_address or ip_address in ('N/A', 'NULL', ''):
         return {'country': 'Unknown', 'region': 'Unknown', 'city': 'Unknown', 'isp': 'Unknown', 'proxy': False}
-
-    try:
-        # Rate limit: max 45 requests per minute
-        time.sleep(0.1)
-        response = requests.get(f'http://ip-api.com/json/{ip_address}?fields=status,country,regionName,city,isp,proxy,hosting', timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('status') == 'success':
-                return {
-                    'country': data.get('country', 'Unknown'),
-                    'region': data.get('regionName', 'Unknown'),
-                    'city': data.get('city', 'Unknown'),
-                    'isp': data.get('isp', 'Unknown'),
-                    'proxy': data.get('proxy', False) or data.get('hosting', False)
-                }
-    except Exception as e:
-        print(f"  Geolocation lookup failed for {ip_address}: {e}")
-
-    return {'country': 'Unknown', 'region': 'Unknown', 'city': 'Unknown', 'isp': 'Unknown', 'proxy': False}
+    return to_audit_geo(geolocate_ip(ip_address))
 
 def parse_event_data(event_data, event_category):
-    """Parse eventData JSON based on event category"""
+    """Parse eventData JSON based on event category (layouts live in event_data.py)"""
     if not event_data:
         return {}
 
-    try:
-        if isinstance(event_data, str):
-            data = json.loads(event_data)
-        else:
-            data = event_data
-
-        if not isinstance(data, list):
-            return {'raw': str(data)}
-
-        # Parse based on event category
-        if event_category in ('LoginSuccessful', 'LoginFailure'):
-            # ["primary_email", "alt_email", "phone1", "phone2", "phone3", "account"]
-            return {
-                'primary_email': data[0] if len(data) > 0 else None,
-                'alt_email': data[1] if len(data) > 1 else None,
-                'phone1': data[2] if len(data) > 2 else None,
-                'phone2': data[3] if len(data) > 3 else None,
-                'phone3': data[4] if len(data) > 4 else None,
-                'account': data[5] if len(data) > 5 else None,
-            }
-        elif 'OTP' in event_category:
-            # ["method", "masked_phone", null, "full_phone", "status"]
-            return {
-                'method': data[0] if len(data) > 0 else None,
-                'masked_phone': data[1] if len(data) > 1 else None,
-                'full_phone': data[3] if len(data) > 3 else None,
-                'status': data[4] if len(data) > 4 else None,
-            }
-        elif 'Change' in event_category or 'email' in event_category.lower():
-            # ["field_name", "new_value", "action"]
-            return {
-                'field': data[0] if len(data) > 0 else None,
-                'new_value': data[1] if len(data) > 1 else None,
-                'action': data[2] if len(data) > 2 else None,
-            }
-        elif event_category == 'New Device Register':
-            return {
-                'device_id': data[0] if len(data) > 0 else None,
-                'device_type': data[1] if len(data) > 1 else None,
-            }
-        else:
-            return {'raw': data}
-    except Exception as e:
-        return {'parse_error': str(e), 'raw': str(event_data)}
+    event = parse_event(event_category, event_data)
+    if event.kind == 'otp':
+        # ["method", "masked_phone", null, "full_phone", "status"]
+        return {
+            'method': event.method,
+            'masked_phone': event.masked_contact,
+            'full_phone': event.contact,
+            'status': event.status,
+        }
+    return event.as_dict()
 
 def query_fraudmonitor():
-    """Query all fraudmonitor records for this MUID"""
-    print(f"Querying fraudmonitor for MUID {MUID}...")
+    """Load this member's full fraudmonitor timeline (local store, older history from production)"""
+    print(f"Loading fraudmonitor timeline for MUID {MUID}...")
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    query = """
-    SELECT activityDate, eventCategory, eventData, ipAddress, platform,
-           platformOS, browser, sessionid, userName, masterMembership
-    FROM fraudmonitor
-    WHERE muid = %s
-    ORDER BY activityDate ASC
-    """
-
-    cursor.execute(query, (MUID,))
-    results = cursor.fetchall()
+    # Follow the MUID's usernames too, so events logged without a muid
+    # (failed logins before authentication) land in the same timeline
+    store = open_timeline_store()
+    timeline = store.timeline(muid=MUID, link=('muid', 'userName'), full_history=True)
+    store.close()
 
     columns = ['activityDate', 'eventCategory', 'eventData', 'ipAddress', 'platform',
                'platformOS', 'browser', 'sessionid', 'userName', 'masterMembership']
 
     records = []
-    for row in results:
-        record = dict(zip(columns, row))
+    for event in timeline:
+        record = {column: getattr(event, column) for column in columns}
         record['parsed_data'] = parse_event_data(record['eventData'], record['eventCategory'])
         records.append(record)
 
-    cursor.close()
-    conn.close()
-
-    print(f"  Found {len(records)} fraudmonitor records")
+    print(f"  Found {len(records)} fraudmonitor records ({timeline.describe()})")
     return records
 
 def query_alerthistory(username):
@@ -417,6 +365,24 @@ def generate_report(fraud_records, alert_records, ip_geo_cache):
         report.append(f"\n*Showing last 50 of {len(login_events)} login events*")
     report.append("")
 
+    # Session view: one row per online banking session that logged in,
+    # failed a login, sent an OTP or changed contact details
+    sessions = sorted((s for s in sessionize(fraud_records)
+                       if s.logins_ok or s.logins_failed or s.otps_sent or s.contact_changes),
+                      key=lambda s: s.start)
+
+    report.append("### Sessions")
+    report.append("")
+    report.append("| Start (PST) | Minutes | Events | Logins OK / Failed | OTPs Sent | Contact Changes | IP Addresses | Platform |")
+    report.append("|-------------|---------|--------|--------------------|-----------|-----------------|--------------|----------|")
+
+    for s in sessions[-50:]:
+        report.append(f"| {utc_to_pst(s.start)} | {s.duration_s / 60:.1f} | {s.events} | {s.logins_ok} / {s.logins_failed} | {s.otps_sent} | {s.contact_changes} | {', '.join(s.ips)} | {s.platform} |")
+
+    if len(sessions) > 50:
+        report.append(f"\n*Showing last 50 of {len(sessions)} sessions*")
+    report.append("")
+
     # Profile Changes
     report.append("---")
     report.append("## 6. Profile Changes")
@@ -580,10 +546,8 @@ def main():
         if r['ipAddress']:
             unique_ips.add(r['ipAddress'])
 
-    ip_geo_cache = {}
-    for i, ip in enumerate(unique_ips, 1):
-        print(f"  [{i}/{len(unique_ips)}] Looking up {ip}...")
-        ip_geo_cache[ip] = get_ip_geolocation(ip)
+    print(f"  Looking up {len(unique_ips)} unique IPs (batched)...")
+    ip_geo_cache = {ip: to_audit_geo(record) for ip, record in geolocate_ips(unique_ips).items()}
 
     # Step 4: Generate report
     print("\nGenerating audit report...")
@@ -14,6 +14,10 @@ import os
 from datetime import datetime, timedelta
 from dwha_connection import get_dwha_connection
 from db_connection import get_connection as get_mysql_connection
+from connection_pool import print_pool_stats
+from stats_frame import load_stats_frame
+from stats_cache import StatsHistoryCache
+from query_plan import QueryPlan, run_with_cursor
 
 try:
     import pandas as pd
@@ -26,6 +30,22 @@ except ImportError:
     exit(1)
 
 
+# First month covered by the YoY report (and the shared stats frame)
+REPORT_START_DATE = '2024-01-01'
+
+# Months of history the standalone PIT report loads to find the latest two
+PIT_LOOKBACK_MONTHS = 6
+
+# Serve stat history from the local cache (stats_cache.py) and only fetch
+# rows newer than its high-water mark. Set False to always read DWHA directly.
+USE_STATS_CACHE = True
+
+# Max concurrent report queries per server (see query_plan.py)
+QUERY_SOURCE_LIMITS = {
+    'dwha': 2,
+    'dbxdb': 2,
+}
+
 # Section definitions with stat codes
 ACTIVE_SECTIONS = {
     "1. Core Membership": {
@@ -302,193 +322,98 @@ def get_monthly_login_stats_from_fraudmonitor(year, start_month=1, end_month=12)
         return {'NewLogins': {}, 'NewActUsr': {}}
 
 
-def get_stat_data(cursor, stat_codes, start_date, end_date):
-    """Query stat data for a list of stat codes."""
-    stats_str = "', '".join(stat_codes)
-    query = f"""
-    SELECT
-        s.digitalstat,
-        d.StatDesc,
-        s.AsOfDate,
-        s.[COUNT]
-    FROM SymWarehouse.History.DigitalChannelsMemberStatsSummary s WITH (NOLOCK)
-    LEFT JOIN SymWarehouse.Lookup.digitalstats d ON d.DigitalStat = s.digitalstat
-    WHERE s.AsOfDate BETWEEN '{start_date}' AND '{end_date}'
-    AND s.digitalstat IN ('{stats_str}')
-    ORDER BY s.digitalstat, s.AsOfDate DESC
-    """
-    cursor.execute(query)
-    # Convert pyodbc.Row objects to tuples for pandas compatibility
-    return [tuple(row) for row in cursor.fetchall()]
-
-
-def pivot_to_monthly(data, stat_descriptions):
-    """Convert raw data to monthly pivot format."""
-    if not data:
-        return pd.DataFrame()
+def collect_stat_codes(sections):
+    """Flatten the stat codes of a section dict into one ordered list."""
+    stat_codes = []
+    for section, config in sections.items():
+        stat_codes.extend(config.get("stats", []))
+    return stat_codes
 
-    df = pd.DataFrame(data, columns=['StatCode', 'Description', 'AsOfDate', 'Count'])
-    df['AsOfDate'] = pd.to_datetime(df['AsOfDate'])
-    df['Month'] = df['AsOfDate'].dt.strftime('%Y-%m')
-
-    # Use our descriptions, fallback to database description
-    df['Description'] = df['StatCode'].map(
-        lambda x: stat_descriptions.get(x, x)
-    )
 
-    # Pivot table: rows = metrics, columns = months
-    pivot = df.pivot_table(
-        index=['StatCode', 'Description'],
-        columns='Month',
-        values='Count',
-        aggfunc='first'
-    ).reset_index()
-
-    # Sort columns chronologically (months)
-    month_cols = sorted([c for c in pivot.columns if c not in ['StatCode', 'Description']])
-    pivot = pivot[['StatCode', 'Description'] + month_cols]
-
-    return pivot
-
-
-def get_yearly_totals(cursor, year, stat_codes):
-    """
-    Get aggregated totals for a full year.
-
-    Args:
-        cursor: Database cursor
-        year: Year to aggregate (e.g., 2024, 2025)
-        stat_codes: List of stat codes to query
-
-    Returns:
-        dict: Stat code -> total value mapping
+def fetch_stats_frame(cursor, stat_codes, start_date):
     """
-    stats_str = "', '".join(stat_codes)
-    start_date = f"{year}-01-01"
-    end_date = f"{year}-12-31"
-
-    query = f"""
-    SELECT
-        s.digitalstat,
-        SUM(s.[COUNT]) AS YearlyTotal
-    FROM SymWarehouse.History.DigitalChannelsMemberStatsSummary s WITH (NOLOCK)
-    WHERE s.AsOfDate BETWEEN '{start_date}' AND '{end_date}'
-    AND s.digitalstat IN ('{stats_str}')
-    GROUP BY s.digitalstat
+    Load a StatsFrame through the local stat cache, or straight from DWHA
+    when USE_STATS_CACHE is off. cursor=None reads the cache offline.
     """
-
-    cursor.execute(query)
-    results = {}
-    for row in cursor.fetchall():
-        results[row[0]] = row[1]
-
-    return results
+    if not USE_STATS_CACHE:
+        return load_stats_frame(cursor, stat_codes, start_date)
+    with StatsHistoryCache() as cache:
+        return cache.load_frame(cursor, stat_codes, start_date)
 
 
-def get_yearly_monthly_data(cursor, year, stat_codes):
+def load_report_frame(start_date=REPORT_START_DATE, stat_codes=None):
     """
-    Get monthly data for a full year.
+    Load the stats frame shared by the YoY and PIT reports in one DWHA pass.
 
-    Args:
-        cursor: Database cursor
-        year: Year to query (e.g., 2024, 2025)
-        stat_codes: List of stat codes to query
+    Falls back to the local stat cache when DWHA is unreachable.
 
     Returns:
-        dict: Nested dict where result[stat_code][month] = value
-              month is 1-12
+        StatsFrame, or None if neither DWHA nor the cache has data
     """
-    stats_str = "', '".join(stat_codes)
-    start_date = f"{year}-01-01"
-    end_date = f"{year}-12-31"
-
-    query = f"""
-    SELECT
-        s.digitalstat,
-        MONTH(s.AsOfDate) AS Month,
-        s.[COUNT]
-    FROM SymWarehouse.History.DigitalChannelsMemberStatsSummary s WITH (NOLOCK)
-    WHERE s.AsOfDate BETWEEN '{start_date}' AND '{end_date}'
-    AND s.digitalstat IN ('{stats_str}')
-    ORDER BY s.digitalstat, MONTH(s.AsOfDate)
+    stat_codes = stat_codes or collect_stat_codes(ACTIVE_SECTIONS)
+    print(f"\nLoading DWHA stats since {start_date} (single pass)...")
+    try:
+        conn = get_dwha_connection()
+        cursor = conn.cursor()
+        frame = fetch_stats_frame(cursor, stat_codes, start_date)
+        cursor.close()
+        conn.close()
+    except Exception as e:
+        print(f"  WARNING: Could not load stats from DWHA: {e}")
+        if not USE_STATS_CACHE:
+            return None
+        frame = fetch_stats_frame(None, stat_codes, start_date)
+        if not len(frame):
+            print("  ERROR: Stat cache is empty - run once with DWHA available")
+            return None
+    print(f"  Loaded {len(frame):,} rows for {len(frame.stat_codes())} metrics")
+    return frame
+
+
+def pit_lookback_start():
+    """First day of the month PIT_LOOKBACK_MONTHS months before this one."""
+    lookback_start = datetime.now().replace(day=1)
+    for _ in range(PIT_LOOKBACK_MONTHS):
+        lookback_start = (lookback_start - timedelta(days=1)).replace(day=1)
+    return lookback_start.strftime('%Y-%m-%d')
+
+
+def gather_report_inputs(stats_start=REPORT_START_DATE, stat_codes=None, include_login_stats=True):
     """
+    Run every query a report needs concurrently across DWHA and dbxdb.
 
-    cursor.execute(query)
-    results = {}
-    for row in cursor.fetchall():
-        stat_code = row[0]
-        month = row[1]
-        value = row[2]
-
-        if stat_code not in results:
-            results[stat_code] = {}
-        results[stat_code][month] = value
-
-    return results
-
-
-def get_latest_two_months_data(cursor, stat_codes):
-    """
-    Get data for the latest two months.
+    The stats frame and enrollment count (DWHA) and the fraudmonitor login
+    queries (dbxdb) are independent, so they run as one QueryPlan and the
+    report waits only for the slowest of them.
 
     Args:
-        cursor: Database cursor
-        stat_codes: List of stat codes to query
+        stats_start: First AsOfDate to load into the stats frame
+        stat_codes: Stat codes for the frame (default: all active sections)
+        include_login_stats: Also fetch Nov-Dec 2025 fraudmonitor login stats
 
     Returns:
-        tuple: (latest_month_data, prior_month_data, latest_month_name, prior_month_name)
-    """
-    stats_str = "', '".join(stat_codes)
-
-    # First get the two most recent distinct months
-    date_query = """
-    SELECT DISTINCT TOP 2
-        YEAR(AsOfDate) AS Year,
-        MONTH(AsOfDate) AS Month,
-        MAX(AsOfDate) AS MaxDate
-    FROM SymWarehouse.History.DigitalChannelsMemberStatsSummary WITH (NOLOCK)
-    GROUP BY YEAR(AsOfDate), MONTH(AsOfDate)
-    ORDER BY MaxDate DESC
-    """
-    cursor.execute(date_query)
-    months = cursor.fetchall()
-
-    if len(months) < 2:
-        return {}, {}, "N/A", "N/A"
-
-    latest_year, latest_month = months[0][0], months[0][1]
-    prior_year, prior_month = months[1][0], months[1][1]
-
-    latest_month_name = f"{datetime(latest_year, latest_month, 1).strftime('%b %Y')}"
-    prior_month_name = f"{datetime(prior_year, prior_month, 1).strftime('%b %Y')}"
-
-    # Get latest month data
-    latest_query = f"""
-    SELECT
-        s.digitalstat,
-        s.[COUNT]
-    FROM SymWarehouse.History.DigitalChannelsMemberStatsSummary s WITH (NOLOCK)
-    WHERE YEAR(s.AsOfDate) = {latest_year}
-    AND MONTH(s.AsOfDate) = {latest_month}
-    AND s.digitalstat IN ('{stats_str}')
+        dict: frame, enrollment_count, active_users_120d and (optionally)
+              login_stats_2025; failed queries come back as None
     """
-    cursor.execute(latest_query)
-    latest_data = {row[0]: row[1] for row in cursor.fetchall()}
-
-    # Get prior month data
-    prior_query = f"""
-    SELECT
-        s.digitalstat,
-        s.[COUNT]
-    FROM SymWarehouse.History.DigitalChannelsMemberStatsSummary s WITH (NOLOCK)
-    WHERE YEAR(s.AsOfDate) = {prior_year}
-    AND MONTH(s.AsOfDate) = {prior_month}
-    AND s.digitalstat IN ('{stats_str}')
-    """
-    cursor.execute(prior_query)
-    prior_data = {row[0]: row[1] for row in cursor.fetchall()}
-
-    return latest_data, prior_data, latest_month_name, prior_month_name
+    print("\nRunning report queries concurrently...")
+    plan = QueryPlan(QUERY_SOURCE_LIMITS)
+    plan.add('frame', 'dwha', load_report_frame, stats_start, stat_codes)
+    plan.add('enrollment_count', 'dwha', run_with_cursor, get_dwha_connection, get_enrollment_count)
+    plan.add('active_users_120d', 'dbxdb', calculate_active_users_from_fraudmonitor, days=120)
+    if include_login_stats:
+        plan.add('login_stats_2025', 'dbxdb', get_monthly_login_stats_from_fraudmonitor,
+                 2025, start_month=11, end_month=12)
+
+    inputs = plan.run()
+    plan.print_timings()
+
+    if inputs.get('enrollment_count'):
+        print(f"  Total Enrolled: {inputs['enrollment_count']:,}")
+    if inputs.get('active_users_120d'):
+        print(f"  Active Users (120-day): {inputs['active_users_120d']:,} (from fraudmonitor.LoginSuccessful)")
+    else:
+        print("  WARNING: Could not calculate active users from fraudmonitor")
+    return inputs
 
 
 def format_change(current, prior):
@@ -506,7 +431,7 @@ def format_change(current, prior):
     return change, f"{pct_change:+.1f}%"
 
 
-def export_yoy_report(output_file):
+def export_yoy_report(output_file, inputs=None):
     """
     Export Year-over-Year comparison report with full monthly breakdown.
 
@@ -515,40 +440,41 @@ def export_yoy_report(output_file):
     - Sheet 2: Monthly Comparison (all 12 months side-by-side)
     - Sheet 3: 2024 Data Only
     - Sheet 4: 2025 Data Only
+
+    Args:
+        output_file: Path of the workbook to write
+        inputs: Optional results of gather_report_inputs() (stats frame from
+                2024 onward plus login stats); gathered here when not supplied
     """
     print("\n" + "-" * 60)
     print("GENERATING YEAR-OVER-YEAR REPORT (FULL MONTHLY COMPARISON)")
     print("-" * 60)
 
-    # Connect to DWHA
-    print("\nConnecting to DWHA...")
-    try:
-        conn = get_dwha_connection()
-        cursor = conn.cursor()
-        print("  Connected successfully")
-    except Exception as e:
-        print(f"  ERROR: Could not connect to DWHA: {e}")
-        return False
-
     # Collect all stat codes
-    all_stats = []
-    for section, config in ACTIVE_SECTIONS.items():
-        all_stats.extend(config.get("stats", []))
+    all_stats = collect_stat_codes(ACTIVE_SECTIONS)
+
+    # One range scan covers both years, the YTD totals and MbrCnt; the
+    # fraudmonitor queries run alongside it
+    if inputs is None:
+        inputs = gather_report_inputs(REPORT_START_DATE, all_stats, include_login_stats=True)
+    frame = inputs.get('frame')
+    if frame is None:
+        print("  ERROR: No stat data available (DWHA unreachable and cache empty)")
+        return False
 
-    # Get monthly data for both years
-    print("\nQuerying 2024 monthly data...")
-    monthly_2024 = get_yearly_monthly_data(cursor, 2024, all_stats)
-    print(f"  Retrieved {len(monthly_2024)} metrics for 2024")
+    monthly_2024 = frame.monthly(2024, all_stats)
+    print(f"\n  Retrieved {len(monthly_2024)} metrics for 2024")
 
-    print("\nQuerying 2025 monthly data...")
-    monthly_2025 = get_yearly_monthly_data(cursor, 2025, all_stats)
+    monthly_2025 = frame.monthly(2025, all_stats)
     print(f"  Retrieved {len(monthly_2025)} metrics for 2025")
 
     # HYBRID DATA SOURCE: Override Nov-Dec 2025 with fraudmonitor data for login stats
     # LoginSuccessful events were added to fraudmonitor on October 28, 2025,
     # making it the accurate source for Nov-Dec 2025 login data
     print("\nUsing fraudmonitor for Nov-Dec 2025 login stats...")
-    fraudmonitor_2025 = get_monthly_login_stats_from_fraudmonitor(2025, start_month=11, end_month=12)
+    fraudmonitor_2025 = inputs.get('login_stats_2025')
+    if fraudmonitor_2025 is None:
+        fraudmonitor_2025 = get_monthly_login_stats_from_fraudmonitor(2025, start_month=11, end_month=12)
 
     # Merge: Replace months 11 and 12 for NewActUsr and NewLogins
     hybrid_stats = ['NewActUsr', 'NewLogins']
@@ -563,10 +489,9 @@ def export_yoy_report(output_file):
                     monthly_2025[stat_code][month] = new_val
                     print(f"  {stat_code} month {month}: DWHA={old_val:,} -> fraudmonitor={new_val:,}")
 
-    # Get yearly totals for YTD comparison
-    print("\nQuerying yearly totals...")
-    totals_2024 = get_yearly_totals(cursor, 2024, all_stats)
-    totals_2025 = get_yearly_totals(cursor, 2025, all_stats)
+    # Yearly totals for YTD comparison
+    totals_2024 = frame.yearly_totals(2024, all_stats)
+    totals_2025 = frame.yearly_totals(2025, all_stats)
 
     # Recalculate 2025 YTD totals for hybrid stats (NewActUsr, NewLogins)
     # Sum all 12 months from the merged monthly_2025 data
@@ -578,28 +503,11 @@ def export_yoy_report(output_file):
             if old_total != recalc_total:
                 print(f"  {stat_code} YTD recalculated: {old_total:,} -> {recalc_total:,}")
 
-    # Get enrollment counts
-    print("\nGetting enrollment data...")
-    enrollment_count = get_enrollment_count(cursor)
-
-    # Get member count
-    cursor.execute("""
-        SELECT TOP 1 [COUNT]
-        FROM SymWarehouse.History.DigitalChannelsMemberStatsSummary WITH (NOLOCK)
-        WHERE digitalstat = 'MbrCnt'
-        ORDER BY AsOfDate DESC
-    """)
-    row = cursor.fetchone()
-    member_count = row[0] if row else 0
-
-    cursor.close()
-    conn.close()
-
-    # Calculate active users from fraudmonitor (live data)
-    print("\nCalculating active users from fraudmonitor (120-day)...")
-    active_users_120d = calculate_active_users_from_fraudmonitor(days=120)
-    if active_users_120d:
-        print(f"  Active Users (120-day): {active_users_120d:,}")
+    enrollment_count = inputs.get('enrollment_count')
+    active_users_120d = inputs.get('active_users_120d')
+
+    # Member count (latest MbrCnt in the frame)
+    member_count = frame.latest_value('MbrCnt') or 0
 
     # Create Excel workbook
     print("\nCreating YoY Excel workbook...")
@@ -950,59 +858,42 @@ def export_yoy_report(output_file):
     return True
 
 
-def export_pit_report(output_file):
+def export_pit_report(output_file, inputs=None):
     """
     Export Point-in-Time snapshot report.
 
     Compares latest month vs prior month.
+
+    Args:
+        output_file: Path of the workbook to write
+        inputs: Optional results of gather_report_inputs(); when not supplied
+                the last PIT_LOOKBACK_MONTHS months are loaded alongside the
+                enrollment and fraudmonitor queries
     """
     print("\n" + "-" * 60)
     print("GENERATING POINT-IN-TIME REPORT")
     print("-" * 60)
 
-    # Connect to DWHA
-    print("\nConnecting to DWHA...")
-    try:
-        conn = get_dwha_connection()
-        cursor = conn.cursor()
-        print("  Connected successfully")
-    except Exception as e:
-        print(f"  ERROR: Could not connect to DWHA: {e}")
-        return False
-
     # Collect all stat codes
-    all_stats = []
-    for section, config in ACTIVE_SECTIONS.items():
-        all_stats.extend(config.get("stats", []))
+    all_stats = collect_stat_codes(ACTIVE_SECTIONS)
 
-    # Get latest two months data
-    print("\nQuerying latest two months of data...")
-    latest_data, prior_data, latest_month, prior_month = get_latest_two_months_data(cursor, all_stats)
+    if inputs is None:
+        inputs = gather_report_inputs(pit_lookback_start(), all_stats, include_login_stats=False)
+    frame = inputs.get('frame')
+    if frame is None:
+        print("  ERROR: No stat data available (DWHA unreachable and cache empty)")
+        return False
+
+    # Latest two months, derived locally
+    latest_data, prior_data, latest_month, prior_month = frame.latest_two_months(all_stats)
     print(f"  Latest month: {latest_month} ({len(latest_data)} metrics)")
     print(f"  Prior month: {prior_month} ({len(prior_data)} metrics)")
 
-    # Get enrollment counts
-    print("\nGetting enrollment data...")
-    enrollment_count = get_enrollment_count(cursor)
-
-    # Get member count
-    cursor.execute("""
-        SELECT TOP 1 [COUNT]
-        FROM SymWarehouse.History.DigitalChannelsMemberStatsSummary WITH (NOLOCK)
-        WHERE digitalstat = 'MbrCnt'
-        ORDER BY AsOfDate DESC
-    """)
-    row = cursor.fetchone()
-    member_count = row[0] if row else 0
-
-    cursor.close()
-    conn.close()
-
-    # Calculate active users from fraudmonitor (live data)
-    print("\nCalculating active users from fraudmonitor (120-day)...")
-    active_users_120d = calculate_active_users_from_fraudmonitor(days=120)
-    if active_users_120d:
-        print(f"  Active Users (120-day): {active_users_120d:,}")
+    enrollment_count = inputs.get('enrollment_count')
+    active_users_120d = inputs.get('active_users_120d')
+
+    # Member count (latest MbrCnt in the frame)
+    member_count = frame.latest_value('MbrCnt') or 0
 
     # Create Excel workbook
     print("\nCreating PIT Excel workbook...")
@@ -1281,63 +1172,33 @@ def export_to_excel(output_file):
 
     print(f"Date range: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
 
-    # Connect to database
-    print("\nConnecting to DWHA...")
-    try:
-        conn = get_dwha_connection()
-        cursor = conn.cursor()
-        print("  Connected successfully")
-    except Exception as e:
-        print(f"  ERROR: Could not connect to DWHA: {e}")
+    # Active + legacy stats (and MbrCnt) in one range scan, run concurrently
+    # with the enrollment and fraudmonitor queries
+    all_active_stats = collect_stat_codes(ACTIVE_SECTIONS)
+    all_legacy_stats = collect_stat_codes(LEGACY_SECTIONS)
+    inputs = gather_report_inputs(start_date.strftime('%Y-%m-%d'), all_active_stats + all_legacy_stats,
+                                  include_login_stats=False)
+    frame = inputs.get('frame')
+    if frame is None:
+        print("  ERROR: No stat data available (DWHA unreachable and cache empty)")
         return False
 
-    # Get enrollment count
-    print("\nGetting enrollment data...")
-    enrollment_count = get_enrollment_count(cursor)
-    print(f"  Total Enrolled: {enrollment_count:,}" if enrollment_count else "  Enrollment query failed")
+    enrollment_count = inputs.get('enrollment_count')
+    active_users_120d = inputs.get('active_users_120d')
 
     # Get member count for penetration calculation
-    cursor.execute("""
-        SELECT TOP 1 [COUNT]
-        FROM SymWarehouse.History.DigitalChannelsMemberStatsSummary WITH (NOLOCK)
-        WHERE digitalstat = 'MbrCnt'
-        ORDER BY AsOfDate DESC
-    """)
-    row = cursor.fetchone()
-    member_count = row[0] if row else 0
+    member_count = frame.latest_value('MbrCnt') or 0
     print(f"  Total Members: {member_count:,}" if member_count else "  Member count query failed")
 
-    # Calculate active users from fraudmonitor (fixes frozen NewActUsr stat)
-    print("\nCalculating active users from fraudmonitor (120-day)...")
-    active_users_120d = calculate_active_users_from_fraudmonitor(days=120)
-    if active_users_120d:
-        print(f"  Active Users (120-day): {active_users_120d:,} (from fraudmonitor.LoginSuccessful)")
-    else:
-        print("  WARNING: Could not calculate active users from fraudmonitor")
-
-    # Collect all active stat codes
-    print("\nQuerying active metrics...")
-    all_active_stats = []
-    for section, config in ACTIVE_SECTIONS.items():
-        all_active_stats.extend(config.get("stats", []))
-
-    active_data = get_stat_data(cursor, all_active_stats, start_date, end_date)
-    active_df = pivot_to_monthly(active_data, STAT_DESCRIPTIONS)
+    # Pivot active and legacy metrics from the frame
+    print("\nBuilding active metrics...")
+    active_df = frame.pivot_monthly(all_active_stats, STAT_DESCRIPTIONS, start_date, end_date)
     print(f"  Retrieved {len(active_df)} active metrics")
 
-    # Collect all legacy stat codes
-    print("\nQuerying legacy metrics...")
-    all_legacy_stats = []
-    for section, config in LEGACY_SECTIONS.items():
-        all_legacy_stats.extend(config.get("stats", []))
-
-    legacy_data = get_stat_data(cursor, all_legacy_stats, start_date, end_date)
-    legacy_df = pivot_to_monthly(legacy_data, STAT_DESCRIPTIONS)
+    print("\nBuilding legacy metrics...")
+    legacy_df = frame.pivot_monthly(all_legacy_stats, STAT_DESCRIPTIONS, start_date, end_date)
     print(f"  Retrieved {len(legacy_df)} legacy metrics")
 
-    cursor.close()
-    conn.close()
-
     # Create Excel workbook
     print("\nCreating Excel workbook...")
     wb = Workbook()
@@ -1414,16 +1275,19 @@ def main():
     success_count = 0
     total_reports = 2
 
+    # One concurrent query plan (single DWHA stats scan) feeds both reports
+    inputs = gather_report_inputs(REPORT_START_DATE, include_login_stats=True)
+
     # Generate Year-over-Year Report
     yoy_file = os.path.join(base_dir, f"Digital_Services_YoY_Report_{date_str}.xlsx")
-    if export_yoy_report(yoy_file):
+    if export_yoy_report(yoy_file, inputs):
         success_count += 1
     else:
         print("  ERROR: Failed to generate YoY report")
 
     # Generate Point-in-Time Report
     pit_file = os.path.join(base_dir, f"Digital_Services_PIT_Report_{date_str}.xlsx")
-    if export_pit_report(pit_file):
+    if export_pit_report(pit_file, inputs):
         success_count += 1
     else:
         print("  ERROR: Failed to generate PIT report")
@@ -1440,6 +1304,9 @@ def main():
         print("FAILED - No reports generated")
     print("=" * 60)
 
+    print("\nConnection pool usage:")
+    print_pool_stats()
+
 
 def main_monthly():
     """Alternative entry point - generates only monthly report (legacy behavior)."""
@@ -1459,6 +1326,9 @@ def main_monthly():
         print("FAILED - Check errors above")
         print("=" * 60)
 
+    print("\nConnection pool usage:")
+    print_pool_stats()
+
 
 if __name__ == "__main__":
     main()
@@ -11,6 +11,7 @@ Output: Updated suspicious email report with wallet data and individual member t
 import pandas as pd
 from datetime import datetime
 from dwha_connection import get_dwha_connection
+from key_list_query import query_by_keys
 
 # Path to suspicious emails report
 SUSPICIOUS_EMAILS_FILE = r"C:\Users\kgreeven\Desktop\SUSPICIOUS_EMAILS_REPORT_20260116.xlsx"
@@ -46,9 +47,7 @@ def query_member_addresses(conn, member_numbers):
     if not member_numbers:
         return pd.DataFrame()
 
-    in_clause = ",".join([f"'{m}'" for m in member_numbers])
-
-    query = f"""
+    query = """
     SELECT DISTINCT
         RTRIM(ParentAccount) AS AccountNumber,
         RTRIM(First) AS FirstName_DWHA,
@@ -64,12 +63,12 @@ def query_member_addresses(conn, member_numbers):
         OpenDate
     FROM History.AccountName an
     INNER JOIN History.Account a ON an.ParentAccount = a.AccountNumber
-    WHERE an.ParentAccount IN ({in_clause})
+    WHERE an.ParentAccount IN ({keys})
       AND an.AcctNameType = 0  -- Primary name record
     """
 
     print("Querying member addresses...")
-    return pd.read_sql(query, conn)
+    return query_by_keys(conn, query, member_numbers)
 
 
 def query_wallet_activations(conn, member_numbers):
@@ -77,9 +76,7 @@ def query_wallet_activations(conn, member_numbers):
     if not member_numbers:
         return pd.DataFrame()
 
-    in_clause = ",".join([f"'{m}'" for m in member_numbers])
-
-    query = f"""
+    query = """
     SELECT
         RTRIM(AccountNumber) AS AccountNumber,
         WalletType,
@@ -91,12 +88,13 @@ def query_wallet_activations(conn, member_numbers):
         FileTime,
         ImportDate
     FROM History.DigitalWalletActivations
-    WHERE AccountNumber IN ({in_clause})
+    WHERE AccountNumber IN ({keys})
     ORDER BY AccountNumber, ActivationDate DESC
     """
 
     print("Querying wallet activations...")
-    return pd.read_sql(query, conn)
+    return query_by_keys(conn, query, member_numbers,
+                         sort_by=['AccountNumber', 'ActivationDate'], ascending=[True, False])
 
 
 def query_wallet_transactions(conn, member_numbers):
@@ -104,9 +102,7 @@ def query_wallet_transactions(conn, member_numbers):
     if not member_numbers:
         return pd.DataFrame()
 
-    in_clause = ",".join([f"'{m}'" for m in member_numbers])
-
-    query = f"""
+    query = """
     SELECT
         RTRIM(AccountNumber) AS AccountNumber,
         WalletType,
@@ -120,12 +116,13 @@ def query_wallet_transactions(conn, member_numbers):
         FileTime,
         ImportDate
     FROM History.DigitalWalletTransactions
-    WHERE AccountNumber IN ({in_clause})
+    WHERE AccountNumber IN ({keys})
     ORDER BY AccountNumber, LocalTransactionDate DESC
     """
 
     print("Querying wallet transactions...")
-    return pd.read_sql(query, conn)
+    return query_by_keys(conn, query, member_numbers,
+                         sort_by=['AccountNumber', 'LocalTransactionDate'], ascending=[True, False])
 
 
 def create_wallet_summary_columns(activations_df, transactions_df, member):
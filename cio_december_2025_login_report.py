@@ -4,136 +4,85 @@ CIO December 2025 Login Report
 Generates summary report of digital banking logins with geographic demographics
 """
 
-import pandas as pd
 from datetime import datetime
-import requests
-import time
-import json
-import os
-from db_connection import get_connection
+from fraudmonitor_scan import FraudmonitorScan, PARALLEL_WORKERS
+from ip_geolocation import geolocate_ips, estimate_minutes, clean_ip, is_public_ip
+from ip_cache_store import get_default_store
+from ip_range_index import get_default_index
 
 # Configuration
 START_DATE = '2025-12-01 00:00:00'
 END_DATE = '2026-01-01 00:00:00'
-IP_CACHE_FILE = 'ip_cache_dec2025.json'
+IP_CACHE_FILE = 'ip_cache_dec2025.json'  # legacy JSON cache, imported into ip_geo_cache.db
 OUTPUT_FILE = 'CIO_December_2025_Login_Report.md'
+OFFLINE_GEO = False  # True = no provider calls; only the range index and cache answer
 
 def load_ip_cache():
-    """Load IP cache from file if exists"""
-    if os.path.exists(IP_CACHE_FILE):
-        try:
-            with open(IP_CACHE_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            pass
-    return {}
-
-def save_ip_cache(cache):
-    """Save IP cache to file"""
-    with open(IP_CACHE_FILE, 'w') as f:
-        json.dump(cache, f)
-
-def get_ip_geolocation(ip_address, ip_cache):
-    """Get geographic information for IP address with caching"""
-    if ip_address in ip_cache:
-        return ip_cache[ip_address]
-
-    try:
-        response = requests.get(
-            f'http://ip-api.com/json/{ip_address}',
-            timeout=2
-        )
-
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('status') == 'success':
-                result = {
-                    'country': data.get('country', 'Unknown'),
-                    'region': data.get('regionName', 'Unknown'),
-                    'city': data.get('city', 'Unknown'),
-                    'isp': data.get('isp', 'Unknown')
-                }
-                ip_cache[ip_address] = result
-                return result
-
-        time.sleep(1.5)  # Rate limit
-    except Exception as e:
-        pass
-
-    # Default for failed lookups
-    default = {
-        'country': 'Unknown',
-        'region': 'Unknown',
-        'city': 'Unknown',
-        'isp': 'Unknown'
+    """Open the shared geolocation cache, importing the legacy JSON cache once"""
+    store = get_default_store()
+    imported = store.import_json(IP_CACHE_FILE)
+    if imported:
+        print(f"      Imported {imported:,} entries from {IP_CACHE_FILE} into {store.path}")
+    return store
+
+def to_cache_entry(record):
+    """Reduce a shared geolocation record to the fields this report caches"""
+    return {
+        'country': record['country'],
+        'region': record['region'],
+        'city': record['city'],
+        'isp': record['isp']
     }
-    ip_cache[ip_address] = default
-    return default
 
 def fetch_login_data():
     """Fetch December 2025 login data from database"""
     print("\n[1/4] Connecting to database...")
-    conn = get_connection()
-    print("      Connected to dbxdb on infinity-9ix.calcoastcu.org")
+    print("      Streaming from dbxdb on infinity-9ix.calcoastcu.org")
 
     print("\n[2/4] Fetching December 2025 login data...")
 
-    query = """
-    SELECT
-        userName,
-        activityDate,
-        platform,
-        ipAddress,
-        browser
-    FROM fraudmonitor
-    WHERE eventCategory = 'LoginSuccessful'
-      AND activityDate >= %s
-      AND activityDate < %s
-    """
-
-    df = pd.read_sql(query, conn, params=[START_DATE, END_DATE])
-
-    cursor = conn.cursor()
-    cursor.close()
-    conn.close()
+    # Day slices read concurrently on several connections, merged back in date
+    # order; only the report's columns are read
+    scan = FraudmonitorScan(
+        columns=('userName', 'activityDate', 'platform', 'ipAddress', 'browser'),
+        categories=['LoginSuccessful'],
+        start=START_DATE, end=END_DATE, partition='day', workers=PARALLEL_WORKERS,
+        batch_size=20000, label='december logins')
+    df = scan.to_frame()
 
     return df
 
-def process_ips(df, ip_cache):
+def process_ips(df, store):
     """Process unique IPs for geolocation"""
     unique_ips = df['ipAddress'].dropna().unique()
     total_ips = len(unique_ips)
 
-    # Find IPs not in cache
-    uncached_ips = [ip for ip in unique_ips if ip not in ip_cache]
-    cached_count = total_ips - len(uncached_ips)
+    # Same order geolocate_ips uses: the shared cache (unexpired entries) first,
+    # then the offline range index for public IPs the cache has no entry for
+    canonical = {ip: clean_ip(ip) for ip in unique_ips}
+    index = get_default_index()
+    cached = store.get_many([ip for ip in canonical.values() if ip])
+    indexed = index.lookup_many([ip for ip in canonical.values()
+                                 if ip and ip not in cached and is_public_ip(ip)]) if index else {}
+    uncached_count = sum(1 for ip in canonical.values() if ip and ip not in cached and ip not in indexed)
 
     print(f"\n[3/4] Processing IP geolocation...")
     print(f"      Total unique IPs: {total_ips:,}")
-    print(f"      Already cached: {cached_count:,}")
-    print(f"      Need to lookup: {len(uncached_ips):,}")
+    print(f"      Already cached: {len(cached):,}")
+    print(f"      Range index hits: {len(indexed):,}")
+    print(f"      Need to lookup: {uncached_count:,}")
 
-    if len(uncached_ips) > 0:
-        print(f"\n      Processing uncached IPs (1.5s delay per request)...")
-        print(f"      Estimated time: {len(uncached_ips) * 1.5 / 60:.1f} minutes")
+    if uncached_count > 0 and not OFFLINE_GEO:
+        print(f"\n      Geolocating uncached IPs in batches (rate-limited, concurrent)...")
+        print(f"      Estimated time: {estimate_minutes(uncached_count):.1f} minutes")
         print()
 
-        for i, ip in enumerate(uncached_ips):
-            get_ip_geolocation(ip, ip_cache)
+    # Cached/index IPs are answered locally; new results are upserted as they arrive
+    records = geolocate_ips(unique_ips, cache=store, index=index, offline=OFFLINE_GEO)
+    if uncached_count > 0 and not OFFLINE_GEO:
+        print(f"      Complete! Cache updated: {store.path}")
 
-            # Progress update every 100 IPs
-            if (i + 1) % 100 == 0:
-                pct = (i + 1) / len(uncached_ips) * 100
-                remaining = (len(uncached_ips) - i - 1) * 1.5 / 60
-                print(f"      Progress: {i + 1:,}/{len(uncached_ips):,} ({pct:.1f}%) - {remaining:.1f} min remaining")
-                # Save cache periodically
-                save_ip_cache(ip_cache)
-
-        # Final save
-        save_ip_cache(ip_cache)
-        print(f"      Complete! Cache saved to {IP_CACHE_FILE}")
-
-    return ip_cache
+    return {ip: to_cache_entry(record) for ip, record in records.items()}
 
 def generate_report(df, ip_cache):
     """Generate the CIO report"""
@@ -151,8 +100,8 @@ def generate_report(df, ip_cache):
     platform_stats.columns = ['platform', 'total_logins', 'unique_members']
 
     # Add geolocation to dataframe
-    df['country'] = df['ipAddress'].apply(lambda x: ip_cache.get(x, {}).get('country', 'Unknown') if pd.notna(x) else 'Unknown')
-    df['region'] = df['ipAddress'].apply(lambda x: ip_cache.get(x, {}).get('region', 'Unknown') if pd.notna(x) else 'Unknown')
+    df['country'] = df['ipAddress'].map({ip: e['country'] for ip, e in ip_cache.items()}).fillna('Unknown')
+    df['region'] = df['ipAddress'].map({ip: e['region'] for ip, e in ip_cache.items()}).fillna('Unknown')
 
     # State/region breakdown (US only)
     us_logins = df[df['country'] == 'United States']
@@ -267,7 +216,7 @@ def generate_report(df, ip_cache):
 - **Data Source:** dbxdb.fraudmonitor table
 - **Event Type:** LoginSuccessful
 - **Timestamps:** UTC (database storage)
-- **IP Geolocation:** ip-api.com (state/region level)
+- **IP Geolocation:** ip-api.com (state/region level), cached in ip_geo_cache.db
 - **LoginSuccessful events:** Available since October 28, 2025
 - **Unknown locations:** IPs that could not be geolocated (private IPs, VPNs, etc.)
 
@@ -289,8 +238,8 @@ def main():
     print("CIO DECEMBER 2025 LOGIN REPORT - GENERATION IN PROGRESS")
     print("=" * 80)
 
-    # Load existing IP cache
-    ip_cache = load_ip_cache()
+    # Open the shared IP geolocation cache
+    store = load_ip_cache()
 
     # Fetch login data
     df = fetch_login_data()
@@ -299,7 +248,7 @@ def main():
     print(f"      Unique IP addresses: {df['ipAddress'].nunique():,}")
 
     # Process IPs for geolocation
-    ip_cache = process_ips(df, ip_cache)
+    ip_cache = process_ips(df, store)
 
     # Generate report
     report = generate_report(df, ip_cache)
@@ -5,40 +5,32 @@ Links fraudmonitor -> customer -> customercommunication via userName
 """
 
 from db_connection import get_connection
-import re
+from event_data import parse_otp_email
+from fraudmonitor_scan import FraudmonitorScan
+from profile_snapshot import open_profile_snapshot
 
 conn = get_connection()
 cursor = conn.cursor()
-
-# Extract email from eventData
-def extract_otp_email(event_data):
-    match = re.search(r'"email",\s*"([^"]+)"', str(event_data))
-    if match:
-        return match.group(1)
-    return None
+profile_snapshot = open_profile_snapshot()
 
 # Step 1: Get OTPs to suspicious domains
 print("STEP 1 - OTP events to suspicious domains (.xyz, .top, mailclone, ibande)")
 print("=" * 70)
-query = """
-SELECT DISTINCT f.muid, f.userName, f.eventData, f.activityDate
-FROM fraudmonitor f
-WHERE f.eventCategory = 'OTP Authentication'
-AND (f.eventData LIKE '%ibande%'
-     OR f.eventData LIKE '%mailclone%'
-     OR f.eventData LIKE '%zenmail.top%')
-ORDER BY f.activityDate DESC
-"""
-cursor.execute(query)
-otp_events = cursor.fetchall()
-print(f"Found {len(otp_events)} OTP events\n")
+# Only the member ids are needed here; eventData is re-read per member below
+otp_scan = FraudmonitorScan(
+    columns=('muid',),
+    categories=['OTP Authentication'],
+    where="eventData LIKE %s OR eventData LIKE %s OR eventData LIKE %s",
+    params=['%ibande%', '%mailclone%', '%zenmail.top%'],
+    label='suspicious otp events')
+unique_muids = list({record.muid for record in otp_scan.records()})
+print(f"Found {otp_scan.rows_read} OTP events\n")
 
 # Step 2: For each, find the username and check profile
 print("STEP 2 - Cross-reference with profiles")
 print("=" * 70)
 
-# Get unique muids and find their usernames
-unique_muids = list(set([r[0] for r in otp_events]))
+# Find usernames for each unique muid
 print(f"Unique members: {len(unique_muids)}\n")
 
 for muid in unique_muids:
@@ -66,7 +58,7 @@ for muid in unique_muids:
 
     otp_emails = []
     for r in otp_records:
-        email = extract_otp_email(r[0])
+        email = parse_otp_email(r[0])
         if email:
             otp_emails.append((email, r[1]))
 
@@ -74,21 +66,13 @@ for muid in unique_muids:
     for email, date in otp_emails:
         print(f"  - {email} ({date})")
 
-    # Get profile emails via customer table
+    # Get profile emails from the local profile snapshot
     profile_emails = []
     for username in usernames:
-        cursor.execute("""
-            SELECT c.id, c.FirstName, c.LastName, cc.Value
-            FROM customer c
-            LEFT JOIN customercommunication cc ON c.id = cc.Customer_id AND cc.Value LIKE '%%%%@%%%%'
-            WHERE c.UserName = %s
-        """, (username,))
-        results = cursor.fetchall()
-        for r in results:
-            if r[3]:  # has email
-                profile_emails.append(r[3])
-            if r[0]:
-                print(f"Customer record: {r[1]} {r[2]} (id: {r[0]})")
+        customer = profile_snapshot.customer(username)
+        if customer:
+            print(f"Customer record: {customer.first_name} {customer.last_name} (id: {customer.id})")
+        profile_emails.extend(profile_snapshot.emails(username=username))
 
     print(f"Profile emails:")
     if not profile_emails:
@@ -121,6 +105,7 @@ for muid in unique_muids:
 
 cursor.close()
 conn.close()
+profile_snapshot.close()
 
 print("\n")
 print("=" * 70)
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Connection Pool Module
+Bounded, reusable connection pools for dbxdb (pymysql) and DWHA (pyodbc).
+
+get_connection() and get_dwha_connection() hand out pooled connections, so
+scripts keep their usual pattern:
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    ...
+    cursor.close()
+    conn.close()      # returns the socket to the pool instead of closing it
+
+A whole board report run then reuses a handful of sockets instead of paying
+TLS + auth for every helper.
+
+Usage: py connection_pool.py   (prints pool metrics after a short self-check)
+"""
+
+import atexit
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class PooledCursor:
+    """
+    Cursor taken from a PooledConnection.
+
+    Delegates everything to the real cursor but keeps the wrapper alive, so a
+    script that drops its connection object while still reading from the
+    cursor does not have the socket handed to another thread mid-query.
+    """
+
+    def __init__(self, conn, raw):
+        self._conn = conn
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__['_raw'], name)
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._raw.close()
+        return False
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a DB-API connection checked out from a ConnectionPool.
+
+    Everything except close() and cursor() is delegated to the real
+    connection. close() hands the connection back to its pool; it is safe to
+    call more than once. Cursors hold a reference to the wrapper, so the
+    connection is only returned on garbage collection once they are gone too.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get('_raw')
+        if raw is None:
+            raise AttributeError(f"Connection already returned to pool '{self._pool.name}'")
+        return getattr(raw, name)
+
+    @property
+    def raw_connection(self):
+        """The underlying pymysql/pyodbc connection."""
+        return self._raw
+
+    def cursor(self, *args, **kwargs):
+        """Open a cursor on the underlying connection."""
+        raw = self.__dict__.get('_raw')
+        if raw is None:
+            raise AttributeError(f"Connection already returned to pool '{self._pool.name}'")
+        return PooledCursor(self, raw.cursor(*args, **kwargs))
+
+    def close(self):
+        """Return the connection to the pool."""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw)
+
+    def invalidate(self):
+        """Close the underlying connection for good (e.g. after a fatal error)."""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw, discard=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __del__(self):
+        # Scripts that forget conn.close() should not leak pool slots; live
+        # cursors keep the wrapper referenced, so this only runs after them
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe bounded pool of DB-API connections.
+
+    Args:
+        name: Pool name used in metrics output
+        connect: Zero-argument callable that opens a new raw connection
+        ping: Callable(raw_conn) that raises if the connection is dead
+        max_size: Maximum number of open connections (checked out + idle)
+        idle_timeout: Seconds an idle connection may sit before it is evicted
+        checkout_timeout: Seconds to wait for a free slot before PoolTimeout
+        reset_on_return: Roll back any open transaction when a connection is returned
+    """
+
+    def __init__(self, name, connect, ping, max_size=4, idle_timeout=300,
+                 checkout_timeout=60, reset_on_return=True):
+        self.name = name
+        self._connect = connect
+        self._ping = ping
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.reset_on_return = reset_on_return
+
+        self._idle = deque()          # (raw_conn, returned_at)
+        self._open = 0                # checked out + idle
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.metrics = {
+            'checkouts': 0,
+            'created': 0,
+            'reused': 0,
+            'reconnects': 0,
+            'evicted_idle': 0,
+            'discarded': 0,
+            'timeouts': 0,
+            'wait_total_s': 0.0,
+            'wait_max_s': 0.0,
+        }
+
+    # ------------------------------------------------------------------
+    # Checkout / return
+    # ------------------------------------------------------------------
+
+    def acquire(self, timeout=None):
+        """
+        Check out a healthy connection.
+
+        Idle connections are reused (most recently returned first) after a
+        health check; stale or broken ones are closed and replaced.
+
+        Returns:
+            PooledConnection: Connection whose close() returns it to the pool
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout(f"Pool '{self.name}' is closed")
+                self._evict_idle_locked()
+                if self._idle:
+                    raw, _ = self._idle.pop()
+                    break
+                if self._open < self.max_size:
+                    self._open += 1
+                    raw = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.metrics['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"Pool '{self.name}': no connection available after {timeout}s "
+                        f"({self.max_size} in use)"
+                    )
+                self._cond.wait(remaining)
+
+            waited = time.monotonic() - start
+            self.metrics['checkouts'] += 1
+            self.metrics['wait_total_s'] += waited
+            self.metrics['wait_max_s'] = max(self.metrics['wait_max_s'], waited)
+
+        # Network work happens outside the lock
+        try:
+            if raw is None:
+                raw = self._new_connection()
+            elif self._healthy(raw):
+                self._count('reused')
+            else:
+                self._close_quietly(raw)
+                self._count('reconnects')
+                raw = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+
+        return PooledConnection(self, raw)
+
+    def connection(self, timeout=None):
+        """
+        Same as acquire(); reads naturally as ``with pool.connection() as conn:``,
+        which returns the connection to the pool when the block exits.
+        """
+        return self.acquire(timeout)
+
+    def release(self, raw, discard=False):
+        """Return a raw connection to the pool (or close it if discard=True)."""
+        if not discard and self.reset_on_return:
+            try:
+                raw.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            if discard or self._closed:
+                self._open -= 1
+                self.metrics['discarded'] += 1 if discard else 0
+                self._cond.notify()
+                close_it = True
+            else:
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+                close_it = False
+
+        if close_it:
+            self._close_quietly(raw)
+
+    def close_all(self):
+        """Close every idle connection and refuse new checkouts."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for raw, _ in idle:
+            self._close_quietly(raw)
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def stats(self):
+        """Snapshot of pool metrics plus current open/idle counts."""
+        with self._cond:
+            snapshot = dict(self.metrics)
+            snapshot['open'] = self._open
+            snapshot['idle'] = len(self._idle)
+            snapshot['in_use'] = self._open - len(self._idle)
+        checkouts = snapshot['checkouts']
+        snapshot['wait_avg_s'] = snapshot['wait_total_s'] / checkouts if checkouts else 0.0
+        return snapshot
+
+    def print_stats(self):
+        """Print a one-line metrics summary for this pool."""
+        s = self.stats()
+        print(f"  Pool '{self.name}': checkouts={s['checkouts']:,} created={s['created']} "
+              f"reused={s['reused']:,} reconnects={s['reconnects']} evicted={s['evicted_idle']} "
+              f"wait avg={s['wait_avg_s'] * 1000:.1f}ms max={s['wait_max_s'] * 1000:.1f}ms "
+              f"open={s['open']}/{self.max_size}")
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _evict_idle_locked(self):
+        """Close connections idle longer than idle_timeout (caller holds lock)."""
+        if not self.idle_timeout:
+            return
+        now = time.monotonic()
+        # Oldest returns sit at the left of the deque
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            raw, _ = self._idle.popleft()
+            self._open -= 1
+            self.metrics['evicted_idle'] += 1
+            self._close_quietly(raw)
+
+    def _new_connection(self):
+        raw = self._connect()
+        self._count('created')
+        return raw
+
+    def _healthy(self, raw):
+        try:
+            self._ping(raw)
+            return True
+        except Exception:
+            return False
+
+    def _count(self, key):
+        with self._cond:
+            self.metrics[key] += 1
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+# ----------------------------------------------------------------------
+# Health checks
+# ----------------------------------------------------------------------
+
+def ping_mysql(raw):
+    """pymysql health check - raises if the server has gone away."""
+    raw.ping(reconnect=False)
+
+
+def ping_odbc(raw):
+    """pyodbc health check - round trips a trivial query."""
+    cursor = raw.cursor()
+    try:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+# ----------------------------------------------------------------------
+# Registry
+# ----------------------------------------------------------------------
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name, connect, ping, **kwargs):
+    """
+    Get (or lazily create) the process-wide pool registered under name.
+
+    Args:
+        name: Pool name, e.g. 'dbxdb' or 'dwha'
+        connect: Callable that opens a raw connection
+        ping: Health check callable
+        **kwargs: Passed to ConnectionPool on first creation
+
+    Returns:
+        ConnectionPool
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(name, connect, ping, **kwargs)
+            _pools[name] = pool
+        return pool
+
+
+def all_pools():
+    """Return the registered pools keyed by name."""
+    with _pools_lock:
+        return dict(_pools)
+
+
+def print_pool_stats():
+    """Print metrics for every registered pool."""
+    pools = all_pools()
+    if not pools:
+        print("  No connection pools in use")
+        return
+    for pool in pools.values():
+        pool.print_stats()
+
+
+def close_all_pools():
+    """Close idle connections in every pool (registered with atexit)."""
+    for pool in all_pools().values():
+        pool.close_all()
+
+
+atexit.register(close_all_pools)
+
+
+if __name__ == "__main__":
+    from db_connection import get_connection
+
+    print("Checking out dbxdb connections...")
+    for _ in range(3):
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.close()
+        conn.close()
+    print_pool_stats()
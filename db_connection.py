@@ -2,10 +2,15 @@
 """
 Database Connection Module
 Reusable MySQL connection for dbxdb
+
+get_connection() hands out connections from a shared pool (see
+connection_pool.py); conn.close() returns the socket to the pool.
 """
 
 import pymysql
 
+from connection_pool import get_pool, ping_mysql
+
 # MySQL configuration
 mysql_config = {
     'host': 'infinity-9ix.calcoastcu.org',
@@ -17,6 +22,24 @@ mysql_config = {
     'connect_timeout': 30,
 }
 
-def get_connection():
-    """Create and return a MySQL connection"""
+# Pool configuration
+pool_config = {
+    'max_size': 4,
+    'idle_timeout': 300,      # seconds; server wait_timeout is longer
+    'checkout_timeout': 60,
+}
+
+
+def get_raw_connection():
+    """Create and return a new, unpooled MySQL connection"""
     return pymysql.connect(**mysql_config)
+
+
+def get_mysql_pool():
+    """Return the shared dbxdb connection pool"""
+    return get_pool('dbxdb', get_raw_connection, ping_mysql, **pool_config)
+
+
+def get_connection():
+    """Check out a pooled MySQL connection (conn.close() returns it to the pool)"""
+    return get_mysql_pool().acquire()
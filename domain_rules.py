@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Email Domain Rules
+Compiled classifier for email addresses / domains against suspicious-domain rules.
+
+The export and fraud scripts used to test every address against a chain of
+any(d in email ...) loops. Here the rules are compiled once into:
+
+    - a reversed-label suffix trie for TLD / domain rules ('.ru', 'ukr.net')
+    - a leading-label table for provider rules on any TLD ('@yandex.', '@tuta.')
+    - an Aho-Corasick automaton for substring rules ('tempmail', 'mailinator')
+
+Every rule carries a label; when several rules match, the one added first
+wins, so a rule set reads top-down like the old if-chain. Domain verdicts
+are cached per distinct domain, and substring rules are screened with one
+regex pass over the whole column, so a column costs about one dict lookup
+per row.
+
+Usage:
+    from domain_rules import classify_email, classify_emails
+    classify_email('ivan@mail.ru')              # 'RUSSIAN'
+    df['Domain_Type'] = classify_emails(df['Email'])
+
+    py domain_rules.py --classify someone@tuta.io
+    py domain_rules.py --bench 200000           (emails/sec vs the old if-chain)
+"""
+
+import argparse
+import random
+import re
+import time
+from bisect import bisect_right
+from collections import deque
+
+_ANY = object()      # suffix rule: the domain or any subdomain of it
+_STRICT = object()   # suffix rule: only subdomains ('.tk' needs a label in front)
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over a fixed set of substrings.
+
+    A compiled regex alternation (finditer) screens text in C first; only
+    texts that contain at least one pattern are walked through the automaton
+    to collect every (possibly overlapping) match.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(dict.fromkeys(p.lower() for p in patterns if p))
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] = self._out[state] + (index,)
+
+        # Breadth-first failure links; outputs inherit their failure state's
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+        screen = re.compile('|'.join(re.escape(p) for p in sorted(self.patterns, key=len, reverse=True))
+                            if self.patterns else r'(?!)')
+        self._screen = screen.search
+        self.finditer = screen.finditer
+
+    def matches(self, text):
+        """
+        Return the indexes of every pattern found in text (lowercase input).
+
+        Returns:
+            set of pattern indexes (empty when nothing matches)
+        """
+        if self._screen(text) is None:
+            return set()
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class DomainRules:
+    """
+    Ordered rule set mapping an email address or bare domain to a label.
+
+    Args:
+        default: Label when no rule matches
+        blank: Label for empty / missing input
+    """
+
+    def __init__(self, default='OTHER', blank='UNKNOWN'):
+        self.default = default
+        self.blank = blank
+        self._trie = {}
+        self._leading = {}
+        self._substrings = []
+        self._priority = 0
+        self._automaton = None
+        self._domain_cache = {}
+
+    def _next_rule(self, label):
+        rule = (self._priority, label)
+        self._priority += 1
+        self._automaton = None
+        self._domain_cache.clear()
+        return rule
+
+    def add_suffix(self, suffix, label):
+        """
+        Match a domain by its trailing labels.
+
+        '.ru' matches any domain under the ru TLD; 'ukr.net' matches ukr.net
+        itself and any of its subdomains. Matching is label-aligned, so
+        'mail.ru' does not match 'gmail.ru'.
+        """
+        strict = suffix.startswith('.')
+        labels = suffix.lower().strip('.').split('.')
+        node = self._trie
+        for part in reversed(labels):
+            node = node.setdefault(part, {})
+        node.setdefault(_STRICT if strict else _ANY, self._next_rule(label))
+        return self
+
+    def add_leading_label(self, name, label):
+        """Match a domain whose first label is name, on any TLD ('yandex' -> yandex.ru, yandex.com)."""
+        self._leading.setdefault(name.lower().strip('.'), self._next_rule(label))
+        return self
+
+    def add_substring(self, pattern, label):
+        """Match pattern anywhere in the (lowercased) input."""
+        self._substrings.append((pattern.lower(), self._next_rule(label)))
+        return self
+
+    def _domain_rule(self, domain):
+        """Best (priority, label) from the suffix trie and leading-label table, or None."""
+        labels = domain.split('.')
+        best = self._leading.get(labels[0]) if len(labels) > 1 else None
+        node = self._trie
+        depth = len(labels)
+        for part in reversed(labels):
+            node = node.get(part)
+            if node is None:
+                break
+            depth -= 1
+            hit = node.get(_ANY)
+            if hit is None and depth:
+                hit = node.get(_STRICT)
+            if hit is not None and (best is None or hit < best):
+                best = hit
+        return best
+
+    def _compile(self):
+        self._automaton = AhoCorasick(p for p, _ in self._substrings)
+        index = {p: i for i, p in enumerate(self._automaton.patterns)}
+        self._substring_rules = [None] * len(self._automaton.patterns)
+        for pattern, rule in self._substrings:
+            slot = index[pattern]
+            if self._substring_rules[slot] is None or rule < self._substring_rules[slot]:
+                self._substring_rules[slot] = rule
+        return self._automaton
+
+    def classify(self, value):
+        """
+        Classify one email address (or bare domain).
+
+        Returns:
+            Label of the highest-priority matching rule, default, or blank
+        """
+        if not value or not isinstance(value, str):
+            return self.blank
+        return self.classify_many([value])[0]
+
+    def classify_many(self, values):
+        """
+        Classify a column of email addresses (or bare domains) in one pass.
+
+        Args:
+            values: Iterable of strings; None / NaN / '' give the blank label
+
+        Returns:
+            list of labels, one per input value
+        """
+        automaton = self._automaton or self._compile()
+        substring_rules = self._substring_rules
+        cache = self._domain_cache
+        domain_rule = self._domain_rule
+        blank = self.blank
+
+        texts = [value.lower() if value and value.__class__ is str else '' for value in values]
+        best = []
+        append = best.append
+        for text in texts:
+            domain = text[text.rfind('@') + 1:].strip()
+            try:
+                append(cache[domain])
+            except KeyError:
+                append(cache.setdefault(domain, domain_rule(domain) if domain else None))
+
+        # One screening pass over the whole column; only rows with a hit are
+        # walked through the automaton
+        if automaton.patterns and texts:
+            joined = '\n'.join(texts)
+            starts = [0] * len(texts)
+            offset = 0
+            for i, text in enumerate(texts):
+                starts[i] = offset
+                offset += len(text) + 1
+            hit_rows = {bisect_right(starts, m.start()) - 1 for m in automaton.finditer(joined)}
+            for row in hit_rows:
+                for slot in automaton.matches(texts[row]):
+                    rule = substring_rules[slot]
+                    if best[row] is None or rule < best[row]:
+                        best[row] = rule
+
+        default = self.default
+        return [blank if not text else default if rule is None else rule[1]
+                for text, rule in zip(texts, best)]
+
+
+# ----------------------------------------------------------------------
+# Rule sets
+# ----------------------------------------------------------------------
+
+# Same categories and precedence as the old export_suspicious_emails if-chain
+# (Proton deliberately not listed - too many legitimate users)
+EMAIL_CATEGORY_RULES = (
+    DomainRules(default='OTHER', blank='UNKNOWN')
+    .add_suffix('mail.ru', 'RUSSIAN')
+    .add_leading_label('yandex', 'RUSSIAN')
+    .add_suffix('inbox.ru', 'RUSSIAN')
+    .add_suffix('bk.ru', 'RUSSIAN')
+    .add_suffix('list.ru', 'RUSSIAN')
+    .add_leading_label('rambler', 'RUSSIAN')
+    .add_suffix('.ru', 'RUSSIAN')
+    .add_suffix('.ua', 'UKRAINIAN')
+    .add_suffix('ukr.net', 'UKRAINIAN')
+    .add_suffix('.by', 'BELARUS')
+    .add_suffix('.su', 'SOVIET')
+    .add_leading_label('tuta', 'TUTA')
+    .add_leading_label('tutanota', 'TUTA')
+)
+for _pattern in ('guerrilla', 'tempmail', 'temp-mail', '10minute', 'throwaway',
+                 'mailinator', 'sharklasers', 'maildrop', 'yopmail'):
+    EMAIL_CATEGORY_RULES.add_substring(_pattern, 'THROWAWAY')
+for _tld in ('.xyz', '.tk', '.ml', '.ga', '.cf', '.click', '.top', '.buzz'):
+    EMAIL_CATEGORY_RULES.add_suffix(_tld, 'SUSPICIOUS_TLD')
+EMAIL_CATEGORY_RULES.add_suffix('cock.li', 'DARK_WEB').add_suffix('airmail.cc', 'DARK_WEB')
+EMAIL_CATEGORY_RULES.add_leading_label('dnmx', 'DARK_WEB').add_leading_label('onionmail', 'DARK_WEB')
+
+SUSPICIOUS_CATEGORIES = ('RUSSIAN', 'UKRAINIAN', 'BELARUS', 'SOVIET', 'TUTA',
+                         'THROWAWAY', 'SUSPICIOUS_TLD', 'DARK_WEB')
+
+
+def classify_email(email):
+    """Classify email by domain type (RUSSIAN, TUTA, THROWAWAY, ... OTHER, UNKNOWN)"""
+    return EMAIL_CATEGORY_RULES.classify(email)
+
+
+def classify_emails(emails):
+    """Classify a column of emails; returns a list aligned with the input"""
+    return EMAIL_CATEGORY_RULES.classify_many(emails)
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+
+def _legacy_classify(email):
+    """The original per-email if-chain, kept for the benchmark"""
+    if not email:
+        return "UNKNOWN"
+    email = email.lower()
+    if any(d in email for d in ['@mail.ru', '@yandex.', '@inbox.ru', '@bk.ru', '@list.ru', '@rambler.', '.ru']):
+        return "RUSSIAN"
+    if '.ua' in email or '@ukr.net' in email:
+        return "UKRAINIAN"
+    if '.by' in email:
+        return "BELARUS"
+    if '.su' in email:
+        return "SOVIET"
+    if any(d in email for d in ['@tuta.', '@tutanota.', '@tuta.io']):
+        return "TUTA"
+    if any(d in email for d in ['guerrilla', 'tempmail', 'temp-mail', '10minute', 'throwaway',
+                                'mailinator', 'sharklasers', 'maildrop', 'yopmail']):
+        return "THROWAWAY"
+    if any(email.endswith(tld) for tld in ['.xyz', '.tk', '.ml', '.ga', '.cf', '.click', '.top', '.buzz']):
+        return "SUSPICIOUS_TLD"
+    if any(d in email for d in ['@cock.li', '@airmail.cc', '@dnmx.', '@onionmail.']):
+        return "DARK_WEB"
+    return "OTHER"
+
+
+def _sample_emails(count, seed=7):
+    rng = random.Random(seed)
+    common = ['gmail.com', 'yahoo.com', 'hotmail.com', 'icloud.com', 'outlook.com', 'aol.com',
+              'cox.net', 'att.net', 'sbcglobal.net', 'me.com', 'msn.com', 'live.com']
+    risky = ['mail.ru', 'yandex.com', 'ukr.net', 'tuta.io', 'mailinator.com', 'zenmail.top',
+             'ibande.xyz', 'cock.li', 'onionmail.org', 'guerrillamail.info', 'corp.by', 'old.su']
+    names = ['jsmith', 'mary.jones', 'a.ruiz', 'tom.byrne', 'kgarcia', 'pnguyen', 'dlee', 'rbrown']
+    out = []
+    for _ in range(count):
+        domain = rng.choice(risky) if rng.random() < 0.02 else rng.choice(common)
+        out.append(f"{rng.choice(names)}{rng.randint(1, 9999)}@{domain}")
+    return out
+
+
+def benchmark(count=200000):
+    """Time classify_emails against the old per-email if-chain."""
+    emails = _sample_emails(count)
+
+    start = time.perf_counter()
+    fast = classify_emails(emails)
+    fast_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy = [_legacy_classify(e) for e in emails]
+    legacy_s = time.perf_counter() - start
+
+    counts = {}
+    for label in fast:
+        counts[label] = counts.get(label, 0) + 1
+    # The old substring checks also fired on local parts ('a.ruiz@gmail.com' -> RUSSIAN)
+    differ = sum(1 for a, b in zip(fast, legacy) if a != b)
+    print(f"classify_emails: {count:,} emails in {fast_s:.3f}s ({count / fast_s:,.0f}/s) -> {counts}")
+    print(f"old if-chain:    {count:,} emails in {legacy_s:.3f}s ({count / legacy_s:,.0f}/s)")
+    print(f"Verdicts that differ (local-part false positives in the old chain): {differ:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Suspicious email domain classifier")
+    parser.add_argument('--classify', nargs='+', metavar='EMAIL', help="classify one or more addresses")
+    parser.add_argument('--bench', type=int, nargs='?', const=200000, metavar='EMAILS',
+                        help="run the emails/sec micro-benchmark")
+    args = parser.parse_args()
+
+    if args.classify:
+        for email, label in zip(args.classify, classify_emails(args.classify)):
+            print(f"{email:40} {label}")
+    if args.bench or not args.classify:
+        benchmark(args.bench or 200000)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,45 @@
 """
 DWHA SQL Server Connection Module
 Connects to the symwarehouse database on DWHA server for digital wallet queries.
+
+get_dwha_connection() hands out connections from a shared pool (see
+connection_pool.py); conn.close() returns the connection to the pool.
 """
 import pyodbc
 
+from connection_pool import get_pool, ping_odbc
+
+CONNECTION_STRING = (
+    'Driver={ODBC Driver 17 for SQL Server};'
+    'Server=DWHA;'
+    'Database=symwarehouse;'
+    'Trusted_Connection=yes;'
+)
+
+# Pool configuration
+POOL_CONFIG = {
+    'max_size': 4,
+    'idle_timeout': 300,
+    'checkout_timeout': 60,
+}
+
+
+def get_raw_dwha_connection():
+    """Open a new, unpooled DWHA connection."""
+    return pyodbc.connect(CONNECTION_STRING)
+
+
+def get_dwha_pool():
+    """Return the shared DWHA connection pool."""
+    return get_pool('dwha', get_raw_dwha_connection, ping_odbc, **POOL_CONFIG)
+
 
 def get_dwha_connection():
     """
-    Establish connection to DWHA SQL Server using Windows Authentication.
+    Check out a pooled DWHA SQL Server connection (Windows Authentication).
 
     Returns:
-        pyodbc.Connection: Active database connection
+        PooledConnection: Wraps a pyodbc.Connection; close() returns it to the pool
 
     Usage:
         conn = get_dwha_connection()
@@ -19,13 +48,7 @@ def get_dwha_connection():
         cursor.close()
         conn.close()
     """
-    connection_string = (
-        'Driver={ODBC Driver 17 for SQL Server};'
-        'Server=DWHA;'
-        'Database=symwarehouse;'
-        'Trusted_Connection=yes;'
-    )
-    return pyodbc.connect(connection_string)
+    return get_dwha_pool().acquire()
 
 
 def test_connection():
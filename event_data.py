@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+eventData Parser
+Decodes fraudmonitor.eventData once, into typed records, for every script.
+
+eventData is a JSON array whose layout depends on eventCategory. Scripts used
+to re-parse it with their own regexes ('"email",\\s*"([^"]+)"'), json.loads
+plus positional indexing, or SUBSTRING_INDEX in SQL. This module is the one
+place that knows the layouts:
+
+    OTP Authentication (new)  ["method", "masked_contact", fallback, "full_contact", "status"]
+    OTP Authentication (old)  ["user_email" | null, "xxx-xxx-1234", "status"]  (sent by text)
+    LoginSuccessful/Failure   ["primary_email", "alt_email", "phone1", "phone2", "phone3", "account"]
+    Change email / phone      ["field_name", "new_value", "action"]
+    New Device Register       ["device_id", "device_type"]
+
+Payloads are decoded with orjson when it is installed (json otherwise); a
+tolerant tokenizer recovers the positional values from truncated or
+otherwise malformed arrays instead of dropping the row.
+
+Usage:
+    from event_data import parse_event, parse_otp, parse_records
+    otp = parse_otp(event_data)                 # OtpEvent or None
+    otp.method, otp.masked_contact, otp.contact, otp.status, otp.format
+
+    for record, event in parse_records(scan.records()):
+        ...
+
+    py event_data.py --bench 200000             (rows/sec micro-benchmark)
+"""
+
+import argparse
+import gc
+import json
+import random
+import re
+import time
+
+try:
+    import orjson
+    _loads = orjson.loads
+    _DecodeError = orjson.JSONDecodeError
+    DECODER = 'orjson'
+except ImportError:
+    _loads = json.loads
+    _DecodeError = json.JSONDecodeError
+    DECODER = 'json'
+
+OTP_CATEGORY = 'OTP Authentication'
+LOGIN_CATEGORIES = ('LoginSuccessful', 'LoginFailure')
+EMAIL_CHANGE_CATEGORIES = ('Change Primary email', 'Change Alternate email')
+PHONE_CHANGE_CATEGORIES = ('Change Phone Number',)
+DEVICE_REGISTER_CATEGORY = 'New Device Register'
+
+OTP_METHODS = ('text', 'email', 'call', 'voice', 'sms')
+
+# One array element: a quoted string, null/true/false, or a bare number
+_TOKEN = re.compile(r'"((?:[^"\\]|\\.)*)"?|(null|true|false)|(-?\d+(?:\.\d+)?)')
+_MASKED_PHONE = 'xxx-xxx-'
+
+
+# ----------------------------------------------------------------------
+# Decoding
+# ----------------------------------------------------------------------
+
+def _tolerant_values(text):
+    """Positional values from a malformed array ('["a", "b", nul' -> ['a', 'b'])."""
+    values = []
+    for string, keyword, number in _TOKEN.findall(text):
+        if keyword:
+            values.append(None if keyword == 'null' else keyword == 'true')
+        elif number:
+            values.append(float(number) if '.' in number else int(number))
+        else:
+            values.append(string.replace('\\"', '"'))
+    return values
+
+
+def decode(event_data):
+    """
+    eventData -> list of values (empty list for blank payloads).
+
+    Already-decoded lists pass through; non-array JSON is wrapped in a list.
+    """
+    if event_data is None:
+        return []
+    try:
+        data = _loads(event_data)        # str and bytes both go straight to the decoder
+    except (_DecodeError, ValueError, TypeError):
+        if isinstance(event_data, list):
+            return event_data
+        if isinstance(event_data, (bytes, bytearray, memoryview)):
+            event_data = bytes(event_data).decode('utf-8', 'replace')
+        text = str(event_data)
+        return _tolerant_values(text) if text.strip() else []
+    if data.__class__ is list:
+        return data
+    return [data]
+
+
+_PAD = (None,) * 6
+
+
+def _at(values, i):
+    return values[i] if len(values) > i else None
+
+
+def _padded(values, n):
+    """First n values of a short array, padded with None."""
+    return (list(values) + list(_PAD))[:n]
+
+
+# ----------------------------------------------------------------------
+# Typed records
+# ----------------------------------------------------------------------
+
+class ParsedEvent:
+    """Base for parsed eventData records."""
+
+    __slots__ = ('values',)
+    kind = 'raw'
+    fields = ()
+
+    def as_dict(self):
+        """Field -> value (the shape the older parse helpers returned)."""
+        return {name: getattr(self, name) for name in self.fields}
+
+    def __repr__(self):
+        inner = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.fields)
+        return f"{type(self).__name__}({inner})"
+
+
+class OtpEvent(ParsedEvent):
+    """
+    OTP Authentication payload.
+
+    method is 'text', 'email', 'call', 'voice' (new format) or 'text' for the
+    old format, where the code always went to the masked phone in position 1.
+    """
+
+    __slots__ = ('method', 'masked_contact', 'fallback', 'contact', 'status', 'legacy_email', 'format')
+    kind = 'otp'
+    fields = ('method', 'masked_contact', 'fallback', 'contact', 'status', 'legacy_email', 'format')
+
+    def __init__(self, values):
+        self.values = values
+        first, second, third, fourth, fifth = values[:5] if len(values) >= 5 else _padded(values, 5)
+        if first in OTP_METHODS:
+            self.format = 'new'
+            self.method = first
+            self.masked_contact = second
+            self.fallback = third
+            self.contact = fourth
+            self.status = fifth
+            self.legacy_email = None
+        else:
+            self.format = 'old'
+            is_phone = second.__class__ is str and _MASKED_PHONE in second
+            has_email = first.__class__ is str and '@' in first
+            if has_email or (first is None and len(values) > 1):
+                self.method = 'text' if is_phone else 'unknown'
+            else:
+                self.method = 'unknown' if not values else 'other'
+            self.masked_contact = second
+            self.fallback = None
+            self.contact = None
+            self.status = third
+            self.legacy_email = first if has_email else None
+
+    @property
+    def email(self):
+        """Email the code was sent to (as logged, possibly masked), or None."""
+        return self.masked_contact if self.method == 'email' else None
+
+    @property
+    def phone(self):
+        """Full phone for new-format text/call OTPs, else the masked phone."""
+        if self.method in ('text', 'sms', 'call', 'voice'):
+            return self.contact or self.masked_contact
+        return None
+
+
+class LoginEvent(ParsedEvent):
+    """LoginSuccessful / LoginFailure payload."""
+
+    __slots__ = ('primary_email', 'alt_email', 'phone1', 'phone2', 'phone3', 'account')
+    kind = 'login'
+    fields = ('primary_email', 'alt_email', 'phone1', 'phone2', 'phone3', 'account')
+
+    def __init__(self, values):
+        self.values = values
+        (self.primary_email, self.alt_email, self.phone1,
+         self.phone2, self.phone3, self.account) = values[:6] if len(values) >= 6 else _padded(values, 6)
+
+    @property
+    def phones(self):
+        return tuple(p for p in (self.phone1, self.phone2, self.phone3) if p)
+
+
+class ContactChangeEvent(ParsedEvent):
+    """Change Primary/Alternate email and Change Phone Number payloads."""
+
+    __slots__ = ('field', 'new_value', 'action', 'contact_type')
+    kind = 'contact_change'
+    fields = ('field', 'new_value', 'action', 'contact_type')
+
+    def __init__(self, values, contact_type):
+        self.values = values
+        self.field, self.new_value, self.action = _padded(values, 3)
+        self.contact_type = contact_type
+
+    @property
+    def new_email_domain(self):
+        value = self.new_value
+        if isinstance(value, str) and '@' in value:
+            return value.rsplit('@', 1)[1].lower()
+        return None
+
+
+class DeviceRegisterEvent(ParsedEvent):
+    """New Device Register payload."""
+
+    __slots__ = ('device_id', 'device_type')
+    kind = 'device_register'
+    fields = ('device_id', 'device_type')
+
+    def __init__(self, values):
+        self.values = values
+        self.device_id, self.device_type = _padded(values, 2)
+
+
+class RawEvent(ParsedEvent):
+    """Any other category: the decoded values, untouched."""
+
+    __slots__ = ()
+    kind = 'raw'
+    fields = ('values',)
+
+    def __init__(self, values):
+        self.values = values
+
+    def as_dict(self):
+        return {'raw': self.values}
+
+
+def _email_change(values):
+    return ContactChangeEvent(values, 'email')
+
+
+def _phone_change(values):
+    return ContactChangeEvent(values, 'phone')
+
+
+# Category -> record constructor, resolved once per category
+_DISPATCH = {OTP_CATEGORY: OtpEvent, DEVICE_REGISTER_CATEGORY: DeviceRegisterEvent}
+_DISPATCH.update({c: LoginEvent for c in LOGIN_CATEGORIES})
+_DISPATCH.update({c: _email_change for c in EMAIL_CHANGE_CATEGORIES})
+_DISPATCH.update({c: _phone_change for c in PHONE_CHANGE_CATEGORIES})
+
+
+def record_class(event_category):
+    """Record constructor for an eventCategory (falls back on name patterns)."""
+    ctor = _DISPATCH.get(event_category)
+    if ctor is None:
+        category = str(event_category or '')
+        lowered = category.lower()
+        if 'otp' in lowered:
+            ctor = OtpEvent
+        elif 'change' in lowered and 'email' in lowered:
+            ctor = _email_change
+        elif 'change' in lowered and 'phone' in lowered:
+            ctor = _phone_change
+        else:
+            ctor = RawEvent
+        _DISPATCH[event_category] = ctor
+    return ctor
+
+
+# ----------------------------------------------------------------------
+# Public API
+# ----------------------------------------------------------------------
+
+def parse_event(event_category, event_data):
+    """Decode one payload into the record type for its category."""
+    return record_class(event_category)(decode(event_data))
+
+
+def parse_otp(event_data):
+    """OtpEvent for an OTP Authentication payload, or None if it is blank."""
+    values = decode(event_data)
+    return OtpEvent(values) if values else None
+
+
+def parse_otp_email(event_data):
+    """Email an OTP was sent to, or None (replaces the '"email",\\s*"..."' regex)."""
+    otp = parse_otp(event_data)
+    return otp.email if otp else None
+
+
+def parse_batch(categories, payloads):
+    """
+    Parse parallel sequences of eventCategory and eventData values.
+
+    Returns:
+        list of ParsedEvent, one per input row
+    """
+    out = []
+    append = out.append
+    loads = _loads
+    ctors = {}
+    # Records hold no reference cycles; pausing the cyclic GC stops it from
+    # rescanning the growing batch every few hundred allocations
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for category, payload in zip(categories, payloads):
+            ctor = ctors.get(category)
+            if ctor is None:
+                ctor = ctors[category] = record_class(category)
+            # Inline fast path; anything unusual goes through decode()
+            try:
+                values = loads(payload)
+                if values.__class__ is not list:
+                    values = [values]
+            except Exception:
+                values = decode(payload)
+            append(ctor(values))
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return out
+
+
+def parse_records(records, category=None, data_field='eventData', category_field='eventCategory'):
+    """
+    Yield (record, parsed) for a stream of row records.
+
+    Args:
+        records: Iterable of namedtuples / objects with eventData (e.g. a FraudmonitorScan)
+        category: Fixed eventCategory when the stream is a single category;
+                  otherwise read from each record's category_field
+    """
+    fixed = record_class(category) if category is not None else None
+    for record in records:
+        ctor = fixed or record_class(getattr(record, category_field))
+        yield record, ctor(decode(getattr(record, data_field)))
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+
+def _sample_payloads(count, seed=11):
+    rng = random.Random(seed)
+    templates = [
+        (OTP_CATEGORY, lambda: json.dumps(['text', f"xxx-xxx-{rng.randint(1000, 9999)}", None,
+                                           f"619-555-{rng.randint(1000, 9999)}", 'success'])),
+        (OTP_CATEGORY, lambda: json.dumps(['email', f"jxxxx{rng.randint(1, 99)}@gmail.com", None,
+                                           f"jsmith{rng.randint(1, 99)}@gmail.com", 'success'])),
+        (OTP_CATEGORY, lambda: json.dumps([f"user{rng.randint(1, 999)}@cox.net",
+                                           f"xxx-xxx-{rng.randint(1000, 9999)}", 'success'])),
+        ('LoginSuccessful', lambda: json.dumps([f"m{rng.randint(1, 999)}@yahoo.com", None,
+                                                '619-555-0100', None, None, str(rng.randint(10**6, 10**7))])),
+        ('Change Primary email', lambda: json.dumps(['email', f"new{rng.randint(1, 999)}@proton.me", 'update'])),
+        (DEVICE_REGISTER_CATEGORY, lambda: json.dumps([f"dev-{rng.randint(1, 10**6)}", 'iPhone'])),
+    ]
+    rows = []
+    for _ in range(count):
+        if rng.random() < 0.01:
+            # Roughly 1% of rows are truncated payloads
+            rows.append((OTP_CATEGORY, '["email", "trunc@ibande.xyz", nul'))
+            continue
+        category, make = rng.choice(templates)
+        rows.append((category, make()))
+    return rows
+
+
+def benchmark(count=200000):
+    """Time parse_batch against the old json.loads + positional-dict approach."""
+    rows = _sample_payloads(count)
+    categories = [r[0] for r in rows]
+    payloads = [r[1] for r in rows]
+
+    start = time.perf_counter()
+    parsed = parse_batch(categories, payloads)
+    fast_s = time.perf_counter() - start
+
+    # What the scripts did before: json.loads plus positional indexing into a
+    # dict (audit parse_event_data / determine_delivery_method)
+    def legacy_parse(category, payload):
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return {'parse_error': True, 'raw': payload}
+        if 'OTP' in category:
+            return {'method': data[0] if len(data) > 0 else None,
+                    'masked_phone': data[1] if len(data) > 1 else None,
+                    'full_phone': data[3] if len(data) > 3 else None,
+                    'status': data[4] if len(data) > 4 else None}
+        return {'raw': data}
+
+    start = time.perf_counter()
+    legacy = [legacy_parse(category, payload) for category, payload in rows]
+    legacy_s = time.perf_counter() - start
+
+    del legacy
+    kinds = {}
+    for event in parsed:
+        kinds[event.kind] = kinds.get(event.kind, 0) + 1
+    print(f"Decoder: {DECODER}")
+    print(f"parse_batch:           {count:,} rows in {fast_s:.3f}s ({count / fast_s:,.0f} rows/s) -> {kinds}")
+    print(f"json.loads + indexing: {count:,} rows in {legacy_s:.3f}s ({count / legacy_s:,.0f} rows/s, untyped)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fraudmonitor eventData parser")
+    parser.add_argument('--bench', type=int, nargs='?', const=200000, metavar='ROWS',
+                        help="run the rows/sec micro-benchmark")
+    parser.add_argument('--parse', nargs=2, metavar=('CATEGORY', 'EVENT_DATA'), help="parse one payload")
+    args = parser.parse_args()
+
+    if args.parse:
+        print(parse_event(*args.parse))
+    if args.bench or not args.parse:
+        benchmark(args.bench or 200000)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,54 +11,48 @@ Creates multi-tab Excel spreadsheet with:
 
 import pandas as pd
 from db_connection import get_connection
+from identity_resolver import IdentityResolver
+from member_timeline import open_timeline_store
 from datetime import datetime, timedelta
-import requests
-import time
+from ip_geolocation import geolocate_ips
 
 # Member info
 MEMBER_NAME = "COLGIN_KATHERINE"
 ACCOUNT_NUMBER = "0001008737"
 OUTPUT_FILE = f"C:\\Users\\kgreeven\\Desktop\\{MEMBER_NAME}_{ACCOUNT_NUMBER}_activity.xlsx"
 
+# Customer lookups: by last name first, by id when the name search misses
+CUSTOMER_BY_NAME_QUERY = """
+    SELECT id, UserName, FirstName, LastName, Status_id, createdts
+    FROM customer
+    WHERE LastName LIKE %s
+"""
+CUSTOMER_BY_ID_QUERY = """
+    SELECT id, UserName, FirstName, LastName, Status_id, createdts
+    FROM customer
+    WHERE id = %s
+"""
+
 # IP Geolocation cache
 IP_CACHE = {}
 
+def prefetch_ip_geolocation(ip_addresses):
+    """Geolocate every uncached IP in one batched, rate-limited pass"""
+    uncached = [ip for ip in ip_addresses if ip and not pd.isna(ip) and ip not in IP_CACHE]
+    for ip, record in geolocate_ips(uncached).items():
+        if record['status'] == 'success':
+            IP_CACHE[ip] = {'city': record['city'], 'region': record['region'], 'isp': record['isp']}
+        else:
+            IP_CACHE[ip] = {'city': '', 'region': '', 'isp': ''}
+
 def get_ip_geolocation(ip_address):
     """Get geographic information for IP address with caching"""
     if not ip_address or pd.isna(ip_address):
         return {'city': '', 'region': '', 'isp': ''}
 
-    # Check cache first
-    if ip_address in IP_CACHE:
-        return IP_CACHE[ip_address]
-
-    try:
-        # Using ip-api.com (free, no key needed, 45 req/min limit)
-        response = requests.get(
-            f'http://ip-api.com/json/{ip_address}',
-            timeout=3
-        )
-
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('status') == 'success':
-                result = {
-                    'city': data.get('city', ''),
-                    'region': data.get('regionName', ''),
-                    'isp': data.get('isp', '')
-                }
-                IP_CACHE[ip_address] = result
-                return result
-
-        # Rate limit - wait a bit
-        time.sleep(0.5)
-    except Exception:
-        pass
-
-    # Default if lookup fails
-    default = {'city': '', 'region': '', 'isp': ''}
-    IP_CACHE[ip_address] = default
-    return default
+    if ip_address not in IP_CACHE:
+        prefetch_ip_geolocation([ip_address])
+    return IP_CACHE[ip_address]
 
 def main():
     print(f"Exporting all activity for {MEMBER_NAME} ({ACCOUNT_NUMBER})")
@@ -69,65 +63,56 @@ def main():
     try:
         # Step 1: Find ALL userNames from fraudmonitor using account number
         print("\n[1/6] Finding associated userName(s)...")
-        username_query = """
-            SELECT DISTINCT userName
-            FROM fraudmonitor
-            WHERE masterMembership = %s AND userName IS NOT NULL
-        """
-        df_users = pd.read_sql(username_query, conn, params=[ACCOUNT_NUMBER])
-
-        usernames = df_users['userName'].tolist() if not df_users.empty else []
-        print(f"    Found usernames from fraudmonitor: {usernames}")
-
-        # Step 2: Get Customer_Id from customer table (search by name too)
-        print("\n[2/6] Getting Customer_Id from customer table...")
-        customer_id = None
-
-        # Search by name since usernames may have changed
-        customer_query = """
-            SELECT id, UserName, FirstName, LastName, Status_id, createdts
-            FROM customer
-            WHERE LastName LIKE %s
-        """
-        df_customer = pd.read_sql(customer_query, conn, params=['%COLGIN%'])
-
-        if not df_customer.empty:
-            customer_id = df_customer['id'].iloc[0]
-            current_username = df_customer['UserName'].iloc[0]
-            print(f"    Found Customer_Id: {customer_id}")
-            print(f"    Current username: {current_username}")
-
-            # Add current username to list if not already there
-            if current_username and current_username not in usernames:
-                usernames.append(current_username)
-                print(f"    All usernames: {usernames}")
-        else:
-            df_customer = pd.DataFrame()
-            print("    No customer record found")
+        cursor = conn.cursor()
+        try:
+            resolver = IdentityResolver(cursor)
+            usernames = resolver.usernames_by_account([ACCOUNT_NUMBER]).get(ACCOUNT_NUMBER, [])
+            print(f"    Found usernames from fraudmonitor: {usernames}")
 
-        # Step 3: Query fraudmonitor - ALL activity using both account# and userName
-        print("\n[3/6] Querying fraudmonitor table (all time)...")
-        if usernames:
-            fraud_query = """
-                SELECT id, sessionid, activityDate, eventCategory, eventData,
-                       ipAddress, platform, platformOS, browser, muid, masterMembership, userName
-                FROM fraudmonitor
-                WHERE masterMembership = %s
-                   OR userName IN ({})
-                ORDER BY activityDate DESC
-            """.format(','.join(['%s'] * len(usernames)))
-            fraud_params = [ACCOUNT_NUMBER] + usernames
-        else:
-            fraud_query = """
-                SELECT id, sessionid, activityDate, eventCategory, eventData,
-                       ipAddress, platform, platformOS, browser, muid, masterMembership, userName
-                FROM fraudmonitor
-                WHERE masterMembership = %s
-                ORDER BY activityDate DESC
-            """
-            fraud_params = [ACCOUNT_NUMBER]
+            # Step 2: Get Customer_Id from customer table (search by name too)
+            print("\n[2/6] Getting Customer_Id from customer table...")
+            customer_id = None
+
+            # Search by name since usernames may have changed
+            df_customer = pd.read_sql(CUSTOMER_BY_NAME_QUERY, conn, params=['%COLGIN%'])
 
-        df_fraud = pd.read_sql(fraud_query, conn, params=fraud_params)
+            if not df_customer.empty:
+                customer_id = df_customer['id'].iloc[0]
+                current_username = df_customer['UserName'].iloc[0]
+                print(f"    Found Customer_Id: {customer_id}")
+                print(f"    Current username: {current_username}")
+
+                # Add current username to list if not already there
+                if current_username and current_username not in usernames:
+                    usernames.append(current_username)
+                    print(f"    All usernames: {usernames}")
+            elif usernames:
+                # Name search missed (name changed?) - fall back to the fraudmonitor usernames
+                customers = resolver.customers_by_username(usernames)
+                if customers:
+                    customer_id = next(iter(customers.values())).id
+                    df_customer = pd.read_sql(CUSTOMER_BY_ID_QUERY, conn, params=[customer_id])
+                    print(f"    Found Customer_Id via username: {customer_id}")
+                else:
+                    print("    No customer record found")
+            else:
+                df_customer = pd.DataFrame()
+                print("    No customer record found")
+        finally:
+            cursor.close()
+
+        # Step 3: Query fraudmonitor - ALL activity using both account# and userName
+        print("\n[3/6] Loading fraudmonitor timeline...")
+        # Same match as masterMembership = %s OR userName IN (...), read from the
+        # local timeline store's identity indexes; history older than the store
+        # covers still comes from production
+        timeline_store = open_timeline_store()
+        timeline = timeline_store.timeline(account=ACCOUNT_NUMBER, usernames=usernames, link=(),
+                                            full_history=True)
+        timeline_store.close()
+        df_fraud = timeline.to_frame(newest_first=True)[[
+            'id', 'sessionid', 'activityDate', 'eventCategory', 'eventData', 'ipAddress',
+            'platform', 'platformOS', 'browser', 'muid', 'masterMembership', 'userName']]
         print(f"    Found {len(df_fraud)} fraud monitor records")
 
         # Add PST time column (UTC - 8 hours)
@@ -147,11 +132,8 @@ def main():
             unique_ips = df_fraud['ipAddress'].dropna().unique()
             print(f"    Looking up {len(unique_ips)} unique IP addresses...")
 
-            # Lookup all unique IPs first (for progress display)
-            for i, ip in enumerate(unique_ips):
-                if i > 0 and i % 10 == 0:
-                    print(f"      Processed {i}/{len(unique_ips)} IPs...")
-                get_ip_geolocation(ip)
+            # Lookup all unique IPs first in one batched pass
+            prefetch_ip_geolocation(unique_ips)
 
             # Now map to dataframe
             df_fraud['IP_City'] = df_fraud['ipAddress'].apply(
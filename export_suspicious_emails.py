@@ -6,80 +6,13 @@ Includes: Russian, Privacy (Proton, Tuta), Throwaway, and other risky TLDs
 
 import pandas as pd
 from db_connection import get_connection
+from domain_rules import classify_emails
+from gibberish_score import gibberish_scores
+from profile_snapshot import open_profile_snapshot
 from datetime import datetime
 
 OUTPUT_FILE = f"C:\\Users\\kgreeven\\Desktop\\SUSPICIOUS_EMAILS_REPORT_{datetime.now().strftime('%Y%m%d')}.xlsx"
 
-def classify_email(email):
-    """Classify email by domain type"""
-    if not email:
-        return "UNKNOWN"
-
-    email = email.lower()
-
-    # Russian domains
-    if any(d in email for d in ['@mail.ru', '@yandex.', '@inbox.ru', '@bk.ru', '@list.ru', '@rambler.', '.ru']):
-        return "RUSSIAN"
-
-    # Ukrainian
-    if '.ua' in email or '@ukr.net' in email:
-        return "UKRAINIAN"
-
-    # Belarus
-    if '.by' in email:
-        return "BELARUS"
-
-    # Soviet legacy
-    if '.su' in email:
-        return "SOVIET"
-
-    # Proton - REMOVED FROM SUSPICIOUS LIST
-    # if any(d in email for d in ['@proton.me', '@protonmail.', '@pm.me']):
-    #     return "PROTON"
-
-    # Tuta
-    if any(d in email for d in ['@tuta.', '@tutanota.', '@tuta.io']):
-        return "TUTA"
-
-    # Guerrilla/Temp mail
-    if any(d in email for d in ['guerrilla', 'tempmail', 'temp-mail', '10minute', 'throwaway',
-                                 'mailinator', 'sharklasers', 'maildrop', 'yopmail']):
-        return "THROWAWAY"
-
-    # Suspicious TLDs
-    if any(email.endswith(tld) for tld in ['.xyz', '.tk', '.ml', '.ga', '.cf', '.click', '.top', '.buzz']):
-        return "SUSPICIOUS_TLD"
-
-    # Other privacy
-    if any(d in email for d in ['@cock.li', '@airmail.cc', '@dnmx.', '@onionmail.']):
-        return "DARK_WEB"
-
-    return "OTHER"
-
-
-def is_gibberish(email):
-    """Check if email looks like random gibberish (fraud indicator)"""
-    if not email or '@' not in email:
-        return False
-
-    local_part = email.split('@')[0].lower()
-
-    # Check for patterns that look like random characters
-    vowels = sum(1 for c in local_part if c in 'aeiou')
-    consonants = sum(1 for c in local_part if c.isalpha() and c not in 'aeiou')
-
-    # Very low vowel ratio suggests gibberish
-    if len(local_part) > 6 and vowels > 0:
-        ratio = consonants / vowels if vowels > 0 else 10
-        if ratio > 4:  # Too many consonants
-            return True
-
-    # Check for repeated patterns
-    if len(set(local_part)) < len(local_part) / 3 and len(local_part) > 8:
-        return True
-
-    return False
-
 
 def main():
     print("=" * 70)
@@ -89,68 +22,33 @@ def main():
     conn = get_connection()
 
     try:
-        # Query for all suspicious emails with member details
-        print("\n[1/4] Querying suspicious emails from customercommunication...")
-
-        query = """
-            SELECT
-                c.id as Customer_Id,
-                c.UserName,
-                c.FirstName,
-                c.LastName,
-                c.Status_id,
-                c.createdts as Account_Created,
-                cc.Value as Email,
-                cc.Type_id as Email_Type,
-                cc.isPrimary,
-                cc.createdts as Email_Created,
-                cc.lastmodifiedts as Email_Last_Modified
-            FROM customercommunication cc
-            JOIN customer c ON cc.Customer_id = c.id
-            WHERE cc.Type_id LIKE '%EMAIL%'
-            AND (
-                -- Russian/Eastern European
-                LOWER(cc.Value) LIKE '%@%.ru'
-                OR LOWER(cc.Value) LIKE '%@mail.ru'
-                OR LOWER(cc.Value) LIKE '%@yandex.%'
-                OR LOWER(cc.Value) LIKE '%@inbox.ru'
-                OR LOWER(cc.Value) LIKE '%@bk.ru'
-                OR LOWER(cc.Value) LIKE '%@list.ru'
-                OR LOWER(cc.Value) LIKE '%@rambler.%'
-                OR LOWER(cc.Value) LIKE '%@%.ua'
-                OR LOWER(cc.Value) LIKE '%@ukr.net'
-                OR LOWER(cc.Value) LIKE '%@%.by'
-                OR LOWER(cc.Value) LIKE '%@%.su'
-                -- Privacy emails (Proton removed - too many legitimate users)
-                OR LOWER(cc.Value) LIKE '%@tuta.%'
-                OR LOWER(cc.Value) LIKE '%@tutanota.%'
-                -- Throwaway
-                OR LOWER(cc.Value) LIKE '%guerrilla%'
-                OR LOWER(cc.Value) LIKE '%tempmail%'
-                OR LOWER(cc.Value) LIKE '%mailinator%'
-                OR LOWER(cc.Value) LIKE '%sharklasers%'
-                -- Suspicious TLDs
-                OR LOWER(cc.Value) LIKE '%@%.xyz'
-                OR LOWER(cc.Value) LIKE '%@%.tk'
-                OR LOWER(cc.Value) LIKE '%@%.ml'
-                OR LOWER(cc.Value) LIKE '%@%.ga'
-                OR LOWER(cc.Value) LIKE '%@%.cf'
-                OR LOWER(cc.Value) LIKE '%@%.click'
-                OR LOWER(cc.Value) LIKE '%@%.top'
-                -- Dark web
-                OR LOWER(cc.Value) LIKE '%@cock.li'
-                OR LOWER(cc.Value) LIKE '%@airmail.cc'
-            )
-            ORDER BY c.LastName, c.FirstName
-        """
-
-        df = pd.read_sql(query, conn)
-        print(f"    Found {len(df)} suspicious email records")
+        # Pull every email on file from the local profile snapshot and classify in
+        # Python with the compiled domain rules; the snapshot only re-reads rows
+        # changed since the last run instead of the full customer join
+        print("\n[1/4] Reading emails from the profile snapshot...")
+
+        snapshot = open_profile_snapshot()
+        df = snapshot.contact_frame('email')
+        snapshot.close()
+        df = df[df['type_id'].fillna('').str.upper().str.contains('EMAIL')]
+        df = df.rename(columns={
+            'customer_id': 'Customer_Id', 'username': 'UserName', 'first_name': 'FirstName',
+            'last_name': 'LastName', 'status_id': 'Status_id', 'account_created': 'Account_Created',
+            'value': 'Email', 'type_id': 'Email_Type', 'is_primary': 'isPrimary',
+            'createdts': 'Email_Created', 'lastmodifiedts': 'Email_Last_Modified',
+        })[['Customer_Id', 'UserName', 'FirstName', 'LastName', 'Status_id', 'Account_Created',
+            'Email', 'Email_Type', 'isPrimary', 'Email_Created', 'Email_Last_Modified']]
+        df = df.sort_values(['LastName', 'FirstName']).reset_index(drop=True)
+        print(f"    Read {len(df)} email records")
 
         # Add classification columns
         print("\n[2/4] Classifying emails...")
-        df['Domain_Type'] = df['Email'].apply(classify_email)
-        df['Looks_Gibberish'] = df['Email'].apply(is_gibberish)
+        df['Domain_Type'] = classify_emails(df['Email'])
+        df = df[~df['Domain_Type'].isin(['OTHER', 'UNKNOWN'])].reset_index(drop=True)
+        print(f"    Found {len(df)} suspicious email records")
+        gibberish = gibberish_scores(df['Email'])
+        df['Gibberish_Score'] = gibberish.score
+        df['Looks_Gibberish'] = gibberish.looks_gibberish
         df['Is_Active'] = df['Status_id'] == 'SID_CUS_ACTIVE'
 
         # Get member numbers and all usernames from fraudmonitor
@@ -282,7 +180,7 @@ def main():
         print(f"    Found member data for {len(member_data)} users")
 
         # Reorder columns
-        df = df[['Domain_Type', 'Is_Active', 'Looks_Gibberish', 'Member_Numbers', 'MUID',
+        df = df[['Domain_Type', 'Is_Active', 'Looks_Gibberish', 'Gibberish_Score', 'Member_Numbers', 'MUID',
                  'UserName', 'All_Usernames', 'FirstName', 'LastName', 'Email',
                  'Email_Created', 'Email_Last_Modified',
                  'First_Seen', 'Last_Active', 'Email_Type',
@@ -300,6 +198,7 @@ def main():
         # Filter active only for summary
         df_active = df[df['Is_Active'] == True].copy()
         df_gibberish = df[(df['Looks_Gibberish'] == True) & (df['Is_Active'] == True)].copy()
+        df_gibberish = df_gibberish.sort_values('Gibberish_Score', ascending=False)
 
         with pd.ExcelWriter(OUTPUT_FILE, engine='openpyxl') as writer:
             # Summary tab
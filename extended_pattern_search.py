@@ -4,68 +4,48 @@ Extended search - go back 1 year to find OTP email mismatches
 """
 
 from db_connection import get_connection
-import re
+from fraudmonitor_scan import days_ago
+from masked_email_index import load_profile_index
+from otp_event_store import open_otp_store
 
 conn = get_connection()
 cursor = conn.cursor()
 
-def extract_otp_email(event_data):
-    match = re.search(r'"email",\s*"([^"]+)"', str(event_data))
-    if match:
-        return match.group(1)
-    return None
-
 def get_domain(email):
     if '@' in email:
         return email.split('@')[1].lower()
     return None
 
-def emails_could_match(otp_email, profile_email):
-    """Check if masked OTP email could match profile email"""
-    otp = otp_email.lower()
-    profile = profile_email.lower()
-    if otp == profile:
-        return True
-    otp_domain = get_domain(otp)
-    profile_domain = get_domain(profile)
-    if otp_domain == profile_domain:
-        otp_local = otp.split('@')[0]
-        profile_local = profile.split('@')[0]
-        if 'x' in otp_local:
-            if len(otp_local) == len(profile_local) or otp_local[0] == profile_local[0]:
-                return True
-    return False
-
 # Get OTP events to email - go back 1 YEAR
 print("Finding OTP events sent to email (last 365 days)...")
 print("=" * 70)
 
-cursor.execute("""
-    SELECT muid, userName, eventData, activityDate
-    FROM fraudmonitor
-    WHERE eventCategory = 'OTP Authentication'
-    AND eventData LIKE '%%"email"%%'
-    AND activityDate > DATE_SUB(NOW(), INTERVAL 365 DAY)
-    ORDER BY activityDate DESC
-""")
-otp_events = cursor.fetchall()
+otp_start = days_ago(365)
+otp_store = open_otp_store(since=otp_start)
+otp_events = otp_store.email_events(start=otp_start, newest_first=True)
+otp_store.close()
 print(f"Found {len(otp_events)} OTP email events\n")
 
-# Build unique muid/email combinations
+# Build unique muid/email combinations (newest first, so each keeps its latest event)
 otp_cases = {}
-for muid, username, event_data, activity_date in otp_events:
-    otp_email = extract_otp_email(event_data)
-    if otp_email and muid:
-        key = (muid, otp_email)
+for event in otp_events:
+    otp_email = event.masked_contact
+    if otp_email and event.muid:
+        key = (event.muid, otp_email)
         if key not in otp_cases:
             otp_cases[key] = {
-                'muid': muid,
-                'username': username,
+                'muid': event.muid,
+                'username': event.userName,
                 'otp_email': otp_email,
-                'date': activity_date
+                'date': event.activityDate
             }
 
 print(f"Unique muid/email combinations: {len(otp_cases)}\n")
+
+# All profile emails in one pull instead of one query per case
+print("Indexing profile emails...")
+profile_index = load_profile_index(cursor)
+print(f"  {profile_index.size} profile emails indexed\n")
 print("Checking each against profile emails...")
 
 # Check each - find REAL mismatches where domain differs
@@ -90,19 +70,10 @@ for key, case in otp_cases.items():
         if row:
             case['username'] = row[0]
 
-    # Get profile emails
-    profile_emails = []
-    if case['username']:
-        cursor.execute("""
-            SELECT cc.Value
-            FROM customer c
-            JOIN customercommunication cc ON c.id = cc.Customer_id
-            WHERE c.UserName = %s AND cc.Value LIKE '%%%%@%%%%'
-        """, (case['username'],))
-        profile_emails = [r[0] for r in cursor.fetchall()]
-
-    # Check match
-    could_match = any(emails_could_match(otp_email, pe) for pe in profile_emails)
+    # Get profile emails and check match
+    profile_emails = sorted(profile_index.emails_for(case['username'])) if case['username'] else []
+    could_match = bool(profile_emails) and profile_index.could_match(otp_email, case['username'])
+    case['other_members'] = sorted(profile_index.owners(otp_email) - {(case['username'] or '').lower()})
 
     if not profile_emails:
         otp_domain = get_domain(otp_email)
@@ -131,4 +102,6 @@ for m in real_mismatches:
     print(f"OTP to: {m['otp_email']}")
     print(f"Profile: {m['profile_emails'] if m['profile_emails'] else '(none)'}")
     print(f"Reason: {m['reason']}")
+    if m['other_members']:
+        print(f"Matches profile of: {', '.join(m['other_members'])}")
     print(f"Date: {m['date']}")
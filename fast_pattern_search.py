@@ -1,57 +1,60 @@
 #!/usr/bin/env python3
 """
 Fast pattern search - bulk SQL pulls, Python processing
+
+OTP events come from the local OTP store (otp_event_store.py), already
+parsed; other fraudmonitor pulls are streamed (fraudmonitor_scan.py).
 """
 
 from db_connection import get_connection
-import re
+from fraudmonitor_scan import FraudmonitorScan, days_ago
+from otp_event_store import open_otp_store
+from profile_snapshot import open_profile_snapshot
 
 conn = get_connection()
 cursor = conn.cursor()
 
-def extract_otp_email(event_data):
-    match = re.search(r'"email",\s*"([^"]+)"', str(event_data))
-    if match:
-        return match.group(1)
-    return None
-
 def get_domain(email):
     if '@' in email:
         return email.split('@')[1].lower()
     return None
 
-# QUERY 1: Get ALL OTP email events (last 1 year)
-print("QUERY 1: Pulling OTP email events (1 year)...")
-cursor.execute("""
-    SELECT muid, userName, eventData, activityDate
-    FROM fraudmonitor
-    WHERE eventCategory = 'OTP Authentication'
-    AND eventData LIKE '%"email"%'
-    AND activityDate > DATE_SUB(NOW(), INTERVAL 365 DAY)
-""")
-otp_events = cursor.fetchall()
+# QUERY 1: ALL OTP email events (last 1 year) from the local OTP store
+print("QUERY 1: Reading OTP email events (1 year) from the OTP store...")
+otp_start = days_ago(365)
+otp_store = open_otp_store(since=otp_start)
+otp_events = otp_store.email_events(start=otp_start)
+otp_store.close()
+
+otp_cases = {}
+for event in otp_events:
+    otp_email = event.masked_contact
+    if otp_email and event.muid:
+        key = (event.muid, otp_email.lower())
+        if key not in otp_cases:
+            otp_cases[key] = {
+                'muid': event.muid,
+                'username': event.userName,
+                'otp_email': otp_email,
+                'date': event.activityDate
+            }
 print(f"  Got {len(otp_events)} rows\n")
 
-# QUERY 2: Get ALL profile emails (customer + customercommunication)
-print("QUERY 2: Pulling all profile emails...")
-cursor.execute("""
-    SELECT c.UserName, cc.Value
-    FROM customer c
-    JOIN customercommunication cc ON c.id = cc.Customer_id
-    WHERE cc.Value LIKE '%@%'
-""")
-profile_rows = cursor.fetchall()
+# QUERY 2: Get ALL profile emails from the local profile snapshot
+print("QUERY 2: Reading all profile emails from the profile snapshot...")
+profile_snapshot = open_profile_snapshot()
+profile_rows = profile_snapshot.email_rows()
+profile_snapshot.close()
 print(f"  Got {len(profile_rows)} rows\n")
 
-# QUERY 3: Get all email change events
+# QUERY 3: Get all email change events (only muid is needed)
 print("QUERY 3: Pulling email change events...")
-cursor.execute("""
-    SELECT muid, eventCategory, activityDate
-    FROM fraudmonitor
-    WHERE eventCategory IN ('Change Primary email', 'Change Alternate email')
-""")
-email_change_rows = cursor.fetchall()
-print(f"  Got {len(email_change_rows)} rows\n")
+change_scan = FraudmonitorScan(
+    columns=('muid',),
+    categories=['Change Primary email', 'Change Alternate email'],
+    label='email change events')
+has_email_change = {record.muid for record in change_scan.records()}
+print(f"  Got {change_scan.rows_read} rows\n")
 
 cursor.close()
 conn.close()
@@ -68,31 +71,10 @@ for username, email in profile_rows:
             profile_emails[key] = set()
         profile_emails[key].add(email.lower())
 
-# Email change events by muid
-has_email_change = set()
-for muid, cat, date in email_change_rows:
-    has_email_change.add(muid)
-
 print(f"  {len(profile_emails)} users with profile emails")
 print(f"  {len(has_email_change)} members with email change events\n")
 
-# PROCESS OTP EVENTS
-print("Processing OTP events...")
-
-# Build unique cases
-otp_cases = {}
-for muid, username, event_data, activity_date in otp_events:
-    otp_email = extract_otp_email(event_data)
-    if otp_email and muid:
-        key = (muid, otp_email.lower())
-        if key not in otp_cases:
-            otp_cases[key] = {
-                'muid': muid,
-                'username': username,
-                'otp_email': otp_email,
-                'date': activity_date
-            }
-
+# OTP events were reduced to unique cases in QUERY 1
 print(f"  {len(otp_cases)} unique muid/email combinations\n")
 
 # FIND MISMATCHES
@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""
+Member Feature Store - rolling per-member activity features kept incrementally
+
+fraud_analysis's CTEs recount a member's failed logins, IPs and recent
+activity with correlated subqueries on every run, and the ad-hoc scripts do
+the same over months of fraudmonitor. This store folds each fraudmonitor row
+into per-member time buckets once and answers "how many / how many distinct
+in the last 1d / 7d / 30d / 120d" from the buckets:
+
+    - every member owns one row of fixed-size numpy arrays: ring buffers of
+      hourly (24), daily (30) and 4-day (30) buckets, each holding event
+      counters and a 64-bit distinct sketch (IPs, devices, OTP contacts)
+    - a bucket slot carries the bucket number it holds, so an old slot is
+      recycled the first time a newer bucket lands on it - no sweeping
+    - windows read the ring that resolves them: 1d from hours, 7d/30d from
+      days, 120d from 4-day buckets
+    - distinct counts are linear-counting estimates over the OR of the
+      window's sketches: exact in practice for the handful of IPs/devices a
+      member uses, within a few percent up to ~100
+    - bulk loads are vectorized per batch; point_in_time() gives every
+      event the features of the member's history strictly before it (the
+      stored buckets plus the earlier events of its batch), so a score never
+      sees the event itself or anything after it
+
+The store syncs by fraudmonitor.id through fraud_tail's sources (production,
+or the member_timeline store with --replay) and is saved as one compressed
+.npz with its high-water mark, so each sync only reads the new rows.
+
+Usage:
+    from feature_store import FeatureStore
+    store = FeatureStore.load()
+    store.sync(FraudmonitorSource())
+    store.features('00638242923564062860')          # {'failed_logins_7d': 3, ...}
+    frame = store.frame()                           # every member, as of now
+    for event, features in store.point_in_time(events): ...
+
+    py feature_store.py --sync                      (default lookback: WINDOW_DAYS)
+    py feature_store.py --sync --replay             (from the local member timeline)
+    py feature_store.py --member 00638242923564062860 [--at "2026-01-05 10:00"]
+    py feature_store.py --top failed_logins_7d [--at 2026-01-05]
+    py feature_store.py --status
+    py feature_store.py --bench
+"""
+
+import argparse
+import os
+import time
+import zlib
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from event_data import (DEVICE_REGISTER_CATEGORY, EMAIL_CHANGE_CATEGORIES, OTP_CATEGORY,
+                        PHONE_CHANGE_CATEGORIES, parse_otp)
+from fraud_tail import BATCH_SIZE, FraudmonitorSource, LocalSource
+from fraudmonitor_scan import days_ago, to_datetime
+
+FEATURE_STORE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'member_features.npz')
+
+Tier = namedtuple('Tier', ['name', 'width', 'slots'])
+Window = namedtuple('Window', ['name', 'tier', 'buckets'])
+
+# Ring buffers every member keeps: bucket width in seconds, number of slots
+TIERS = (Tier('hour', 3600, 24), Tier('day', 86400, 30), Tier('4day', 4 * 86400, 30))
+
+# Each window is read from one tier: the last `buckets` buckets up to the query time
+WINDOWS = (Window('1d', 0, 24), Window('7d', 1, 7), Window('30d', 1, 30), Window('120d', 2, 30))
+WINDOW_DAYS = 120
+
+COUNTERS = ('events', 'logins', 'failed_logins', 'otps', 'contact_changes', 'new_devices')
+SKETCHES = ('ips', 'devices', 'otp_contacts')
+
+FEATURE_NAMES = tuple(f"{name}_{w.name}" for w in WINDOWS for name in COUNTERS) + \
+    tuple(f"distinct_{name}_{w.name}" for w in WINDOWS for name in SKETCHES)
+
+SKETCH_BITS = 64
+COUNTER_MAX = np.iinfo(np.uint16).max        # counters saturate instead of wrapping
+INITIAL_CAPACITY = 1024
+SYNC_BATCH = 50000
+
+CONTACT_CHANGE_CATEGORIES = EMAIL_CHANGE_CATEGORIES + PHONE_CHANGE_CATEGORIES
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Slot layout: tiers side by side in one axis of NSLOTS
+_OFFSETS = np.cumsum([0] + [t.slots for t in TIERS])[:-1]
+NSLOTS = int(sum(t.slots for t in TIERS))
+
+
+def to_seconds(moment):
+    """Seconds since 1970 for a naive datetime (activityDate wall clock, no tz shift)."""
+    return int((to_datetime(moment) - _EPOCH).total_seconds())
+
+
+def _seconds_array(moments):
+    values = pd.to_datetime(pd.Series(moments)).to_numpy(dtype='datetime64[s]')
+    return values.astype(np.int64)
+
+
+def _sketch_bits(values):
+    """One uint64 bit per value (stable crc32 hash, computed once per distinct value); 0 for blanks."""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+    table = np.array([np.uint64(1) << np.uint64(zlib.crc32(str(v).encode()) % SKETCH_BITS)
+                      if v not in ('', None) else np.uint64(0) for v in uniques] + [np.uint64(0)],
+                     dtype=np.uint64)
+    return table[codes]                         # sentinel -1 picks the trailing 0
+
+
+def linear_count(bits):
+    """Distinct-count estimate from OR-ed sketches (any shape of uint64)."""
+    zeros = SKETCH_BITS - np.bitwise_count(bits).astype(np.float64)
+    with np.errstate(divide='ignore'):
+        estimate = -SKETCH_BITS * np.log(np.maximum(zeros, 0.5) / SKETCH_BITS)
+    return np.rint(estimate).astype(np.int64)
+
+
+def _otp_contact(event_data):
+    parsed = parse_otp(event_data)
+    if parsed is None:                  # blank / NULL payload
+        return None
+    contact = parsed.email or parsed.phone
+    return str(contact).lower() if contact else None
+
+
+def event_columns(events):
+    """
+    Arrays the store ingests for a batch of fraudmonitor rows.
+
+    Args:
+        events: Sequence of records with the TAIL_COLUMNS fields
+
+    Returns:
+        (member keys, seconds, counter increments (n, COUNTERS) uint16,
+         sketch bits (n, SKETCHES) uint64)
+    """
+    frame = pd.DataFrame.from_records(events, columns=events[0]._fields) if events else pd.DataFrame()
+    n = len(frame)
+    if not n:
+        return [], np.empty(0, np.int64), np.empty((0, len(COUNTERS)), np.uint16), \
+            np.empty((0, len(SKETCHES)), np.uint64)
+    # Same keys as fraud_tail.member_key: the muid, else 'u:' + lowercase userName
+    muid = frame['muid'].fillna('').astype(str)
+    user = frame['userName'].fillna('').astype(str).str.lower()
+    keys = np.where(muid != '', muid, np.where(user != '', 'u:' + user, ''))
+    category = frame['eventCategory'].fillna('')
+
+    inc = np.zeros((n, len(COUNTERS)), dtype=np.uint16)
+    inc[:, 0] = 1
+    inc[:, 1] = category == 'LoginSuccessful'
+    inc[:, 2] = category == 'LoginFailure'
+    inc[:, 3] = category == OTP_CATEGORY
+    inc[:, 4] = category.isin(CONTACT_CHANGE_CATEGORIES)
+    inc[:, 5] = category == DEVICE_REGISTER_CATEGORY
+
+    otp = (category == OTP_CATEGORY).to_numpy()
+    contacts = np.full(n, None, dtype=object)
+    contacts[otp] = [_otp_contact(data) for data in frame['eventData'][otp]]
+    devices = (frame['platform'].fillna('') + '|' + frame['platformOS'].fillna('') + '|'
+               + frame['browser'].fillna('')).str.strip('|')
+    bits = np.column_stack([_sketch_bits(frame['ipAddress'].fillna('')), _sketch_bits(devices),
+                            _sketch_bits(contacts)])
+    return keys, _seconds_array(frame['activityDate']), inc, bits
+
+
+class FeatureStore:
+    """
+    Array-backed rolling-window aggregates for every member.
+
+    Args:
+        capacity: Initial member rows (grows by doubling)
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.members = []                   # row -> member key
+        self.index = {}                     # member key -> row
+        self.stamps = np.full((capacity, NSLOTS), -1, dtype=np.int32)
+        self.counts = np.zeros((capacity, NSLOTS, len(COUNTERS)), dtype=np.uint16)
+        self.sketches = np.zeros((capacity, NSLOTS, len(SKETCHES)), dtype=np.uint64)
+        self.last_seen = np.zeros(capacity, dtype=np.int64)
+        self.mark = None                    # (source name, last fraudmonitor id)
+        self.events_folded = 0
+
+    def __len__(self):
+        return len(self.members)
+
+    # ------------------------------------------------------------------
+    # Rows
+    # ------------------------------------------------------------------
+
+    def _grow(self, needed):
+        capacity = len(self.stamps)
+        if needed <= capacity:
+            return
+        capacity = max(capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+        extra = capacity - len(self.stamps)
+        self.stamps = np.concatenate([self.stamps, np.full((extra, NSLOTS), -1, dtype=np.int32)])
+        self.counts = np.concatenate([self.counts, np.zeros((extra,) + self.counts.shape[1:], np.uint16)])
+        self.sketches = np.concatenate([self.sketches,
+                                        np.zeros((extra,) + self.sketches.shape[1:], np.uint64)])
+        self.last_seen = np.concatenate([self.last_seen, np.zeros(extra, np.int64)])
+
+    def _rows(self, keys):
+        """Row per member key, adding new members (-1 for blank keys)."""
+        index = self.index
+        rows = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            row = index.get(key)
+            if row is None:
+                if not key:
+                    rows[i] = -1
+                    continue
+                row = index[key] = len(self.members)
+                self.members.append(key)
+            rows[i] = row
+        self._grow(len(self.members))
+        return rows
+
+    # ------------------------------------------------------------------
+    # Folding events in
+    # ------------------------------------------------------------------
+
+    def add_batch(self, events):
+        """Fold a batch of fraudmonitor rows in (any order; vectorized per tier)."""
+        keys, seconds, inc, bits = event_columns(events)
+        rows = self._rows(keys)
+        keep = rows >= 0
+        self._fold(rows[keep], seconds[keep], inc[keep], bits[keep])
+        return int(keep.sum())
+
+    def _fold(self, rows, seconds, inc, bits):
+        if not len(rows):
+            return
+        stamps = self.stamps.reshape(-1)
+        counts = self.counts.reshape(-1, len(COUNTERS))
+        sketches = self.sketches.reshape(-1, len(SKETCHES))
+        for tier, offset in zip(TIERS, _OFFSETS):
+            bucket = seconds // tier.width
+            cell = rows * NSLOTS + offset + bucket % tier.slots
+            cells, inverse = np.unique(cell, return_inverse=True)
+            newest = np.full(len(cells), -1, dtype=np.int64)
+            np.maximum.at(newest, inverse, bucket)
+
+            # Recycle slots still holding an older bucket; events older than
+            # the slot's bucket have already left this ring
+            current = stamps[cells].astype(np.int64)
+            stale = current < newest
+            counts[cells[stale]] = 0
+            sketches[cells[stale]] = 0
+            stamps[cells[stale]] = newest[stale]
+            live = bucket == np.maximum(current, newest)[inverse]
+
+            target = inverse[live]
+            added = np.column_stack([np.bincount(target, weights=inc[live, c], minlength=len(cells))
+                                     for c in range(len(COUNTERS))])
+            counts[cells] = np.minimum(counts[cells] + added, COUNTER_MAX).astype(np.uint16)
+            merged = np.zeros((len(cells), len(SKETCHES)), dtype=np.uint64)
+            np.bitwise_or.at(merged, target, bits[live])
+            sketches[cells] |= merged
+        np.maximum.at(self.last_seen, rows, seconds)
+        self.events_folded += len(rows)
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _window_values(self, rows, seconds):
+        """(counts (r, WINDOWS, COUNTERS), OR-ed sketches (r, WINDOWS, SKETCHES)) for rows as of seconds."""
+        counts = np.empty((len(rows), len(WINDOWS), len(COUNTERS)), dtype=np.int64)
+        sketches = np.empty((len(rows), len(WINDOWS), len(SKETCHES)), dtype=np.uint64)
+        for w, window in enumerate(WINDOWS):
+            tier = TIERS[window.tier]
+            slots = slice(_OFFSETS[window.tier], _OFFSETS[window.tier] + tier.slots)
+            newest = (seconds // tier.width)[:, None]
+            stamps = self.stamps[rows, slots]
+            in_window = (stamps <= newest) & (stamps > newest - window.buckets)        # (r, slot)
+            counts[:, w] = np.einsum('rs,rsc->rc', in_window, self.counts[rows, slots], dtype=np.int64)
+            sketches[:, w] = np.bitwise_or.reduce(
+                np.where(in_window[..., None], self.sketches[rows, slots], np.uint64(0)), axis=1)
+        return counts, sketches
+
+    def _frame(self, rows, seconds, index):
+        """Feature frame for rows (-1 = unknown member, all zeros) as of seconds."""
+        known = np.maximum(rows, 0)
+        parts_counts, parts_distinct = [], []
+        for start in range(0, len(rows), 20000):          # bounds the (r, window, slot, sketch) temp
+            counts, distinct = self._window_values(known[start:start + 20000], seconds[start:start + 20000])
+            parts_counts.append(counts.reshape(len(counts), -1))
+            parts_distinct.append(linear_count(distinct).reshape(len(distinct), -1))
+        values = np.hstack([np.vstack(parts_counts), np.vstack(parts_distinct)]) if len(rows) else \
+            np.zeros((0, len(FEATURE_NAMES)), dtype=np.int64)
+        values[rows < 0] = 0
+        return pd.DataFrame(values, columns=FEATURE_NAMES, index=index)
+
+    def features(self, member, at=None):
+        """
+        One member's features as of at (default: the member's latest event).
+
+        Buckets are the resolution: at counts whole buckets up to the one it
+        falls in, so events later in that hour/day are included.
+
+        Returns:
+            dict of FEATURE_NAMES -> int (all 0 for an unknown member)
+        """
+        row = self.index.get(member)
+        if row is None:
+            return dict.fromkeys(FEATURE_NAMES, 0)
+        second = to_seconds(at) if at is not None else int(self.last_seen[row])
+        frame = self._frame(np.array([row]), np.array([second], dtype=np.int64), [member])
+        return {name: int(value) for name, value in frame.iloc[0].items()}
+
+    def frame(self, members=None, at=None):
+        """
+        Features for many members (default: all) as of at (default: now).
+
+        Returns:
+            DataFrame indexed by member key, one column per FEATURE_NAMES
+        """
+        members = list(self.members if members is None else members)
+        rows = np.array([self.index.get(m, -1) for m in members], dtype=np.int64)
+        second = to_seconds(at or datetime.now())
+        return self._frame(rows, np.full(len(rows), second, dtype=np.int64), pd.Index(members, name='member'))
+
+    def _batch_in_time(self, events):
+        """
+        Features of each event in a batch from the history strictly before
+        it, then fold the batch in.
+
+        The stored buckets answer for everything before the batch; earlier
+        events of the same member inside the batch are added on top: sorted
+        by (member, time), the ones in a window are a contiguous range, so
+        counters are prefix-sum differences and sketches a range OR over a
+        sparse table (log2(n) levels of pairwise ORs).
+        """
+        keys, seconds, inc, bits = event_columns(events)
+        rows = self._rows(keys)
+        n = len(rows)
+        values = np.zeros((n, len(FEATURE_NAMES)), dtype=np.int64)
+        if not n:
+            return values
+        known = rows >= 0
+        counts, sketches = [], []
+        for start in range(0, n, 20000):
+            part_counts, part_sketches = self._window_values(np.maximum(rows[start:start + 20000], 0),
+                                                             seconds[start:start + 20000])
+            counts.append(part_counts)
+            sketches.append(part_sketches)
+        counts, sketches = np.concatenate(counts), np.concatenate(sketches)
+
+        order = np.lexsort((np.arange(n), seconds, rows))
+        sorted_rows, sorted_seconds = rows[order], seconds[order]
+        position = np.arange(n)
+        prefix = np.vstack([np.zeros((1, len(COUNTERS)), np.int64), np.cumsum(inc[order], axis=0, dtype=np.int64)])
+        levels = [bits[order]]
+        while 1 << len(levels) <= n:
+            half = 1 << (len(levels) - 1)
+            previous = levels[-1]
+            levels.append(previous | np.vstack([previous[half:], np.zeros((half,) + previous.shape[1:],
+                                                                          np.uint64)]))
+        table = np.stack(levels)
+        for w, window in enumerate(WINDOWS):
+            bucket = sorted_seconds // TIERS[window.tier].width
+            composite = (sorted_rows << 32) + bucket
+            first = np.searchsorted(composite, composite - window.buckets + 1, side='left')
+            counts[order, w] += prefix[position] - prefix[first]
+            length = position - first
+            level = np.where(length > 0, np.log2(np.maximum(length, 1)).astype(np.int64), 0)
+            ranged = table[level, first] | table[level, np.maximum(position - (1 << level), 0)]
+            sketches[order, w] |= np.where((length > 0)[:, None], ranged, np.uint64(0))
+
+        values[:] = np.hstack([counts.reshape(n, -1), linear_count(sketches).reshape(n, -1)])
+        values[~known] = 0
+        self._fold(rows[known], seconds[known], inc[known], bits[known])
+        return values
+
+    def point_in_time_frame(self, events, batch_size=BATCH_SIZE):
+        """
+        Features of every event as of just before it, folding the events in.
+
+        Args:
+            events: Records with the TAIL_COLUMNS fields, in fraudmonitor order
+
+        Returns:
+            DataFrame aligned with events, one column per FEATURE_NAMES
+        """
+        events = list(events)
+        parts = [self._batch_in_time(events[start:start + batch_size])
+                 for start in range(0, len(events), batch_size)]
+        values = np.vstack(parts) if parts else np.zeros((0, len(FEATURE_NAMES)), dtype=np.int64)
+        return pd.DataFrame(values, columns=FEATURE_NAMES)
+
+    def point_in_time(self, events, batch_size=BATCH_SIZE):
+        """
+        Yield (event, features) with each event scored on the member's history
+        strictly before it (events are folded in batch by batch as they go).
+        """
+        events = iter(events)
+        while True:
+            batch = [event for _, event in zip(range(batch_size), events)]
+            if not batch:
+                return
+            for event, values in zip(batch, self._batch_in_time(batch).tolist()):
+                yield event, dict(zip(FEATURE_NAMES, values))
+
+    # ------------------------------------------------------------------
+    # Sync / persistence
+    # ------------------------------------------------------------------
+
+    def sync(self, source, since=None, batch_size=SYNC_BATCH, progress=True):
+        """
+        Fold in every source row past the stored mark.
+
+        Args:
+            source: fraud_tail FraudmonitorSource or LocalSource
+            since: Start date when the store has no mark for this source
+                   (default: WINDOW_DAYS back)
+        """
+        if self.mark and self.mark[0] == source.name:
+            last_id = self.mark[1]
+        else:
+            last_id = source.first_id_since(since or days_ago(WINDOW_DAYS))
+        started = time.perf_counter()
+        read = 0
+        while True:
+            events = source.fetch(last_id, batch_size)
+            if not events:
+                break
+            self.add_batch(events)
+            read += len(events)
+            last_id = events[-1].id
+            self.mark = (source.name, last_id)
+            if progress:
+                print(f"  {read:,} rows -> id {last_id} ({events[-1].activityDate}), "
+                      f"{len(self.members):,} members, {time.perf_counter() - started:.1f}s")
+            if len(events) < batch_size:
+                break
+        self.mark = (source.name, last_id)
+        return read
+
+    def prune(self, now=None):
+        """Drop members with no events inside the longest window; returns how many."""
+        cutoff = to_seconds(now or datetime.now()) - WINDOW_DAYS * 86400
+        count = len(self.members)
+        keep = np.flatnonzero(self.last_seen[:count] >= cutoff)
+        dropped = count - len(keep)
+        if dropped:
+            self.members = [self.members[i] for i in keep]
+            self.index = {key: row for row, key in enumerate(self.members)}
+            self.stamps = self.stamps[keep]
+            self.counts = self.counts[keep]
+            self.sketches = self.sketches[keep]
+            self.last_seen = self.last_seen[keep]
+            self._grow(max(len(keep), INITIAL_CAPACITY))
+        return dropped
+
+    def save(self, path=FEATURE_STORE_FILE):
+        """Write the store (trimmed to its members) and mark; atomic replace."""
+        count = len(self.members)
+        temp = path + '.tmp.npz'
+        np.savez_compressed(temp, members=np.array(self.members, dtype=str),
+                            stamps=self.stamps[:count], counts=self.counts[:count],
+                            sketches=self.sketches[:count], last_seen=self.last_seen[:count],
+                            mark=np.array([self.mark[0] if self.mark else '',
+                                           str(self.mark[1]) if self.mark else '']))
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path=FEATURE_STORE_FILE):
+        """Saved store, or an empty one when path does not exist."""
+        store = cls()
+        if not os.path.exists(path):
+            return store
+        with np.load(path) as data:
+            store.members = data['members'].tolist()
+            store.index = {key: row for row, key in enumerate(store.members)}
+            store.stamps = data['stamps']
+            store.counts = data['counts']
+            store.sketches = data['sketches']
+            store.last_seen = data['last_seen']
+            name, last_id = data['mark'].tolist()
+            store.mark = (name, int(last_id)) if name else None
+        store._grow(max(len(store.members), INITIAL_CAPACITY))
+        return store
+
+    def status(self):
+        count = len(self.members)
+        used = self.stamps.nbytes + self.counts.nbytes + self.sketches.nbytes + self.last_seen.nbytes
+        newest = self.last_seen[:count].max() if count else None
+        print(f"Members:        {count:,} (capacity {len(self.stamps):,}, {used / 1e6:.1f} MB in memory)")
+        print(f"Mark:           {self.mark[1] if self.mark else '-'} "
+              f"({self.mark[0] if self.mark else 'never synced'})")
+        print(f"Newest event:   {_EPOCH + timedelta(seconds=int(newest)) if newest else '-'}")
+        print(f"Windows:        {', '.join(w.name for w in WINDOWS)}  "
+              f"(tiers: {', '.join(f'{t.slots} x {t.name}' for t in TIERS)})")
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+
+def _synthetic_events(count, members=20000, days=30, seed=5):
+    from fraud_tail import TailEvent
+    rng = np.random.default_rng(seed)
+    start = datetime(2026, 1, 1)
+    offsets = np.sort(rng.integers(0, days * 86400, count))
+    categories = np.array(['LoginSuccessful', 'LoginFailure', OTP_CATEGORY, 'Change Primary email',
+                           DEVICE_REGISTER_CATEGORY, 'View Accounts'])
+    picks = rng.choice(len(categories), count, p=[0.35, 0.05, 0.1, 0.01, 0.01, 0.48])
+    member = rng.integers(0, members, count)
+    ips = rng.integers(0, 4, count)
+    return [TailEvent(i + 1, start + timedelta(seconds=int(offsets[i])), categories[picks[i]],
+                      f'["email", "m{member[i]}@example.com", null, null, "sent"]'
+                      if picks[i] == 2 else '[]',
+                      f"10.{member[i] % 250}.{ips[i]}.{member[i] % 7}", 'web', 'Windows', 'Chrome',
+                      f"s{member[i]}-{offsets[i] // 3600}", f"M{member[i]:08d}", f"user{member[i]}", None)
+            for i in range(count)]
+
+
+def benchmark(count=300000):
+    events = _synthetic_events(count)
+    store = FeatureStore()
+    started = time.perf_counter()
+    for start in range(0, count, SYNC_BATCH):
+        store.add_batch(events[start:start + SYNC_BATCH])
+    bulk = time.perf_counter() - started
+    started = time.perf_counter()
+    frame = store.frame(at=events[-1].activityDate)
+    query = time.perf_counter() - started
+
+    replay = FeatureStore()
+    sample = events[:50000]
+    started = time.perf_counter()
+    for _ in replay.point_in_time(sample):
+        pass
+    streamed = time.perf_counter() - started
+    print(f"Bulk fold:      {count:,} events in {bulk:.2f}s ({count / bulk:,.0f}/s)")
+    print(f"All members:    {len(frame):,} x {len(FEATURE_NAMES)} features in {query:.2f}s")
+    print(f"Point in time:  {len(sample):,} events in {streamed:.2f}s ({len(sample) / streamed:,.0f}/s)")
+    row_bytes = (store.stamps.nbytes + store.counts.nbytes + store.sketches.nbytes) / len(store.stamps)
+    print(f"Memory:         {row_bytes:,.0f} bytes per member row")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling per-member activity features")
+    parser.add_argument('--sync', action='store_true', help="fold in new fraudmonitor rows and save")
+    parser.add_argument('--replay', action='store_true', help="sync from the local member timeline store")
+    parser.add_argument('--since', metavar='YYYY-MM-DD', help="start date for a store with no mark")
+    parser.add_argument('--member', help="member key (muid, or u:username)")
+    parser.add_argument('--at', help="query time (default: the member's latest event / now for --top)")
+    parser.add_argument('--top', metavar='FEATURE', help="members with the highest value of a feature")
+    parser.add_argument('--path', default=FEATURE_STORE_FILE, help="store file")
+    parser.add_argument('--status', action='store_true')
+    parser.add_argument('--bench', action='store_true', help="synthetic fold/query benchmark")
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark()
+        return
+
+    store = FeatureStore.load(args.path)
+    if args.sync:
+        if args.replay:
+            from member_timeline import TIMELINE_FILE
+            source = LocalSource(TIMELINE_FILE, table='events')
+        else:
+            source = FraudmonitorSource()
+        print(f"Syncing {source.name}...")
+        store.sync(source, since=to_datetime(args.since) if args.since else None)
+        print(f"Pruned {store.prune():,} idle members")
+        store.save(args.path)
+    if args.status or not (args.sync or args.member or args.top):
+        store.status()
+    if args.member:
+        key = args.member if args.member in store.index else f"u:{args.member.lower()}"
+        print(f"\nFeatures for {key}" + (f" as of {args.at}" if args.at else ""))
+        features = store.features(key, at=args.at)
+        for name in COUNTERS + tuple(f"distinct_{s}" for s in SKETCHES):
+            print(f"  {name:24}" + ''.join(f"{w.name:>6}={features[f'{name}_{w.name}']:<6}" for w in WINDOWS))
+    if args.top:
+        if args.top not in FEATURE_NAMES:
+            parser.error(f"unknown feature {args.top}; one of {', '.join(FEATURE_NAMES)}")
+        frame = store.frame(at=args.at)
+        print(frame.sort_values(args.top, ascending=False).head(25)[[args.top]].to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -5,15 +5,21 @@ Outputs comprehensive fraud report to CSV with IP geolocation
 """
 
 import pymysql
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-import requests
 import warnings
 import sys
-import time
+from ip_geolocation import geolocate_ips
+from domain_rules import DomainRules
+from risk_rules import (EMAIL_CHANGE_ACTIONS, EMAIL_CHANGE_MODEL, GEO_MODEL, RiskModel, Rule,
+                        assign_levels, col)
 
 warnings.filterwarnings('ignore')
 
+# True = no provider calls; IPs are answered from the offline range index and cache only
+OFFLINE_GEO = False
+
 # Known suspicious email domains
 SUSPICIOUS_DOMAINS = [
     'telegmail.com', 'tuta.com', 'proton.me', 'protonmail.com',
@@ -23,135 +29,81 @@ SUSPICIOUS_DOMAINS = [
     'temp-mail.io', 'mohmal.com', 'dispostable.com', 'fakeinbox.com'
 ]
 
-# High risk countries
-HIGH_RISK_COUNTRIES = [
-    'Russia', 'China', 'Nigeria', 'Romania', 'Brazil', 'North Korea',
-    'India', 'Indonesia', 'Philippines', 'Vietnam', 'Ukraine', 'Iran'
-]
-
-def get_ip_geolocation(ip_address, ip_cache={}):
-    """Get geographic information for IP address with caching"""
-    # Check cache first
-    if ip_address in ip_cache:
-        return ip_cache[ip_address]
+def to_fraud_geo(record):
+    """Reduce a shared geolocation record to the fields used in this report"""
+    return {key: record[key] for key in
+            ('country', 'city', 'region', 'isp', 'org', 'lat', 'lon', 'timezone', 'zip', 'as')}
 
-    try:
-        # Using ip-api.com (free, no key needed, 45 req/min limit)
-        response = requests.get(
-            f'http://ip-api.com/json/{ip_address}',
-            timeout=2
-        )
-
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('status') == 'success':
-                result = {
-                    'country': data.get('country', 'Unknown'),
-                    'city': data.get('city', 'Unknown'),
-                    'region': data.get('regionName', 'Unknown'),
-                    'isp': data.get('isp', 'Unknown'),
-                    'org': data.get('org', 'Unknown'),
-                    'lat': data.get('lat', ''),
-                    'lon': data.get('lon', ''),
-                    'timezone': data.get('timezone', 'Unknown'),
-                    'zip': data.get('zip', ''),
-                    'as': data.get('as', 'Unknown')
-                }
-                ip_cache[ip_address] = result
-                return result
-
-        # Rate limit - wait a bit
-        time.sleep(1.5)
-    except:
-        pass
-
-    # Default if lookup fails
-    default = {
-        'country': 'Unknown',
-        'city': 'Unknown',
-        'region': 'Unknown',
-        'isp': 'Unknown',
-        'org': 'Unknown',
-        'lat': '',
-        'lon': '',
-        'timezone': 'Unknown',
-        'zip': '',
-        'as': 'Unknown'
-    }
-    ip_cache[ip_address] = default
-    return default
+def build_domain_rules():
+    """Compile SUSPICIOUS_DOMAINS and the risky TLDs into one rule set (list order = precedence)"""
+    rules = DomainRules(default='No', blank='UNKNOWN')
+    for sus_domain in SUSPICIOUS_DOMAINS:
+        rules.add_substring(sus_domain, f'YES - {sus_domain.upper()}')
+    for tld in ['.tk', '.ml', '.ga', '.cf', '.click', '.download', '.review', '.top', '.buzz']:
+        rules.add_suffix(tld, f'SUSPICIOUS TLD - {tld}')
+    return rules
+
+DOMAIN_RULES = build_domain_rules()
+
+def check_suspicious_domains(domains):
+    """Check a column of email domains; returns a list of verdicts aligned with the input"""
+    verdicts = DOMAIN_RULES.classify_many(domains)
+    for i, (domain, verdict) in enumerate(zip(domains, verdicts)):
+        # Check for numbers in domain (often suspicious)
+        if verdict == 'No' and any(char.isdigit() for char in domain.lower().split('.')[0]):
+            verdicts[i] = 'NUMBERS IN DOMAIN'
+    return verdicts
 
 def check_suspicious_domain(domain):
     """Check if email domain is suspicious"""
-    if not domain:
-        return 'UNKNOWN'
-
-    domain_lower = domain.lower()
-
-    # Check against known suspicious domains
-    for sus_domain in SUSPICIOUS_DOMAINS:
-        if sus_domain in domain_lower:
-            return f'YES - {sus_domain.upper()}'
-
-    # Check for suspicious TLDs
-    suspicious_tlds = ['.tk', '.ml', '.ga', '.cf', '.click', '.download', '.review', '.top', '.buzz']
-    for tld in suspicious_tlds:
-        if domain_lower.endswith(tld):
-            return f'SUSPICIOUS TLD - {tld}'
-
-    # Check for numbers in domain (often suspicious)
-    domain_parts = domain_lower.split('.')
-    if len(domain_parts) > 0 and any(char.isdigit() for char in domain_parts[0]):
-        return 'NUMBERS IN DOMAIN'
-
-    return 'No'
-
-def check_vpn_indicators(isp, org):
-    """Check for VPN/Proxy indicators"""
-    vpn_keywords = ['vpn', 'proxy', 'tor', 'relay', 'anonymous', 'hosting',
-                    'datacenter', 'cloud', 'server', 'virtual', 'private']
-    combined = f"{isp} {org}".lower()
-
-    for keyword in vpn_keywords:
-        if keyword in combined:
-            return f'YES - {keyword.upper()}'
-    return 'No'
-
-def calculate_geo_risk_score(geo_data):
-    """Calculate risk score based on geographic data"""
-    score = 0
-    factors = []
-
-    # Country risk
-    country = geo_data.get('country', 'Unknown')
-    if country == 'Unknown':
-        score += 20
-        factors.append('Unknown location')
-    elif country in HIGH_RISK_COUNTRIES:
-        score += 50
-        factors.append(f'High-risk country: {country}')
-    elif country != 'United States':
-        score += 30
-        factors.append(f'Foreign: {country}')
-
-    # ISP/Org risk
-    isp = geo_data.get('isp', '').lower()
-    org = geo_data.get('org', '').lower()
-
-    vpn_check = check_vpn_indicators(isp, org)
-    if vpn_check.startswith('YES'):
-        score += 40
-        factors.append(vpn_check)
-
-    # Hosting providers
-    hosting_providers = ['amazon', 'google cloud', 'azure', 'digitalocean', 'linode']
-    for provider in hosting_providers:
-        if provider in isp or provider in org:
-            score += 30
-            factors.append(f'Hosting provider: {provider}')
-            break
-
-    return score, '; '.join(factors) if factors else 'Normal'
+    return check_suspicious_domains([domain])[0]
+
+# Combined score = SQL-enriched email change score + geo score + this
+DOMAIN_RISK_MODEL = RiskModel([Rule('SuspiciousDomain', col('Domain_Risk_Details') != 'No', 50)])
+
+FINAL_ASSESSMENT_LEVELS = ((200, 'EXTREME - IMMEDIATE LOCK'), (150, 'CRITICAL - LOCK & CALL'),
+                           (100, 'HIGH - URGENT REVIEW'), (75, 'ELEVATED - VERIFY'),
+                           (50, 'MODERATE - MONITOR'))
+
+# Raw SQL columns selected only to feed email_change_features; not part of the CSV
+SCORING_ONLY_COLUMNS = ['Browser', 'Activity_24h', 'Activity_Daily_Avg']
+
+def email_change_features(df):
+    """Report columns -> the feature frame risk_rules.EMAIL_CHANGE_MODEL scores"""
+    return pd.DataFrame({
+        'ip_total_sessions': df['IP_Sessions'],
+        'ip_days_active': df['IP_Days'],
+        'browser': df['Browser'],
+        'account_email_changes': df['Prior_Email_Changes'],
+        'failed_attempts': df['Failed_Login_Attempts'],
+        'last_24h_activity': df['Activity_24h'],
+        'historical_avg_daily': df['Activity_Daily_Avg'],
+        'activityDate': pd.to_datetime(df['Change_DateTime']),
+        'new_email_domain': df['Email_Domain'],
+    }, index=df.index)
+
+def geo_frame(records):
+    """One row per geolocated IP with the report's IP_* columns and the geo risk score"""
+    geo = pd.DataFrame([{'IP_Address': ip, **to_fraud_geo(record)} for ip, record in records.items()],
+                       columns=['IP_Address', 'country', 'city', 'region', 'isp', 'org', 'lat', 'lon',
+                                'timezone', 'zip', 'as'])
+    scored = GEO_MODEL.score(geo, labels=True)
+    return pd.DataFrame({
+        'IP_Address': geo['IP_Address'],
+        'IP_Country': geo['country'],
+        'IP_City': geo['city'],
+        'IP_Region': geo['region'],
+        'IP_ISP': geo['isp'],
+        'IP_Organization': geo['org'],
+        'IP_Latitude': geo['lat'].astype(str),
+        'IP_Longitude': geo['lon'].astype(str),
+        'IP_Timezone': geo['timezone'],
+        'Is_Foreign_IP': np.where(geo['country'].isin(['United States', 'Unknown']), 'NO', 'YES'),
+        'Is_VPN_Proxy': np.where(scored['VPN'] > 0, 'YES', 'NO'),
+        'VPN_Details': scored['VPN_label'].replace('', 'No'),
+        'Geo_Risk_Score': scored['score'],
+        'Geo_Risk_Factors': scored['factors'],
+    })
 
 def main():
     print("=" * 80)
@@ -261,7 +213,7 @@ account_patterns AS (
         AND activityDate >= '2025-09-01'
     GROUP BY userName, masterMembership
 ),
-risk_scores AS (
+change_features AS (
     SELECT
         ec.*,
         COALESCE(iph.total_sessions, 0) as ip_total_sessions,
@@ -278,50 +230,7 @@ risk_scores AS (
         COALESCE(ap.account_age_days, 0) as account_age_days,
         COALESCE(ap.last_24h_activity, 1) as last_24h_activity,
         COALESCE(ap.failed_attempts, 0) as failed_attempts,
-        COALESCE(ap.avg_daily_activity_historical, 0) as historical_avg_daily,
-        CASE
-            WHEN COALESCE(iph.total_sessions, 0) = 0 THEN 50
-            WHEN COALESCE(iph.total_sessions, 0) <= 2 THEN 30
-            ELSE 0
-        END as new_ip_risk,
-        CASE WHEN ec.browser IS NOT NULL THEN 30 ELSE 0 END as browser_risk,
-        CASE
-            WHEN COALESCE(iph.days_active, 1) <= 1 THEN 20
-            WHEN COALESCE(iph.days_active, 1) <= 3 THEN 10
-            ELSE 0
-        END as ip_age_risk,
-        CASE
-            WHEN COALESCE(ap.email_changes, 0) > 3 THEN 30
-            WHEN COALESCE(ap.email_changes, 0) > 2 THEN 20
-            WHEN COALESCE(ap.email_changes, 0) > 1 THEN 10
-            ELSE 0
-        END as frequent_changes_risk,
-        CASE
-            WHEN COALESCE(ap.failed_attempts, 0) > 10 THEN 30
-            WHEN COALESCE(ap.failed_attempts, 0) > 5 THEN 20
-            WHEN COALESCE(ap.failed_attempts, 0) > 0 THEN 10
-            ELSE 0
-        END as failed_attempts_risk,
-        CASE
-            WHEN ap.last_24h_activity > GREATEST(ap.avg_daily_activity_historical * 5, 10) THEN 30
-            WHEN ap.last_24h_activity > GREATEST(ap.avg_daily_activity_historical * 3, 5) THEN 15
-            ELSE 0
-        END as activity_spike_risk,
-        CASE
-            WHEN HOUR(ec.activityDate) BETWEEN 0 AND 5 THEN 15
-            WHEN HOUR(ec.activityDate) BETWEEN 22 AND 23 THEN 5
-            ELSE 0
-        END as odd_hour_risk,
-        CASE
-            WHEN ec.new_email_domain IN ('gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com', 'icloud.com') THEN 0
-            WHEN ec.new_email_domain LIKE '%temp%' OR ec.new_email_domain LIKE '%disposable%' THEN 50
-            WHEN ec.new_email_domain LIKE '%guerrilla%' OR ec.new_email_domain LIKE '%mailinator%' THEN 50
-            ELSE 15
-        END as unusual_domain_risk,
-        CASE
-            WHEN ec.browser IS NOT NULL AND COALESCE(iph.total_sessions, 0) = 0 THEN 20
-            ELSE 0
-        END as combo_risk
+        COALESCE(ap.avg_daily_activity_historical, 0) as historical_avg_daily
     FROM email_changes ec
     LEFT JOIN ip_history iph
         ON ec.userName = iph.userName
@@ -379,35 +288,6 @@ SELECT
     rs.muid as MUID,
     rs.userName as Username,
     rs.sessionid as Session_ID,
-    (rs.new_ip_risk + rs.browser_risk + rs.ip_age_risk +
-     rs.frequent_changes_risk + rs.failed_attempts_risk +
-     rs.activity_spike_risk + rs.odd_hour_risk +
-     rs.unusual_domain_risk + rs.combo_risk) as Risk_Score,
-    CASE
-        WHEN (rs.new_ip_risk + rs.browser_risk + rs.ip_age_risk + rs.frequent_changes_risk +
-              rs.failed_attempts_risk + rs.activity_spike_risk + rs.odd_hour_risk +
-              rs.unusual_domain_risk + rs.combo_risk) >= 100 THEN 'CRITICAL'
-        WHEN (rs.new_ip_risk + rs.browser_risk + rs.ip_age_risk + rs.frequent_changes_risk +
-              rs.failed_attempts_risk + rs.activity_spike_risk + rs.odd_hour_risk +
-              rs.unusual_domain_risk + rs.combo_risk) >= 75 THEN 'HIGH'
-        WHEN (rs.new_ip_risk + rs.browser_risk + rs.ip_age_risk + rs.frequent_changes_risk +
-              rs.failed_attempts_risk + rs.activity_spike_risk + rs.odd_hour_risk +
-              rs.unusual_domain_risk + rs.combo_risk) >= 50 THEN 'MEDIUM'
-        WHEN (rs.new_ip_risk + rs.browser_risk + rs.ip_age_risk + rs.frequent_changes_risk +
-              rs.failed_attempts_risk + rs.activity_spike_risk + rs.odd_hour_risk +
-              rs.unusual_domain_risk + rs.combo_risk) >= 25 THEN 'LOW'
-        ELSE 'MINIMAL'
-    END as Risk_Level,
-    CONCAT(
-        IF(rs.new_ip_risk > 0, CONCAT('NewIP(', rs.new_ip_risk, ') '), ''),
-        IF(rs.browser_risk > 0, CONCAT('Browser(', rs.browser_risk, ') '), ''),
-        IF(rs.frequent_changes_risk > 0, CONCAT('FreqChanges(', rs.frequent_changes_risk, ') '), ''),
-        IF(rs.failed_attempts_risk > 0, CONCAT('Failed(', rs.failed_attempts_risk, ') '), ''),
-        IF(rs.activity_spike_risk > 0, CONCAT('Spike(', rs.activity_spike_risk, ') '), ''),
-        IF(rs.odd_hour_risk > 0, CONCAT('OddHr(', rs.odd_hour_risk, ') '), ''),
-        IF(rs.unusual_domain_risk > 0, CONCAT('Domain(', rs.unusual_domain_risk, ') '), ''),
-        IF(rs.combo_risk > 0, CONCAT('Combo(', rs.combo_risk, ') '), '')
-    ) as Risk_Factors,
     DATE_FORMAT(rs.activityDate, '%Y-%m-%d %H:%i:%s') as Change_DateTime,
     rs.email_type as Email_Type,
     CONCAT(rs.new_email_user, '@', rs.new_email_domain) as New_Email,
@@ -434,30 +314,14 @@ SELECT
     ) as Activity_Stats,
     COALESCE(rs.platform, 'Unknown') as Platform,
     COALESCE(rs.browser, 'App') as Access_Type,
-    CASE
-        WHEN (rs.new_ip_risk + rs.browser_risk + rs.ip_age_risk + rs.frequent_changes_risk +
-              rs.failed_attempts_risk + rs.activity_spike_risk + rs.odd_hour_risk +
-              rs.unusual_domain_risk + rs.combo_risk) >= 100 THEN 'LOCK ACCOUNT NOW'
-        WHEN (rs.new_ip_risk + rs.browser_risk + rs.ip_age_risk + rs.frequent_changes_risk +
-              rs.failed_attempts_risk + rs.activity_spike_risk + rs.odd_hour_risk +
-              rs.unusual_domain_risk + rs.combo_risk) >= 75 THEN 'CALL MEMBER IN 1 HOUR'
-        WHEN (rs.new_ip_risk + rs.browser_risk + rs.ip_age_risk + rs.frequent_changes_risk +
-              rs.failed_attempts_risk + rs.activity_spike_risk + rs.odd_hour_risk +
-              rs.unusual_domain_risk + rs.combo_risk) >= 50 THEN 'VERIFY TODAY'
-        WHEN (rs.new_ip_risk + rs.browser_risk + rs.ip_age_risk + rs.frequent_changes_risk +
-              rs.failed_attempts_risk + rs.activity_spike_risk + rs.odd_hour_risk +
-              rs.unusual_domain_risk + rs.combo_risk) >= 25 THEN 'MONITOR'
-        ELSE 'OK'
-    END as Action_Required,
+    rs.browser as Browser,
+    rs.last_24h_activity as Activity_24h,
+    rs.historical_avg_daily as Activity_Daily_Avg,
     LEFT(COALESCE(ra.recent_history, 'No recent activity'), 500) as Recent_Activity
-FROM risk_scores rs
+FROM change_features rs
 LEFT JOIN ip_sharing ips ON rs.ipAddress = ips.ipAddress
 LEFT JOIN recent_activity ra ON rs.userName = ra.userName
-ORDER BY
-    (rs.new_ip_risk + rs.browser_risk + rs.ip_age_risk + rs.frequent_changes_risk +
-     rs.failed_attempts_risk + rs.activity_spike_risk + rs.odd_hour_risk +
-     rs.unusual_domain_risk + rs.combo_risk) DESC,
-    rs.activityDate DESC
+ORDER BY rs.activityDate DESC
         """
 
         print("\nExecuting advanced risk analysis query...")
@@ -472,105 +336,51 @@ ORDER BY
             print("\nNo email changes found since September 1st")
             return
 
+        # Score the enriched rows locally (rules and weights live in risk_rules.py)
+        scored = EMAIL_CHANGE_MODEL.score(email_change_features(df))
+        df.insert(4, 'Risk_Score', scored['score'])
+        df.insert(5, 'Risk_Level', scored['level'])
+        df.insert(6, 'Risk_Factors', scored['factors'])
+        df.insert(df.columns.get_loc('Recent_Activity'), 'Action_Required',
+                  assign_levels(scored['score'], EMAIL_CHANGE_ACTIONS, 'OK'))
+        df = df.drop(columns=SCORING_ONLY_COLUMNS)
+
         # Add geolocation and additional analysis columns
         print("\n" + "=" * 80)
         print("ANALYZING IP ADDRESSES AND EMAIL DOMAINS")
         print("=" * 80)
 
-        # Initialize new columns
-        df['IP_Country'] = ''
-        df['IP_City'] = ''
-        df['IP_Region'] = ''
-        df['IP_ISP'] = ''
-        df['IP_Organization'] = ''
-        df['IP_Latitude'] = ''
-        df['IP_Longitude'] = ''
-        df['IP_Timezone'] = ''
-        df['Is_Foreign_IP'] = ''
-        df['Is_VPN_Proxy'] = ''
-        df['VPN_Details'] = ''
-        df['Is_Suspicious_Domain'] = ''
-        df['Domain_Risk_Details'] = ''
-        df['Geo_Risk_Score'] = 0
-        df['Geo_Risk_Factors'] = ''
-        df['Combined_Risk_Score'] = 0
-        df['Final_Risk_Assessment'] = ''
-
         # Process unique IPs for geolocation
-        unique_ips = df['IP_Address'].dropna().unique()
-        ip_cache = {}
+        unique_ips = [ip for ip in df['IP_Address'].dropna().unique() if ip not in ('', 'None')]
 
         print(f"\nAnalyzing {len(unique_ips)} unique IP addresses...")
 
-        for i, ip in enumerate(unique_ips):
-            if pd.isna(ip) or ip == '' or ip == 'None':
-                continue
-
-            if (i + 1) % 10 == 0:
-                print(f"  Progress: {i+1}/{len(unique_ips)} IPs analyzed...")
-
-            # Get geolocation with rate limiting
-            geo_data = get_ip_geolocation(ip, ip_cache)
-
-            # Update all rows with this IP
-            mask = df['IP_Address'] == ip
-            df.loc[mask, 'IP_Country'] = geo_data['country']
-            df.loc[mask, 'IP_City'] = geo_data['city']
-            df.loc[mask, 'IP_Region'] = geo_data['region']
-            df.loc[mask, 'IP_ISP'] = geo_data['isp']
-            df.loc[mask, 'IP_Organization'] = geo_data['org']
-            df.loc[mask, 'IP_Latitude'] = str(geo_data['lat'])
-            df.loc[mask, 'IP_Longitude'] = str(geo_data['lon'])
-            df.loc[mask, 'IP_Timezone'] = geo_data['timezone']
-
-            # Check if foreign
-            is_foreign = 'YES' if geo_data['country'] not in ['United States', 'Unknown'] else 'NO'
-            df.loc[mask, 'Is_Foreign_IP'] = is_foreign
-
-            # Check for VPN/Proxy
-            vpn_check = check_vpn_indicators(geo_data['isp'], geo_data['org'])
-            df.loc[mask, 'Is_VPN_Proxy'] = 'YES' if vpn_check.startswith('YES') else 'NO'
-            df.loc[mask, 'VPN_Details'] = vpn_check
-
-            # Calculate geo risk score
-            geo_risk_score, geo_factors = calculate_geo_risk_score(geo_data)
-            df.loc[mask, 'Geo_Risk_Score'] = geo_risk_score
-            df.loc[mask, 'Geo_Risk_Factors'] = geo_factors
+        # Geolocate every IP up front: shared cache first, then the offline range
+        # index, then batched, rate-limited provider requests for the rest; then
+        # score all of them at once and join the IP columns back onto the rows
+        records = geolocate_ips(unique_ips, offline=OFFLINE_GEO)
+        geo = geo_frame(records)
+        df = df.merge(geo, on='IP_Address', how='left')
+        text_columns = [c for c in geo.columns if c not in ('IP_Address', 'Geo_Risk_Score')]
+        df[text_columns] = df[text_columns].fillna('')
+        df['Geo_Risk_Score'] = df['Geo_Risk_Score'].fillna(0).astype(int)
 
         print("\n✓ IP address analysis complete")
 
         # Analyze email domains
         print("\nAnalyzing email domains for suspicious patterns...")
 
-        for idx, row in df.iterrows():
-            domain = row['Email_Domain']
-
-            # Check for suspicious domains
-            domain_check = check_suspicious_domain(domain)
-            df.at[idx, 'Is_Suspicious_Domain'] = 'YES' if domain_check != 'No' else 'NO'
-            df.at[idx, 'Domain_Risk_Details'] = domain_check
-
-            # Calculate combined risk score
-            base_risk = row['Risk_Score'] if pd.notna(row['Risk_Score']) else 0
-            geo_risk = row['Geo_Risk_Score'] if pd.notna(row['Geo_Risk_Score']) else 0
-            domain_risk = 50 if domain_check != 'No' else 0
-
-            combined_score = base_risk + geo_risk + domain_risk
-            df.at[idx, 'Combined_Risk_Score'] = combined_score
-
-            # Final assessment
-            if combined_score >= 200:
-                df.at[idx, 'Final_Risk_Assessment'] = 'EXTREME - IMMEDIATE LOCK'
-            elif combined_score >= 150:
-                df.at[idx, 'Final_Risk_Assessment'] = 'CRITICAL - LOCK & CALL'
-            elif combined_score >= 100:
-                df.at[idx, 'Final_Risk_Assessment'] = 'HIGH - URGENT REVIEW'
-            elif combined_score >= 75:
-                df.at[idx, 'Final_Risk_Assessment'] = 'ELEVATED - VERIFY'
-            elif combined_score >= 50:
-                df.at[idx, 'Final_Risk_Assessment'] = 'MODERATE - MONITOR'
-            else:
-                df.at[idx, 'Final_Risk_Assessment'] = 'LOW - ROUTINE'
+        # Classify the whole column in one pass
+        domain_checks = check_suspicious_domains(df['Email_Domain'].tolist())
+        position = df.columns.get_loc('Geo_Risk_Score')
+        df.insert(position, 'Is_Suspicious_Domain', ['YES' if check != 'No' else 'NO' for check in domain_checks])
+        df.insert(position + 1, 'Domain_Risk_Details', domain_checks)
+
+        # Combined risk score and final assessment
+        domain_risk = DOMAIN_RISK_MODEL.score(df)['score']
+        df['Combined_Risk_Score'] = df['Risk_Score'].fillna(0) + df['Geo_Risk_Score'] + domain_risk
+        df['Final_Risk_Assessment'] = assign_levels(df['Combined_Risk_Score'], FINAL_ASSESSMENT_LEVELS,
+                                                    'LOW - ROUTINE')
 
         print("✓ Email domain analysis complete")
 
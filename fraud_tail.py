@@ -0,0 +1,673 @@
+#!/usr/bin/env python3
+"""
+Fraudmonitor Tail
+Follows fraudmonitor as rows land and runs incremental detectors over them.
+
+Every detection used to be a batch script re-run by hand over months of
+history: fast_pattern_search's "cgregory pattern" (OTP sent to an email
+whose domain is not on the profile, with no email change event),
+export_suspicious_emails (risky email domains / gibberish addresses) and
+fraud_analysis's email-change risk report (the CLI also runs geo_velocity's
+impossible-travel check). Here each of them is a detector that sees one
+event at a time plus a small per-member state, and the tail loop feeds it
+only the rows it has not seen yet:
+
+    - the high-water mark is fraudmonitor.id; each poll is a primary-key
+      range read (id > mark ORDER BY id LIMIT batch), so a cycle touches
+      only new rows and costs the same whatever the table size
+    - detector state (per detector, per member) and the mark are kept in a
+      local SQLite file and committed together with the cycle's alerts, so
+      a restart resumes exactly where the last cycle ended
+    - alerts are printed and stored as soon as the cycle that read the
+      event finishes - a few seconds after it lands with the default poll
+      interval
+
+A LocalSource reads the same columns from a SQLite table instead of
+production: an empty stand-in table to push test events into, or the
+member_timeline store (--replay) to run the detectors over history.
+
+Usage:
+    from fraud_tail import FraudTail, FraudmonitorSource, LocalSource, DEFAULT_DETECTORS
+    tail = FraudTail(FraudmonitorSource(), [d() for d in DEFAULT_DETECTORS])
+    tail.run()                                  # poll until Ctrl+C
+    alerts = tail.run_once()                    # one cycle
+
+    py fraud_tail.py                            (tail production from the saved mark, or from now)
+    py fraud_tail.py --since 2026-01-01         (start the mark at a date and catch up)
+    py fraud_tail.py --replay --state replay.db (run the detectors over the member timeline)
+    py fraud_tail.py --alerts 50                (latest stored alerts)
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from domain_rules import SUSPICIOUS_CATEGORIES, classify_email
+from event_data import EMAIL_CHANGE_CATEGORIES, OTP_CATEGORY, parse_event
+from fraudmonitor_scan import record_type, to_datetime
+from gibberish_score import gibberish_scores
+from risk_rules import EMAIL_CHANGE_ACTIONS, EMAIL_CHANGE_MODEL, assign_levels
+
+TAIL_STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fraud_tail.db')
+
+TAIL_COLUMNS = ('id', 'activityDate', 'eventCategory', 'eventData', 'ipAddress', 'platform',
+                'platformOS', 'browser', 'sessionid', 'muid', 'userName', 'masterMembership')
+
+POLL_INTERVAL = 5          # seconds between polls once caught up
+BATCH_SIZE = 5000          # rows per poll
+STATE_CHUNK = 500          # member keys per state lookup
+MAX_CACHED_STATES = 50000  # member states kept in memory between cycles
+
+TailEvent = record_type(TAIL_COLUMNS)
+
+Alert = namedtuple('Alert', ['detector', 'member', 'severity', 'event_id', 'activityDate',
+                             'summary', 'details'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tail_cursor (
+    source      TEXT PRIMARY KEY,
+    last_id     INTEGER NOT NULL,   -- high-water mark: largest fraudmonitor.id processed
+    last_event  TEXT,               -- activityDate of that row
+    updated_at  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS member_state (
+    detector    TEXT NOT NULL,
+    member      TEXT NOT NULL,
+    state       TEXT NOT NULL,      -- JSON
+    updated_at  TEXT NOT NULL,
+    PRIMARY KEY (detector, member)
+);
+CREATE TABLE IF NOT EXISTS alerts (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    detector     TEXT NOT NULL,
+    member       TEXT,
+    severity     TEXT NOT NULL,
+    event_id     INTEGER,
+    activityDate TEXT,
+    summary      TEXT NOT NULL,
+    details      TEXT,              -- JSON
+    created_at   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_alerts_member ON alerts (member, id);
+"""
+
+
+def member_key(event):
+    """Key detectors keep state under: the muid, else 'u:' + lowercase userName."""
+    if event.muid:
+        return str(event.muid)
+    if event.userName:
+        return f"u:{event.userName.lower()}"
+    return None
+
+
+def _now_text():
+    return datetime.now().isoformat(sep=' ', timespec='seconds')
+
+
+def _email_domain(email):
+    if email and '@' in email:
+        return email.rsplit('@', 1)[1].lower()
+    return None
+
+
+# ----------------------------------------------------------------------
+# Event sources
+# ----------------------------------------------------------------------
+
+class FraudmonitorSource:
+    """
+    Production fraudmonitor, read by id range.
+
+    Args:
+        get_conn: Connection factory (default: pooled dbxdb connection)
+    """
+
+    name = 'fraudmonitor'
+
+    def __init__(self, get_conn=None):
+        if get_conn is None:
+            from db_connection import get_connection as get_conn
+        self.get_conn = get_conn
+
+    def _query(self, sql, params):
+        conn = self.get_conn()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def fetch(self, after_id, limit):
+        """Up to limit TailEvents with id > after_id, in id order."""
+        select = ", ".join(f"`{c}`" for c in TAIL_COLUMNS)
+        rows = self._query(f"SELECT {select} FROM fraudmonitor WHERE id > %s ORDER BY id LIMIT %s",
+                           (after_id, limit))
+        return [TailEvent(*row) for row in rows]
+
+    def latest_id(self):
+        """Largest id in the table (0 when empty)."""
+        return self._query("SELECT COALESCE(MAX(id), 0) FROM fraudmonitor", ())[0][0]
+
+    def first_id_since(self, since):
+        """Mark that makes the next fetch start at the first row on or after since."""
+        row = self._query("SELECT MIN(id) FROM fraudmonitor WHERE activityDate >= %s", (since,))[0]
+        return (row[0] - 1) if row[0] is not None else self.latest_id()
+
+
+class LocalSource:
+    """
+    fraudmonitor-shaped SQLite table: the stand-in for tests and replays.
+
+    Args:
+        path: SQLite file (':memory:' for a throwaway table)
+        table: Table holding the TAIL_COLUMNS (created if missing), e.g.
+               'events' to read the member_timeline store
+    """
+
+    name = 'local'
+
+    def __init__(self, path=':memory:', table='fraudmonitor'):
+        self.path = path
+        self.table = table
+        self.name = f"local:{os.path.basename(path)}:{table}"
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, activityDate TEXT NOT NULL, "
+            + ", ".join(f"{c} TEXT" for c in TAIL_COLUMNS[2:]) + ")")
+
+    def close(self):
+        self.conn.close()
+
+    def insert(self, events):
+        """Append events (TailEvent or dicts with TAIL_COLUMNS keys; id may be None)."""
+        rows = []
+        for event in events:
+            values = [event.get(c) for c in TAIL_COLUMNS] if isinstance(event, dict) else list(event)
+            moment = values[1]
+            values[1] = moment.isoformat(sep=' ') if isinstance(moment, datetime) else moment
+            rows.append(values)
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO {self.table} ({', '.join(TAIL_COLUMNS)}) VALUES "
+                f"({', '.join('?' for _ in TAIL_COLUMNS)})", rows)
+
+    def fetch(self, after_id, limit):
+        rows = self.conn.execute(
+            f"SELECT {', '.join(TAIL_COLUMNS)} FROM {self.table} WHERE id > ? ORDER BY id LIMIT ?",
+            (after_id, limit)).fetchall()
+        return [TailEvent(r[0], datetime.fromisoformat(r[1]), *r[2:]) for r in rows]
+
+    def latest_id(self):
+        return self.conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {self.table}").fetchone()[0]
+
+    def first_id_since(self, since):
+        row = self.conn.execute(f"SELECT MIN(id) FROM {self.table} WHERE activityDate >= ?",
+                                (to_datetime(since).isoformat(sep=' '),)).fetchone()
+        return (row[0] - 1) if row[0] is not None else self.latest_id()
+
+
+# ----------------------------------------------------------------------
+# Detectors
+# ----------------------------------------------------------------------
+
+class Detector:
+    """
+    Base class for incremental detectors.
+
+    A detector names the eventCategory values it needs (None = all) and
+    implements process(event, parsed, state), where state is the member's
+    JSON-serializable dict (empty the first time a member is seen) that it
+    updates in place. process returns a list of Alert.
+    """
+
+    name = 'detector'
+    categories = None
+
+    def start_cycle(self, events):
+        """Hook called with each polling cycle's events before they are processed
+        (refresh reference data, batch lookups...)."""
+
+    def process(self, event, parsed, state):
+        raise NotImplementedError
+
+    def alert(self, event, severity, summary, **details):
+        return Alert(self.name, member_key(event), severity, event.id, event.activityDate,
+                     summary, details)
+
+
+class OtpEmailMismatchDetector(Detector):
+    """
+    fast_pattern_search's "cgregory pattern", one OTP at a time: an OTP went
+    to an email whose domain is not on the member's profile, and the member
+    has no email change event. Each (member, email) pair alerts once.
+
+    Args:
+        snapshot: ProfileSnapshot for profile emails (default: the shared one)
+        refresh_every: Seconds between incremental snapshot refreshes
+    """
+
+    name = 'otp_email_mismatch'
+    categories = (OTP_CATEGORY,) + EMAIL_CHANGE_CATEGORIES
+
+    COMMON_DOMAINS = ('gmail.com', 'yahoo.com', 'hotmail.com', 'icloud.com',
+                      'outlook.com', 'aol.com', 'me.com', 'att.net', 'cox.net')
+
+    def __init__(self, snapshot=None, refresh_every=300):
+        self.snapshot = snapshot
+        self.refresh_every = refresh_every
+        self._refreshed_at = None
+        self._profile_domains = {}
+
+    def start_cycle(self, events):
+        if self.snapshot is None:
+            from profile_snapshot import open_profile_snapshot
+            self.snapshot = open_profile_snapshot(refresh=False, progress=False)
+        if self.refresh_every is not None and (
+                self._refreshed_at is None or time.monotonic() - self._refreshed_at > self.refresh_every):
+            self.snapshot.refresh(progress=False)
+            self._refreshed_at = time.monotonic()
+            self._profile_domains.clear()
+
+    def profile_domains(self, username):
+        key = username.lower()
+        if key not in self._profile_domains:
+            emails = self.snapshot.emails(username=username) if self.snapshot else []
+            self._profile_domains[key] = {_email_domain(e) for e in emails} - {None}
+        return self._profile_domains[key]
+
+    def process(self, event, parsed, state):
+        if event.eventCategory in EMAIL_CHANGE_CATEGORIES:
+            state['email_changed'] = event.activityDate.isoformat(sep=' ')
+            return []
+        if parsed.method != 'email' or not event.userName or state.get('email_changed'):
+            return []
+        otp_email = parsed.masked_contact
+        otp_domain = _email_domain(otp_email)
+        if not otp_domain:
+            return []
+        domains = self.profile_domains(event.userName)
+        if otp_domain in domains or (not domains and otp_domain in self.COMMON_DOMAINS):
+            return []
+        alerted = state.setdefault('alerted', [])
+        if otp_email.lower() in alerted:
+            return []
+        alerted.append(otp_email.lower())
+        return [self.alert(event, 'HIGH', f"OTP sent to {otp_email}, not a profile email domain",
+                           username=event.userName, otp_email=otp_email,
+                           profile_domains=sorted(domains), ip=event.ipAddress)]
+
+
+class SuspiciousEmailDetector(Detector):
+    """
+    export_suspicious_emails on the way in: a new primary / alternate email
+    on a suspicious domain (domain_rules) or with a gibberish local part.
+    """
+
+    name = 'suspicious_email'
+    categories = EMAIL_CHANGE_CATEGORIES
+
+    def process(self, event, parsed, state):
+        email = parsed.new_value if isinstance(parsed.new_value, str) else None
+        if not email or '@' not in email:
+            return []
+        domain_type = classify_email(email)
+        gibberish = gibberish_scores([email])
+        score = round(float(gibberish.score[0]), 3)
+        looks_gibberish = bool(gibberish.looks_gibberish[0])
+        if domain_type not in SUSPICIOUS_CATEGORIES and not looks_gibberish:
+            return []
+        seen = state.setdefault('emails', [])
+        if email.lower() in seen:
+            return []
+        seen.append(email.lower())
+        severity = 'HIGH' if domain_type in SUSPICIOUS_CATEGORIES and looks_gibberish else 'MEDIUM'
+        label = domain_type if domain_type in SUSPICIOUS_CATEGORIES else 'GIBBERISH'
+        return [self.alert(event, severity, f"{event.eventCategory}: {email} ({label})",
+                           username=event.userName, email=email, domain_type=domain_type,
+                           gibberish_score=score, ip=event.ipAddress)]
+
+
+class EmailChangeRiskDetector(Detector):
+    """
+    fraud_analysis's email-change risk score, computed at the moment of the
+    change from the member's history up to that event (the report's CTEs
+    also counted activity after the change). Keeps per member: sessions and
+    active days per IP (most recent MAX_IPS), email changes, failed events,
+    first seen, and hourly event counts for the last 8 days.
+    """
+
+    name = 'email_change_risk'
+    categories = None
+
+    MAX_IPS = 50
+
+    def __init__(self, min_score=50, model=EMAIL_CHANGE_MODEL):
+        self.min_score = min_score
+        self.model = model
+
+    def features(self, event, parsed, state):
+        """risk_rules EMAIL_CHANGE_FEATURES for an email change event against state."""
+        ip = state['ips'].get(event.ipAddress or '', {})
+        hour = event.activityDate.replace(minute=0, second=0, microsecond=0)
+        last_24h = sum(n for h, n in state['hours'].items()
+                       if datetime.fromisoformat(h) > hour - timedelta(hours=24))
+        last_7d = sum(state['hours'].values())
+        first_seen = datetime.fromisoformat(state['first_seen'])
+        history_days = max((event.activityDate - timedelta(days=7) - first_seen).days, 1)
+        return {
+            'ip_total_sessions': ip.get('sessions', 0),
+            'ip_days_active': ip.get('days', 1),
+            'browser': event.browser or None,
+            'account_email_changes': state['email_changes'] + 1,
+            'failed_attempts': state['failed'],
+            'last_24h_activity': last_24h,
+            'historical_avg_daily': max(state['events'] - last_7d, 0) / history_days,
+            'activityDate': event.activityDate,
+            'new_email_domain': parsed.new_email_domain or '',
+        }
+
+    def score(self, event, parsed, state):
+        """(score, level, action, {factor: points}) for an email change event against state."""
+        row = self.model.score(pd.DataFrame([self.features(event, parsed, state)])).iloc[0]
+        factors = {rule.name: int(row[rule.name]) for rule in self.model.rules if row[rule.name] > 0}
+        score = int(row['score'])
+        action = str(assign_levels([score], EMAIL_CHANGE_ACTIONS, 'OK')[0])
+        return score, str(row['level']), action, factors
+
+    def _observe(self, event, state):
+        """Fold one event into the member's history."""
+        moment = event.activityDate
+        state['events'] += 1
+        hour = moment.replace(minute=0, second=0, microsecond=0)
+        key = hour.isoformat(sep=' ')
+        hours = state['hours']
+        if key in hours:
+            hours[key] += 1
+        else:
+            hours[key] = 1
+            cutoff = hour - timedelta(days=8)
+            for h in [h for h in hours if datetime.fromisoformat(h) < cutoff]:
+                del hours[h]
+        category = (event.eventCategory or '').lower()
+        if 'fail' in category or 'denied' in category:
+            state['failed'] += 1
+
+        if event.ipAddress:
+            ips = state['ips']
+            ip = ips.pop(event.ipAddress, None) or {'sessions': 0, 'days': 0, 'last_session': None,
+                                                   'last_day': None}
+            if event.sessionid != ip['last_session'] or not event.sessionid:
+                ip['sessions'] += 1
+                ip['last_session'] = event.sessionid
+            day = moment.date().isoformat()
+            if day != ip['last_day']:
+                ip['days'] += 1
+                ip['last_day'] = day
+            ips[event.ipAddress] = ip            # most recently used last
+            while len(ips) > self.MAX_IPS:
+                del ips[next(iter(ips))]
+
+    def process(self, event, parsed, state):
+        if not state:
+            state.update(events=0, failed=0, email_changes=0, hours={}, ips={},
+                         first_seen=event.activityDate.isoformat(sep=' '))
+        alerts = []
+        if event.eventCategory in EMAIL_CHANGE_CATEGORIES and event.masterMembership:
+            score, level, action, factors = self.score(event, parsed, state)
+            state['email_changes'] += 1
+            if score >= self.min_score:
+                summary = (f"{event.eventCategory} to {parsed.new_value} scored {score} ({level}): "
+                           + ' '.join(f"{name}({points})" for name, points in factors.items()))
+                alerts.append(self.alert(event, level, summary, username=event.userName,
+                                         account=event.masterMembership, score=score,
+                                         factors=factors, action=action, ip=event.ipAddress))
+        self._observe(event, state)
+        return alerts
+
+
+DEFAULT_DETECTORS = (OtpEmailMismatchDetector, SuspiciousEmailDetector, EmailChangeRiskDetector)
+
+
+# ----------------------------------------------------------------------
+# Tail loop
+# ----------------------------------------------------------------------
+
+class FraudTail:
+    """
+    Polls a source past its high-water mark and runs detectors on new rows.
+
+    Args:
+        source: FraudmonitorSource or LocalSource
+        detectors: Detector instances
+        state_path: SQLite file for the mark, member state and alerts
+        batch_size: Rows per poll
+        on_alert: Called with each Alert (default: print it)
+    """
+
+    def __init__(self, source, detectors, state_path=TAIL_STATE_FILE, batch_size=BATCH_SIZE,
+                 on_alert=None):
+        self.source = source
+        self.detectors = list(detectors)
+        self.batch_size = batch_size
+        self.on_alert = on_alert or print_alert
+        self.conn = sqlite3.connect(state_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._states = OrderedDict()    # (detector, member) -> state dict, least recently used first
+        self.rows_read = 0
+        self.alerts_raised = 0
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # ------------------------------------------------------------------
+    # High-water mark
+    # ------------------------------------------------------------------
+
+    def mark(self):
+        """(last_id, last activityDate text) or None before the first cycle."""
+        return self.conn.execute("SELECT last_id, last_event FROM tail_cursor WHERE source = ?",
+                                 (self.source.name,)).fetchone()
+
+    def set_mark(self, last_id, last_event=None):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO tail_cursor (source, last_id, last_event, updated_at) VALUES (?, ?, ?, ?)",
+                (self.source.name, last_id, last_event, _now_text()))
+
+    def start_at(self, since=None):
+        """Set the mark to since (a date), or to the newest row when since is None."""
+        last_id = self.source.first_id_since(since) if since is not None else self.source.latest_id()
+        self.set_mark(last_id)
+        return last_id
+
+    # ------------------------------------------------------------------
+    # Member state
+    # ------------------------------------------------------------------
+
+    def _load_states(self, keys):
+        """Bring the states for (detector, member) keys into the cache."""
+        missing = {}
+        for key in keys:
+            if key in self._states:
+                self._states.move_to_end(key)
+            else:
+                missing.setdefault(key[0], []).append(key[1])
+        for detector, members in missing.items():
+            for start in range(0, len(members), STATE_CHUNK):
+                chunk = members[start:start + STATE_CHUNK]
+                found = dict(self.conn.execute(
+                    f"SELECT member, state FROM member_state WHERE detector = ? "
+                    f"AND member IN ({', '.join('?' for _ in chunk)})", [detector] + chunk))
+                for member in chunk:
+                    state = found.get(member)
+                    self._states[(detector, member)] = json.loads(state) if state else {}
+
+    def _trim_cache(self):
+        while len(self._states) > MAX_CACHED_STATES:
+            self._states.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    # Cycles
+    # ------------------------------------------------------------------
+
+    def run_once(self):
+        """
+        Fetch the rows past the mark (one batch), run the detectors, and
+        commit their state, the alerts and the new mark together.
+
+        Returns:
+            list of Alert raised in this cycle
+        """
+        mark = self.mark()
+        last_id = mark[0] if mark else self.start_at()
+        events = self.source.fetch(last_id, self.batch_size)
+        if not events:
+            return []
+        self.rows_read += len(events)
+        for detector in self.detectors:
+            detector.start_cycle(events)
+
+        wanted = []
+        for detector in self.detectors:
+            categories = set(detector.categories) if detector.categories is not None else None
+            wanted.append((detector, categories))
+        keys = {(d.name, member_key(e)) for e in events for d, cats in wanted
+                if member_key(e) and (cats is None or e.eventCategory in cats)}
+        self._load_states(keys)
+
+        alerts = []
+        dirty = set()
+        for event in events:
+            member = member_key(event)
+            if member is None:
+                continue
+            parsed = None
+            for detector, categories in wanted:
+                if categories is not None and event.eventCategory not in categories:
+                    continue
+                if parsed is None:
+                    parsed = parse_event(event.eventCategory, event.eventData)
+                key = (detector.name, member)
+                alerts.extend(detector.process(event, parsed, self._states[key]))
+                dirty.add(key)
+
+        last = events[-1]
+        now = _now_text()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO member_state (detector, member, state, updated_at) VALUES (?, ?, ?, ?)",
+                [(d, m, json.dumps(self._states[(d, m)], default=str), now) for d, m in dirty])
+            self.conn.executemany(
+                "INSERT INTO alerts (detector, member, severity, event_id, activityDate, summary, details, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(a.detector, a.member, a.severity, a.event_id, str(a.activityDate), a.summary,
+                  json.dumps(a.details, default=str), now) for a in alerts])
+            self.conn.execute(
+                "INSERT OR REPLACE INTO tail_cursor (source, last_id, last_event, updated_at) VALUES (?, ?, ?, ?)",
+                (self.source.name, last.id, str(last.activityDate), now))
+        self._trim_cache()
+
+        self.alerts_raised += len(alerts)
+        for alert in alerts:
+            self.on_alert(alert)
+        return alerts
+
+    def run(self, poll_interval=POLL_INTERVAL, max_cycles=None, until_caught_up=False):
+        """
+        Poll until interrupted. Full batches are followed by another poll
+        straight away; once caught up the loop sleeps poll_interval.
+
+        Args:
+            max_cycles: Stop after this many cycles that read rows
+            until_caught_up: Stop at the first poll that comes back short
+        """
+        cycles = 0
+        started = time.perf_counter()
+        try:
+            while max_cycles is None or cycles < max_cycles:
+                before = self.rows_read
+                self.run_once()
+                read = self.rows_read - before
+                if read:
+                    cycles += 1
+                    mark = self.mark()
+                    print(f"  [{_now_text()}] {read:,} rows -> id {mark[0]} ({mark[1]}), "
+                          f"{self.alerts_raised:,} alerts so far")
+                if read < self.batch_size:
+                    if until_caught_up:
+                        break
+                    time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            print("\nStopped.")
+        print(f"{self.rows_read:,} rows, {self.alerts_raised:,} alerts in {time.perf_counter() - started:.1f}s")
+
+    def recent_alerts(self, limit=50):
+        """Latest stored alerts, newest first."""
+        rows = self.conn.execute(
+            "SELECT detector, member, severity, event_id, activityDate, summary, details FROM alerts "
+            "ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [Alert(*row[:6], json.loads(row[6]) if row[6] else {}) for row in rows]
+
+
+def print_alert(alert):
+    print(f"ALERT {alert.severity:8} {alert.detector:20} {alert.activityDate}  "
+          f"member={alert.member}  {alert.summary}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail fraudmonitor and run incremental detectors")
+    parser.add_argument('--since', metavar='YYYY-MM-DD', help="reset the mark to this date before tailing")
+    parser.add_argument('--replay', action='store_true',
+                        help="read the local member timeline store instead of production")
+    parser.add_argument('--state', default=TAIL_STATE_FILE, help="state / alert file")
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help="seconds between polls")
+    parser.add_argument('--once', action='store_true', help="catch up once and exit")
+    parser.add_argument('--alerts', type=int, metavar='N', help="show the latest N stored alerts and exit")
+    args = parser.parse_args()
+
+    if args.replay:
+        from member_timeline import TIMELINE_FILE
+        source = LocalSource(TIMELINE_FILE, table='events')
+    else:
+        source = FraudmonitorSource()
+
+    # geo_velocity imports this module for Detector
+    from geo_velocity import GeoVelocityDetector
+
+    # A replay stays offline: profile emails come from the snapshot as it is
+    detectors = [OtpEmailMismatchDetector(refresh_every=None if args.replay else 300),
+                 SuspiciousEmailDetector(), EmailChangeRiskDetector(), GeoVelocityDetector()]
+
+    with FraudTail(source, detectors, state_path=args.state) as tail:
+        if args.alerts:
+            for alert in reversed(tail.recent_alerts(args.alerts)):
+                print_alert(alert)
+            return
+        if args.since:
+            print(f"Mark set to id {tail.start_at(to_datetime(args.since))} ({args.since})")
+        elif args.replay and tail.mark() is None:
+            tail.set_mark(0)
+        print(f"Tailing {source.name} from id {(tail.mark() or (tail.start_at(),))[0]} "
+              f"with {', '.join(d.name for d in tail.detectors)}")
+        tail.run(poll_interval=args.interval, until_caught_up=args.once or args.replay)
+
+
+if __name__ == "__main__":
+    main()
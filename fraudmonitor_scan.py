@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Fraudmonitor Scan
+Streaming reads of the fraudmonitor table in bounded memory.
+
+The investigation scripts used to fetchall() a year of fraudmonitor rows
+(eventData included) before doing any work. A scan instead reads through an
+unbuffered pymysql SSCursor and yields typed record batches of a fixed size.
+A background thread keeps fetching the next batches while the caller
+processes the current one, so analysis overlaps with the network transfer.
+
+- Column projection: only the requested columns leave the server
+- Date partitioning: a long activityDate range is read as day/week/month
+  slices, one short statement each
+- Parallel slices: workers=N reads slices concurrently on N connections and
+  merges them back in date order, retrying a failed slice on a fresh
+  connection; cancelling KILLs running statements so no sessions are orphaned
+- Progress: rows, rows/s and the current slice are printed as the scan runs
+
+Usage:
+    scan = FraudmonitorScan(
+        columns=('muid', 'userName', 'eventData', 'activityDate'),
+        categories=['OTP Authentication'],
+        where="eventData LIKE %s", params=['%"email"%'],
+        start=days_ago(365), partition='week', workers=PARALLEL_WORKERS)
+    for record in scan.records():
+        record.muid, record.eventData ...
+
+    for batch in scan.batches():       # FraudBatch of up to batch_size records
+        df = batch.to_frame()
+"""
+
+import queue
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import pymysql
+
+from connection_pool import PoolTimeout
+from db_connection import get_connection, get_raw_connection
+
+TABLE = 'fraudmonitor'
+
+DEFAULT_COLUMNS = ('muid', 'userName', 'eventCategory', 'eventData', 'activityDate', 'ipAddress')
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_PREFETCH = 2          # batches buffered ahead of the consumer
+DEFAULT_RETRIES = 2
+
+# Errors a slice is retried on: dropped/refused connections and a pool with
+# no free slot before the checkout timeout
+RETRYABLE_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError, PoolTimeout)
+
+# Parallel scans check out pooled connections; leave one of the pool's four
+# for the calling script's own cursor
+PARALLEL_WORKERS = 3
+
+PARTITION_STEPS = {
+    'day': timedelta(days=1),
+    'week': timedelta(days=7),
+}
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+_record_types = {}
+
+
+def record_type(columns):
+    """namedtuple class for a column projection (one class per projection)."""
+    columns = tuple(columns)
+    if columns not in _record_types:
+        _record_types[columns] = namedtuple('FraudmonitorRecord', columns)
+    return _record_types[columns]
+
+
+def to_datetime(value):
+    """Accept datetime, date or 'YYYY-MM-DD[ HH:MM:SS]' strings."""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(str(value).strip())
+
+
+def days_ago(days, now=None):
+    """Start of a lookback window ending now (DATE_SUB(NOW(), INTERVAL n DAY))."""
+    return (now or datetime.now()) - timedelta(days=days)
+
+
+def _add_month(moment):
+    year, month = (moment.year + 1, 1) if moment.month == 12 else (moment.year, moment.month + 1)
+    return moment.replace(year=year, month=month, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def date_partitions(start, end, partition):
+    """
+    Split [start, end) into consecutive slices.
+
+    Args:
+        start, end: datetime bounds (end exclusive)
+        partition: 'day', 'week', 'month', a timedelta, or None for one slice
+
+    Returns:
+        list of (slice_start, slice_end)
+    """
+    if partition is None or start is None or end is None:
+        return [(start, end)]
+    slices = []
+    cursor = start
+    while cursor < end:
+        if partition == 'month':
+            nxt = _add_month(cursor)
+        else:
+            step = partition if isinstance(partition, timedelta) else PARTITION_STEPS[partition]
+            nxt = cursor + step
+        slices.append((cursor, min(nxt, end)))
+        cursor = nxt
+    return slices
+
+
+class FraudBatch:
+    """
+    A batch of fraudmonitor records sharing one column projection.
+
+    Attributes:
+        records: list of namedtuple records
+        columns: tuple of column names
+        partition: (slice_start, slice_end) the batch was read from
+    """
+
+    __slots__ = ('records', 'columns', 'partition')
+
+    def __init__(self, records, columns, partition):
+        self.records = records
+        self.columns = columns
+        self.partition = partition
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def column(self, name):
+        """All values of one column, in batch order."""
+        i = self.columns.index(name)
+        return [r[i] for r in self.records]
+
+    def to_frame(self):
+        """pandas DataFrame of the batch."""
+        import pandas as pd
+        return pd.DataFrame.from_records(self.records, columns=list(self.columns))
+
+
+class _Stop:
+    """Queue sentinel carrying the producer's error (if any)."""
+
+    def __init__(self, error=None):
+        self.error = error
+
+
+class FraudmonitorScan:
+    """
+    Streaming, projected, optionally date-partitioned fraudmonitor read.
+
+    Args:
+        columns: Columns to select (identifiers only)
+        categories: Optional eventCategory values (IN list)
+        where: Extra SQL condition with %s placeholders (no bare % signs)
+        params: Parameters for the where condition
+        start, end: activityDate bounds, start inclusive / end exclusive
+                    (end defaults to now when start is given)
+        partition: 'day', 'week', 'month', a timedelta, or None
+        batch_size: Records per batch
+        prefetch: Batches fetched ahead of the consumer
+        workers: Connections reading slices concurrently (needs partition)
+        retries: Retries per slice after a connection/server error or pool
+                 timeout (parallel mode)
+        retry_backoff: First retry delay in seconds, doubled per attempt
+        get_conn: Connection factory (default: pooled dbxdb connection)
+        kill_conn: Connection factory used to KILL QUERY on cancellation
+        progress: Print progress while scanning
+        label: Name shown in progress output
+    """
+
+    def __init__(self, columns=DEFAULT_COLUMNS, categories=None, where=None, params=(),
+                 start=None, end=None, partition=None, batch_size=DEFAULT_BATCH_SIZE,
+                 prefetch=DEFAULT_PREFETCH, workers=1, retries=DEFAULT_RETRIES,
+                 retry_backoff=1.0, get_conn=get_connection, kill_conn=get_raw_connection,
+                 progress=True, label=TABLE):
+        self.columns = tuple(columns)
+        for column in self.columns:
+            if not _IDENTIFIER.match(column):
+                raise ValueError(f"Invalid column name: {column!r}")
+        self.categories = list(categories) if categories else None
+        self.where = where
+        self.params = list(params)
+        self.start = to_datetime(start)
+        self.end = to_datetime(end) or (datetime.now() if self.start is not None else None)
+        self.partition = partition
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self.workers = max(1, workers)
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.get_conn = get_conn
+        self.kill_conn = kill_conn
+        self.progress = progress
+        self.label = label
+        self.record_type = record_type(self.columns)
+        self.rows_read = 0
+        self.elapsed_s = 0.0
+
+    def partitions(self):
+        """The (start, end) slices this scan reads, oldest first."""
+        return date_partitions(self.start, self.end, self.partition)
+
+    def build_query(self, slice_start, slice_end):
+        """SQL and parameters for one slice."""
+        conditions = []
+        params = []
+        if self.categories:
+            conditions.append(f"eventCategory IN ({', '.join(['%s'] * len(self.categories))})")
+            params.extend(self.categories)
+        if slice_start is not None:
+            conditions.append("activityDate >= %s")
+            params.append(slice_start)
+        if slice_end is not None:
+            conditions.append("activityDate < %s")
+            params.append(slice_end)
+        if self.where:
+            conditions.append(f"({self.where})")
+            params.extend(self.params)
+        select = ", ".join(f"`{c}`" for c in self.columns)
+        sql = f"SELECT {select} FROM {TABLE}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return sql, params
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _read_slice(self, conn, slice_bounds, emit, stop):
+        """Stream one slice through an SSCursor, calling emit(batch) per batch."""
+        sql, params = self.build_query(*slice_bounds)
+        cursor = conn.cursor(pymysql.cursors.SSCursor)
+        try:
+            cursor.execute(sql, params)
+            make = self.record_type._make
+            while not stop.is_set():
+                rows = cursor.fetchmany(self.batch_size)
+                if not rows:
+                    return True
+                emit(FraudBatch([make(r) for r in rows], self.columns, slice_bounds))
+            return False
+        finally:
+            if not stop.is_set():
+                cursor.close()
+
+    @staticmethod
+    def _release(conn, finished):
+        """Return a cleanly finished connection; drop one left mid-result."""
+        if finished or not hasattr(conn, 'invalidate'):
+            conn.close()
+        else:
+            # A half-read unbuffered result cannot be reused; drop the socket
+            conn.invalidate()
+
+    @staticmethod
+    def _server_thread_id(conn):
+        try:
+            return conn.thread_id()
+        except Exception:
+            return None
+
+    def _kill_queries(self, thread_ids):
+        """KILL QUERY still-running statements so cancelled scans leave no server work behind."""
+        thread_ids = [tid for tid in thread_ids if tid]
+        if not thread_ids or self.kill_conn is None:
+            return
+        try:
+            conn = self.kill_conn()
+            try:
+                cursor = conn.cursor()
+                for tid in thread_ids:
+                    try:
+                        cursor.execute(f"KILL QUERY {int(tid)}")
+                    except pymysql.err.MySQLError:
+                        pass        # statement already finished
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"  Warning: could not cancel scan queries {thread_ids}: {e}")
+
+    # -- serial: one connection, slices in turn -------------------------
+
+    def _produce(self, out, stop, active):
+        conn = None
+        error = None
+        finished = False
+        try:
+            conn = self.get_conn()
+            active['serial'] = self._server_thread_id(conn)
+            for slice_bounds in self.partitions():
+                if not self._read_slice(conn, slice_bounds, out.put, stop):
+                    break
+            else:
+                finished = True
+        except Exception as e:
+            error = e
+        finally:
+            active.pop('serial', None)
+            if conn is not None:
+                self._release(conn, finished)
+            out.put(_Stop(error))
+
+    def _serial_batches(self):
+        out = queue.Queue(maxsize=max(1, self.prefetch))
+        stop = threading.Event()
+        active = {}
+        producer = threading.Thread(target=self._produce, args=(out, stop, active),
+                                    name=f"scan-{self.label}", daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = out.get()
+                if isinstance(item, _Stop):
+                    if item.error is not None:
+                        raise item.error
+                    return
+                yield item
+        finally:
+            stop.set()
+            if producer.is_alive():
+                self._kill_queries(list(active.values()))
+            # Unblock a producer waiting on a full queue
+            while producer.is_alive():
+                try:
+                    out.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+
+    # -- parallel: slices spread over several connections ---------------
+
+    def _read_slice_buffered(self, slice_bounds, stop, active):
+        """
+        Read one whole slice on its own connection, retrying transient errors.
+
+        The slice is buffered so a retry never emits duplicate rows.
+        """
+        attempt = 0
+        while True:
+            conn = None
+            batches = []
+            finished = False
+            try:
+                # Checkout is inside the try: a refused connect or a pool
+                # timeout is retried like a dropped connection
+                conn = self.get_conn()
+                active[slice_bounds] = self._server_thread_id(conn)
+                finished = self._read_slice(conn, slice_bounds, batches.append, stop)
+                return batches
+            except RETRYABLE_ERRORS as e:
+                if stop.is_set() or attempt >= self.retries:
+                    raise
+                attempt += 1
+                delay = self.retry_backoff * (2 ** (attempt - 1))
+                print(f"  Warning: [{self.label}] slice {slice_bounds[0]:%Y-%m-%d} failed ({e}); "
+                      f"retry {attempt}/{self.retries} in {delay:.0f}s")
+                time.sleep(delay)
+            finally:
+                active.pop(slice_bounds, None)
+                if conn is not None:
+                    self._release(conn, finished)
+
+    def _parallel_batches(self):
+        slices = self.partitions()
+        stop = threading.Event()
+        active = {}
+        # Slices in flight: one per worker plus a few finished ones waiting their turn
+        window = self.workers + max(1, self.prefetch)
+        futures = {}
+        next_submit = 0
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"scan-{self.label}")
+        try:
+            for i in range(len(slices)):
+                while next_submit < len(slices) and next_submit < i + window:
+                    futures[next_submit] = executor.submit(
+                        self._read_slice_buffered, slices[next_submit], stop, active)
+                    next_submit += 1
+                # Merge in slice order, whatever order the slices finish in
+                for batch in futures.pop(i).result():
+                    yield batch
+        finally:
+            stop.set()
+            if active:
+                self._kill_queries(list(active.values()))
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def batches(self):
+        """
+        Yield FraudBatch objects in activityDate-slice order.
+
+        With workers=1 one connection streams the slices while the next
+        batches are prefetched in the background; with workers>1 slices are
+        read concurrently on separate connections and merged back in order.
+        Breaking out of the loop cancels the scan: running statements are
+        killed and their connections discarded.
+        """
+        parallel = self.workers > 1 and len(self.partitions()) > 1
+        source = self._parallel_batches() if parallel else self._serial_batches()
+        started = time.perf_counter()
+        last_report = started
+        current_slice = None
+        self.rows_read = 0
+        try:
+            for item in source:
+                self.rows_read += len(item)
+                if self.progress and (item.partition != current_slice or time.perf_counter() - last_report >= 5):
+                    current_slice = item.partition
+                    last_report = time.perf_counter()
+                    self._print_progress(started, item.partition)
+                yield item
+        finally:
+            source.close()
+            self.elapsed_s = time.perf_counter() - started
+            if self.progress:
+                mode = f", {self.workers} connections" if parallel else ''
+                print(f"  [{self.label}] {self.rows_read:,} rows in {self.elapsed_s:.1f}s{mode}")
+
+    def records(self):
+        """Yield individual records (namedtuples with one field per column)."""
+        for batch in self.batches():
+            yield from batch.records
+
+    def to_frame(self):
+        """Read the whole scan into one DataFrame (for result sets that fit in memory)."""
+        import pandas as pd
+        frames = [batch.to_frame() for batch in self.batches()]
+        if not frames:
+            return pd.DataFrame(columns=list(self.columns))
+        return pd.concat(frames, ignore_index=True)
+
+    def _print_progress(self, started, slice_bounds):
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        where = ''
+        if slice_bounds and slice_bounds[0] is not None:
+            where = f" - slice {slice_bounds[0]:%Y-%m-%d}"
+        print(f"  [{self.label}] {self.rows_read:,} rows ({self.rows_read / elapsed:,.0f} rows/s){where}")
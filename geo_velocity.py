@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Geo Velocity - impossible travel and country hops in login streams
+
+cio_december_2025_login_report geolocates login IPs only to count them by
+state; nothing looks at where one member logs in from next. This module
+follows each member's sequence of located logins / OTPs and flags:
+
+    - IMPOSSIBLE_TRAVEL: the great-circle distance from the previous
+      location, less LOCATION_TOLERANCE_KM of geolocation error, needs more
+      than MAX_SPEED_KMH over the elapsed time (and is at least
+      MIN_TRAVEL_KM, so carrier-hub jitter between nearby cities is ignored)
+    - COUNTRY_HOP: the country changed within COUNTRY_HOP_HOURS
+
+IPs are located once per distinct address through geolocate_ips (offline
+range index, shared ip_geo_cache.db, then the provider unless offline).
+Range-index hits carry no coordinates, so they take the centroid of the
+cached records for the same city. The batch pass sorts a month of events by
+(member, time) and computes every hop with numpy in one go; in fraud_tail,
+GeoVelocityDetector keeps each member's last located point as its state and
+applies the same rules one event at a time.
+
+Usage:
+    from geo_velocity import scan_travel, travel_frame, locate_ips
+    hops = scan_travel('2025-12-01', '2026-01-01')          # flagged hops
+    hops = travel_frame(events_df, locate_ips(events_df['ipAddress']))
+
+    py geo_velocity.py --month 2025-12
+    py geo_velocity.py --days 30 --offline --csv travel_flags.csv
+    py geo_velocity.py --muid 00638242923564062860 --all   (one member's hops, from the local timeline)
+    py geo_velocity.py --bench
+"""
+
+import argparse
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from event_data import OTP_CATEGORY
+from fraud_tail import Detector
+from fraudmonitor_scan import FraudmonitorScan, PARALLEL_WORKERS, days_ago, to_datetime
+from ip_geolocation import geolocate_ips
+
+TRAVEL_CATEGORIES = ('LoginSuccessful', OTP_CATEGORY)
+TRAVEL_COLUMNS = ('activityDate', 'eventCategory', 'ipAddress', 'muid', 'userName')
+
+EARTH_RADIUS_KM = 6371.0088
+MAX_SPEED_KMH = 900            # airliner cruise; anything faster is not travel
+MIN_TRAVEL_KM = 500            # shorter jumps are within IP geolocation error
+LOCATION_TOLERANCE_KM = 150    # discounted from every distance before the speed test
+MIN_ELAPSED_HOURS = 1 / 60     # same-minute hops are timed as one minute
+COUNTRY_HOP_HOURS = 24
+
+LOCATION_COLUMNS = ('country', 'region', 'city', 'isp', 'lat', 'lon')
+MAX_CACHED_LOCATIONS = 200000  # tail-mode IP -> location entries kept in memory
+
+
+# ----------------------------------------------------------------------
+# Geometry and rules (arrays or scalars)
+# ----------------------------------------------------------------------
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; NaN wherever a coordinate is missing."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def assess_hops(km, hours, country_changed):
+    """
+    Apply the travel rules to hops.
+
+    Args:
+        km: Distance from the previous location (NaN = unknown)
+        hours: Elapsed hours since the previous location
+        country_changed: Previous and current country differ
+
+    Returns:
+        (speed_kmh, impossible, hop, severity) arrays; severity is '' for
+        hops that break no rule
+    """
+    km = np.asarray(km, dtype=np.float64)
+    hours = np.asarray(hours, dtype=np.float64)
+    speed = np.maximum(km - LOCATION_TOLERANCE_KM, 0) / np.maximum(hours, MIN_ELAPSED_HOURS)
+    with np.errstate(invalid='ignore'):
+        impossible = (km >= MIN_TRAVEL_KM) & (speed > MAX_SPEED_KMH)
+    hop = np.asarray(country_changed, dtype=bool) & (hours < COUNTRY_HOP_HOURS)
+    severity = np.select([impossible & hop, impossible, hop], ['CRITICAL', 'HIGH', 'MEDIUM'], default='')
+    return speed, impossible, hop, severity
+
+
+def _flag_text(impossible, hop):
+    return np.select([impossible & hop, impossible, hop],
+                     ['IMPOSSIBLE_TRAVEL,COUNTRY_HOP', 'IMPOSSIBLE_TRAVEL', 'COUNTRY_HOP'], default='')
+
+
+def _place(country, region, city):
+    parts = [p for p in (city, region, country) if p and p != 'Unknown']
+    return ', '.join(dict.fromkeys(parts)) or 'Unknown'
+
+
+# ----------------------------------------------------------------------
+# Locations
+# ----------------------------------------------------------------------
+
+def locate_ips(ips, offline=False, progress=True, cache=True, index=True, centroids=None):
+    """
+    Location of every distinct IP.
+
+    Args:
+        ips: Iterable of IP strings (blanks / NaN ignored)
+        offline: Answer from the range index and cache only
+        cache, index: Passed to geolocate_ips
+        centroids: {(country, region, city): (lat, lon)} that fills records
+                   without coordinates and learns from the ones that have
+                   them (default: GeoCacheStore.city_centroids(); pass the
+                   same dict to keep it across calls)
+
+    Returns:
+        DataFrame indexed by IP with LOCATION_COLUMNS; IPs with no country
+        are left out
+    """
+    ips = pd.Series(list(ips), dtype=object).dropna().unique().tolist()
+    if not ips:
+        return pd.DataFrame(columns=LOCATION_COLUMNS, index=pd.Index([], name='ip'))
+    records = geolocate_ips(ips, progress=progress, cache=cache, index=index, offline=offline)
+    frame = pd.DataFrame.from_dict(records, orient='index')
+    frame.index.name = 'ip'
+    for column in LOCATION_COLUMNS:
+        if column not in frame:
+            frame[column] = np.nan
+    frame = frame[(frame['status'] == 'success') & frame['country'].notna()
+                  & ~frame['country'].isin(('', 'Unknown'))][list(LOCATION_COLUMNS)].copy()
+    frame['lat'] = pd.to_numeric(frame['lat'], errors='coerce')
+    frame['lon'] = pd.to_numeric(frame['lon'], errors='coerce')
+
+    # Range-index hits have a place but no coordinates: use the city centroid
+    # of the cached lookups (and of this call's own records)
+    if centroids is None:
+        centroids = {}
+    if not centroids and cache:
+        from ip_cache_store import get_default_store
+        centroids.update((get_default_store() if cache is True else cache).city_centroids())
+    place = ['country', 'region', 'city']
+    learned = frame.dropna(subset=['lat', 'lon']).groupby(place)[['lat', 'lon']].mean()
+    centroids.update(zip(learned.index, map(tuple, learned.to_numpy())))
+    missing = (frame['lat'].isna() | frame['lon'].isna()).to_numpy()
+    if missing.any():
+        fill = np.array([centroids.get(key, (np.nan, np.nan))
+                         for key in zip(*(frame.loc[missing, c] for c in place))], dtype=np.float64)
+        frame.loc[missing, 'lat'] = fill[:, 0]
+        frame.loc[missing, 'lon'] = fill[:, 1]
+    return frame
+
+
+# ----------------------------------------------------------------------
+# Batch pass
+# ----------------------------------------------------------------------
+
+def travel_frame(events, locations, flagged_only=True):
+    """
+    Every member's consecutive located events, as hops with distance,
+    speed and flags.
+
+    Args:
+        events: DataFrame with activityDate, ipAddress, muid, userName
+                (eventCategory optional)
+        locations: locate_ips() frame
+        flagged_only: Keep only hops that break a rule
+
+    Returns:
+        DataFrame, one row per hop: member, from/to time, IP, place and
+        country, km, hours, speed_kmh, flags, severity
+    """
+    muid = events['muid'].fillna('').astype(str).to_numpy(dtype=object)
+    user = events['userName'].fillna('').astype(str).str.lower().to_numpy(dtype=object)
+    member = np.where(muid != '', muid, np.where(user != '', 'u:' + user, ''))
+
+    # Everything below works on integer codes: IP -> location row, member -> code
+    ip_row = locations.index.get_indexer(events['ipAddress'])
+    located = np.flatnonzero((ip_row >= 0) & (member != ''))
+    member_code, members = pd.factorize(member[located], sort=True)
+    seconds = pd.to_datetime(events['activityDate']).to_numpy(dtype='datetime64[s]').astype(np.int64)[located]
+    order = np.lexsort((seconds, member_code))
+    rows, ip_row, member_code, seconds = located[order], ip_row[located][order], member_code[order], seconds[order]
+
+    country_code, _ = pd.factorize(locations['country'])
+    lat, lon = locations['lat'].to_numpy(np.float64)[ip_row], locations['lon'].to_numpy(np.float64)[ip_row]
+    country = country_code[ip_row]
+    same = np.zeros(len(rows), dtype=bool)
+    same[1:] = member_code[1:] == member_code[:-1]
+    km = np.full(len(rows), np.nan)
+    km[1:] = haversine_km(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    hours = np.zeros(len(rows))
+    hours[1:] = (seconds[1:] - seconds[:-1]) / 3600
+    changed = np.zeros(len(rows), dtype=bool)
+    changed[1:] = country[1:] != country[:-1]
+    speed, impossible, hop, severity = assess_hops(km, hours, changed)
+    keep = np.flatnonzero(same & ((severity != '') if flagged_only else True))
+    before = keep - 1
+
+    places = np.array([_place(*row) for row in zip(locations['country'], locations['region'],
+                                                   locations['city'])], dtype=object)
+    ips, countries = locations.index.to_numpy(dtype=object), locations['country'].to_numpy(dtype=object)
+    times = pd.to_datetime(events['activityDate']).to_numpy()
+    out = pd.DataFrame({
+        'member': np.asarray(members, dtype=object)[member_code[keep]],
+        'from_time': times[rows[before]],
+        'to_time': times[rows[keep]],
+        'from_ip': ips[ip_row[before]],
+        'to_ip': ips[ip_row[keep]],
+        'from_place': places[ip_row[before]],
+        'to_place': places[ip_row[keep]],
+        'from_country': countries[ip_row[before]],
+        'to_country': countries[ip_row[keep]],
+        'km': np.round(km[keep], 1),
+        'hours': np.round(hours[keep], 3),
+        'speed_kmh': np.round(speed[keep], 0),
+        'flags': _flag_text(impossible[keep], hop[keep]),
+        'severity': severity[keep],
+    })
+    if 'eventCategory' in events:
+        out.insert(5, 'eventCategory', events['eventCategory'].to_numpy(dtype=object)[rows[keep]])
+    return out
+
+
+def scan_travel(start, end=None, offline=False, flagged_only=True, progress=True):
+    """
+    Read LoginSuccessful / OTP events for [start, end) from fraudmonitor,
+    locate their IPs and return travel_frame() hops.
+    """
+    scan = FraudmonitorScan(columns=TRAVEL_COLUMNS, categories=list(TRAVEL_CATEGORIES),
+                            start=start, end=end, partition='day', workers=PARALLEL_WORKERS,
+                            batch_size=20000, label='travel events')
+    events = scan.to_frame()
+    if progress:
+        print(f"      {len(events):,} events, {events['ipAddress'].nunique():,} distinct IPs")
+    started = time.perf_counter()
+    hops = travel_frame(events, locate_ips(events['ipAddress'], offline=offline, progress=progress),
+                        flagged_only=flagged_only)
+    if progress:
+        print(f"      {len(hops):,} hops in {time.perf_counter() - started:.1f}s")
+    return hops
+
+
+def timeline_travel(muid, offline=True, flagged_only=False):
+    """One member's hops from the local member timeline store."""
+    from member_timeline import open_timeline_store
+
+    with open_timeline_store(sync=False, progress=False) as store:
+        # Not masterMembership: joint-account holders travel independently
+        timeline = store.timeline(muid=muid, link=('muid', 'userName'))
+    # The timeline merges the member's own usernames / MUIDs: one sequence
+    events = timeline.to_frame().assign(muid=muid)
+    events = events[events['eventCategory'].isin(TRAVEL_CATEGORIES)]
+    return travel_frame(events, locate_ips(events['ipAddress'], offline=offline, progress=False),
+                        flagged_only=flagged_only)
+
+
+# ----------------------------------------------------------------------
+# Tail mode
+# ----------------------------------------------------------------------
+
+class GeoVelocityDetector(Detector):
+    """
+    fraud_tail detector: the member's last located login / OTP is the state,
+    each new one is checked against it with assess_hops. Events older than
+    the state (id order and activityDate order can disagree) are skipped.
+    IPs are located once per cycle for the whole batch and kept in a bounded
+    cache.
+
+    Args:
+        offline: Locate from the range index and cache only (default: a
+                 provider lookup would stall the tail on its rate limit)
+    """
+
+    name = 'geo_velocity'
+    categories = TRAVEL_CATEGORIES
+
+    def __init__(self, offline=True):
+        self.offline = offline
+        self._locations = OrderedDict()     # ip -> location dict, or None when unlocated
+        self._centroids = {}
+
+    def start_cycle(self, events):
+        new = {e.ipAddress for e in events
+               if e.eventCategory in self.categories and e.ipAddress and e.ipAddress not in self._locations}
+        if not new:
+            return
+        found = locate_ips(new, offline=self.offline, progress=False, centroids=self._centroids)
+        located = found.to_dict('index')
+        for ip in new:
+            self._locations[ip] = located.get(ip)
+        while len(self._locations) > MAX_CACHED_LOCATIONS:
+            self._locations.popitem(last=False)
+
+    def process(self, event, parsed, state):
+        location = self._locations.get(event.ipAddress)
+        if location is None:
+            return []
+        point = {'time': event.activityDate.isoformat(sep=' '), 'ip': event.ipAddress,
+                 **{k: (None if pd.isna(location[k]) else location[k]) for k in LOCATION_COLUMNS}}
+        last = state.get('last')
+        if not last:
+            state['last'] = point
+            return []
+        hours = (event.activityDate - datetime.fromisoformat(last['time'])).total_seconds() / 3600
+        if hours < 0:
+            # Arrived out of activityDate order: the hop it belongs to is
+            # already past, and the newer location must stay the state
+            return []
+        state['last'] = point
+        km = haversine_km(*(np.nan if v is None else v
+                            for v in (last['lat'], last['lon'], point['lat'], point['lon'])))
+        speed, impossible, hop, severity = assess_hops(km, hours, last['country'] != point['country'])
+        severity = str(severity)
+        if not severity:
+            return []
+        here, there = _place(point['country'], point['region'], point['city']), \
+            _place(last['country'], last['region'], last['city'])
+        # One alert per route: a member bouncing through a VPN would repeat it every event
+        route = f"{there} > {here}"
+        routes = state.setdefault('routes', [])
+        if route in routes:
+            return []
+        routes.append(route)
+        del routes[:-20]
+        distance = '' if np.isnan(km) else f"{float(km):,.0f} km in {hours:.2f}h ({float(speed):,.0f} km/h) "
+        return [self.alert(event, severity, f"{str(_flag_text(impossible, hop))}: {there} -> {here} {distance}"
+                                            f"via {event.ipAddress}",
+                           username=event.userName, from_ip=last['ip'], to_ip=event.ipAddress,
+                           from_time=last['time'], km=None if np.isnan(km) else round(float(km), 1),
+                           hours=round(hours, 3), from_country=last['country'],
+                           to_country=point['country'])]
+
+
+# ----------------------------------------------------------------------
+# Benchmark / CLI
+# ----------------------------------------------------------------------
+
+def _synthetic_logins(count, members=50000, days=30, seed=3):
+    """Random logins over a stub city table, with a few members hopping abroad."""
+    from ip_geolocation import STUB_LOCATIONS
+
+    rng = np.random.default_rng(seed)
+    ip_count = 20000
+    city = rng.choice(len(STUB_LOCATIONS), ip_count, p=None)
+    locations = pd.DataFrame({
+        'country': [STUB_LOCATIONS[c][0] for c in city], 'region': [STUB_LOCATIONS[c][1] for c in city],
+        'city': [STUB_LOCATIONS[c][2] for c in city], 'isp': [STUB_LOCATIONS[c][5] for c in city],
+        'lat': [STUB_LOCATIONS[c][3] for c in city], 'lon': [STUB_LOCATIONS[c][4] for c in city],
+    }, index=pd.Index([f"198.51.{i // 256}.{i % 256}" for i in range(ip_count)], name='ip'))
+    member = rng.integers(0, members, count)
+    # Members mostly reuse one home IP; one login in 20 comes from anywhere
+    home = rng.integers(0, ip_count, members)
+    ip = np.where(rng.random(count) < 0.95, home[member], rng.integers(0, ip_count, count))
+    events = pd.DataFrame({
+        'activityDate': datetime(2025, 12, 1) + pd.to_timedelta(rng.integers(0, days * 86400, count), unit='s'),
+        'eventCategory': np.where(rng.random(count) < 0.8, 'LoginSuccessful', OTP_CATEGORY),
+        'ipAddress': locations.index.to_numpy()[ip],
+        'muid': [f"M{m:08d}" for m in member],
+        'userName': [f"user{m}" for m in member],
+    })
+    return events, locations
+
+
+def benchmark(count=1000000):
+    events, locations = _synthetic_logins(count)
+    started = time.perf_counter()
+    hops = travel_frame(events, locations)
+    elapsed = time.perf_counter() - started
+    print(f"{count:,} events, {events['muid'].nunique():,} members: {len(hops):,} flagged hops "
+          f"in {elapsed:.2f}s ({count / elapsed:,.0f} events/s)")
+    print(hops['flags'].value_counts().to_string())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Impossible travel / country hops in login streams")
+    parser.add_argument('--month', metavar='YYYY-MM', help="calendar month to scan")
+    parser.add_argument('--days', type=int, default=30, help="lookback when --month is not given")
+    parser.add_argument('--muid', help="one member's hops from the local member timeline")
+    parser.add_argument('--offline', action='store_true', help="no provider lookups (range index + cache only)")
+    parser.add_argument('--all', action='store_true', help="list every hop, not only flagged ones")
+    parser.add_argument('--csv', help="write the hops to a CSV file")
+    parser.add_argument('--bench', action='store_true', help="synthetic one-pass benchmark")
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark()
+        return
+
+    if args.muid:
+        hops = timeline_travel(args.muid, flagged_only=not args.all)
+    else:
+        if args.month:
+            start = to_datetime(f"{args.month}-01")
+            end = (start + timedelta(days=32)).replace(day=1)
+        else:
+            start, end = days_ago(args.days), None
+        print(f"Scanning {', '.join(TRAVEL_CATEGORIES)} from {start:%Y-%m-%d}"
+              + (f" to {end:%Y-%m-%d}" if end else ""))
+        hops = scan_travel(start, end, offline=args.offline, flagged_only=not args.all)
+
+    if hops.empty:
+        print("No hops.")
+        return
+    print(f"\n{'Severity':9} {'Member':22} {'From':19} {'To':19} {'Route':60} {'km':>8} {'km/h':>8}")
+    for row in hops.itertuples(index=False):
+        route = f"{row.from_place} -> {row.to_place}"
+        print(f"{row.severity or '-':9} {row.member:22} {row.from_time:%Y-%m-%d %H:%M:%S} "
+              f"{row.to_time:%Y-%m-%d %H:%M:%S} {route[:60]:60} {row.km:>8,.0f} {row.speed_kmh:>8,.0f}")
+    print(f"\n{len(hops):,} hops; " + ', '.join(f"{k}: {v:,}" for k, v in hops['flags'].value_counts().items() if k))
+    if args.csv:
+        hops.to_csv(args.csv, index=False)
+        print(f"Saved {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Gibberish Scoring
+Vectorized randomness score for email local parts (the part before '@').
+
+Machine-generated fraud accounts tend to use random-looking addresses
+(qzkxvt93@..., xjw8k2lp@...). Every email is scored in one batch of NumPy
+operations over a fixed-width byte matrix:
+
+    - character-class ratios (vowels, consonants, digits, symbols)
+    - Shannon entropy of the character distribution
+    - bigram improbability against a built-in English / names bigram table
+    - longest digit run
+
+The components are combined into a continuous score in [0, 1] (higher is
+more random) that can be used directly as a risk feature. The old
+is_gibberish boolean (consonant/vowel ratio > 4, or very few distinct
+characters) is computed alongside it, unchanged, as looks_gibberish.
+
+Usage:
+    from gibberish_score import gibberish_scores, is_gibberish
+    features = gibberish_scores(df['Email'])
+    df['Gibberish_Score'] = features.score
+    df['Looks_Gibberish'] = features.looks_gibberish
+
+    py gibberish_score.py --score qzkxvt93@gmail.com john.smith@gmail.com
+    py gibberish_score.py --bench 200000        (emails/sec vs the old per-email loop)
+"""
+
+import argparse
+import random
+import time
+from collections import namedtuple
+
+import numpy as np
+
+WIDTH = 64               # local parts longer than this (RFC limit) are truncated
+SCORE_THRESHOLD = 0.5    # score above which an address reads as machine-generated
+
+# Built-in sample of English words and common names for the bigram table
+_BIGRAM_CORPUS = """
+the and that have for not with you this but his from they say her she will one all would there
+their what out about who get which when make can like time just him know take people into year
+your good some could them see other than then now look only come its over think also back after
+use two how our work first well way even new want because any these give day most find here thing
+many well tell very through long where much should great little world still between home family
+school state country mother father night water house point place money story business service
+james john robert michael william david richard joseph thomas charles christopher daniel matthew
+anthony mark donald steven paul andrew joshua kenneth kevin brian george timothy ronald edward jason
+jeffrey ryan jacob gary nicholas eric jonathan stephen larry justin scott brandon benjamin samuel
+gregory alexander frank patrick raymond jack dennis jerry tyler aaron jose adam nathan henry douglas
+mary patricia jennifer linda elizabeth barbara susan jessica sarah karen lisa nancy betty margaret
+sandra ashley kimberly emily donna michelle carol amanda dorothy melissa deborah stephanie rebecca
+sharon laura cynthia kathleen amy angela shirley anna brenda pamela emma nicole helen samantha
+katherine christine debra rachel carolyn janet catherine maria heather diane ruth julie olivia joyce
+smith johnson williams brown jones garcia miller davis rodriguez martinez hernandez lopez gonzalez
+wilson anderson thomas taylor moore jackson martin lee perez thompson white harris sanchez clark
+ramirez lewis robinson walker young allen king wright scott torres nguyen hill flores green adams
+nelson baker hall rivera campbell mitchell carter roberts gregory byrne murphy kelly sullivan
+walsh quinn lynn wayne dwyer myers byron flynn glenn bryant hayes lyons boyd doyle floyd reyes
+cruz ortiz gomez diaz morales reed cook morgan bell murphy bailey cooper howard ward cox richardson
+wood watson brooks bennett gray james hughes price sanders myers long ross foster powell jenkins
+perry russell butler barnes fisher henderson coleman simmons patterson jordan reynolds hamilton
+graham kim gonzales alexander ramos wallace griffin west cole hayes chavez gibson bryant ellis
+stevens murray ford marshall owens mcdonald harrison ruiz kennedy wells alvarez woods mendoza
+castillo olson webb washington tucker freeman burns henry vasquez snyder simpson crawford jimenez
+porter mason shaw gordon wagner hunter romero hicks dixon hunt palmer robertson black holmes stone
+meyer boyd mills warren fox rose rice moreno schmidt patel ferguson nichols herrera medina ryan
+fernandez weaver daniels stephens gardner payne kelley dunn pierce arnold tran spencer peters
+hawkins grant hansen castro hoffman hart elliott cunningham knight bradley greeven mail office
+info contact admin sales support account member bank credit union online login secure service
+"""
+
+GibberishFeatures = namedtuple('GibberishFeatures', [
+    'score', 'looks_gibberish', 'length', 'vowel_ratio', 'consonant_ratio', 'digit_ratio',
+    'entropy', 'bigram_nll', 'max_digit_run'])
+
+
+def _build_bigram_table(corpus, smoothing=0.5):
+    """Return a 26x26 array of -log2 P(next letter | letter) from a word corpus."""
+    counts = np.full((26, 26), smoothing)
+    for word in corpus.split():
+        codes = np.frombuffer(word.encode('ascii'), dtype=np.uint8).astype(np.int64) - 97
+        if len(codes) > 1:
+            np.add.at(counts, (codes[:-1], codes[1:]), 1)
+    probs = counts / counts.sum(axis=1, keepdims=True)
+    return -np.log2(probs)
+
+
+BIGRAM_NLL = _build_bigram_table(_BIGRAM_CORPUS)
+# Average per-bigram cost of English text vs uniformly random letters
+_ENGLISH_NLL = 3.4
+_RANDOM_NLL = float(BIGRAM_NLL.mean())
+
+
+# Byte -> character class lookup tables
+_IS_LETTER = np.zeros(256, dtype=bool)
+_IS_LETTER[ord('a'):ord('z') + 1] = True
+_IS_VOWEL = np.zeros(256, dtype=bool)
+_IS_VOWEL[list(b'aeiou')] = True
+_IS_DIGIT = np.zeros(256, dtype=bool)
+_IS_DIGIT[ord('0'):ord('9') + 1] = True
+
+
+def local_parts(emails):
+    """Lowercased local parts for an iterable of emails (None / NaN -> '')."""
+    return [e.split('@')[0].lower() if e and e.__class__ is str else '' for e in emails]
+
+
+def _byte_matrix(parts, width):
+    """Encode local parts into an (n, width) uint8 matrix, zero padded."""
+    encoded = np.array([p.encode('ascii', 'replace') for p in parts], dtype=f'S{width}')
+    return encoded.view(np.uint8).reshape(len(parts), width)
+
+
+def score_local_parts(parts):
+    """
+    Score a batch of (already extracted) local parts.
+
+    Args:
+        parts: Sequence of lowercase local-part strings
+
+    Returns:
+        GibberishFeatures of NumPy arrays, one element per input
+    """
+    n = len(parts)
+    true_length = np.fromiter(map(len, parts), dtype=np.int64, count=n)
+    # Matrix only as wide as the longest local part in this batch
+    width = int(min(max(true_length.max(initial=0), 2), WIDTH))
+    codes = _byte_matrix(parts, width)
+    length = np.minimum(true_length, width)
+    safe_length = np.maximum(length, 1)
+
+    is_letter = _IS_LETTER[codes]
+    is_vowel = _IS_VOWEL[codes]
+    is_digit = _IS_DIGIT[codes]
+    vowels = is_vowel.sum(axis=1)
+    consonants = (is_letter & ~is_vowel).sum(axis=1)
+    digits = is_digit.sum(axis=1)
+    # Letter/digit switches: 'xjw8k2lp' switches four times, 'mary1985' once
+    switches = (is_digit[:, 1:] != is_digit[:, :-1]) & (codes[:, 1:] != 0)
+    switches = switches.sum(axis=1)
+
+    # Distinct characters and Shannon entropy from runs in each sorted row
+    # (padding zeros sort first and are dropped)
+    ordered = np.sort(codes, axis=1)
+    flat = ordered.ravel()
+    starts = np.ones(flat.shape, dtype=bool)
+    starts[1:] = flat[1:] != flat[:-1]
+    starts[::width] = True
+    starts &= flat != 0
+    run_id = np.cumsum(starts) - 1
+    run_row = np.nonzero(starts)[0] // width
+    run_count = np.bincount(run_id[flat != 0], minlength=len(run_row))
+    distinct = np.bincount(run_row, minlength=n)
+    p = run_count / safe_length[run_row]
+    entropy = np.bincount(run_row, weights=-p * np.log2(p), minlength=n)
+
+    # Mean improbability of letter-to-letter transitions
+    pair = is_letter[:, :-1] & is_letter[:, 1:]
+    first = np.where(pair, codes[:, :-1].astype(np.int64) - 97, 0)
+    second = np.where(pair, codes[:, 1:].astype(np.int64) - 97, 0)
+    pair_count = pair.sum(axis=1)
+    bigram_nll = np.where(pair, BIGRAM_NLL[first, second], 0.0).sum(axis=1) / np.maximum(pair_count, 1)
+
+    # Longest digit run, one column at a time across all rows
+    run = np.zeros(n, dtype=np.int64)
+    max_digit_run = np.zeros(n, dtype=np.int64)
+    for col in range(width):
+        run = (run + 1) * is_digit[:, col]
+        np.maximum(max_digit_run, run, out=max_digit_run)
+
+    # Existing boolean rule, unchanged
+    ratio = consonants / np.maximum(vowels, 1)
+    looks_gibberish = (((true_length > 6) & (vowels > 0) & (ratio > 4)) |
+                       ((distinct < true_length / 3) & (true_length > 8)))
+
+    # Continuous score: each component normalised to [0, 1], weighted
+    bigram_part = np.clip((bigram_nll - _ENGLISH_NLL) / (_RANDOM_NLL - _ENGLISH_NLL), 0, 1)
+    bigram_part = np.where(pair_count > 0, bigram_part, 0.5)
+    consonant_part = np.clip(2 * (consonants - 2 * vowels) / safe_length, 0, 1)
+    max_entropy = np.log2(np.minimum(safe_length, 36).astype(float) + 1)
+    entropy_part = np.clip(entropy / max_entropy, 0, 1) * (length > 5)
+    mixing_part = np.clip((switches - 1) / 4, 0, 1)
+    digit_part = np.clip((max_digit_run - 4) / 6, 0, 1)
+    score = (0.45 * bigram_part + 0.2 * consonant_part + 0.1 * entropy_part
+             + 0.15 * mixing_part + 0.1 * digit_part)
+    # Very short local parts carry too little signal to call random
+    score = np.where(length >= 4, score, score * length / 4)
+
+    return GibberishFeatures(
+        score=np.round(score, 4),
+        looks_gibberish=looks_gibberish,
+        length=true_length,
+        vowel_ratio=vowels / safe_length,
+        consonant_ratio=ratio,
+        digit_ratio=digits / safe_length,
+        entropy=entropy,
+        bigram_nll=bigram_nll,
+        max_digit_run=max_digit_run,
+    )
+
+
+def gibberish_scores(emails):
+    """Score a column of email addresses; see score_local_parts."""
+    return score_local_parts(local_parts(emails))
+
+
+def gibberish_score(email):
+    """Continuous randomness score in [0, 1] for one email address."""
+    return float(gibberish_scores([email]).score[0])
+
+
+def is_gibberish(email):
+    """Check if email looks like random gibberish (fraud indicator)"""
+    if not email or '@' not in email:
+        return False
+    return bool(gibberish_scores([email]).looks_gibberish[0])
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+
+def _legacy_is_gibberish(email):
+    """The original per-email check from export_suspicious_emails, kept for the benchmark"""
+    if not email or '@' not in email:
+        return False
+    local_part = email.split('@')[0].lower()
+    vowels = sum(1 for c in local_part if c in 'aeiou')
+    consonants = sum(1 for c in local_part if c.isalpha() and c not in 'aeiou')
+    if len(local_part) > 6 and vowels > 0:
+        ratio = consonants / vowels if vowels > 0 else 10
+        if ratio > 4:
+            return True
+    if len(set(local_part)) < len(local_part) / 3 and len(local_part) > 8:
+        return True
+    return False
+
+
+def _sample_emails(count, seed=5):
+    rng = random.Random(seed)
+    first = ['john', 'mary', 'kevin', 'sarah', 'dgarcia', 'tom.byrne', 'jsmith', 'amy_lee', 'pnguyen']
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    out = []
+    for _ in range(count):
+        if rng.random() < 0.05:
+            local = ''.join(rng.choice(letters + '0123456789') for _ in range(rng.randint(7, 14)))
+        else:
+            local = rng.choice(first) + (str(rng.randint(1, 99)) if rng.random() < 0.5 else '')
+        out.append(f"{local}@gmail.com")
+    return out
+
+
+def benchmark(count=200000):
+    """Time gibberish_scores against the old per-email boolean check."""
+    emails = _sample_emails(count)
+
+    start = time.perf_counter()
+    features = gibberish_scores(emails)
+    fast_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy = [_legacy_is_gibberish(e) for e in emails]
+    legacy_s = time.perf_counter() - start
+
+    agree = int((features.looks_gibberish == np.array(legacy)).sum())
+    print(f"gibberish_scores: {count:,} emails in {fast_s:.3f}s ({count / fast_s:,.0f}/s)")
+    print(f"old is_gibberish: {count:,} emails in {legacy_s:.3f}s ({count / legacy_s:,.0f}/s, boolean only)")
+    print(f"Boolean agreement with the old check: {agree:,}/{count:,}")
+    print(f"Score > {SCORE_THRESHOLD}: {int((features.score > SCORE_THRESHOLD).sum()):,} "
+          f"(about 5% of the sample is random)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Email local-part gibberish scoring")
+    parser.add_argument('--score', nargs='+', metavar='EMAIL', help="score one or more addresses")
+    parser.add_argument('--bench', type=int, nargs='?', const=200000, metavar='EMAILS',
+                        help="run the emails/sec micro-benchmark")
+    args = parser.parse_args()
+
+    if args.score:
+        features = gibberish_scores(args.score)
+        for i, email in enumerate(args.score):
+            print(f"{email:40} score={features.score[i]:.3f} gibberish={bool(features.looks_gibberish[i])} "
+                  f"entropy={features.entropy[i]:.2f} bigram={features.bigram_nll[i]:.2f} "
+                  f"digit_run={features.max_digit_run[i]}")
+    if args.bench or not args.score:
+        benchmark(args.bench or 200000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Identity Resolver
+Set-based lookup of username / MUID / customer.Id / masterMembership for a
+whole list of members at once.
+
+waf_user_lookup used to resolve every input line with up to four
+single-row queries (customer by Token, fraudmonitor by muid, customer by
+UserName, account number by userName), so a WAF export of a few thousand
+entries cost thousands of round trips. Here each step is one query per
+chunk of keys (IN lists of CHUNK_SIZE parameters), and the fraudmonitor
+steps aggregate in MySQL (GROUP BY) so only one row per member comes back.
+
+Resolution order is unchanged:
+    MUID entry      customer.Token -> fraudmonitor.muid (+ customer by its userName)
+    username entry  customer.UserName -> fraudmonitor.userName
+
+Usernames are matched with a plain IN over the value as given and its
+lowercase form, so the customer / fraudmonitor userName indexes stay usable.
+That equals the old LOWER(x) = LOWER(%s) lookups only under a
+case-insensitive collation (the dbxdb default): with a case-sensitive one a
+stored 'JSmith' is missed for 'jsmith'. IdentityResolver(lower_fallback=True)
+retries names the IN lookup missed with LOWER(x) IN (...), which cannot use
+the index.
+
+Usage:
+    from identity_resolver import IdentityResolver
+    resolver = IdentityResolver(cursor)
+    identities = resolver.resolve(entries)      # [Identity(input, username, customer_id, ...)]
+    resolver.muids_by_account(account_numbers)  # {account: [muid, ...]}
+
+    py identity_resolver.py mike123 638242923564062860
+"""
+
+import argparse
+from collections import namedtuple
+
+CHUNK_SIZE = 1000
+
+Identity = namedtuple('Identity', ['input', 'username', 'customer_id', 'muid', 'account_number', 'source'])
+
+CustomerIdentity = namedtuple('CustomerIdentity', ['id', 'username', 'token'])
+MemberIdentity = namedtuple('MemberIdentity', ['username', 'muid', 'account_number'])
+
+
+def is_muid(entry):
+    """Check if entry is a MUID (numeric, 15+ digits)"""
+    return entry.isdigit() and len(entry) >= 15
+
+
+def _username_keys(usernames):
+    """Distinct values to send for case-insensitive username matching."""
+    keys = set()
+    for name in usernames:
+        if name:
+            keys.add(name)
+            keys.add(name.lower())
+    return sorted(keys)
+
+
+class IdentityResolver:
+    """
+    Bulk identity lookups over customer and fraudmonitor.
+
+    Args:
+        cursor: dbxdb cursor, opened from a connection that stays checked out
+            for as long as the resolver is used:
+
+                pool = db_connection.get_mysql_pool()
+                with pool.connection() as conn:
+                    resolver = IdentityResolver(conn.cursor())
+        chunk_size: Keys per IN list
+        lower_fallback: Retry usernames the indexed IN lookup missed with
+            LOWER(column) IN (...), for case-sensitive collations
+    """
+
+    def __init__(self, cursor, chunk_size=CHUNK_SIZE, lower_fallback=False):
+        self.cursor = cursor
+        self.chunk_size = chunk_size
+        self.lower_fallback = lower_fallback
+        self.queries = 0
+
+    def _fetch_chunked(self, sql, keys):
+        """Run sql once per chunk of keys; sql has one {placeholders} slot."""
+        keys = list(keys)
+        rows = []
+        for start in range(0, len(keys), self.chunk_size):
+            chunk = keys[start:start + self.chunk_size]
+            self.cursor.execute(sql.format(placeholders=', '.join(['%s'] * len(chunk))), chunk)
+            rows.extend(self.cursor.fetchall())
+            self.queries += 1
+        return rows
+
+    def _fetch_by_username(self, sql, column, usernames, name_index):
+        """
+        Run sql (one {match} slot) for usernames; row[name_index] is the
+        matched username. With lower_fallback, names the indexed lookup
+        missed are retried case-insensitively.
+        """
+        rows = self._fetch_chunked(sql.format(match=f"{column} IN ({{placeholders}})"),
+                                   _username_keys(usernames))
+        if self.lower_fallback:
+            found = {row[name_index].lower() for row in rows if row[name_index]}
+            missing = sorted({name.lower() for name in usernames if name} - found)
+            if missing:
+                rows.extend(self._fetch_chunked(
+                    sql.format(match=f"LOWER({column}) IN ({{placeholders}})"), missing))
+        return rows
+
+    # ------------------------------------------------------------------
+    # customer
+    # ------------------------------------------------------------------
+
+    def customers_by_username(self, usernames):
+        """{lowercase username: CustomerIdentity}"""
+        rows = self._fetch_by_username("""
+            SELECT id, UserName, Token
+            FROM customer
+            WHERE {match}
+        """, 'UserName', usernames, 1)
+        found = {}
+        for row in rows:
+            if row[1]:
+                found.setdefault(row[1].lower(), CustomerIdentity(*row))
+        return found
+
+    def customers_by_token(self, tokens):
+        """{Token (MUID): CustomerIdentity}"""
+        rows = self._fetch_chunked("""
+            SELECT id, UserName, Token
+            FROM customer
+            WHERE Token IN ({placeholders})
+        """, sorted({t for t in tokens if t}))
+        found = {}
+        for row in rows:
+            found.setdefault(str(row[2]), CustomerIdentity(*row))
+        return found
+
+    # ------------------------------------------------------------------
+    # fraudmonitor
+    # ------------------------------------------------------------------
+
+    def members_by_username(self, usernames):
+        """
+        {lowercase username: MemberIdentity} from fraudmonitor.
+
+        Prefers a muid that was seen with a masterMembership, as the old
+        two-step lookup did; members without any muid are left out.
+        """
+        rows = self._fetch_by_username("""
+            SELECT userName, muid, MAX(masterMembership)
+            FROM fraudmonitor
+            WHERE {match}
+            AND muid IS NOT NULL AND muid != ''
+            GROUP BY userName, muid
+        """, 'userName', usernames, 0)
+        found = {}
+        for username, muid, account in rows:
+            if not username:
+                continue
+            key = username.lower()
+            current = found.get(key)
+            if current is None or (account and not current.account_number):
+                found[key] = MemberIdentity(username, muid, account or None)
+        return found
+
+    def members_by_muid(self, muids):
+        """{muid: MemberIdentity} from fraudmonitor."""
+        rows = self._fetch_chunked("""
+            SELECT muid, MAX(userName), MAX(masterMembership)
+            FROM fraudmonitor
+            WHERE muid IN ({placeholders})
+            GROUP BY muid
+        """, sorted({m for m in muids if m}))
+        return {str(muid): MemberIdentity(username, muid, account or None) for muid, username, account in rows}
+
+    def account_numbers(self, usernames):
+        """{lowercase username: masterMembership}"""
+        rows = self._fetch_by_username("""
+            SELECT userName, MAX(masterMembership)
+            FROM fraudmonitor
+            WHERE {match}
+            AND masterMembership IS NOT NULL AND masterMembership != ''
+            GROUP BY userName
+        """, 'userName', usernames, 0)
+        found = {}
+        for username, account in rows:
+            if username:
+                found.setdefault(username.lower(), account)
+        return found
+
+    def muids_by_account(self, account_numbers):
+        """{masterMembership: [muid, ...]} (sorted, distinct)"""
+        rows = self._fetch_chunked("""
+            SELECT DISTINCT masterMembership, muid
+            FROM fraudmonitor
+            WHERE masterMembership IN ({placeholders})
+            AND muid IS NOT NULL
+            AND muid != ''
+        """, sorted(set(account_numbers)))
+        found = {}
+        for account, muid in sorted(rows):
+            found.setdefault(account, []).append(muid)
+        return found
+
+    def usernames_by_account(self, account_numbers):
+        """{masterMembership: [userName, ...]} (sorted, distinct)"""
+        rows = self._fetch_chunked("""
+            SELECT DISTINCT masterMembership, userName
+            FROM fraudmonitor
+            WHERE masterMembership IN ({placeholders})
+            AND userName IS NOT NULL
+        """, sorted(set(account_numbers)))
+        found = {}
+        for account, username in sorted(rows):
+            found.setdefault(account, []).append(username)
+        return found
+
+    # ------------------------------------------------------------------
+    # Mixed input
+    # ------------------------------------------------------------------
+
+    def resolve(self, entries):
+        """
+        Resolve a mixed list of usernames and MUIDs.
+
+        Args:
+            entries: Input strings (MUIDs are numeric, 15+ digits)
+
+        Returns:
+            list of Identity in input order; source is 'customer',
+            'fraudmonitor' or None when nothing was found
+        """
+        entries = [e.strip() for e in entries]
+        muid_entries = [e for e in entries if is_muid(e)]
+        name_entries = [e for e in entries if e and not is_muid(e)]
+
+        by_token = self.customers_by_token(muid_entries)
+        by_muid = self.members_by_muid([m for m in muid_entries if m not in by_token])
+        customers = self.customers_by_username(
+            name_entries + [m.username for m in by_muid.values() if m.username])
+        members = self.members_by_username([n for n in name_entries if n.lower() not in customers])
+        accounts = self.account_numbers(
+            [c.username for c in by_token.values()] + [n for n in name_entries if n.lower() in customers])
+
+        out = []
+        for entry in entries:
+            if is_muid(entry):
+                cust = by_token.get(entry)
+                member = by_muid.get(entry)
+                if cust:
+                    out.append(Identity(entry, cust.username, cust.id, cust.token,
+                                        accounts.get((cust.username or '').lower()), 'customer'))
+                elif member:
+                    linked = customers.get((member.username or '').lower())
+                    out.append(Identity(entry, member.username, linked.id if linked else None,
+                                        member.muid, member.account_number, 'fraudmonitor'))
+                else:
+                    out.append(Identity(entry, None, None, entry, None, None))
+            else:
+                cust = customers.get(entry.lower())
+                member = members.get(entry.lower())
+                if cust:
+                    out.append(Identity(entry, cust.username, cust.id, cust.token,
+                                        accounts.get(entry.lower()), 'customer'))
+                elif member:
+                    out.append(Identity(entry, member.username, None, member.muid,
+                                        member.account_number, 'fraudmonitor'))
+                else:
+                    out.append(Identity(entry, entry, None, None, None, None))
+        return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve usernames / MUIDs to customer id, MUID and account number")
+    parser.add_argument('entries', nargs='+', help="usernames or MUIDs")
+    parser.add_argument('--lower-fallback', action='store_true',
+                        help="retry missed usernames with LOWER() (case-sensitive collations)")
+    args = parser.parse_args()
+
+    from db_connection import get_connection
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        resolver = IdentityResolver(cursor, lower_fallback=args.lower_fallback)
+        identities = resolver.resolve(args.entries)
+    finally:
+        cursor.close()
+        conn.close()
+
+    for ident in identities:
+        print(f"{ident.input:25} user={ident.username or '':20} customer_id={ident.customer_id or '':10} "
+              f"muid={ident.muid or '':20} account={ident.account_number or '':12} ({ident.source or 'NOT FOUND'})")
+    print(f"\n{len(identities)} entries resolved with {resolver.queries} queries")
+
+
+if __name__ == "__main__":
+    main()
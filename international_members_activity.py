@@ -14,6 +14,8 @@ import pandas as pd
 from datetime import datetime, timedelta
 from dwha_connection import get_dwha_connection
 from db_connection import get_connection as get_dbxdb_connection
+from key_list_query import query_by_keys
+from stream_join import HashJoin, frame_records, normalize_account
 
 # Output file
 OUTPUT_FILE = r"C:\Users\kgreeven\Desktop\INTERNATIONAL_MEMBERS_ACTIVITY.xlsx"
@@ -80,10 +82,7 @@ def query_dbxdb_activity(conn, account_numbers):
     if not account_numbers:
         return pd.DataFrame()
 
-    # Build IN clause with account numbers
-    in_clause = ",".join([f"'{acc}'" for acc in account_numbers])
-
-    query = f"""
+    query = """
     SELECT
         masterMembership AS AccountNumber,
         MAX(activityDate) AS LastActivity,
@@ -91,20 +90,16 @@ def query_dbxdb_activity(conn, account_numbers):
         COUNT(*) AS TotalActivityCount,
         COUNT(CASE WHEN eventCategory = 'LoginSuccessful' THEN 1 END) AS LoginCount
     FROM fraudmonitor
-    WHERE masterMembership IN ({in_clause})
+    WHERE masterMembership IN ({keys})
     GROUP BY masterMembership
     """
 
+    # Account numbers go through a session temp table (or fixed-size IN chunks)
+    # instead of one statement with every account number inlined
     print(f"Querying DBXDB for activity data on {len(account_numbers)} accounts...")
-    cursor = conn.cursor()
-    cursor.execute(query)
-
-    # Fetch results
     columns = ['AccountNumber', 'LastActivity', 'LastLogin', 'TotalActivityCount', 'LoginCount']
-    rows = cursor.fetchall()
-    cursor.close()
-
-    return pd.DataFrame(rows, columns=columns)
+    df = query_by_keys(conn, query, account_numbers)
+    return df if not df.empty else pd.DataFrame(columns=columns)
 
 
 def categorize_activity(row, cutoff_90_days, cutoff_30_days):
@@ -153,7 +148,7 @@ def main():
     dbxdb_conn = get_dbxdb_connection()
     print("Connected to DBXDB successfully!")
 
-    account_numbers = intl_members_df['AccountNumber'].tolist()
+    account_numbers = [normalize_account(a) for a in intl_members_df['AccountNumber']]
     activity_df = query_dbxdb_activity(dbxdb_conn, account_numbers)
     dbxdb_conn.close()
 
@@ -162,7 +157,13 @@ def main():
 
     # Step 3: Merge data
     print("Step 3: Merging member and activity data...")
-    merged_df = intl_members_df.merge(activity_df, on='AccountNumber', how='left')
+    # Hash join on normalized account keys: DWHA's CHAR ParentAccount and dbxdb's
+    # masterMembership can differ in padding, which an exact merge would miss
+    activity_columns = ['LastActivity', 'LastLogin', 'TotalActivityCount', 'LoginCount']
+    join = HashJoin(frame_records(activity_df), frame_records(intl_members_df), 'AccountNumber',
+                    how='left', build_columns=activity_columns)
+    merged_df = join.to_frame(columns=list(intl_members_df.columns) + activity_columns)
+    print(f"  {join.summary()}")
 
     # Add activity status category
     merged_df['ActivityStatus'] = merged_df.apply(
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+IP Geolocation Cache Store
+One persistent, shared SQLite cache for every script that geolocates IPs.
+
+Replaces the monolithic ip_cache_dec2025.json (rewritten in full every 100
+lookups) and the process-local dicts the other scripts threw away on exit.
+
+- One row per IP with the full geolocation record and a fetched_at timestamp
+- TTL eviction: successful lookups expire after TTL_DAYS, negative results
+  (provider had no data, private ranges) after NEGATIVE_TTL_DAYS
+- Transient failures (timeouts, rate limiting) are never cached
+- WAL journal mode, so several scripts can read while one writes
+- Saves are row-level upserts, not a rewrite of the whole cache
+
+Usage:
+    py ip_cache_store.py --status
+    py ip_cache_store.py --import ip_cache_dec2025.json
+    py ip_cache_store.py --evict
+"""
+
+import argparse
+import ipaddress
+import json
+import os
+import sqlite3
+import threading
+import time
+
+GEO_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ip_geo_cache.db')
+
+TTL_DAYS = 90
+NEGATIVE_TTL_DAYS = 7
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ip_geo (
+    ip         TEXT PRIMARY KEY,
+    status     TEXT NOT NULL,      -- 'success' or 'fail'
+    record     TEXT NOT NULL,      -- JSON geolocation record
+    fetched_at REAL NOT NULL       -- unix time of the lookup
+);
+CREATE INDEX IF NOT EXISTS ix_ip_geo_fetched ON ip_geo (status, fetched_at);
+CREATE TABLE IF NOT EXISTS imported_sources (
+    path       TEXT PRIMARY KEY,
+    mtime      REAL NOT NULL,
+    entries    INTEGER NOT NULL
+);
+"""
+
+# Fields of the shared record shape (see ip_geolocation.EMPTY_RECORD)
+RECORD_DEFAULTS = {
+    'status': 'fail',
+    'country': 'Unknown',
+    'region': 'Unknown',
+    'city': 'Unknown',
+    'zip': '',
+    'lat': '',
+    'lon': '',
+    'timezone': 'Unknown',
+    'isp': 'Unknown',
+    'org': 'Unknown',
+    'as': 'Unknown',
+    'proxy': False,
+}
+
+
+class GeoCacheStore:
+    """
+    SQLite-backed geolocation cache shared across scripts.
+
+    Args:
+        path: Cache file (default: ip_geo_cache.db next to this script)
+        ttl_days: Lifetime of successful lookups
+        negative_ttl_days: Lifetime of negative results
+    """
+
+    def __init__(self, path=GEO_CACHE_FILE, ttl_days=TTL_DAYS, negative_ttl_days=NEGATIVE_TTL_DAYS):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.negative_ttl = negative_ttl_days * 86400
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _fresh_after(self, now=None):
+        now = now or time.time()
+        return now - self.ttl, now - self.negative_ttl
+
+    # ------------------------------------------------------------------
+    # Reads / writes
+    # ------------------------------------------------------------------
+
+    def get_many(self, ips):
+        """
+        Fetch unexpired cache entries.
+
+        Returns:
+            dict: {ip: record} for the IPs that are cached and fresh
+        """
+        ips = [ip for ip in dict.fromkeys(ips) if ip is not None]
+        ok_after, neg_after = self._fresh_after()
+        found = {}
+        with self._lock:
+            # SQLite limits bound parameters per statement, so chunk the IN list
+            for i in range(0, len(ips), 500):
+                chunk = ips[i:i + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = self.conn.execute(
+                    f"SELECT ip, record FROM ip_geo WHERE ip IN ({placeholders}) "
+                    f"AND ((status = 'success' AND fetched_at >= ?) OR (status != 'success' AND fetched_at >= ?))",
+                    chunk + [ok_after, neg_after]
+                ).fetchall()
+                for ip, record in rows:
+                    found[ip] = json.loads(record)
+        return found
+
+    def get(self, ip):
+        """Single-IP lookup; None when missing or expired."""
+        return self.get_many([ip]).get(ip)
+
+    def put_many(self, records, fetched_at=None):
+        """
+        Upsert lookup results. Transient failures are skipped.
+
+        Args:
+            records: {ip: record}
+            fetched_at: Override the lookup time (unix seconds)
+
+        Returns:
+            int: Number of rows written
+        """
+        fetched_at = fetched_at or time.time()
+        rows = [(ip, record.get('status', 'fail'), json.dumps(record), fetched_at)
+                for ip, record in records.items()
+                if ip is not None and not record.get('transient')]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO ip_geo (ip, status, record, fetched_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def evict_expired(self):
+        """Delete expired entries. Returns the number of rows removed."""
+        ok_after, neg_after = self._fresh_after()
+        with self._lock, self.conn:
+            return self.conn.execute(
+                "DELETE FROM ip_geo WHERE (status = 'success' AND fetched_at < ?) "
+                "OR (status != 'success' AND fetched_at < ?)",
+                (ok_after, neg_after)
+            ).rowcount
+
+    def city_centroids(self):
+        """
+        Average coordinates per place over cached successful lookups, for
+        records that name a city but carry no lat/lon (range index hits).
+
+        Returns:
+            dict: {(country, region, city): (lat, lon)}
+        """
+        with self._lock:
+            rows = self.conn.execute("SELECT record FROM ip_geo WHERE status = 'success'").fetchall()
+        sums = {}
+        for (text,) in rows:
+            record = json.loads(text)
+            try:
+                lat, lon = float(record.get('lat')), float(record.get('lon'))
+            except (TypeError, ValueError):
+                continue
+            key = (record.get('country'), record.get('region'), record.get('city'))
+            total = sums.setdefault(key, [0.0, 0.0, 0])
+            total[0] += lat
+            total[1] += lon
+            total[2] += 1
+        return {key: (lat / n, lon / n) for key, (lat, lon, n) in sums.items()}
+
+    # ------------------------------------------------------------------
+    # JSON import
+    # ------------------------------------------------------------------
+
+    def import_json(self, path, force=False):
+        """
+        Import a legacy {ip: {country, region, city, isp, ...}} JSON cache.
+
+        Positive entries get a full TTL from import time; negative entries are
+        stamped with the file's mtime so stale 'Unknown' results get retried.
+        A file is only imported again if it changed (or force=True).
+
+        Returns:
+            int: Entries imported (0 if skipped)
+        """
+        if not os.path.exists(path):
+            return 0
+        mtime = os.path.getmtime(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            row = self.conn.execute("SELECT mtime FROM imported_sources WHERE path = ?", (key,)).fetchone()
+        if row and row[0] == mtime and not force:
+            return 0
+
+        with open(path, 'r') as f:
+            legacy = json.load(f)
+
+        records = {}
+        for ip, entry in legacy.items():
+            # Store under the canonical form geolocate_ips() looks up
+            try:
+                ip = str(ipaddress.ip_address(str(ip).strip()))
+            except ValueError:
+                continue
+            record = dict(RECORD_DEFAULTS)
+            record.update(entry or {})
+            record['status'] = 'success' if record.get('country') not in (None, '', 'Unknown') else 'fail'
+            records[ip] = record
+
+        # Don't overwrite fresher lookups already in the store
+        existing = self.get_many(records.keys())
+        records = {ip: r for ip, r in records.items() if ip not in existing}
+        self.put_many({ip: r for ip, r in records.items() if r['status'] == 'success'})
+        self.put_many({ip: r for ip, r in records.items() if r['status'] != 'success'}, fetched_at=mtime)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO imported_sources (path, mtime, entries) VALUES (?, ?, ?)",
+                (key, mtime, len(records))
+            )
+        return len(records)
+
+    def stats(self):
+        """Counts of fresh / expired, positive / negative entries."""
+        ok_after, neg_after = self._fresh_after()
+        with self._lock:
+            row = self.conn.execute("""
+                SELECT
+                    COUNT(*),
+                    SUM(status = 'success' AND fetched_at >= ?),
+                    SUM(status != 'success' AND fetched_at >= ?),
+                    SUM((status = 'success' AND fetched_at < ?) OR (status != 'success' AND fetched_at < ?))
+                FROM ip_geo
+            """, (ok_after, neg_after, ok_after, neg_after)).fetchone()
+        return {'total': row[0], 'fresh_positive': row[1] or 0,
+                'fresh_negative': row[2] or 0, 'expired': row[3] or 0}
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_store():
+    """Process-wide store on GEO_CACHE_FILE (opened on first use)."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = GeoCacheStore()
+        return _default_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the shared IP geolocation cache")
+    parser.add_argument('--status', action='store_true', help="show cache counts")
+    parser.add_argument('--import', dest='import_path', metavar='JSON', help="import a legacy JSON cache")
+    parser.add_argument('--evict', action='store_true', help="delete expired entries")
+    args = parser.parse_args()
+
+    with GeoCacheStore() as store:
+        if args.import_path:
+            imported = store.import_json(args.import_path, force=True)
+            print(f"Imported {imported:,} entries from {args.import_path}")
+        if args.evict:
+            print(f"Evicted {store.evict_expired():,} expired entries")
+        s = store.stats()
+        print(f"Cache {store.path}: {s['total']:,} entries "
+              f"({s['fresh_positive']:,} fresh, {s['fresh_negative']:,} negative, {s['expired']:,} expired)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Offline IP Range Index
+Answers IP geolocation from a local, memory-mapped table of address ranges.
+
+Most login IPs fall into a small set of carrier ranges (Verizon, Charter,
+T-Mobile, Cox, AT&T...), so a sorted table of non-overlapping intervals
+mapped to country/region/city/ISP answers the bulk of lookups by binary
+search, with no network call. That makes geolocation work in air-gapped
+runs and turns whole pandas columns into one vectorized searchsorted.
+
+Layout on disk (ip_range_index/):
+    v4_start.npy, v4_end.npy, v4_label.npy   uint32 / uint32 / int32
+    v6_start.npy, v6_end.npy, v6_label.npy   uint64 / uint64 / int32
+    labels.json                              list of label dicts
+
+IPv6 ranges are indexed on the upper 64 bits of the address (carrier
+allocations are /64 or shorter); longer prefixes are widened to /64.
+
+Build it from a local range file or learn it from cached lookups:
+
+    py ip_range_index.py --learn                   (from ip_geo_cache.db + ip_cache_dec2025.json)
+    py ip_range_index.py --from-csv ranges.csv     (network or start_ip,end_ip + label columns)
+    py ip_range_index.py --lookup 76.167.248.209
+    py ip_range_index.py --bench
+"""
+
+import argparse
+import csv
+import heapq
+import ipaddress
+import json
+import os
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ip_range_index')
+LEGACY_JSON_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ip_cache_dec2025.json')
+
+LABEL_FIELDS = ('country', 'region', 'city', 'isp', 'org', 'as', 'timezone')
+
+# Prefix lengths used when learning ranges from individual cached IPs
+LEARN_V4_PREFIX = 24
+LEARN_V6_PREFIX = 48
+# Distinct agreeing lookups a prefix needs before it is trusted as a range
+LEARN_MIN_SAMPLES = 3
+
+
+def parse_ip(value):
+    """
+    Parse an IP to (family, key) where key is the int used by the index.
+
+    IPv4 (including IPv4-mapped IPv6) -> (4, 32-bit int)
+    IPv6                              -> (6, upper 64 bits)
+    Anything else                     -> (None, None)
+    """
+    if value is None or (isinstance(value, float) and value != value):
+        return None, None
+    try:
+        ip = ipaddress.ip_address(str(value).strip())
+    except ValueError:
+        return None, None
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    if ip.version == 4:
+        return 4, int(ip)
+    return 6, int(ip) >> 64
+
+
+def network_bounds(network):
+    """(family, start_key, end_key) for a CIDR network."""
+    net = ipaddress.ip_network(str(network).strip(), strict=False)
+    if net.version == 4:
+        return 4, int(net.network_address), int(net.broadcast_address)
+    return 6, int(net.network_address) >> 64, int(net.broadcast_address) >> 64
+
+
+def _flatten(ranges):
+    """
+    Turn possibly-overlapping (start, end, label_idx) ranges into disjoint
+    sorted intervals; where ranges nest, the narrowest one wins.
+    """
+    if not ranges:
+        return []
+    points = sorted({r[0] for r in ranges} | {r[1] + 1 for r in ranges})
+    by_start = sorted(ranges, key=lambda r: r[0])
+    active = []                      # heap of (width, end, label)
+    out = []
+    i = 0
+    for left, right in zip(points, points[1:]):
+        while i < len(by_start) and by_start[i][0] <= left:
+            start, end, label = by_start[i]
+            heapq.heappush(active, (end - start, end, label))
+            i += 1
+        while active and active[0][1] < left:
+            heapq.heappop(active)
+        # Drop expired entries hiding below the top as well
+        if active and any(e < left for _, e, _ in active):
+            active = [a for a in active if a[1] >= left]
+            heapq.heapify(active)
+        if not active:
+            continue
+        label = active[0][2]
+        seg_end = right - 1
+        if out and out[-1][2] == label and out[-1][1] + 1 == left:
+            out[-1] = (out[-1][0], seg_end, label)
+        else:
+            out.append((left, seg_end, label))
+    return out
+
+
+class IpRangeIndex:
+    """
+    Sorted-interval index for IPv4 and IPv6 (upper 64 bits).
+
+    Use IpRangeIndex.build() to create one from ranges, save() to write it
+    to disk, and IpRangeIndex.load() to memory-map it back.
+    """
+
+    def __init__(self, v4, v6, labels):
+        self.v4_start, self.v4_end, self.v4_label = v4
+        self.v6_start, self.v6_end, self.v6_label = v6
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.v4_start) + len(self.v6_start)
+
+    @classmethod
+    def build(cls, ranges):
+        """
+        Build an index.
+
+        Args:
+            ranges: Iterable of (family, start_key, end_key, label_dict)
+
+        Returns:
+            IpRangeIndex
+        """
+        label_ids = {}
+        labels = []
+        per_family = {4: [], 6: []}
+        for family, start, end, label in ranges:
+            clean = {field: label.get(field, '') or '' for field in LABEL_FIELDS}
+            key = tuple(clean[f] for f in LABEL_FIELDS)
+            if key not in label_ids:
+                label_ids[key] = len(labels)
+                labels.append(clean)
+            per_family[family].append((start, end, label_ids[key]))
+
+        def arrays(family, dtype):
+            flat = _flatten(per_family[family])
+            return (np.array([r[0] for r in flat], dtype=dtype),
+                    np.array([r[1] for r in flat], dtype=dtype),
+                    np.array([r[2] for r in flat], dtype=np.int32))
+
+        return cls(arrays(4, np.uint32), arrays(6, np.uint64), labels)
+
+    def save(self, path=INDEX_DIR):
+        """Write the index as .npy arrays + labels.json."""
+        os.makedirs(path, exist_ok=True)
+        for name in ('v4_start', 'v4_end', 'v4_label', 'v6_start', 'v6_end', 'v6_label'):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, 'labels.json'), 'w') as f:
+            json.dump(self.labels, f)
+
+    @classmethod
+    def load(cls, path=INDEX_DIR):
+        """Memory-map an index written by save()."""
+        def arr(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+        with open(os.path.join(path, 'labels.json'), 'r') as f:
+            labels = json.load(f)
+        return cls((arr('v4_start'), arr('v4_end'), arr('v4_label')),
+                   (arr('v6_start'), arr('v6_end'), arr('v6_label')),
+                   labels)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def _search(self, starts, ends, label_ids, keys):
+        """Vectorized interval search; returns label ids (-1 for misses)."""
+        if len(starts) == 0 or len(keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.searchsorted(starts, keys, side='right') - 1
+        valid = pos >= 0
+        pos_clipped = np.where(valid, pos, 0)
+        hit = valid & (keys <= np.asarray(ends)[pos_clipped])
+        return np.where(hit, np.asarray(label_ids)[pos_clipped], -1)
+
+    def lookup_label_ids(self, ips):
+        """
+        Label id for every IP (-1 = not covered / not an IP).
+
+        Each distinct value is parsed once; the interval search itself is a
+        single numpy searchsorted per address family.
+        """
+        values = list(ips)
+        uniques = {}
+        for v in values:
+            if v not in uniques:
+                uniques[v] = parse_ip(v)
+
+        v4_keys = [(v, k) for v, (fam, k) in uniques.items() if fam == 4]
+        v6_keys = [(v, k) for v, (fam, k) in uniques.items() if fam == 6]
+        resolved = {}
+        if v4_keys:
+            ids = self._search(self.v4_start, self.v4_end, self.v4_label,
+                               np.array([k for _, k in v4_keys], dtype=np.uint32))
+            resolved.update(zip((v for v, _ in v4_keys), ids.tolist()))
+        if v6_keys:
+            ids = self._search(self.v6_start, self.v6_end, self.v6_label,
+                               np.array([k for _, k in v6_keys], dtype=np.uint64))
+            resolved.update(zip((v for v, _ in v6_keys), ids.tolist()))
+        return np.array([resolved.get(v, -1) for v in values], dtype=np.int64)
+
+    def lookup(self, ip):
+        """Label dict for one IP, or None when the index does not cover it."""
+        label_id = int(self.lookup_label_ids([ip])[0])
+        return self.labels[label_id] if label_id >= 0 else None
+
+    def lookup_many(self, ips):
+        """{ip: label} for the IPs the index covers (misses are omitted)."""
+        ips = list(dict.fromkeys(ips))
+        ids = self.lookup_label_ids(ips)
+        return {ip: self.labels[i] for ip, i in zip(ips, ids.tolist()) if i >= 0}
+
+    def lookup_series(self, series, fields=LABEL_FIELDS):
+        """
+        Vectorized lookup for a pandas Series of IPs.
+
+        Returns:
+            pandas.DataFrame indexed like series with one column per field;
+            IPs the index does not cover get NaN
+        """
+        import pandas as pd
+
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        ids = self.lookup_label_ids(list(uniques))
+        # Row -> label id, with -1 for NaN rows and uncovered IPs
+        row_ids = np.where(codes >= 0, ids[codes] if len(ids) else -1, -1)
+        out = {}
+        for field in fields:
+            column = np.array([label.get(field, '') for label in self.labels] + [np.nan], dtype=object)
+            out[field] = column[row_ids]          # -1 picks the trailing NaN
+        return pd.DataFrame(out, index=series.index)
+
+
+# ----------------------------------------------------------------------
+# Sources
+# ----------------------------------------------------------------------
+
+def ranges_from_csv(path):
+    """
+    Read ranges from a CSV with either a 'network' (CIDR) column or
+    'start_ip' and 'end_ip' columns, plus any of the LABEL_FIELDS.
+    """
+    ranges = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            label = {field: row.get(field, '') for field in LABEL_FIELDS}
+            if row.get('network'):
+                family, start, end = network_bounds(row['network'])
+            else:
+                family, start = parse_ip(row['start_ip'])
+                end_family, end = parse_ip(row['end_ip'])
+                if family is None or family != end_family:
+                    continue
+            ranges.append((family, start, end, label))
+    return ranges
+
+
+def ranges_from_records(records, v4_prefix=LEARN_V4_PREFIX, v6_prefix=LEARN_V6_PREFIX,
+                        min_samples=LEARN_MIN_SAMPLES):
+    """
+    Learn ranges from individual cached lookups.
+
+    IPs are grouped by prefix (/24 IPv4, /48 IPv6 by default). A prefix is
+    emitted only when it holds at least min_samples successful lookups and
+    all of them agree on country and region; city is kept only when it is
+    unanimous too, ISP is the most common value. A single cached IP is not
+    enough to label the 255 addresses around it.
+
+    Args:
+        records: {ip: record} with at least country/region/city/isp
+        min_samples: Minimum distinct IPs per prefix
+
+    Returns:
+        list of (family, start, end, label)
+    """
+    groups = defaultdict(dict)
+    for ip, record in records.items():
+        if not record or record.get('country') in (None, '', 'Unknown'):
+            continue
+        if record.get('status', 'success') != 'success':
+            continue
+        try:
+            addr = ipaddress.ip_address(str(ip).strip())
+        except ValueError:
+            continue
+        if addr.version == 6 and addr.ipv4_mapped is not None:
+            addr = addr.ipv4_mapped
+        prefix = v4_prefix if addr.version == 4 else v6_prefix
+        net = ipaddress.ip_network(f"{addr}/{prefix}", strict=False)
+        groups[str(net)][str(addr)] = record
+
+    ranges = []
+    for network, by_ip in groups.items():
+        members = list(by_ip.values())
+        if len(members) < min_samples:
+            continue
+        countries = {m.get('country') for m in members}
+        regions = {m.get('region') for m in members}
+        if len(countries) != 1 or len(regions) != 1:
+            continue
+        cities = {m.get('city') for m in members}
+        label = {field: Counter(m.get(field, '') for m in members).most_common(1)[0][0]
+                 for field in LABEL_FIELDS}
+        if len(cities) != 1:
+            label['city'] = ''
+        family, start, end = network_bounds(network)
+        ranges.append((family, start, end, label))
+    return ranges
+
+
+def learn_from_caches(legacy_json=LEGACY_JSON_CACHE):
+    """Collect {ip: record} from ip_geo_cache.db and the legacy JSON cache."""
+    records = {}
+    if legacy_json and os.path.exists(legacy_json):
+        with open(legacy_json, 'r') as f:
+            records.update(json.load(f))
+    try:
+        from ip_cache_store import get_default_store
+        store = get_default_store()
+        for ip, record in store.conn.execute("SELECT ip, record FROM ip_geo WHERE status = 'success'"):
+            records[ip] = json.loads(record)
+    except Exception as e:
+        print(f"  Warning: could not read ip_geo_cache.db: {e}")
+    return records
+
+
+_default_index = None
+
+
+def get_default_index(path=INDEX_DIR):
+    """Memory-mapped index from INDEX_DIR, or None if it has not been built."""
+    global _default_index
+    if _default_index is None and os.path.exists(os.path.join(path, 'labels.json')):
+        _default_index = IpRangeIndex.load(path)
+    return _default_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build / query the offline IP range index")
+    parser.add_argument('--learn', action='store_true', help="learn ranges from cached lookups")
+    parser.add_argument('--min-samples', type=int, default=LEARN_MIN_SAMPLES,
+                        help=f"agreeing lookups a prefix needs when learning (default: {LEARN_MIN_SAMPLES})")
+    parser.add_argument('--from-csv', metavar='CSV', help="build from a local range file")
+    parser.add_argument('--lookup', nargs='+', metavar='IP', help="look up IPs in the index")
+    parser.add_argument('--bench', action='store_true', help="time a vectorized lookup over cached IPs")
+    args = parser.parse_args()
+
+    if args.learn or args.from_csv:
+        ranges = []
+        if args.from_csv:
+            ranges.extend(ranges_from_csv(args.from_csv))
+        if args.learn:
+            ranges.extend(ranges_from_records(learn_from_caches(), min_samples=args.min_samples))
+        start = time.perf_counter()
+        index = IpRangeIndex.build(ranges)
+        index.save()
+        print(f"Built index: {len(index.v4_start):,} IPv4 + {len(index.v6_start):,} IPv6 intervals, "
+              f"{len(index.labels):,} labels in {time.perf_counter() - start:.2f}s -> {INDEX_DIR}")
+
+    index = get_default_index()
+    if index is None:
+        print("No index built yet - run with --learn or --from-csv")
+        return
+
+    if args.lookup:
+        for ip in args.lookup:
+            label = index.lookup(ip)
+            print(f"{ip:<40} {label if label else 'not covered'}")
+
+    if args.bench:
+        import pandas as pd
+        ips = list(learn_from_caches().keys())
+        series = pd.Series(ips * max(1, 200000 // max(1, len(ips))))
+        start = time.perf_counter()
+        result = index.lookup_series(series)
+        elapsed = time.perf_counter() - start
+        covered = result['country'].notna().mean() * 100
+        print(f"Vectorized lookup: {len(series):,} rows ({len(ips):,} distinct IPs) in {elapsed:.3f}s, "
+              f"{covered:.1f}% covered")
+
+
+if __name__ == "__main__":
+    main()
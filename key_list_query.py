@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Key List Query
+Run one query for an arbitrarily long list of keys (account numbers,
+usernames...) on DWHA (pyodbc) or dbxdb (pymysql).
+
+Several reports built WHERE AccountNumber IN ('...', '...') with f-strings
+over thousands of keys: a different statement text (and a new compiled plan)
+on every call, literal quoting done by hand, and SQL Server's batch size
+limits lurking past a few thousand keys. Instead the query is written once
+with a {keys} slot:
+
+    SELECT ... FROM History.DigitalWalletActivations
+    WHERE AccountNumber IN ({keys})
+
+and query_by_keys() fills it in one of two ways:
+
+    temp table   the keys are bulk-loaded into a session temp table
+                 (#key_list on SQL Server via fast_executemany, a TEMPORARY
+                 key_list table on MySQL via multi-row INSERTs) and {keys}
+                 becomes SELECT k FROM that table - one statement whose text
+                 never changes, whatever the number of keys
+    chunks       fallback when temp tables are not allowed (or the list is
+                 short): parameterized IN lists of a few fixed sizes, the
+                 last chunk padded by repeating a key so every statement
+                 has one of a handful of shapes. Given a connect function,
+                 chunks run in parallel on separate pooled connections
+
+Usage:
+    from key_list_query import query_by_keys
+    df = query_by_keys(conn, QUERY, account_numbers)
+    df = query_by_keys(conn, QUERY, account_numbers, params=[since_date])   # extra ? / %s params
+    df = query_by_keys(conn, QUERY, accounts, method='chunks', connect=get_dwha_connection)
+    df = query_by_keys(conn, QUERY, accounts, sort_by=['AccountNumber', 'ActivationDate'],
+                       ascending=[True, False])                               # template has ORDER BY
+
+    py key_list_query.py --dwha 100000     (time temp table vs chunks on DWHA)
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+TEMP_TABLE_MIN = 1000             # shorter lists go straight to a single IN chunk
+CHUNK_SIZES = (16, 128, 1000)     # IN list shapes; the last one is the chunk size
+MAX_PARAMS = {'mssql': 2000, 'mysql': 10000}   # SQL Server allows 2100 per statement
+INSERT_BATCH = 1000               # rows per multi-row INSERT on MySQL
+PARALLEL_WORKERS = 2              # at or below the connection pool sizes
+
+TEMP_TABLE = {'mssql': '#key_list', 'mysql': 'key_list'}
+PLACEHOLDER = {'mssql': '?', 'mysql': '%s'}
+
+
+def connection_dialect(conn):
+    """'mssql' for pyodbc connections, 'mysql' for pymysql (pooled or raw)."""
+    raw = getattr(conn, 'raw_connection', conn)
+    return 'mssql' if type(raw).__module__.startswith('pyodbc') else 'mysql'
+
+
+def _unique_keys(keys):
+    """Keys as strings, duplicates and blanks removed, first-seen order kept."""
+    seen = {}
+    for key in keys:
+        if key is None or (isinstance(key, float) and pd.isna(key)):
+            continue
+        key = str(key)
+        if key:
+            seen.setdefault(key, None)
+    return list(seen)
+
+
+def _key_width(keys):
+    """Column width rounded up to a power of two, so the temp table DDL rarely changes."""
+    width = 16
+    longest = max(len(k) for k in keys)
+    while width < longest:
+        width *= 2
+    return width
+
+
+def _split_params(template, dialect, params):
+    """Split extra params into those bound before and after the {keys} slot."""
+    params = list(params or ())
+    before = template.split('{keys}', 1)[0].count(PLACEHOLDER[dialect])
+    return params[:before], params[before:]
+
+
+def _fetch_frame(cursor, sql, args):
+    if args:
+        cursor.execute(sql, args)
+    else:
+        cursor.execute(sql)
+    rows = cursor.fetchall()
+    columns = [d[0] for d in cursor.description]
+    return pd.DataFrame([tuple(r) for r in rows], columns=columns)
+
+
+def chunk_plan(count, limit):
+    """
+    Sizes of the IN lists used for count keys.
+
+    Full chunks use the largest shape that fits limit; the remainder is
+    rounded up to the next shape so statement texts repeat.
+    """
+    shapes = [s for s in CHUNK_SIZES if s <= limit] or [limit]
+    full, rest = divmod(count, shapes[-1])
+    plan = [shapes[-1]] * full
+    if rest:
+        plan.append(next(s for s in shapes if s >= rest))
+    return plan
+
+
+# ----------------------------------------------------------------------
+# Temp table path
+# ----------------------------------------------------------------------
+
+def _load_temp_table(cursor, dialect, keys):
+    table = TEMP_TABLE[dialect]
+    width = _key_width(keys)
+    if dialect == 'mssql':
+        cursor.execute(f"IF OBJECT_ID('tempdb..{table}') IS NOT NULL DROP TABLE {table}")
+        cursor.execute(f"CREATE TABLE {table} (k VARCHAR({width}) COLLATE DATABASE_DEFAULT PRIMARY KEY)")
+        cursor.fast_executemany = True
+        cursor.executemany(f"INSERT INTO {table} (k) VALUES (?)", [(k,) for k in keys])
+    else:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {table}")
+        cursor.execute(f"CREATE TEMPORARY TABLE {table} (k VARCHAR({width}) PRIMARY KEY)")
+        for start in range(0, len(keys), INSERT_BATCH):
+            batch = keys[start:start + INSERT_BATCH]
+            cursor.execute(f"INSERT INTO {table} (k) VALUES " + ', '.join(['(%s)'] * len(batch)), batch)
+    return table
+
+
+def _drop_temp_table(cursor, dialect):
+    table = TEMP_TABLE[dialect]
+    if dialect == 'mssql':
+        cursor.execute(f"IF OBJECT_ID('tempdb..{table}') IS NOT NULL DROP TABLE {table}")
+    else:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {table}")
+
+
+def _query_temp_table(conn, template, keys, dialect, params):
+    cursor = conn.cursor()
+    try:
+        table = _load_temp_table(cursor, dialect, keys)
+        before, after = _split_params(template, dialect, params)
+        return _fetch_frame(cursor, template.format(keys=f"SELECT k FROM {table}"), before + after)
+    finally:
+        try:
+            _drop_temp_table(cursor, dialect)
+        finally:
+            cursor.close()
+
+
+# ----------------------------------------------------------------------
+# Chunked path
+# ----------------------------------------------------------------------
+
+def _chunks(template, keys, dialect, params):
+    """(sql, args) per chunk, padded to the planned IN list sizes."""
+    before, after = _split_params(template, dialect, params)
+    limit = MAX_PARAMS[dialect] - len(before) - len(after)
+    statements = []
+    start = 0
+    for size in chunk_plan(len(keys), limit):
+        chunk = keys[start:start + size]
+        start += size
+        chunk = chunk + [chunk[-1]] * (size - len(chunk))
+        sql = template.format(keys=', '.join([PLACEHOLDER[dialect]] * size))
+        statements.append((sql, before + chunk + after))
+    return statements
+
+
+def _run_chunks(conn, statements):
+    cursor = conn.cursor()
+    try:
+        return [_fetch_frame(cursor, sql, args) for sql, args in statements]
+    finally:
+        cursor.close()
+
+
+def _run_chunks_parallel(connect, statements, workers):
+    def run(part):
+        conn = connect()
+        try:
+            return _run_chunks(conn, part)
+        finally:
+            conn.close()
+
+    parts = [statements[i::workers] for i in range(workers)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return [frame for frames in executor.map(run, parts) for frame in frames]
+
+
+def _query_chunks(conn, template, keys, dialect, params, connect, workers):
+    statements = _chunks(template, keys, dialect, params)
+    if connect is not None and len(statements) > 1 and workers > 1:
+        frames = _run_chunks_parallel(connect, statements, min(workers, len(statements)))
+    else:
+        frames = _run_chunks(conn, statements)
+    frames = [f for f in frames if not f.empty] or frames[:1]
+    return pd.concat(frames, ignore_index=True)
+
+
+# ----------------------------------------------------------------------
+# Public entry point
+# ----------------------------------------------------------------------
+
+def query_by_keys(conn, template, keys, params=None, method='auto', connect=None,
+                  workers=PARALLEL_WORKERS, sort_by=None, ascending=True, progress=True):
+    """
+    Run template for every key in keys and return one DataFrame.
+
+    Args:
+        conn: DWHA or dbxdb connection (pooled or raw)
+        template: SQL with a single {keys} slot, e.g. "... WHERE x IN ({keys})";
+                  other placeholders use the driver's style (? for DWHA, %s for
+                  dbxdb; literal % on dbxdb must be written %%)
+        keys: Iterable of keys (converted to str, de-duplicated)
+        params: Extra parameters for the template's own placeholders, in order
+        method: 'auto' (temp table for long lists, chunks if that fails),
+                'temp' or 'chunks'
+        connect: Optional connection factory (get_dwha_connection...) so
+                 chunks can run in parallel on their own connections
+        workers: Parallel chunk workers when connect is given
+        sort_by: Columns to sort the combined result by. ORDER BY in the
+                 template only orders each chunk, so a template with one
+                 should pass the same columns here
+        ascending: Passed to DataFrame.sort_values with sort_by (bool or
+                   one bool per column)
+        progress: Print a note when falling back from the temp table
+
+    Returns:
+        pandas DataFrame; empty (no columns) when keys is empty
+    """
+    keys = _unique_keys(keys)
+    if not keys:
+        return pd.DataFrame()
+    dialect = connection_dialect(conn)
+
+    df = None
+    use_temp = method == 'temp' or (method == 'auto' and len(keys) > TEMP_TABLE_MIN)
+    if use_temp:
+        try:
+            df = _query_temp_table(conn, template, keys, dialect, params)
+        except Exception as e:
+            if method == 'temp':
+                raise
+            if progress:
+                print(f"  Temp table unavailable ({type(e).__name__}: {e}); falling back to chunked IN lists")
+            if dialect == 'mssql':
+                conn.rollback()
+
+    if df is None:
+        df = _query_chunks(conn, template, keys, dialect, params, connect, workers)
+    if sort_by is not None and not df.empty:
+        df = df.sort_values(sort_by, ascending=ascending, kind='stable', ignore_index=True)
+    return df
+
+
+def benchmark(count):
+    """Time the temp table and chunked paths for count account numbers on DWHA."""
+    from dwha_connection import get_dwha_connection
+
+    template = """
+    SELECT RTRIM(ParentAccount) AS AccountNumber, COUNT(*) AS Names
+    FROM History.AccountName
+    WHERE ParentAccount IN ({keys})
+    GROUP BY ParentAccount
+    """
+    keys = [str(n).zfill(10) for n in range(1000000, 1000000 + count)]
+    conn = get_dwha_connection()
+    try:
+        for method, connect in (('temp', None), ('chunks', None), ('chunks', get_dwha_connection)):
+            start = time.perf_counter()
+            df = query_by_keys(conn, template, keys, method=method, connect=connect)
+            label = f"{method}{' (parallel)' if connect else ''}"
+            print(f"{label:18} {len(keys):,} keys -> {len(df):,} rows in {time.perf_counter() - start:.2f}s")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Large key-list queries via temp tables or chunked IN lists")
+    parser.add_argument('--dwha', type=int, metavar='KEYS', default=20000,
+                        help="benchmark with this many account numbers on DWHA")
+    args = parser.parse_args()
+    benchmark(args.dwha)
+
+
+if __name__ == "__main__":
+    main()
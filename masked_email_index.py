@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Masked Email Index
+Answers "which profile emails could this masked OTP address be?" in O(1).
+
+OTP Authentication events record the address the code went to in masked
+form: inner characters of the local part are replaced with 'x'
+(mike@protonmail.com -> mxke@protonmail.com), and some older masks use a
+fixed number of x's (asmith@gmail.com -> axxx@gmail.com). The scripts used
+to compare each masked address against one member's profile emails with
+pairwise string logic, which made cross-member searches quadratic.
+
+The index buckets every profile email by (domain, local-part length,
+first char, last char), with wildcard buckets for masked first / last
+characters, so a lookup touches only addresses of the right shape:
+
+    strict  same length and every unmasked character equal (mxke -> mike)
+    loose   the old emails_could_match rule: same domain and either the same
+            length or the same first character (axxx -> asmith)
+
+Usage:
+    from masked_email_index import MaskedEmailIndex, load_profile_index
+    index = load_profile_index(cursor)          # every profile email on file
+    index.owners('mxke@protonmail.com')         # {'mike123', ...}
+    index.match_many(otp_emails, loose=True)    # {masked: [(email, owner), ...]}
+
+    py masked_email_index.py --attribute 365    (cross-member attribution over the OTP store)
+    py masked_email_index.py --bench            (lookups/sec vs pairwise comparison)
+"""
+
+import argparse
+import random
+import time
+
+MASK_CHAR = 'x'
+
+PROFILE_EMAIL_SQL = """
+    SELECT c.UserName, cc.Value
+    FROM customer c
+    JOIN customercommunication cc ON c.id = cc.Customer_id
+    WHERE cc.Value LIKE '%@%'
+"""
+
+
+def split_email(email):
+    """Return (local, domain) lowercased, or (None, None) when email has no '@'."""
+    if not email or '@' not in email:
+        return None, None
+    local, _, domain = email.strip().lower().rpartition('@')
+    return local, domain
+
+
+def mask_consistent(masked_local, local):
+    """True when local has the same length and agrees with every unmasked character."""
+    if len(masked_local) != len(local):
+        return False
+    for m, c in zip(masked_local, local):
+        if m != MASK_CHAR and m != c:
+            return False
+    return True
+
+
+def emails_could_match(otp_email, profile_email):
+    """Check if masked OTP email could match profile email"""
+    otp_local, otp_domain = split_email(otp_email)
+    profile_local, profile_domain = split_email(profile_email)
+    if otp_local is None or profile_local is None:
+        return (otp_email or '').lower() == (profile_email or '').lower()
+    if otp_local == profile_local and otp_domain == profile_domain:
+        return True
+    if otp_domain == profile_domain and MASK_CHAR in otp_local and profile_local:
+        return len(otp_local) == len(profile_local) or otp_local[:1] == profile_local[:1]
+    return False
+
+
+class MaskedEmailIndex:
+    """
+    In-memory index of profile emails for masked-address lookups.
+
+    Every (email, owner) pair is filed under four shape keys -
+    (domain, length, first, last) with first and/or last replaced by None -
+    so a masked first or last character becomes a wildcard lookup rather
+    than a scan. A (domain, first) bucket serves the loose rule.
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._shape = {}
+        self._first = {}
+        self._by_owner = {}
+        self.size = 0
+
+    def add(self, email, owner=None):
+        """Index one profile email; owner is any hashable (username, muid...)."""
+        local, domain = split_email(email)
+        if not local:
+            return
+        owner = owner.lower() if isinstance(owner, str) else owner
+        address = f"{local}@{domain}"
+        entry = (local, address, owner)
+        owners = self._by_owner.setdefault(owner, set())
+        if address in owners:
+            return
+        owners.add(address)
+        self._exact.setdefault(address, []).append(entry)
+        length, first, last = len(local), local[0], local[-1]
+        for key in ((domain, length, first, last), (domain, length, first, None),
+                    (domain, length, None, last), (domain, length, None, None)):
+            self._shape.setdefault(key, []).append(entry)
+        self._first.setdefault((domain, first), []).append(entry)
+        self.size += 1
+
+    def add_many(self, rows):
+        """Index (owner, email) rows, e.g. straight from PROFILE_EMAIL_SQL."""
+        for owner, email in rows:
+            self.add(email, owner)
+        return self
+
+    def emails_for(self, owner):
+        """All indexed emails of one owner (lowercased)."""
+        owner = owner.lower() if isinstance(owner, str) else owner
+        return self._by_owner.get(owner, set())
+
+    def candidates(self, masked_email, loose=False):
+        """
+        Profile emails the (possibly masked) address could be.
+
+        Args:
+            masked_email: Address as recorded in the OTP event
+            loose: Use the old same-length-or-same-first-char rule instead of
+                   requiring every unmasked character to agree
+
+        Returns:
+            list of (email, owner); an unmasked address only matches itself
+        """
+        local, domain = split_email(masked_email)
+        if not local:
+            return []
+        exact = [(address, owner) for _, address, owner in self._exact.get(f"{local}@{domain}", ())]
+        if MASK_CHAR not in local:
+            return exact
+
+        if loose:
+            found = {(address, owner) for _, address, owner in
+                     self._shape.get((domain, len(local), None, None), ())}
+            found.update((address, owner) for _, address, owner in self._first.get((domain, local[0]), ()))
+            return exact + sorted(found - set(exact), key=str)
+
+        first = None if local[0] == MASK_CHAR else local[0]
+        last = None if local[-1] == MASK_CHAR else local[-1]
+        out = exact
+        for profile_local, address, owner in self._shape.get((domain, len(local), first, last), ()):
+            if profile_local != local and mask_consistent(local, profile_local):
+                out.append((address, owner))
+        return out
+
+    def owners(self, masked_email, loose=False):
+        """Set of owners whose profile emails could be masked_email."""
+        return {owner for _, owner in self.candidates(masked_email, loose)}
+
+    def could_match(self, masked_email, owner, loose=True):
+        """True when any profile email of owner could be masked_email."""
+        if loose:
+            # One owner has a handful of emails; cheaper than the wide loose buckets
+            return any(emails_could_match(masked_email, email) for email in self.emails_for(owner))
+        owner = owner.lower() if isinstance(owner, str) else owner
+        return owner in self.owners(masked_email)
+
+    def match_many(self, masked_emails, loose=False):
+        """
+        Batch lookup; each distinct address is resolved once.
+
+        Returns:
+            dict of masked email -> list of (email, owner)
+        """
+        results = {}
+        for masked in masked_emails:
+            if masked and masked not in results:
+                results[masked] = self.candidates(masked, loose)
+        return results
+
+
+def load_profile_index(cursor):
+    """Build a MaskedEmailIndex (owner = lowercase username) from every profile email on file."""
+    cursor.execute(PROFILE_EMAIL_SQL)
+    return MaskedEmailIndex().add_many(cursor.fetchall())
+
+
+def attribute_otp_events(events, index, loose=False):
+    """
+    Cross-member attribution for OTP email events.
+
+    An address that fails the strict rule for the member is retried with
+    the loose rule against the member's own emails before it is reported,
+    so old fixed-x masks (axxx for asmith) still count as the member's.
+
+    Args:
+        events: OtpRow records (otp_event_store) with userName and masked_contact
+        index: MaskedEmailIndex keyed by username
+        loose: Use the loose rule for every candidate, other members included
+
+    Returns:
+        list of dicts for events whose address fits no profile email of the
+        member themselves; 'other_owners' lists members it does fit
+    """
+    matches = index.match_many((e.masked_contact for e in events), loose=loose)
+    out = []
+    for event in events:
+        candidates = matches.get(event.masked_contact)
+        if candidates is None:
+            continue
+        owners = {owner for _, owner in candidates}
+        username = (event.userName or '').lower()
+        if username and username in owners:
+            continue
+        if username and not loose and index.could_match(event.masked_contact, username, loose=True):
+            continue
+        out.append({'muid': event.muid, 'username': event.userName, 'otp_email': event.masked_contact,
+                    'date': event.activityDate, 'other_owners': sorted(o for o in owners if o)})
+    return out
+
+
+# ----------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------
+
+def _synthetic(count, seed=3):
+    rng = random.Random(seed)
+    domains = ['gmail.com', 'yahoo.com', 'hotmail.com', 'icloud.com', 'cox.net', 'protonmail.com']
+    letters = 'abcdefghijklmnopqrstuvwyz'
+    profiles = []
+    for i in range(count):
+        local = ''.join(rng.choice(letters) for _ in range(rng.randint(4, 12)))
+        profiles.append((f"user{i}", f"{local}@{rng.choice(domains)}"))
+    return profiles
+
+
+def _mask(email):
+    local, domain = split_email(email)
+    return local[0] + MASK_CHAR * (len(local) - 2) + local[-1] + '@' + domain
+
+
+def benchmark(profiles=100000, queries=20000):
+    """Time match_many against comparing every query with every profile email."""
+    rows = _synthetic(profiles)
+    start = time.perf_counter()
+    index = MaskedEmailIndex().add_many(rows)
+    build_s = time.perf_counter() - start
+
+    rng = random.Random(9)
+    masked = [_mask(rng.choice(rows)[1]) for _ in range(queries)]
+    start = time.perf_counter()
+    results = index.match_many(masked)
+    lookup_s = time.perf_counter() - start
+
+    sample = masked[:50]
+    start = time.perf_counter()
+    for m in sample:
+        [owner for owner, email in rows if emails_could_match(m, email)]
+    pairwise_s = (time.perf_counter() - start) / len(sample) * queries
+
+    found = sum(1 for m in masked if results[m])
+    print(f"Index build: {index.size:,} profile emails in {build_s:.2f}s")
+    print(f"match_many:  {queries:,} masked addresses in {lookup_s:.3f}s "
+          f"({queries / lookup_s:,.0f}/s), {found:,} with candidates")
+    print(f"pairwise:    {queries:,} x {profiles:,} comparisons ~{pairwise_s:,.0f}s (extrapolated)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Masked OTP email -> profile email index")
+    parser.add_argument('--attribute', type=int, metavar='DAYS',
+                        help="attribute OTP email events from the last DAYS days across all members")
+    parser.add_argument('--loose', action='store_true',
+                        help="use the old same-length-or-first-char rule for other members too "
+                             "(always tried for the member's own emails)")
+    parser.add_argument('--bench', action='store_true', help="run the lookup micro-benchmark")
+    args = parser.parse_args()
+
+    if args.attribute:
+        from db_connection import get_connection
+        from fraudmonitor_scan import days_ago
+        from otp_event_store import open_otp_store
+
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            print("Pulling all profile emails...")
+            index = load_profile_index(cursor)
+        finally:
+            cursor.close()
+            conn.close()
+        print(f"  {index.size:,} profile emails indexed")
+
+        otp_start = days_ago(args.attribute)
+        otp_store = open_otp_store(since=otp_start)
+        events = otp_store.email_events(start=otp_start, newest_first=True)
+        otp_store.close()
+        print(f"  {len(events):,} OTP email events\n")
+
+        unmatched = attribute_otp_events(events, index, loose=args.loose)
+        cross = [u for u in unmatched if u['other_owners']]
+        print(f"OTP addresses matching no profile email of the member: {len(unmatched):,}")
+        print(f"...of which fit another member's profile email: {len(cross):,}")
+        print("=" * 70)
+        for u in cross:
+            print(f"{u['date']}  {u['username'] or u['muid']:25} {u['otp_email']:35} -> {', '.join(u['other_owners'][:5])}")
+    if args.bench or not args.attribute:
+        benchmark()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+Member Timeline - local, identity-indexed copy of fraudmonitor events
+
+audit_MUID_* and export_member_activity pulled a member's whole fraudmonitor
+history from production with OR conditions over muid / masterMembership /
+userName, hardcoded to one member and slow on long histories. This store
+keeps every event locally (synced incrementally by fraudmonitor.id, like
+otp_event_store) with an index on each identity key, so:
+
+    - one member's timeline is a few index lookups: the keys given (muid,
+      account number, username, customer id) are expanded to every key
+      they co-occur with (a member's other usernames, MUIDs...) and the
+      matching events come back merged and time-ordered, in milliseconds
+    - batch mode loads the keys of hundreds of members into temp tables and
+      reads all their events in one ordered pass, writing one CSV per member
+
+Account numbers are normalized like stream_join (zero-padded to 10 digits);
+usernames are matched case-insensitively. Customer ids are mapped to
+usernames through the profile snapshot.
+
+    py member_timeline.py --status
+    py member_timeline.py --sync                      (default lookback: SYNC_LOOKBACK_DAYS)
+    py member_timeline.py --sync --since 2024-01-01
+    py member_timeline.py --muid 00638242923564062860
+    py member_timeline.py --account 0001008737 --username kcolgin
+    py member_timeline.py --batch members.txt --out timelines   (one key per line)
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from fraudmonitor_scan import FraudmonitorScan, PARALLEL_WORKERS, days_ago, to_datetime
+from stream_join import normalize_account
+
+TIMELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'member_timeline.db')
+
+SYNC_LOOKBACK_DAYS = 400
+
+EVENT_COLUMNS = ('id', 'activityDate', 'eventCategory', 'eventData', 'ipAddress', 'platform',
+                 'platformOS', 'browser', 'sessionid', 'muid', 'userName', 'masterMembership')
+
+TimelineEvent = namedtuple('TimelineEvent', EVENT_COLUMNS)
+
+# Identity keys followed when expanding a member (see MemberTimelineStore.resolve)
+LINK_KEYS = ('muid', 'userName', 'masterMembership')
+
+MAX_LINKED_KEYS = 50      # stop expanding past this many keys (shared/test accounts)
+
+PST_OFFSET = timedelta(hours=-8)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id               INTEGER PRIMARY KEY,
+    activityDate     TEXT NOT NULL,
+    eventCategory    TEXT,
+    eventData        TEXT,
+    ipAddress        TEXT,
+    platform         TEXT,
+    platformOS       TEXT,
+    browser          TEXT,
+    sessionid        TEXT,
+    muid             TEXT,
+    userName         TEXT,
+    masterMembership TEXT,      -- normalized account number
+    user_key         TEXT       -- lower(userName)
+);
+CREATE INDEX IF NOT EXISTS ix_events_muid ON events (muid, activityDate);
+CREATE INDEX IF NOT EXISTS ix_events_user ON events (user_key, activityDate);
+CREATE INDEX IF NOT EXISTS ix_events_account ON events (masterMembership, activityDate);
+CREATE TABLE IF NOT EXISTS timeline_sync (
+    id          INTEGER PRIMARY KEY CHECK (id = 1),
+    loaded_from TEXT NOT NULL,      -- earliest activityDate covered
+    max_id      INTEGER NOT NULL,   -- high-water mark: largest fraudmonitor.id stored
+    synced_at   TEXT NOT NULL
+);
+"""
+
+_KEY_COLUMN = {'muid': 'muid', 'userName': 'user_key', 'masterMembership': 'masterMembership'}
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+def _user_key(username):
+    return username.strip().lower() if username and username.strip() else None
+
+
+def _muid_key(muid):
+    return str(muid).strip() if muid is not None and str(muid).strip() else None
+
+
+class Timeline:
+    """
+    One member's merged timeline.
+
+    Attributes:
+        muids, usernames, accounts, customer_ids: Identity keys (after expansion)
+        events: list of TimelineEvent, oldest first (activityDate as datetime)
+    """
+
+    def __init__(self, muids, usernames, accounts, customer_ids, events):
+        self.muids = muids
+        self.usernames = usernames
+        self.accounts = accounts
+        self.customer_ids = customer_ids
+        self.events = events
+
+    def __len__(self):
+        return len(self.events)
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def to_frame(self, newest_first=False):
+        """pandas DataFrame of the events."""
+        import pandas as pd
+        events = self.events[::-1] if newest_first else self.events
+        return pd.DataFrame.from_records(events, columns=list(EVENT_COLUMNS))
+
+    def describe(self):
+        """One-line summary of the identity keys and event count."""
+        span = ''
+        if self.events:
+            span = f" {self.events[0].activityDate:%Y-%m-%d} .. {self.events[-1].activityDate:%Y-%m-%d}"
+        return (f"{len(self.events):,} events{span} | muid {', '.join(sorted(self.muids)) or '-'} | "
+                f"user {', '.join(sorted(self.usernames)) or '-'} | "
+                f"account {', '.join(sorted(self.accounts)) or '-'} | "
+                f"customer {', '.join(sorted(self.customer_ids)) or '-'}")
+
+
+class MemberTimelineStore:
+    """
+    SQLite store of fraudmonitor events indexed by identity key.
+
+    Args:
+        path: SQLite file (default: member_timeline.db next to this script)
+        profile_snapshot: Optional ProfileSnapshot for customer id <-> username
+    """
+
+    def __init__(self, path=TIMELINE_FILE, profile_snapshot=None):
+        self.path = path
+        self.profile_snapshot = profile_snapshot
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # ------------------------------------------------------------------
+    # Sync from fraudmonitor
+    # ------------------------------------------------------------------
+
+    def sync_state(self):
+        """(loaded_from datetime, max_id) or None before the first sync."""
+        row = self.conn.execute("SELECT loaded_from, max_id FROM timeline_sync WHERE id = 1").fetchone()
+        return (datetime.fromisoformat(row[0]), row[1]) if row else None
+
+    def _append(self, batch):
+        """Append one scan batch; returns the largest id in it."""
+        rows = []
+        for r in batch.records:
+            rows.append((r.id, r.activityDate.isoformat(sep=' '), r.eventCategory, _text(r.eventData),
+                         _text(r.ipAddress), _text(r.platform), _text(r.platformOS), _text(r.browser),
+                         _text(r.sessionid), _muid_key(r.muid), _text(r.userName),
+                         normalize_account(r.masterMembership), _user_key(r.userName)))
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO events ({', '.join(EVENT_COLUMNS)}, user_key) "
+                f"VALUES ({', '.join('?' for _ in range(len(EVENT_COLUMNS) + 1))})", rows)
+        return max((r[0] for r in rows), default=0)
+
+    def _load(self, scan):
+        max_id = 0
+        for batch in scan.batches():
+            max_id = max(max_id, self._append(batch))
+        return scan.rows_read, max_id
+
+    def sync(self, since=None, progress=True):
+        """
+        Bring the store up to date.
+
+        The first sync loads events from `since` (default: the last
+        SYNC_LOOKBACK_DAYS days) with a parallel date-partitioned scan; later
+        syncs fetch only ids above the high-water mark, plus a backfill when
+        `since` is earlier than what the store already covers.
+
+        Returns:
+            int: Rows read from fraudmonitor
+        """
+        state = self.sync_state()
+        if since is None:
+            since = state[0] if state else days_ago(SYNC_LOOKBACK_DAYS)
+        since = to_datetime(since)
+        read = 0
+        if state is None:
+            loaded_from = since
+            scan = FraudmonitorScan(columns=EVENT_COLUMNS, start=since, partition='week',
+                                    workers=PARALLEL_WORKERS, progress=progress, label='timeline load')
+            read, max_id = self._load(scan)
+        else:
+            loaded_from, max_id = state
+            if since < loaded_from:
+                scan = FraudmonitorScan(columns=EVENT_COLUMNS, start=since, end=loaded_from,
+                                        partition='week', workers=PARALLEL_WORKERS,
+                                        progress=progress, label='timeline backfill')
+                backfilled, backfill_max = self._load(scan)
+                read += backfilled
+                max_id = max(max_id, backfill_max)
+                loaded_from = since
+            scan = FraudmonitorScan(columns=EVENT_COLUMNS, where="id > %s", params=[max_id],
+                                    progress=progress, label='timeline sync')
+            new, new_max = self._load(scan)
+            read += new
+            max_id = max(max_id, new_max)
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO timeline_sync (id, loaded_from, max_id, synced_at) VALUES (1, ?, ?, ?)",
+                (loaded_from.isoformat(sep=' '), max_id, datetime.now().isoformat(sep=' ', timespec='seconds')))
+        return read
+
+    # ------------------------------------------------------------------
+    # Identity resolution
+    # ------------------------------------------------------------------
+
+    def _customer_usernames(self, customer_ids):
+        if not customer_ids:
+            return set()
+        if self.profile_snapshot is None:
+            from profile_snapshot import ProfileSnapshot
+            self.profile_snapshot = ProfileSnapshot()
+        found = set()
+        for customer_id in customer_ids:
+            row = self.profile_snapshot.customer_by_id(customer_id)
+            if row and row.username:
+                found.add(row.username.lower())
+        return found
+
+    def _customer_ids(self, usernames):
+        if self.profile_snapshot is None or not usernames:
+            return set()
+        ids = (self.profile_snapshot.customer_id(u) for u in usernames)
+        return {str(i) for i in ids if i is not None}
+
+    def resolve(self, muids=(), usernames=(), accounts=(), customer_ids=(), link=LINK_KEYS):
+        """
+        Expand identity keys to everything they co-occur with on events.
+
+        Args:
+            muids, usernames, accounts, customer_ids: Starting keys
+            link: Which discovered key kinds to follow ('muid', 'userName',
+                  'masterMembership'); e.g. ('muid', 'userName') keeps one
+                  person without pulling in other members of a joint account
+
+        Returns:
+            dict with sets 'muid', 'userName', 'masterMembership', 'customer_id'
+        """
+        keys = {
+            'muid': {k for k in map(_muid_key, muids) if k},
+            'userName': {k for k in map(_user_key, usernames) if k},
+            'masterMembership': {k for k in map(normalize_account, accounts) if k},
+        }
+        customer_ids = {str(c) for c in customer_ids if c is not None}
+        keys['userName'] |= self._customer_usernames(customer_ids)
+
+        pending = {kind: set(values) for kind, values in keys.items()}
+        while any(pending.values()):
+            conditions, params = [], []
+            for kind, values in pending.items():
+                if values:
+                    conditions.append(f"{_KEY_COLUMN[kind]} IN ({', '.join('?' for _ in values)})")
+                    params.extend(values)
+            rows = self.conn.execute(
+                f"SELECT DISTINCT muid, user_key, masterMembership FROM events WHERE {' OR '.join(conditions)}",
+                params).fetchall()
+            pending = {kind: set() for kind in keys}
+            for row in rows:
+                for kind, value in zip(('muid', 'userName', 'masterMembership'), row):
+                    if value and kind in link and value not in keys[kind]:
+                        pending[kind].add(value)
+            if sum(len(v) for v in keys.values()) + sum(len(v) for v in pending.values()) > MAX_LINKED_KEYS:
+                print(f"  [timeline] more than {MAX_LINKED_KEYS} linked identity keys; not expanding further")
+                break
+            for kind, values in pending.items():
+                keys[kind] |= values
+
+        keys['customer_id'] = customer_ids | self._customer_ids(keys['userName'])
+        return keys
+
+    # ------------------------------------------------------------------
+    # Timelines
+    # ------------------------------------------------------------------
+
+    def _events_for(self, keys, start=None, end=None):
+        conditions, params = [], []
+        for kind, column in _KEY_COLUMN.items():
+            values = keys.get(kind)
+            if values:
+                conditions.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+        if not conditions:
+            return []
+        where = f"({' OR '.join(conditions)})"
+        if start is not None:
+            where += " AND activityDate >= ?"
+            params.append(to_datetime(start).isoformat(sep=' '))
+        if end is not None:
+            where += " AND activityDate < ?"
+            params.append(to_datetime(end).isoformat(sep=' '))
+        sql = f"SELECT {', '.join(EVENT_COLUMNS)} FROM events WHERE {where} ORDER BY activityDate, id"
+        return [TimelineEvent(r[0], datetime.fromisoformat(r[1]), *r[2:]) for r in self.conn.execute(sql, params)]
+
+    def _production_events(self, keys, start, end):
+        """
+        The keys' events in [start, end) read from production fraudmonitor,
+        normalized like stored rows (for history older than the store).
+        """
+        conditions, params = [], []
+        muids = sorted(keys.get('muid') or ())
+        usernames = sorted(keys.get('userName') or ())
+        # Production holds account numbers as logged: padded or not
+        accounts = sorted({form for a in keys.get('masterMembership') or () for form in (a, a.lstrip('0'))})
+        for column, values in (('muid', muids), ('userName', usernames), ('masterMembership', accounts)):
+            if values:
+                conditions.append(f"{column} IN ({', '.join(['%s'] * len(values))})")
+                params.extend(values)
+        if not conditions:
+            return []
+        scan = FraudmonitorScan(columns=EVENT_COLUMNS, where=' OR '.join(conditions), params=params,
+                                start=start, end=end, progress=False, label='timeline history')
+        events = [TimelineEvent(r.id, r.activityDate, r.eventCategory, _text(r.eventData), _text(r.ipAddress),
+                                _text(r.platform), _text(r.platformOS), _text(r.browser), _text(r.sessionid),
+                                _muid_key(r.muid), _text(r.userName), normalize_account(r.masterMembership))
+                  for batch in scan.batches() for r in batch.records]
+        events.sort(key=lambda e: (e.activityDate, e.id))
+        return events
+
+    def timeline(self, muid=None, username=None, account=None, customer_id=None,
+                 usernames=(), start=None, end=None, link=LINK_KEYS, full_history=False):
+        """
+        One member's merged, time-ordered timeline.
+
+        Args:
+            muid, username, account, customer_id: Any known identity key(s)
+            usernames: Additional usernames
+            start, end: activityDate bounds (start inclusive, end exclusive)
+            link: Key kinds followed when expanding (see resolve)
+            full_history: Read events older than the store covers (it keeps
+                          SYNC_LOOKBACK_DAYS by default) from production, so
+                          an all-time timeline is really all time
+
+        Returns:
+            Timeline
+        """
+        keys = self.resolve(muids=[muid] if muid else [],
+                            usernames=([username] if username else []) + list(usernames),
+                            accounts=[account] if account else [],
+                            customer_ids=[customer_id] if customer_id else [], link=link)
+        events = self._events_for(keys, start, end)
+        state = self.sync_state()
+        if full_history and state is not None and (start is None or to_datetime(start) < state[0]):
+            history_end = min(state[0], to_datetime(end)) if end is not None else state[0]
+            stored = {e.id for e in events}
+            older = [e for e in self._production_events(keys, start, history_end) if e.id not in stored]
+            events = older + events
+        return Timeline(keys['muid'], keys['userName'], keys['masterMembership'], keys['customer_id'], events)
+
+    def write_timelines(self, members, out_dir, start=None, end=None, link=LINK_KEYS, progress=True):
+        """
+        Batch mode: write one CSV timeline per member in a single ordered pass.
+
+        Args:
+            members: dict of label -> identity kwargs for resolve()
+                     (e.g. {'0001008737': {'accounts': ['0001008737']}})
+            out_dir: Directory for <label>.csv files
+
+        Returns:
+            dict of label -> number of events written
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        owners = {kind: {} for kind in _KEY_COLUMN}
+        for label, identity in members.items():
+            keys = self.resolve(link=link, **identity)
+            for kind in _KEY_COLUMN:
+                for value in keys[kind]:
+                    owners[kind].setdefault(value, set()).add(label)
+
+        # Keys go into temp tables, so one statement covers every member
+        self.conn.execute("DROP TABLE IF EXISTS temp.timeline_keys")
+        self.conn.execute("CREATE TEMP TABLE timeline_keys (kind TEXT, value TEXT, PRIMARY KEY (kind, value))")
+        self.conn.executemany("INSERT INTO temp.timeline_keys VALUES (?, ?)",
+                              [(kind, value) for kind in owners for value in owners[kind]])
+        conditions = " OR ".join(
+            f"{column} IN (SELECT value FROM temp.timeline_keys WHERE kind = '{kind}')"
+            for kind, column in _KEY_COLUMN.items())
+        sql = f"SELECT {', '.join(EVENT_COLUMNS)}, user_key FROM events WHERE ({conditions})"
+        params = []
+        if start is not None:
+            sql += " AND activityDate >= ?"
+            params.append(to_datetime(start).isoformat(sep=' '))
+        if end is not None:
+            sql += " AND activityDate < ?"
+            params.append(to_datetime(end).isoformat(sep=' '))
+        sql += " ORDER BY activityDate, id"
+
+        header = ['activityDate', 'activityDate_PST'] + [c for c in EVENT_COLUMNS if c not in ('activityDate',)]
+        files, writers, counts = {}, {}, {label: 0 for label in members}
+        try:
+            for label in members:
+                path = os.path.join(out_dir, f"{label}.csv")
+                files[label] = open(path, 'w', newline='', encoding='utf-8')
+                writers[label] = csv.writer(files[label])
+                writers[label].writerow(header)
+            for row in self.conn.execute(sql, params):
+                moment = datetime.fromisoformat(row[1])
+                labels = (owners['muid'].get(row[9], set()) | owners['userName'].get(row[12], set())
+                          | owners['masterMembership'].get(row[11], set()))
+                out = [row[1], (moment + PST_OFFSET).isoformat(sep=' '), row[0], *row[2:12]]
+                for label in labels:
+                    writers[label].writerow(out)
+                    counts[label] += 1
+        finally:
+            for f in files.values():
+                f.close()
+            self.conn.execute("DROP TABLE IF EXISTS temp.timeline_keys")
+        if progress:
+            print(f"  Wrote {len(members)} timelines ({sum(counts.values()):,} events) to {out_dir}")
+        return counts
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def rebuild(self):
+        """Drop every event and the high-water mark."""
+        with self.conn:
+            self.conn.execute("DELETE FROM events")
+            self.conn.execute("DELETE FROM timeline_sync")
+
+    def status(self):
+        """Summary of what the store holds."""
+        state = self.conn.execute("SELECT loaded_from, max_id, synced_at FROM timeline_sync WHERE id = 1").fetchone()
+        return {'rows': self.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0],
+                'loaded_from': state[0] if state else None,
+                'max_id': state[1] if state else None,
+                'synced_at': state[2] if state else None}
+
+
+def open_timeline_store(sync=True, since=None, progress=True, profile_snapshot=None):
+    """
+    Open the shared timeline store, syncing new events first.
+
+    Pass sync=False to work offline against what the store already holds.
+    """
+    store = MemberTimelineStore(profile_snapshot=profile_snapshot)
+    if sync:
+        start = time.perf_counter()
+        read = store.sync(since=since, progress=progress)
+        if progress:
+            print(f"  Timeline store: {read:,} new events synced in {time.perf_counter() - start:.1f}s")
+    return store
+
+
+def _batch_members(path):
+    """Read one identity key per line (MUID, account number or username)."""
+    from identity_resolver import is_muid
+
+    members = {}
+    with open(path, 'r') as f:
+        for line in f:
+            entry = line.strip()
+            if not entry:
+                continue
+            if is_muid(entry):
+                members[entry] = {'muids': [entry]}
+            elif entry.isdigit():
+                members[entry] = {'accounts': [entry]}
+            else:
+                members[entry] = {'usernames': [entry]}
+    return members
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local per-member fraudmonitor timelines")
+    parser.add_argument('--status', action='store_true', help="show store contents")
+    parser.add_argument('--sync', action='store_true', help="fetch new events from fraudmonitor")
+    parser.add_argument('--since', metavar='YYYY-MM-DD', help="earliest activityDate to cover")
+    parser.add_argument('--rebuild', action='store_true', help="drop everything (next sync reloads)")
+    parser.add_argument('--muid', help="timeline for a MUID")
+    parser.add_argument('--account', help="timeline for an account number (masterMembership)")
+    parser.add_argument('--username', help="timeline for a username")
+    parser.add_argument('--customer-id', help="timeline for a customer.id (needs the profile snapshot)")
+    parser.add_argument('--batch', metavar='FILE', help="write timelines for every key in FILE")
+    parser.add_argument('--out', default='timelines', help="output directory for --batch")
+    args = parser.parse_args()
+
+    with MemberTimelineStore() as store:
+        if args.rebuild:
+            store.rebuild()
+            print(f"Store cleared: {store.path}")
+        if args.sync:
+            read = store.sync(since=args.since)
+            print(f"Synced {read:,} rows from fraudmonitor")
+
+        if args.muid or args.account or args.username or args.customer_id:
+            start = time.perf_counter()
+            timeline = store.timeline(muid=args.muid, username=args.username, account=args.account,
+                                      customer_id=args.customer_id)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(timeline.describe())
+            print("=" * 70)
+            for e in timeline:
+                print(f"{(e.activityDate + PST_OFFSET):%Y-%m-%d %H:%M:%S} PST  {e.eventCategory or '':28} "
+                      f"{e.userName or '':20} {e.ipAddress or '':16} {e.sessionid or ''}")
+            print(f"\n{len(timeline):,} events in {elapsed_ms:.1f} ms")
+        elif args.batch:
+            store.write_timelines(_batch_members(args.batch), args.out)
+        else:
+            s = store.status()
+            print(f"Timeline store: {s['rows']:,} events from {s['loaded_from']}, "
+                  f"high-water id {s['max_id']}, synced {s['synced_at']}")
+
+
+if __name__ == "__main__":
+    main()
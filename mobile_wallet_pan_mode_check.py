@@ -11,6 +11,7 @@ Output: MOBILE_WALLET_PAN_MODE_CHECK.xlsx
 import pandas as pd
 from datetime import datetime, timedelta
 from dwha_connection import get_dwha_connection
+from key_list_query import query_by_keys
 
 # Output file
 OUTPUT_FILE = r"C:\Users\kgreeven\Desktop\MOBILE_WALLET_PAN_MODE_CHECK.xlsx"
@@ -58,9 +59,7 @@ def query_atm_pan_mode_07(conn, member_numbers):
     if not member_numbers:
         return pd.DataFrame()
 
-    in_clause = ",".join([f"'{m}'" for m in member_numbers])
-
-    query = f"""
+    query = """
     SELECT
         RTRIM(AccountNumber) AS AccountNumber,
         LocalTransactionDate,
@@ -84,13 +83,15 @@ def query_atm_pan_mode_07(conn, member_numbers):
         RTRIM(TerminalID) AS TerminalID,
         RTRIM(ProcessorAccount) AS ProcessorAccount
     FROM AtmDialog.Raw_Production
-    WHERE AccountNumber IN ({in_clause})
+    WHERE AccountNumber IN ({keys})
       AND PANEntryMode = '07'
     ORDER BY AccountNumber, LocalTransactionDate DESC, LocalTransactionTime DESC
     """
 
     print("Querying ATM transactions with PAN Entry Mode 07...")
-    return pd.read_sql(query, conn)
+    return query_by_keys(conn, query, member_numbers,
+                         sort_by=['AccountNumber', 'LocalTransactionDate', 'LocalTransactionTime'],
+                         ascending=[True, False, False])
 
 
 def query_all_atm_transactions(conn, member_numbers, since_date='2025-12-01'):
@@ -101,9 +102,7 @@ def query_all_atm_transactions(conn, member_numbers, since_date='2025-12-01'):
     if not member_numbers:
         return pd.DataFrame()
 
-    in_clause = ",".join([f"'{m}'" for m in member_numbers])
-
-    query = f"""
+    query = """
     SELECT
         RTRIM(AccountNumber) AS AccountNumber,
         LocalTransactionDate,
@@ -122,13 +121,15 @@ def query_all_atm_transactions(conn, member_numbers, since_date='2025-12-01'):
         PostSuccess,
         ResponseCodeIn
     FROM AtmDialog.Raw_Production
-    WHERE AccountNumber IN ({in_clause})
-      AND LocalTransactionDate >= '{since_date}'
+    WHERE AccountNumber IN ({keys})
+      AND LocalTransactionDate >= ?
     ORDER BY AccountNumber, LocalTransactionDate DESC, LocalTransactionTime DESC
     """
 
     print(f"Querying all ATM transactions since {since_date}...")
-    return pd.read_sql(query, conn)
+    return query_by_keys(conn, query, member_numbers, params=[since_date],
+                         sort_by=['AccountNumber', 'LocalTransactionDate', 'LocalTransactionTime'],
+                         ascending=[True, False, False])
 
 
 def query_wallet_activations(conn, member_numbers):
@@ -136,9 +137,7 @@ def query_wallet_activations(conn, member_numbers):
     if not member_numbers:
         return pd.DataFrame()
 
-    in_clause = ",".join([f"'{m}'" for m in member_numbers])
-
-    query = f"""
+    query = """
     SELECT
         RTRIM(AccountNumber) AS AccountNumber,
         WalletType,
@@ -150,12 +149,13 @@ def query_wallet_activations(conn, member_numbers):
         FileTime,
         ImportDate
     FROM History.DigitalWalletActivations
-    WHERE AccountNumber IN ({in_clause})
+    WHERE AccountNumber IN ({keys})
     ORDER BY AccountNumber, ActivationDate DESC
     """
 
     print("Querying wallet activations...")
-    return pd.read_sql(query, conn)
+    return query_by_keys(conn, query, member_numbers,
+                         sort_by=['AccountNumber', 'ActivationDate'], ascending=[True, False])
 
 
 def query_wallet_transactions(conn, member_numbers):
@@ -163,9 +163,7 @@ def query_wallet_transactions(conn, member_numbers):
     if not member_numbers:
         return pd.DataFrame()
 
-    in_clause = ",".join([f"'{m}'" for m in member_numbers])
-
-    query = f"""
+    query = """
     SELECT
         RTRIM(AccountNumber) AS AccountNumber,
         WalletType,
@@ -179,12 +177,13 @@ def query_wallet_transactions(conn, member_numbers):
         FileTime,
         ImportDate
     FROM History.DigitalWalletTransactions
-    WHERE AccountNumber IN ({in_clause})
+    WHERE AccountNumber IN ({keys})
     ORDER BY AccountNumber, LocalTransactionDate DESC
     """
 
     print("Querying wallet transactions...")
-    return pd.read_sql(query, conn)
+    return query_by_keys(conn, query, member_numbers,
+                         sort_by=['AccountNumber', 'LocalTransactionDate'], ascending=[True, False])
 
 
 def query_member_addresses(conn, member_numbers):
@@ -192,9 +191,7 @@ def query_member_addresses(conn, member_numbers):
     if not member_numbers:
         return pd.DataFrame()
 
-    in_clause = ",".join([f"'{m}'" for m in member_numbers])
-
-    query = f"""
+    query = """
     SELECT DISTINCT
         RTRIM(an.ParentAccount) AS AccountNumber,
         RTRIM(an.First) AS FirstName,
@@ -210,12 +207,12 @@ def query_member_addresses(conn, member_numbers):
         a.OpenDate
     FROM History.AccountName an
     INNER JOIN History.Account a ON an.ParentAccount = a.AccountNumber
-    WHERE an.ParentAccount IN ({in_clause})
+    WHERE an.ParentAccount IN ({keys})
       AND an.AcctNameType = 0  -- Primary name record
     """
 
     print("Querying member addresses...")
-    return pd.read_sql(query, conn)
+    return query_by_keys(conn, query, member_numbers)
 
 
 def create_summary(members_df, pan07_df, activations_df, wallet_txns_df, all_atm_df):
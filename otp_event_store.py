@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+OTP Event Store - local, already-parsed copy of fraudmonitor OTP events
+
+Every OTP investigation (otp_impact_analysis, fast/extended pattern search,
+real_otp_mismatches, all_otp_email_check, phone_otp_check(_v2)) used to scan
+a year of 'OTP Authentication' rows in production with LIKE '%"email"%'
+filters and parse eventData again. This store keeps those events locally,
+parsed once (event_data.OtpEvent), so investigations read an indexed SQLite
+file in milliseconds.
+
+- Append-only: rows are keyed by fraudmonitor.id and never rewritten
+- Incremental sync: after the first load only rows with id above the
+  high-water mark are fetched (a primary-key range read); a request for an
+  earlier start date backfills just the missing date range
+- Partitioned by month: one table per month (otp_2025_12 ...), so a
+  December-only question touches December's table and indexes only
+
+    py otp_event_store.py --status
+    py otp_event_store.py --sync                 (default lookback: SYNC_LOOKBACK_DAYS)
+    py otp_event_store.py --sync --since 2024-01-01
+    py otp_event_store.py --rebuild
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from event_data import OTP_CATEGORY, parse_batch
+from fraudmonitor_scan import FraudmonitorScan, PARALLEL_WORKERS, days_ago, to_datetime
+
+OTP_STORE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'otp_event_store.db')
+
+SYNC_LOOKBACK_DAYS = 400
+
+SCAN_COLUMNS = ('id', 'muid', 'userName', 'eventData', 'activityDate', 'ipAddress')
+
+EVENT_COLUMNS = ('id', 'muid', 'userName', 'activityDate', 'method', 'masked_contact',
+                 'contact', 'status', 'format', 'legacy_email', 'ipAddress')
+
+OtpRow = namedtuple('OtpRow', EVENT_COLUMNS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS otp_partitions (
+    month   TEXT PRIMARY KEY,       -- 'YYYY_MM'
+    rows    INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS otp_sync (
+    id             INTEGER PRIMARY KEY CHECK (id = 1),
+    loaded_from    TEXT NOT NULL,   -- earliest activityDate covered
+    max_id         INTEGER NOT NULL,-- high-water mark: largest fraudmonitor.id stored
+    synced_at      TEXT NOT NULL
+);
+"""
+
+PARTITION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id             INTEGER PRIMARY KEY,
+    muid           TEXT,
+    userName       TEXT,
+    activityDate   TEXT NOT NULL,
+    method         TEXT,
+    masked_contact TEXT,
+    contact        TEXT,
+    status         TEXT,
+    format         TEXT,
+    legacy_email   TEXT,
+    ipAddress      TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_{table}_muid ON {table} (muid);
+CREATE INDEX IF NOT EXISTS ix_{table}_user ON {table} (userName COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS ix_{table}_method ON {table} (method, masked_contact);
+"""
+
+_MONTH = re.compile(r'^\d{4}_\d{2}$')
+
+
+def partition_name(moment):
+    """'YYYY_MM' partition key for a datetime."""
+    return f"{moment.year:04d}_{moment.month:02d}"
+
+
+def _table(month):
+    if not _MONTH.match(month):
+        raise ValueError(f"Invalid partition: {month!r}")
+    return f"otp_{month}"
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+class OtpEventStore:
+    """
+    Month-partitioned SQLite store of parsed OTP events.
+
+    Args:
+        path: SQLite file (default: otp_event_store.db next to this script)
+    """
+
+    def __init__(self, path=OTP_STORE_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._known_partitions = set(r[0] for r in self.conn.execute("SELECT month FROM otp_partitions"))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # ------------------------------------------------------------------
+    # Sync from fraudmonitor
+    # ------------------------------------------------------------------
+
+    def sync_state(self):
+        """(loaded_from datetime, max_id) or None before the first sync."""
+        row = self.conn.execute("SELECT loaded_from, max_id FROM otp_sync WHERE id = 1").fetchone()
+        return (datetime.fromisoformat(row[0]), row[1]) if row else None
+
+    def _ensure_partition(self, month):
+        if month not in self._known_partitions:
+            # executescript commits, so partitions are created outside the insert transaction
+            self.conn.executescript(PARTITION_SCHEMA.format(table=_table(month)))
+            self.conn.execute("INSERT OR IGNORE INTO otp_partitions (month, rows) VALUES (?, 0)", (month,))
+            self.conn.commit()
+            self._known_partitions.add(month)
+
+    def _append(self, batch):
+        """Parse one scan batch and append it to its month partitions."""
+        events = parse_batch([OTP_CATEGORY] * len(batch), batch.column('eventData'))
+        by_month = {}
+        for record, otp in zip(batch.records, events):
+            moment = record.activityDate
+            by_month.setdefault(partition_name(moment), []).append((
+                record.id, _text(record.muid), _text(record.userName), moment.isoformat(sep=' '),
+                otp.method, _text(otp.masked_contact), _text(otp.contact), _text(otp.status),
+                otp.format, _text(otp.legacy_email), _text(record.ipAddress)))
+        for month in by_month:
+            self._ensure_partition(month)
+        max_id = 0
+        with self.conn:
+            for month, rows in by_month.items():
+                table = _table(month)
+                added = self.conn.executemany(
+                    f"INSERT OR IGNORE INTO {table} ({', '.join(EVENT_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' for _ in EVENT_COLUMNS)})", rows).rowcount
+                self.conn.execute("UPDATE otp_partitions SET rows = rows + ? WHERE month = ?", (added, month))
+                max_id = max(max_id, max(r[0] for r in rows))
+        return max_id
+
+    def _load(self, scan):
+        """Run a scan into the store; returns (rows read, largest id seen)."""
+        max_id = 0
+        for batch in scan.batches():
+            max_id = max(max_id, self._append(batch))
+        return scan.rows_read, max_id
+
+    def sync(self, since=None, progress=True):
+        """
+        Bring the store up to date.
+
+        The first sync loads OTP events from `since` (default: the last
+        SYNC_LOOKBACK_DAYS days) with a parallel date-partitioned scan. Later
+        syncs fetch only ids above the high-water mark, plus a backfill when
+        `since` is earlier than what the store already covers.
+
+        Returns:
+            int: Rows read from fraudmonitor
+        """
+        state = self.sync_state()
+        if since is None:
+            # Without an explicit start, never backfill an existing store
+            since = state[0] if state else days_ago(SYNC_LOOKBACK_DAYS)
+        since = to_datetime(since)
+        read = 0
+        if state is None:
+            loaded_from, max_id = since, 0
+            scan = FraudmonitorScan(columns=SCAN_COLUMNS, categories=[OTP_CATEGORY], start=since,
+                                    partition='week', workers=PARALLEL_WORKERS,
+                                    progress=progress, label='otp store load')
+            read, max_id = self._load(scan)
+        else:
+            loaded_from, max_id = state
+            if since < loaded_from:
+                scan = FraudmonitorScan(columns=SCAN_COLUMNS, categories=[OTP_CATEGORY],
+                                        start=since, end=loaded_from, partition='week',
+                                        workers=PARALLEL_WORKERS, progress=progress,
+                                        label='otp store backfill')
+                backfilled, backfill_max = self._load(scan)
+                read += backfilled
+                max_id = max(max_id, backfill_max)
+                loaded_from = since
+            scan = FraudmonitorScan(columns=SCAN_COLUMNS, categories=[OTP_CATEGORY],
+                                    where="id > %s", params=[max_id],
+                                    progress=progress, label='otp store sync')
+            new, new_max = self._load(scan)
+            read += new
+            max_id = max(max_id, new_max)
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO otp_sync (id, loaded_from, max_id, synced_at) VALUES (1, ?, ?, ?)",
+                (loaded_from.isoformat(sep=' '), max_id, datetime.now().isoformat(sep=' ', timespec='seconds')))
+        return read
+
+    # ------------------------------------------------------------------
+    # Local reads
+    # ------------------------------------------------------------------
+
+    def partitions(self, start=None, end=None):
+        """Partition keys overlapping [start, end), oldest first."""
+        months = [r[0] for r in self.conn.execute("SELECT month FROM otp_partitions ORDER BY month")]
+        lo = partition_name(to_datetime(start)) if start else None
+        hi = partition_name(to_datetime(end)) if end else None
+        return [m for m in months if (lo is None or m >= lo) and (hi is None or m <= hi)]
+
+    def events(self, start=None, end=None, method=None, muid=None, username=None,
+               newest_first=False, limit=None):
+        """
+        OTP events from the local store.
+
+        Args:
+            start, end: activityDate bounds (start inclusive, end exclusive)
+            method: 'email', 'text', 'call', ... or a list of methods
+            muid, username: Restrict to one member (username is case-insensitive)
+            newest_first: Order by activityDate descending
+            limit: Maximum rows
+
+        Returns:
+            list of OtpRow (activityDate as datetime)
+
+        Raises:
+            ValueError: start is earlier than the store covers (sync with
+                        since=start first, e.g. open_otp_store(since=start))
+        """
+        state = self.sync_state()
+        if start is not None and state is not None and to_datetime(start) < state[0]:
+            raise ValueError(f"OTP store only covers activity from {state[0]:%Y-%m-%d %H:%M}; "
+                             f"sync with since={to_datetime(start):%Y-%m-%d} to read from there")
+        conditions = []
+        params = []
+        if start is not None:
+            conditions.append("activityDate >= ?")
+            params.append(to_datetime(start).isoformat(sep=' '))
+        if end is not None:
+            conditions.append("activityDate < ?")
+            params.append(to_datetime(end).isoformat(sep=' '))
+        if method is not None:
+            methods = [method] if isinstance(method, str) else list(method)
+            conditions.append(f"method IN ({', '.join('?' for _ in methods)})")
+            params.extend(methods)
+        if muid is not None:
+            conditions.append("muid = ?")
+            params.append(muid)
+        if username is not None:
+            conditions.append("userName = ? COLLATE NOCASE")
+            params.append(username)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        months = self.partitions(start, end)
+        if newest_first:
+            months = months[::-1]
+        rows = []
+        for month in months:
+            sql = f"SELECT {', '.join(EVENT_COLUMNS)} FROM {_table(month)}{where} ORDER BY activityDate"
+            if newest_first:
+                sql += " DESC"
+            if limit is not None:
+                sql += f" LIMIT {int(limit) - len(rows)}"
+            for row in self.conn.execute(sql, params):
+                rows.append(OtpRow(row[0], row[1], row[2], datetime.fromisoformat(row[3]), *row[4:]))
+            if limit is not None and len(rows) >= limit:
+                break
+        return rows
+
+    def email_events(self, start=None, end=None, **kwargs):
+        """OTP events sent to an email address."""
+        return self.events(start, end, method='email', **kwargs)
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def rebuild(self):
+        """Drop every partition and the high-water mark."""
+        with self.conn:
+            for month in self.partitions():
+                self.conn.execute(f"DROP TABLE IF EXISTS {_table(month)}")
+            self.conn.execute("DELETE FROM otp_partitions")
+            self.conn.execute("DELETE FROM otp_sync")
+        self._known_partitions.clear()
+
+    def status(self):
+        """Summary of what the store holds."""
+        state = self.conn.execute("SELECT loaded_from, max_id, synced_at FROM otp_sync WHERE id = 1").fetchone()
+        rows = self.conn.execute("SELECT COALESCE(SUM(rows), 0), COUNT(*) FROM otp_partitions").fetchone()
+        return {'rows': rows[0], 'partitions': rows[1],
+                'loaded_from': state[0] if state else None,
+                'max_id': state[1] if state else None,
+                'synced_at': state[2] if state else None}
+
+
+def open_otp_store(sync=True, since=None, progress=True):
+    """
+    Open the shared store, syncing new events first.
+
+    Pass sync=False to work offline against what the store already holds.
+    """
+    store = OtpEventStore()
+    if sync:
+        start = time.perf_counter()
+        read = store.sync(since=since, progress=progress)
+        if progress:
+            print(f"  OTP store: {read:,} new events synced in {time.perf_counter() - start:.1f}s")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local OTP event store")
+    parser.add_argument('--status', action='store_true', help="show store contents")
+    parser.add_argument('--sync', action='store_true', help="fetch new OTP events from fraudmonitor")
+    parser.add_argument('--since', metavar='YYYY-MM-DD', help="earliest activityDate to cover")
+    parser.add_argument('--rebuild', action='store_true', help="drop everything (next sync reloads)")
+    args = parser.parse_args()
+
+    with OtpEventStore() as store:
+        if args.rebuild:
+            store.rebuild()
+            print(f"Store cleared: {store.path}")
+        if args.sync:
+            read = store.sync(since=args.since)
+            print(f"Synced {read:,} rows from fraudmonitor")
+        s = store.status()
+        print(f"OTP store: {s['rows']:,} events in {s['partitions']} monthly partitions, "
+              f"from {s['loaded_from']}, high-water id {s['max_id']}, synced {s['synced_at']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,79 +8,40 @@ Data formats:
 - NEW FORMAT: ["method", "contact", "fallback", "full_contact", "status"]
 """
 
-from db_connection import get_connection
-import json
+from event_data import parse_otp
+from otp_event_store import open_otp_store
 
-def determine_delivery_method(event_data_str):
-    """Determine delivery method from eventData JSON string"""
-    if not event_data_str:
-        return 'unknown'
-
-    try:
-        data = json.loads(event_data_str)
-        if not data or len(data) == 0:
-            return 'unknown'
-
-        first_elem = data[0]
-
-        # New format: first element is delivery method
-        if first_elem in ('text', 'email', 'call', 'voice'):
-            return first_elem
-
-        # Old format: check if first element is email and second is phone
-        if first_elem and '@' in str(first_elem):
-            # Email in position 0, check if phone in position 1
-            if len(data) > 1 and data[1] and 'xxx-xxx-' in str(data[1]):
-                return 'text'  # OTP was sent to the phone, not email
-            return 'unknown'
+DELIVERY_METHODS = ('text', 'email', 'call', 'voice', 'unknown', 'other')
 
-        # Old format: null in position 0, phone in position 1
-        if first_elem is None and len(data) > 1:
-            if data[1] and 'xxx-xxx-' in str(data[1]):
-                return 'text'
-            return 'unknown'
 
-        return 'other'
-    except (json.JSONDecodeError, TypeError, IndexError):
+def determine_delivery_method(event_data_str):
+    """Determine delivery method from eventData JSON string (see event_data.OtpEvent)"""
+    otp = parse_otp(event_data_str)
+    if otp is None:
         return 'unknown'
+    return otp.method if otp.method in DELIVERY_METHODS else 'other'
 
 
 def analyze_otp_december():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    print("Fetching OTP data for December 2025...")
-
-    # Fetch all OTP events with eventData and userName
-    sql = """
-    SELECT eventData, userName
-    FROM fraudmonitor
-    WHERE eventCategory = 'OTP Authentication'
-      AND activityDate >= '2025-12-01'
-      AND activityDate < '2026-01-01'
-    """
+    # OTP events come from the local store (synced incrementally from fraudmonitor)
+    store = open_otp_store(since='2025-12-01')
 
-    cursor.execute(sql)
+    print("Reading OTP data for December 2025...")
+    events = store.events(start='2025-12-01', end='2026-01-01')
+    store.close()
 
     # Process in Python
     counts = {'text': 0, 'email': 0, 'call': 0, 'voice': 0, 'unknown': 0, 'other': 0}
     users = {'text': set(), 'email': set(), 'call': set(), 'voice': set(), 'unknown': set(), 'other': set()}
 
     total = 0
-    for row in cursor:
-        event_data, username = row
-        method = determine_delivery_method(event_data)
+    for event in events:
+        method = event.method if event.method in DELIVERY_METHODS else 'other'
         counts[method] += 1
-        if username:
-            users[method].add(username)
+        if event.userName:
+            users[method].add(event.userName)
         total += 1
 
-        if total % 50000 == 0:
-            print(f"  Processed {total:,} records...")
-
-    cursor.close()
-    conn.close()
-
     print(f"\nTotal records processed: {total:,}")
 
     print("\n" + "="*60)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Phone Index
+Exact and near (Hamming distance <= k) phone matching over every profile phone.
+
+The phone anomaly scripts normalized and compared phone strings pair by
+pair (re.sub + zip loops), and verify_all_phone_anomalies ran one SELECT
+per username. Here every profile phone is normalized once to its last 10
+digits and packed into a (rows, 10) uint8 digit matrix, grouped by owner
+(customer id or username). Comparisons are NumPy operations:
+
+    - per owner: distance from an OTP phone to the closest phone of that
+      customer, for a whole batch of (phone, owner) pairs at once
+    - globally: "who else has a phone one digit off", using pigeonhole
+      blocks (k + 1 digit blocks, at least one must match exactly) so only
+      a small candidate set is compared. Blocks interleave digit positions
+      so shared area codes / exchanges do not collapse them into a few
+      huge buckets
+
+Numbers shorter than 10 digits are right-aligned and padded; they only
+compare against numbers of the same length (different lengths count as
+DIFFERENT, the old digits_different convention).
+
+Usage:
+    from phone_index import PhoneIndex, normalize_phone
+    index = PhoneIndex(rows)                    # (owner, phone) rows
+    index.distance_to_owners(otp_phones, customer_ids)   # array; 0 = exact
+    index.near('619-555-1234', k=1)             # [(phone, owner, distance), ...]
+
+    py phone_index.py --bench                   (tens of thousands of anomalies vs all phones)
+"""
+
+import argparse
+import random
+import re
+import time
+
+import numpy as np
+
+DIGITS = 10
+DIFFERENT = 10       # distance reported for numbers of different lengths (old digits_different)
+NO_PHONE = -1        # distance reported when the owner has no usable phone
+_PAD = 10            # digit value used for right-aligned padding
+_NON_DIGIT = re.compile(r'\D')
+
+
+def normalize_phone(phone, min_digits=1):
+    """Extract just digits, return the last 10 (None when fewer than min_digits)"""
+    if not phone:
+        return None
+    digits = _NON_DIGIT.sub('', str(phone))
+    if len(digits) >= DIGITS:
+        return digits[-DIGITS:]
+    return digits if len(digits) >= min_digits else None
+
+
+def format_phone(digits):
+    """Format 10 digits as xxx-xxx-xxxx"""
+    if digits and len(digits) == DIGITS:
+        return f"{digits[:3]}-{digits[3:6]}-{digits[6:]}"
+    return digits
+
+
+def pack_phones(normalized):
+    """
+    Pack normalized digit strings into a (n, 10) uint8 matrix.
+
+    Shorter numbers are right-aligned with a pad value that never equals a digit.
+    """
+    if not normalized:
+        return np.zeros((0, DIGITS), dtype=np.uint8)
+    # ':' is the byte after '9', so it becomes _PAD after subtracting '0'
+    raw = ''.join(p.rjust(DIGITS, ':') for p in normalized).encode('ascii')
+    return (np.frombuffer(raw, dtype=np.uint8) - ord('0')).reshape(len(normalized), DIGITS)
+
+
+def hamming(a, b):
+    """Row-wise distance between two packed matrices (DIFFERENT when lengths differ)."""
+    distance = (a != b).sum(axis=1)
+    same_length = (a == _PAD).sum(axis=1) == (b == _PAD).sum(axis=1)
+    return np.where(same_length, distance, DIFFERENT)
+
+
+def _expand_ranges(starts, counts):
+    """Concatenate arange(start, start + count) for every pair, vectorized."""
+    total = int(counts.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + (np.arange(total) - offsets)
+
+
+class PhoneIndex:
+    """
+    Packed-digit index over profile phones.
+
+    Args:
+        rows: Iterable of (owner, phone); owner is a customer id, username...
+              (string owners are matched case-insensitively)
+        max_distance: Largest k that near() / near_many() will be asked for;
+                      each extra digit means shorter blocks and more candidates
+        min_digits: Phones with fewer digits are ignored (as in the old scripts)
+    """
+
+    QUERY_CHUNK = 2000
+
+    def __init__(self, rows, max_distance=1, min_digits=7):
+        self.max_distance = max_distance
+        grouped = {}
+        for owner, phone in rows:
+            normalized = normalize_phone(phone, min_digits)
+            if normalized is None:
+                continue
+            owner = owner.lower() if isinstance(owner, str) else owner
+            phones = grouped.setdefault(owner, {})
+            phones.setdefault(normalized, phone)
+
+        self.phones = []     # normalized digits, grouped by owner
+        self.raw = []        # value as stored in customercommunication
+        self.owners = []
+        self._span = {}
+        for owner, phones in grouped.items():
+            start = len(self.phones)
+            self.phones.extend(phones)
+            self.raw.extend(phones.values())
+            self.owners.extend([owner] * len(phones))
+            self._span[owner] = (start, len(self.phones))
+        self.digits = pack_phones(self.phones)
+
+        # Pigeonhole blocks: within distance k, one of k + 1 blocks matches exactly
+        self._blocks = []
+        for block in range(max_distance + 1):
+            cols = np.arange(block, DIGITS, max_distance + 1)
+            keys = self._block_keys(self.digits, cols)
+            order = np.argsort(keys, kind='stable')
+            self._blocks.append((cols, keys[order], order))
+
+    def __len__(self):
+        return len(self.phones)
+
+    @staticmethod
+    def _block_keys(digits, cols):
+        weights = (_PAD + 1) ** np.arange(len(cols) - 1, -1, -1, dtype=np.int64)
+        return digits[:, cols].astype(np.int64) @ weights
+
+    def _owner_key(self, owner):
+        return owner.lower() if isinstance(owner, str) else owner
+
+    def phones_for(self, owner, raw=False):
+        """Normalized (or raw, as stored) phones of one owner."""
+        start, end = self._span.get(self._owner_key(owner), (0, 0))
+        return (self.raw if raw else self.phones)[start:end]
+
+    def distance_to_owners(self, phones, owners):
+        """
+        Closest distance from each phone to any phone of the paired owner.
+
+        Args:
+            phones: OTP phones (any format)
+            owners: Owner for each phone (None for unknown)
+
+        Returns:
+            int array: 0 exact, 1..9 digits off, DIFFERENT for other lengths,
+            NO_PHONE when the owner has no phone or the query is not a number
+        """
+        normalized = [normalize_phone(p) for p in phones]
+        spans = [self._span.get(self._owner_key(o), (0, 0)) if o is not None else (0, 0) for o in owners]
+        starts = np.array([s for s, _ in spans], dtype=np.int64)
+        counts = np.array([e - s for s, e in spans], dtype=np.int64)
+        counts[[n is None for n in normalized]] = 0
+
+        query_digits = pack_phones([n or '' for n in normalized])
+        qi = np.repeat(np.arange(len(normalized)), counts)
+        ri = _expand_ranges(starts, counts)
+        result = np.full(len(normalized), NO_PHONE, dtype=np.int64)
+        if len(qi):
+            distance = hamming(query_digits[qi], self.digits[ri])
+            best = np.full(len(normalized), DIFFERENT + 1, dtype=np.int64)
+            np.minimum.at(best, qi, distance)
+            result = np.where(counts > 0, best, NO_PHONE)
+        return result
+
+    def near_many(self, phones, k=1, exclude_owners=None):
+        """
+        Every indexed phone within distance k of each query phone.
+
+        Args:
+            phones: Query phones (any format)
+            k: Maximum number of differing digits (<= max_distance)
+            exclude_owners: Optional owner per query to leave out (e.g. the member themselves)
+
+        Returns:
+            list (one per query) of [(phone, owner, distance), ...] sorted by distance
+        """
+        phones = list(phones)
+        if k > self.max_distance:
+            raise ValueError(f"k={k} exceeds max_distance={self.max_distance} of this index")
+        out = []
+        for chunk in range(0, len(phones), self.QUERY_CHUNK):
+            end = chunk + self.QUERY_CHUNK
+            excluded = exclude_owners[chunk:end] if exclude_owners is not None else None
+            out.extend(self._near_chunk(phones[chunk:end], k, excluded))
+        return out
+
+    def _near_chunk(self, phones, k, exclude_owners):
+        normalized = [normalize_phone(p) or '' for p in phones]
+        query_digits = pack_phones(normalized)
+        valid = np.array([bool(n) for n in normalized], dtype=bool)
+        stride = max(len(self.phones), 1)
+
+        pairs = []
+        for cols, sorted_keys, order in self._blocks:
+            keys = self._block_keys(query_digits, cols)
+            lo = np.searchsorted(sorted_keys, keys, side='left')
+            hi = np.searchsorted(sorted_keys, keys, side='right')
+            counts = np.where(valid, hi - lo, 0)
+            qi = np.repeat(np.arange(len(normalized)), counts)
+            pairs.append(qi * stride + order[_expand_ranges(lo, counts)])
+        out = [[] for _ in normalized]
+        if not pairs:
+            return out
+
+        combined = np.unique(np.concatenate(pairs))
+        qi, ri = np.divmod(combined, stride)
+        distance = hamming(query_digits[qi], self.digits[ri])
+        keep = distance <= k
+        for q, r, d in zip(qi[keep].tolist(), ri[keep].tolist(), distance[keep].tolist()):
+            owner = self.owners[r]
+            if exclude_owners is not None and owner == self._owner_key(exclude_owners[q]):
+                continue
+            out[q].append((self.phones[r], owner, d))
+        for matches in out:
+            matches.sort(key=lambda m: m[2])
+        return out
+
+    def near(self, phone, k=1, exclude_owner=None):
+        """Indexed phones within distance k of one phone; see near_many."""
+        return self.near_many([phone], k, [exclude_owner])[0]
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+
+def _synthetic(count, seed=4):
+    rng = random.Random(seed)
+    rows = []
+    for cust_id in range(count):
+        for _ in range(rng.randint(1, 3)):
+            rows.append((cust_id, f"{rng.choice(['619', '858', '760'])}-{rng.randint(200, 999)}-{rng.randint(0, 9999):04d}"))
+    return rows
+
+
+def benchmark(customers=200000, anomalies=50000):
+    """Verify a batch of (otp phone, customer) anomalies against every profile phone."""
+    rows = _synthetic(customers)
+    start = time.perf_counter()
+    index = PhoneIndex(rows)
+    build_s = time.perf_counter() - start
+
+    rng = random.Random(8)
+    sample = [rng.choice(rows) for _ in range(anomalies)]
+    queries, owners = [], []
+    for owner, phone in sample:
+        digits = list(normalize_phone(phone))
+        if rng.random() < 0.5:
+            digits[rng.randrange(DIGITS)] = str(rng.randrange(10))
+        queries.append(''.join(digits))
+        owners.append(owner)
+
+    start = time.perf_counter()
+    distance = index.distance_to_owners(queries, owners)
+    owner_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    near = index.near_many(queries, k=1, exclude_owners=owners)
+    near_s = time.perf_counter() - start
+
+    print(f"Index build: {len(index):,} phones for {customers:,} customers in {build_s:.2f}s")
+    print(f"distance_to_owners: {anomalies:,} anomalies in {owner_s:.3f}s "
+          f"(exact {int((distance == 0).sum()):,}, 1-2 off {int(((distance > 0) & (distance <= 2)).sum()):,})")
+    print(f"near_many(k=1):     {anomalies:,} phones vs all {len(index):,} in {near_s:.3f}s "
+          f"({sum(1 for n in near if n):,} have another customer one digit off)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packed-digit phone index")
+    parser.add_argument('--bench', action='store_true', help="run the verification benchmark")
+    parser.parse_args()
+    benchmark()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,28 +4,18 @@ Check if OTP phone anomaly exists - OTP sent to phone NOT in profile with no cha
 """
 
 from db_connection import get_connection
+from fraudmonitor_scan import days_ago
+from otp_event_store import open_otp_store
 import re
 
 conn = get_connection()
 cursor = conn.cursor()
 
-def extract_phone(event_data):
-    # Look for phone patterns in OTP events: ["sms", "xxx-xxx-1234", ...] or phone numbers
-    # Unmasked phones look like: 619-555-1234
-    match = re.search(r'"sms",\s*"([^"]+)"', str(event_data))
-    if match:
-        return match.group(1)
-    return None
-
-print("QUERY 1: Pulling OTP SMS events (1 year)...")
-cursor.execute("""
-    SELECT muid, userName, eventData, activityDate
-    FROM fraudmonitor
-    WHERE eventCategory = 'OTP Authentication'
-    AND eventData LIKE '%"sms"%'
-    AND activityDate > DATE_SUB(NOW(), INTERVAL 365 DAY)
-""")
-otp_events = cursor.fetchall()
+print("QUERY 1: Reading OTP SMS events (1 year) from the OTP store...")
+otp_start = days_ago(365)
+otp_store = open_otp_store(since=otp_start)
+otp_events = otp_store.events(start=otp_start, method='sms')
+otp_store.close()
 print(f"  Got {len(otp_events)} SMS OTP events\n")
 
 print("QUERY 2: Pulling profile phone numbers...")
@@ -73,16 +63,17 @@ for username, phone in profile_rows:
 # Process OTP events
 print("Processing OTP SMS events...")
 otp_cases = {}
-for muid, username, event_data, activity_date in otp_events:
-    otp_phone = extract_phone(event_data)
-    if otp_phone and muid:
-        key = (muid, otp_phone)
+for event in otp_events:
+    # ["sms", "xxx-xxx-1234", ...] - the logged (masked) phone
+    otp_phone = event.masked_contact
+    if otp_phone and event.muid:
+        key = (event.muid, otp_phone)
         if key not in otp_cases:
             otp_cases[key] = {
-                'muid': muid,
-                'username': username,
+                'muid': event.muid,
+                'username': event.userName,
                 'otp_phone': otp_phone,
-                'date': activity_date
+                'date': event.activityDate
             }
 
 print(f"  {len(otp_cases)} unique muid/phone combinations\n")
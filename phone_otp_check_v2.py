@@ -4,36 +4,28 @@ Check phone OTP anomalies - using correct format ["text", ...]
 """
 
 from db_connection import get_connection
+from fraudmonitor_scan import days_ago
+from otp_event_store import open_otp_store
+from phone_index import PhoneIndex, format_phone
 import re
 
 conn = get_connection()
 cursor = conn.cursor()
 
-def extract_phone_from_text_otp(event_data):
+FULL_PHONE = re.compile(r'^\d{3}-\d{3}-\d{4}$')
+
+def full_phone_from_text_otp(event):
     # Format: ["text", "xxx-xxx-1234", null, "619-555-1234", "success"]
     # The 4th element is the full phone number
-    match = re.search(r'\["text",\s*"[^"]+",\s*[^,]+,\s*"(\d{3}-\d{3}-\d{4})"', str(event_data))
-    if match:
-        return match.group(1)
+    if event.contact and FULL_PHONE.match(event.contact):
+        return event.contact
     return None
 
-def normalize_phone(phone):
-    if not phone:
-        return None
-    digits = re.sub(r'\D', '', str(phone))
-    if len(digits) >= 10:
-        return digits[-10:]
-    return digits
-
-print("QUERY 1: Pulling OTP text events (1 year)...")
-cursor.execute("""
-    SELECT muid, userName, eventData, activityDate
-    FROM fraudmonitor
-    WHERE eventCategory = 'OTP Authentication'
-    AND eventData LIKE '%"text"%'
-    AND activityDate > DATE_SUB(NOW(), INTERVAL 365 DAY)
-""")
-otp_events = cursor.fetchall()
+print("QUERY 1: Reading OTP text events (1 year) from the OTP store...")
+otp_start = days_ago(365)
+otp_store = open_otp_store(since=otp_start)
+otp_events = otp_store.events(start=otp_start, method='text')
+otp_store.close()
 print(f"  Got {len(otp_events)} text OTP events\n")
 
 print("QUERY 2: Pulling profile phone numbers...")
@@ -57,49 +49,42 @@ print(f"  Got {len(phone_change_muids)} members with phone changes\n")
 cursor.close()
 conn.close()
 
-# Build profile phone lookup
-profile_phones = {}
-for username, phone in profile_rows:
-    if username and phone:
-        key = username.lower()
-        if key not in profile_phones:
-            profile_phones[key] = set()
-        normalized = normalize_phone(phone)
-        if normalized and len(normalized) == 10:
-            profile_phones[key].add(normalized)
+# Build packed profile phone index by username (full 10-digit numbers only)
+profile_phones = PhoneIndex(((username, phone) for username, phone in profile_rows if username),
+                            min_digits=10)
 
 # Process OTP events
 print("Processing text OTP events...")
 otp_cases = {}
-for muid, username, event_data, activity_date in otp_events:
-    otp_phone = extract_phone_from_text_otp(event_data)
-    if otp_phone and muid:
-        key = (muid, otp_phone)
+for event in otp_events:
+    otp_phone = full_phone_from_text_otp(event)
+    if otp_phone and event.muid:
+        key = (event.muid, otp_phone)
         if key not in otp_cases:
             otp_cases[key] = {
-                'muid': muid,
-                'username': username,
+                'muid': event.muid,
+                'username': event.userName,
                 'otp_phone': otp_phone,
-                'date': activity_date
+                'date': event.activityDate
             }
 
 print(f"  {len(otp_cases)} unique muid/phone combinations\n")
 
-# Find mismatches
-mismatches = []
-for (muid, otp_phone), case in otp_cases.items():
-    username = case['username']
-    otp_normalized = normalize_phone(otp_phone)
-
-    # Get profile phones
-    user_phones = set()
-    if username:
-        user_phones = profile_phones.get(username.lower(), set())
+# Find mismatches: closest profile phone per case, and who else has the OTP phone, in one batch each
+cases = list(otp_cases.values())
+otp_phones = [case['otp_phone'] for case in cases]
+usernames = [case['username'] for case in cases]
+distances = profile_phones.distance_to_owners(otp_phones, usernames)
+on_file_for = profile_phones.near_many(otp_phones, k=0, exclude_owners=usernames)
 
+mismatches = []
+for case, distance, others in zip(cases, distances, on_file_for):
     # Check if OTP phone matches any profile phone
-    if otp_normalized not in user_phones:
-        case['profile_phones'] = [f"{p[:3]}-{p[3:6]}-{p[6:]}" for p in list(user_phones)[:5]]
-        case['has_phone_change'] = muid in phone_change_muids
+    if distance != 0:
+        user_phones = profile_phones.phones_for(case['username']) if case['username'] else []
+        case['profile_phones'] = [format_phone(p) for p in user_phones[:5]]
+        case['phone_on_file_for'] = sorted({owner for _, owner, _ in others})
+        case['has_phone_change'] = case['muid'] in phone_change_muids
         mismatches.append(case)
 
 # Filter for anomalies (no phone change event)
@@ -117,5 +102,7 @@ for m in anomalies[:20]:
     print(f"Username: {m['username']}")
     print(f"OTP to: {m['otp_phone']}")
     print(f"Profile phones: {m['profile_phones'] if m['profile_phones'] else '(none)'}")
+    if m['phone_on_file_for']:
+        print(f"OTP phone is on file for: {', '.join(m['phone_on_file_for'][:5])}")
     print(f"Date: {m['date']}")
     print("-" * 50)
@@ -6,7 +6,7 @@ Matches account numbers to MUIDs from fraudmonitor table
 
 import openpyxl
 from db_connection import get_connection
-from collections import defaultdict
+from identity_resolver import IdentityResolver
 
 # File paths
 INPUT_FILE = r'C:\Users\kgreeven\Downloads\Invalid Addresses- Account List- MUIDS NEEDED 1 (1).xlsx'
@@ -26,35 +26,17 @@ def get_muid_mappings(account_numbers):
     if not account_numbers:
         return {}
 
-    conn = get_connection()
-    cursor = conn.cursor()
-
     # Normalize account numbers to match database format (10-digit zero-padded)
     normalized = [normalize_account_number(acc) for acc in account_numbers]
 
-    # Build placeholders for IN clause
-    placeholders = ', '.join(['%s'] * len(normalized))
-
-    query = f"""
-        SELECT DISTINCT masterMembership, muid
-        FROM fraudmonitor
-        WHERE masterMembership IN ({placeholders})
-        AND muid IS NOT NULL
-        AND muid != ''
-        ORDER BY masterMembership, muid
-    """
-
-    cursor.execute(query, normalized)
-    results = cursor.fetchall()
-
-    cursor.close()
-    conn.close()
-
-    # Group MUIDs by normalized account number
-    muid_map = defaultdict(list)
-    for master_membership, muid in results:
-        if muid not in muid_map[master_membership]:
-            muid_map[master_membership].append(muid)
+    # Chunked IN lists, so long account lists do not become one giant statement
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        muid_map = IdentityResolver(cursor).muids_by_account(normalized)
+    finally:
+        cursor.close()
+        conn.close()
 
     # Create mapping from original account numbers to MUIDs
     original_to_muid = {}
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Profile Snapshot - local, normalized copy of customer + customercommunication
+
+The email and phone investigations (fast_pattern_search, verify_phone_bulk,
+comprehensive_email_check, simple_email_check, export_suspicious_emails)
+each pulled the full customer x customercommunication join from dbxdb and
+rebuilt their own dicts of profile emails and phones. This snapshot keeps
+both tables in a local SQLite file with the normalized columns they all
+need, indexed for lookups:
+
+    contacts.kind     'email' / 'phone' / 'other' (from Type_id, then the value)
+    contacts.email    lowercased address        contacts.domain   part after '@'
+    contacts.phone    last 10 digits (phone_index.normalize_phone)
+
+- Incremental refresh: only rows created or modified since the high-water
+  mark (createdts / lastmodifiedts, with a small overlap) are re-pulled and
+  upserted
+- Deletes: ids are reconciled against dbxdb at most once every
+  RECONCILE_HOURS (a cheap id-only read)
+
+Usage:
+    from profile_snapshot import open_profile_snapshot
+    snapshot = open_profile_snapshot()
+    snapshot.emails(username='cgregory619')         # ['c...@gmail.com', ...]
+    snapshot.email_rows()                           # [(username, email), ...] for indexes
+    snapshot.find(phone='619-555-1234')             # ContactRow list
+
+    py profile_snapshot.py --status
+    py profile_snapshot.py --refresh
+    py profile_snapshot.py --rebuild                (drop everything, next refresh reloads)
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from db_connection import get_connection
+from phone_index import normalize_phone
+
+SNAPSHOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profile_snapshot.db')
+
+REFRESH_OVERLAP = timedelta(minutes=10)   # re-read rows this close to the high-water mark
+RECONCILE_HOURS = 24                      # how often deleted ids are reconciled
+FETCH_BATCH = 20000
+
+CUSTOMER_COLUMNS = ('id', 'UserName', 'FirstName', 'LastName', 'Status_id', 'createdts', 'lastmodifiedts')
+COMM_COLUMNS = ('id', 'Customer_id', 'Type_id', 'isPrimary', 'Value', 'createdts', 'lastmodifiedts')
+
+ContactRow = namedtuple('ContactRow', [
+    'customer_id', 'username', 'first_name', 'last_name', 'status_id', 'account_created', 'type_id',
+    'is_primary', 'value', 'kind', 'email', 'domain', 'phone', 'createdts', 'lastmodifiedts'])
+CustomerRow = namedtuple('CustomerRow', ['id', 'username', 'first_name', 'last_name', 'status_id',
+                                         'createdts', 'lastmodifiedts'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    id             TEXT PRIMARY KEY,
+    UserName       TEXT,
+    FirstName      TEXT,
+    LastName       TEXT,
+    Status_id      TEXT,
+    createdts      TEXT,
+    lastmodifiedts TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_customers_user ON customers (UserName COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS contacts (
+    id             TEXT PRIMARY KEY,
+    Customer_id    TEXT,
+    Type_id        TEXT,
+    isPrimary      INTEGER,
+    Value          TEXT,
+    createdts      TEXT,
+    lastmodifiedts TEXT,
+    kind           TEXT NOT NULL,
+    email          TEXT,
+    domain         TEXT,
+    phone          TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_contacts_customer ON contacts (Customer_id);
+CREATE INDEX IF NOT EXISTS ix_contacts_email ON contacts (email);
+CREATE INDEX IF NOT EXISTS ix_contacts_domain ON contacts (domain);
+CREATE INDEX IF NOT EXISTS ix_contacts_phone ON contacts (phone);
+
+CREATE TABLE IF NOT EXISTS snapshot_sync (
+    source         TEXT PRIMARY KEY,   -- 'customer' / 'customercommunication'
+    high_water     TEXT NOT NULL,      -- latest createdts / lastmodifiedts stored
+    reconciled_at  TEXT NOT NULL,
+    refreshed_at   TEXT NOT NULL
+);
+"""
+
+_CONTACT_SELECT = """
+    SELECT cc.Customer_id, c.UserName, c.FirstName, c.LastName, c.Status_id, c.createdts,
+           cc.Type_id, cc.isPrimary, cc.Value, cc.kind, cc.email, cc.domain, cc.phone, cc.createdts, cc.lastmodifiedts
+    FROM contacts cc
+    LEFT JOIN customers c ON c.id = cc.Customer_id
+"""
+
+
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return str(value)
+
+
+def classify_contact(type_id, value):
+    """
+    Normalized (kind, email, domain, phone) for one customercommunication row.
+
+    Type_id decides first (an email typed into a phone field stays a phone
+    row with no usable number); untyped values are judged by content.
+    """
+    type_upper = (type_id or '').upper()
+    value = (value or '').strip()
+    if 'PHONE' in type_upper:
+        kind = 'phone'
+    elif 'EMAIL' in type_upper or '@' in value:
+        kind = 'email'
+    elif normalize_phone(value, min_digits=7):
+        kind = 'phone'
+    else:
+        kind = 'other'
+
+    email = domain = phone = None
+    if kind == 'email' and '@' in value:
+        email = value.lower()
+        domain = email.rpartition('@')[2]
+    elif kind == 'phone' and '@' not in value:
+        phone = normalize_phone(value, min_digits=7)
+    return kind, email, domain, phone
+
+
+class ProfileSnapshot:
+    """
+    SQLite snapshot of customer + customercommunication with normalized contacts.
+
+    Args:
+        path: SQLite file (default: profile_snapshot.db next to this script)
+    """
+
+    def __init__(self, path=SNAPSHOT_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # ------------------------------------------------------------------
+    # Refresh from dbxdb
+    # ------------------------------------------------------------------
+
+    def _sync_state(self, source):
+        row = self.conn.execute("SELECT high_water, reconciled_at FROM snapshot_sync WHERE source = ?",
+                                (source,)).fetchone()
+        return (datetime.fromisoformat(row[0]), datetime.fromisoformat(row[1])) if row else None
+
+    def _pull(self, cursor, table, columns, high_water, to_row, insert_sql, progress):
+        """Upsert rows created / modified since high_water; returns (rows read, new high-water)."""
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        params = ()
+        if high_water is not None:
+            since = high_water - REFRESH_OVERLAP
+            sql += " WHERE createdts >= %s OR lastmodifiedts >= %s"
+            params = (since, since)
+        cursor.execute(sql, params)
+
+        read = 0
+        newest = high_water
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH)
+            if not rows:
+                break
+            with self.conn:
+                self.conn.executemany(insert_sql, [to_row(r) for r in rows])
+            for r in rows:
+                for stamp in (r[-2], r[-1]):
+                    if isinstance(stamp, datetime) and (newest is None or stamp > newest):
+                        newest = stamp
+            read += len(rows)
+            if progress:
+                print(f"    {table}: {read:,} rows")
+        return read, newest
+
+    def _reconcile(self, cursor, table, local_table):
+        """Delete local rows whose id no longer exists in dbxdb."""
+        cursor.execute(f"SELECT id FROM {table}")
+        remote = {str(r[0]) for r in cursor.fetchall()}
+        local = [r[0] for r in self.conn.execute(f"SELECT id FROM {local_table}")]
+        gone = [(i,) for i in local if i not in remote]
+        if gone:
+            with self.conn:
+                self.conn.executemany(f"DELETE FROM {local_table} WHERE id = ?", gone)
+        return len(gone)
+
+    def refresh(self, full=False, progress=True):
+        """
+        Bring the snapshot up to date.
+
+        Args:
+            full: Re-read both tables entirely (also reconciles deletes)
+
+        Returns:
+            int: Rows read from dbxdb
+        """
+        def customer_row(r):
+            return tuple(_text(v) for v in r)
+
+        def contact_row(r):
+            cid, cust_id, type_id, is_primary, value, created, modified = r
+            return (_text(cid), _text(cust_id), type_id, int(is_primary) if is_primary is not None else None,
+                    value, _text(created), _text(modified), *classify_contact(type_id, value))
+
+        sources = (
+            ('customer', 'customers', CUSTOMER_COLUMNS, customer_row,
+             f"INSERT OR REPLACE INTO customers ({', '.join(CUSTOMER_COLUMNS)}) VALUES "
+             f"({', '.join('?' for _ in CUSTOMER_COLUMNS)})"),
+            ('customercommunication', 'contacts', COMM_COLUMNS, contact_row,
+             f"INSERT OR REPLACE INTO contacts ({', '.join(COMM_COLUMNS)}, kind, email, domain, phone) VALUES "
+             f"({', '.join('?' for _ in range(len(COMM_COLUMNS) + 4))})"),
+        )
+
+        now = datetime.now()
+        read = 0
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            for table, local_table, columns, to_row, insert_sql in sources:
+                state = None if full else self._sync_state(table)
+                high_water, reconciled_at = state if state else (None, None)
+                if progress:
+                    mode = f"changes since {high_water - REFRESH_OVERLAP}" if high_water else "full load"
+                    print(f"  Refreshing {table} ({mode})...")
+                pulled, high_water = self._pull(cursor, table, columns, high_water, to_row, insert_sql, progress)
+                read += pulled
+
+                if reconciled_at is None or now - reconciled_at > timedelta(hours=RECONCILE_HOURS):
+                    removed = self._reconcile(cursor, table, local_table)
+                    reconciled_at = now
+                    if progress and removed:
+                        print(f"    {table}: {removed:,} deleted rows removed")
+
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO snapshot_sync (source, high_water, reconciled_at, refreshed_at) "
+                        "VALUES (?, ?, ?, ?)",
+                        (table, _text(high_water or now), _text(reconciled_at),
+                         now.isoformat(sep=' ', timespec='seconds')))
+        finally:
+            cursor.close()
+            conn.close()
+        return read
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def customer(self, username):
+        """CustomerRow for a username (case-insensitive), or None."""
+        row = self.conn.execute(
+            f"SELECT {', '.join(CUSTOMER_COLUMNS)} FROM customers WHERE UserName = ? COLLATE NOCASE "
+            "ORDER BY UserName = ? DESC LIMIT 1", (username, username)).fetchone()
+        return CustomerRow(*row) if row else None
+
+    def customer_id(self, username):
+        """customer.id for a username (case-insensitive), or None."""
+        row = self.customer(username) if username else None
+        return row.id if row else None
+
+    def customer_by_id(self, customer_id):
+        """CustomerRow for a customer.id, or None."""
+        row = self.conn.execute(
+            f"SELECT {', '.join(CUSTOMER_COLUMNS)} FROM customers WHERE id = ?", (str(customer_id),)).fetchone()
+        return CustomerRow(*row) if row else None
+
+    def customers(self):
+        """Every CustomerRow."""
+        return [CustomerRow(*r) for r in self.conn.execute(
+            f"SELECT {', '.join(CUSTOMER_COLUMNS)} FROM customers")]
+
+    def contacts(self, username=None, customer_id=None, kind=None):
+        """
+        Contact rows, optionally for one customer and / or one kind.
+
+        Args:
+            username: Customer username (case-insensitive)
+            customer_id: customer.id
+            kind: 'email', 'phone' or 'other'
+
+        Returns:
+            list of ContactRow
+        """
+        conditions = []
+        params = []
+        if username is not None:
+            conditions.append("c.UserName = ? COLLATE NOCASE")
+            params.append(username)
+        if customer_id is not None:
+            conditions.append("cc.Customer_id = ?")
+            params.append(str(customer_id))
+        if kind is not None:
+            conditions.append("cc.kind = ?")
+            params.append(kind)
+        sql = _CONTACT_SELECT + (f" WHERE {' AND '.join(conditions)}" if conditions else "")
+        return [ContactRow(*r) for r in self.conn.execute(sql, params)]
+
+    def emails(self, username=None, customer_id=None):
+        """Normalized profile emails of one customer."""
+        return sorted({r.email for r in self.contacts(username, customer_id, 'email') if r.email})
+
+    def phones(self, username=None, customer_id=None):
+        """Normalized (10-digit where available) profile phones of one customer."""
+        return sorted({r.phone for r in self.contacts(username, customer_id, 'phone') if r.phone})
+
+    def email_rows(self):
+        """(username, email) for every profile email - input for MaskedEmailIndex and friends."""
+        return self.conn.execute(
+            "SELECT c.UserName, cc.email FROM contacts cc JOIN customers c ON c.id = cc.Customer_id "
+            "WHERE cc.email IS NOT NULL").fetchall()
+
+    def phone_rows(self, by='customer_id'):
+        """(customer id or username, raw value) for every phone-typed row - input for PhoneIndex."""
+        owner = 'cc.Customer_id' if by == 'customer_id' else 'c.UserName'
+        return self.conn.execute(
+            f"SELECT {owner}, cc.Value FROM contacts cc LEFT JOIN customers c ON c.id = cc.Customer_id "
+            "WHERE cc.kind = 'phone'").fetchall()
+
+    def find(self, email=None, domain=None, phone=None):
+        """Contact rows holding an email, any email at a domain, or a phone number."""
+        if email is not None:
+            where, value = "cc.email = ?", email.strip().lower()
+        elif domain is not None:
+            where, value = "cc.domain = ?", domain.strip().lower()
+        elif phone is not None:
+            where, value = "cc.phone = ?", normalize_phone(phone, min_digits=7)
+        else:
+            raise ValueError("find() needs email, domain or phone")
+        return [ContactRow(*r) for r in self.conn.execute(_CONTACT_SELECT + f" WHERE {where}", (value,))]
+
+    def contact_frame(self, kind=None):
+        """pandas DataFrame of contacts joined to their customer (one row per contact)."""
+        import pandas as pd
+        sql = _CONTACT_SELECT + (" WHERE cc.kind = ?" if kind else "")
+        return pd.DataFrame(self.conn.execute(sql, (kind,) if kind else ()).fetchall(),
+                            columns=ContactRow._fields)
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def rebuild(self):
+        """Drop every row and the high-water marks."""
+        with self.conn:
+            self.conn.execute("DELETE FROM customers")
+            self.conn.execute("DELETE FROM contacts")
+            self.conn.execute("DELETE FROM snapshot_sync")
+
+    def status(self):
+        """Summary of what the snapshot holds."""
+        counts = dict(self.conn.execute("SELECT kind, COUNT(*) FROM contacts GROUP BY kind").fetchall())
+        sync = {r[0]: (r[1], r[2]) for r in self.conn.execute(
+            "SELECT source, high_water, refreshed_at FROM snapshot_sync")}
+        return {'customers': self.conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0],
+                'emails': counts.get('email', 0), 'phones': counts.get('phone', 0),
+                'other': counts.get('other', 0), 'sync': sync}
+
+
+def open_profile_snapshot(refresh=True, progress=True):
+    """
+    Open the shared snapshot, pulling changed rows first.
+
+    Pass refresh=False to work offline against what the snapshot already holds.
+    """
+    snapshot = ProfileSnapshot()
+    if refresh:
+        start = time.perf_counter()
+        read = snapshot.refresh(progress=progress)
+        if progress:
+            print(f"  Profile snapshot: {read:,} changed rows pulled in {time.perf_counter() - start:.1f}s")
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local customer contact snapshot")
+    parser.add_argument('--status', action='store_true', help="show snapshot contents")
+    parser.add_argument('--refresh', action='store_true', help="pull changed rows from dbxdb")
+    parser.add_argument('--full', action='store_true', help="with --refresh: re-read both tables")
+    parser.add_argument('--rebuild', action='store_true', help="drop everything (next refresh reloads)")
+    args = parser.parse_args()
+
+    with ProfileSnapshot() as snapshot:
+        if args.rebuild:
+            snapshot.rebuild()
+            print(f"Snapshot cleared: {snapshot.path}")
+        if args.refresh:
+            read = snapshot.refresh(full=args.full)
+            print(f"Pulled {read:,} rows from dbxdb")
+        s = snapshot.status()
+        print(f"Profile snapshot: {s['customers']:,} customers, {s['emails']:,} emails, "
+              f"{s['phones']:,} phones, {s['other']:,} other contacts")
+        for source, (high_water, refreshed_at) in s['sync'].items():
+            print(f"  {source}: high-water {high_water}, refreshed {refreshed_at}")
+
+
+if __name__ == "__main__":
+    main()
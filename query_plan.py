@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Query Plan Executor
+Runs a report's independent queries concurrently across DWHA and dbxdb.
+
+Reports declare their queries as named tasks tagged with a source. The plan
+runs them on a thread pool, never exceeding the per-source concurrency limit,
+and prints a per-query timing breakdown at the end. Wall-clock time becomes
+roughly that of the slowest query instead of the sum of all of them.
+
+Usage:
+    plan = QueryPlan({'dwha': 2, 'dbxdb': 2})
+    plan.add('enrollment_count', 'dwha', run_with_cursor, get_dwha_connection, get_enrollment_count)
+    plan.add('active_users_120d', 'dbxdb', calculate_active_users_from_fraudmonitor, days=120)
+    results = plan.run()
+    plan.print_timings()
+
+Each task checks out its own pooled connection, so connections are never
+shared between threads.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Default per-source concurrency (kept at or below each connection pool's size)
+DEFAULT_SOURCE_LIMITS = {
+    'dwha': 2,
+    'dbxdb': 2,
+}
+
+
+class QueryTask:
+    """One named query in a plan, plus its outcome and timings."""
+
+    def __init__(self, name, source, fn, args, kwargs):
+        self.name = name
+        self.source = source
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.result = None
+        self.error = None
+        self.wait_s = 0.0
+        self.elapsed_s = 0.0
+
+
+class QueryPlan:
+    """
+    Set of independent queries executed concurrently with per-source limits.
+
+    Args:
+        source_limits: Dict of source name -> max concurrent tasks
+        default_limit: Limit for sources not listed in source_limits
+    """
+
+    def __init__(self, source_limits=None, default_limit=1):
+        self.source_limits = dict(DEFAULT_SOURCE_LIMITS if source_limits is None else source_limits)
+        self.default_limit = default_limit
+        self.tasks = []
+        self.wall_s = 0.0
+
+    def add(self, name, source, fn, *args, **kwargs):
+        """Declare a task. Returns the plan so calls can be chained."""
+        if any(t.name == name for t in self.tasks):
+            raise ValueError(f"Duplicate task name in query plan: {name}")
+        self.tasks.append(QueryTask(name, source, fn, args, kwargs))
+        return self
+
+    def _run_task(self, task, semaphore, submitted_at):
+        with semaphore:
+            started = time.perf_counter()
+            task.wait_s = started - submitted_at
+            try:
+                task.result = task.fn(*task.args, **task.kwargs)
+            except Exception as e:
+                task.error = e
+            task.elapsed_s = time.perf_counter() - started
+        return task
+
+    def run(self, raise_errors=False):
+        """
+        Execute every task and wait for all of them.
+
+        Args:
+            raise_errors: Re-raise the first task error instead of returning None for it
+
+        Returns:
+            dict: Task name -> result (None for tasks that failed)
+        """
+        if not self.tasks:
+            return {}
+
+        semaphores = {}
+        for task in self.tasks:
+            if task.source not in semaphores:
+                limit = self.source_limits.get(task.source, self.default_limit)
+                semaphores[task.source] = threading.BoundedSemaphore(limit)
+
+        workers = sum(self.source_limits.get(src, self.default_limit) for src in semaphores)
+        workers = min(workers, len(self.tasks))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='query') as pool:
+            futures = [pool.submit(self._run_task, task, semaphores[task.source], time.perf_counter())
+                       for task in self.tasks]
+            for future in futures:
+                future.result()
+        self.wall_s = time.perf_counter() - start
+
+        for task in self.tasks:
+            if task.error is not None:
+                if raise_errors:
+                    raise task.error
+                print(f"  Warning: query '{task.name}' ({task.source}) failed: {task.error}")
+
+        return {task.name: task.result for task in self.tasks}
+
+    def timings(self):
+        """Per-task timing rows, slowest first."""
+        rows = [{
+            'name': t.name,
+            'source': t.source,
+            'wait_s': t.wait_s,
+            'elapsed_s': t.elapsed_s,
+            'status': 'ok' if t.error is None else 'error',
+        } for t in self.tasks]
+        return sorted(rows, key=lambda r: r['elapsed_s'], reverse=True)
+
+    def print_timings(self):
+        """Print the per-query timing breakdown and the concurrency saving."""
+        print("\n  Query timings:")
+        print(f"    {'Query':<28} {'Source':<8} {'Wait':>8} {'Run':>8}  Status")
+        for row in self.timings():
+            print(f"    {row['name']:<28} {row['source']:<8} {row['wait_s']:>7.2f}s "
+                  f"{row['elapsed_s']:>7.2f}s  {row['status']}")
+        serial = sum(t.elapsed_s for t in self.tasks)
+        print(f"    Wall clock: {self.wall_s:.2f}s (serial would be ~{serial:.2f}s)")
+
+
+def run_with_cursor(get_conn, fn, *args, **kwargs):
+    """
+    Check out a connection, call fn(cursor, *args, **kwargs), and return it.
+
+    Lets cursor-based helpers such as get_enrollment_count run as plan tasks
+    on their own connection.
+    """
+    conn = get_conn()
+    try:
+        cursor = conn.cursor()
+        try:
+            return fn(cursor, *args, **kwargs)
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
@@ -5,80 +5,49 @@ Find REAL OTP email mismatches - where domain is completely different
 """
 
 from db_connection import get_connection
-import re
+from fraudmonitor_scan import days_ago
+from masked_email_index import load_profile_index
+from otp_event_store import open_otp_store
 
 conn = get_connection()
 cursor = conn.cursor()
 
-def extract_otp_email(event_data):
-    match = re.search(r'"email",\s*"([^"]+)"', str(event_data))
-    if match:
-        return match.group(1)
-    return None
-
 def get_domain(email):
     if '@' in email:
         return email.split('@')[1].lower()
     return None
 
-def emails_could_match(otp_email, profile_email):
-    """Check if masked OTP email could match profile email"""
-    otp = otp_email.lower()
-    profile = profile_email.lower()
-
-    # Same email exactly
-    if otp == profile:
-        return True
-
-    # Same domain and similar length (likely masked version)
-    otp_domain = get_domain(otp)
-    profile_domain = get_domain(profile)
-
-    if otp_domain == profile_domain:
-        # Same domain - likely a masked version
-        otp_local = otp.split('@')[0]
-        profile_local = profile.split('@')[0]
-        # If OTP has x's and first/last chars match, it's masked
-        if 'x' in otp_local:
-            if len(otp_local) == len(profile_local):
-                return True  # Same length, likely masked
-            if otp_local[0] == profile_local[0]:
-                return True  # Same first char, likely masked
-
-    return False
-
 # Get recent OTP events to email (last 60 days)
 print("Finding OTP events sent to email (last 60 days)...")
 print("=" * 70)
 
-cursor.execute("""
-    SELECT muid, userName, eventData, activityDate
-    FROM fraudmonitor
-    WHERE eventCategory = 'OTP Authentication'
-    AND eventData LIKE '%%"email"%%'
-    AND activityDate > DATE_SUB(NOW(), INTERVAL 60 DAY)
-    ORDER BY activityDate DESC
-    LIMIT 500
-""")
-otp_events = cursor.fetchall()
+otp_start = days_ago(60)
+otp_store = open_otp_store(since=otp_start)
+otp_events = otp_store.email_events(start=otp_start, newest_first=True, limit=500)
+otp_store.close()
 print(f"Found {len(otp_events)} OTP email events\n")
 
 # Build list of unique muid/email combinations
 otp_cases = {}
-for muid, username, event_data, activity_date in otp_events:
-    otp_email = extract_otp_email(event_data)
-    if otp_email and muid:
-        key = (muid, otp_email)
+for event in otp_events:
+    otp_email = event.masked_contact
+    if otp_email and event.muid:
+        key = (event.muid, otp_email)
         if key not in otp_cases:
             otp_cases[key] = {
-                'muid': muid,
-                'username': username,
+                'muid': event.muid,
+                'username': event.userName,
                 'otp_email': otp_email,
-                'date': activity_date
+                'date': event.activityDate
             }
 
 print(f"Unique muid/email combinations: {len(otp_cases)}\n")
 
+# All profile emails in one pull, indexed by masked-address shape
+print("Indexing profile emails...")
+profile_index = load_profile_index(cursor)
+print(f"  {profile_index.size} profile emails indexed\n")
+
 # Check each against profile - find REAL mismatches
 real_mismatches = []
 for key, case in otp_cases.items():
@@ -96,24 +65,11 @@ for key, case in otp_cases.items():
         if row:
             case['username'] = row[0]
 
-    # Get profile emails via customer table
-    if case['username']:
-        cursor.execute("""
-            SELECT cc.Value
-            FROM customer c
-            JOIN customercommunication cc ON c.id = cc.Customer_id
-            WHERE c.UserName = %s AND cc.Value LIKE '%%%%@%%%%'
-        """, (case['username'],))
-        profile_emails = [r[0] for r in cursor.fetchall()]
-    else:
-        profile_emails = []
-
-    # Check if OTP email could match ANY profile email
-    could_match = False
-    for pe in profile_emails:
-        if emails_could_match(otp_email, pe):
-            could_match = True
-            break
+    # Profile emails for this user, and whether the (masked) OTP email could be one of them
+    profile_emails = sorted(profile_index.emails_for(case['username'])) if case['username'] else []
+    could_match = bool(profile_emails) and profile_index.could_match(otp_email, case['username'])
+    # Members whose profile email the masked address fits exactly
+    case['other_members'] = sorted(profile_index.owners(otp_email) - {(case['username'] or '').lower()})
 
     # Also check if profile emails is empty (no profile found)
     if not profile_emails:
@@ -144,4 +100,6 @@ for m in real_mismatches:
     print(f"OTP sent to: {m['otp_email']}")
     print(f"Profile emails: {m['profile_emails'] if m['profile_emails'] else '(none found)'}")
     print(f"Reason: {m['reason']}")
+    if m['other_members']:
+        print(f"Matches profile of: {', '.join(m['other_members'])}")
     print(f"Date: {m['date']}")
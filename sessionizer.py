@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Sessionizer
+Turns a time-ordered stream of fraudmonitor events into one compact record
+per online-banking session, in a single pass with bounded state.
+
+fraud_analysis counts COUNT(DISTINCT sessionid) in SQL and audit_MUID walks
+rows one by one, so there was no session-level view: when did a session
+start and end, which IPs and devices did it use, how many logins failed,
+were OTPs sent, was an email or phone changed in it. Sessionizer consumes
+records (FraudmonitorScan batches, member_timeline events or dicts) and
+emits SessionRecord tuples:
+
+    - events carrying a sessionid are grouped by it; events without one
+      (failed logins before authentication...) by muid, else userName,
+      else ipAddress
+    - a key that stays quiet for longer than gap starts a new session, so
+      a reused sessionid or a member's next visit is not merged in
+    - events may arrive up to `lateness` behind the newest one seen (a scan
+      slice is read in table order, not strictly by activityDate); a session
+      is closed and emitted once the stream has moved gap + lateness past its
+      last event, and at most max_open sessions are held at any time
+
+Usage:
+    from sessionizer import Sessionizer, sessionize, sessions_frame
+    sessionizer = Sessionizer()
+    for batch in scan.batches():
+        for session in sessionizer.feed(batch):
+            ...
+    for session in sessionizer.flush():
+        ...
+
+    sessions = list(sessionize(timeline))           # any iterable of records
+    df = sessions_frame(sessions)
+
+    py sessionizer.py --days 1 --csv sessions.csv   (production scan, one day slice at a time)
+    py sessionizer.py --muid 00638242923564062860   (from the local member timeline)
+"""
+
+import argparse
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from event_data import LOGIN_CATEGORIES, OTP_CATEGORY, parse_otp
+from fraudmonitor_scan import FraudmonitorScan, PARALLEL_WORKERS, days_ago, to_datetime
+
+SESSION_GAP = timedelta(minutes=30)      # inactivity that ends a session
+ALLOWED_LATENESS = timedelta(minutes=5)  # how far behind the newest event a record may arrive
+MAX_OPEN_SESSIONS = 200000               # open sessions held before the oldest is force-closed
+MAX_SESSION_IPS = 20                     # distinct IPs kept per session (ip_count stops there)
+
+SCAN_COLUMNS = ('activityDate', 'eventCategory', 'eventData', 'ipAddress', 'platform',
+                'platformOS', 'browser', 'sessionid', 'muid', 'userName', 'masterMembership')
+
+SessionRecord = namedtuple('SessionRecord', [
+    'session_key', 'sessionid', 'muid', 'userName', 'masterMembership',
+    'start', 'end', 'duration_s', 'events', 'categories', 'ips', 'ip_count',
+    'platform', 'platformOS', 'browser', 'logins_ok', 'logins_failed',
+    'otps_sent', 'otp_methods', 'contact_changes',
+])
+
+_LOGIN_OK, _LOGIN_FAILED = LOGIN_CATEGORIES
+
+
+def _accessor(record):
+    """Field getter for a record: namedtuple/object attributes or dict keys."""
+    if isinstance(record, dict):
+        return lambda r, name: r.get(name)
+    return lambda r, name: getattr(r, name, None)
+
+
+def _is_contact_change(category):
+    return category.startswith('Change ')
+
+
+class _OpenSession:
+    """Running aggregates for one session."""
+
+    __slots__ = ('key', 'sessionid', 'muid', 'userName', 'masterMembership', 'start', 'last',
+                 'events', 'categories', 'ips', 'platform', 'platformOS',
+                 'browser', 'logins_ok', 'logins_failed', 'otps_sent', 'otp_methods',
+                 'contact_changes')
+
+    def __init__(self, key, sessionid, moment):
+        self.key = key
+        self.sessionid = sessionid
+        self.muid = self.userName = self.masterMembership = None
+        self.platform = self.platformOS = self.browser = None
+        self.start = self.last = moment
+        self.events = 0
+        self.categories = {}
+        self.ips = {}
+        self.logins_ok = self.logins_failed = 0
+        self.otps_sent = 0
+        self.otp_methods = {}
+        self.contact_changes = 0
+
+    def close(self):
+        return SessionRecord(
+            self.key, self.sessionid, self.muid, self.userName, self.masterMembership,
+            self.start, self.last, (self.last - self.start).total_seconds(), self.events,
+            self.categories, tuple(self.ips), len(self.ips), self.platform, self.platformOS,
+            self.browser, self.logins_ok, self.logins_failed, self.otps_sent,
+            self.otp_methods, self.contact_changes)
+
+
+class Sessionizer:
+    """
+    Streaming session builder.
+
+    Args:
+        gap: Inactivity (timedelta) after which a key starts a new session
+        lateness: How far an event may lag the newest activityDate seen
+        max_open: Open sessions kept in memory; past it the least recently
+                  active session is closed early (counted in .evicted)
+        parse_otps: Decode OTP eventData to count delivery methods
+    """
+
+    def __init__(self, gap=SESSION_GAP, lateness=ALLOWED_LATENESS, max_open=MAX_OPEN_SESSIONS,
+                 parse_otps=True):
+        self.gap = gap
+        self.lateness = lateness
+        self.max_open = max_open
+        self.parse_otps = parse_otps
+        self.open = OrderedDict()       # key -> _OpenSession, least recently active first
+        self.watermark = None           # newest activityDate seen
+        self.events = 0
+        self.sessions_closed = 0
+        self.late_events = 0            # arrived after their session had been closed
+        self.evicted = 0
+        self._get = None
+
+    def _session_key(self, record):
+        get = self._get
+        sessionid = get(record, 'sessionid')
+        if sessionid:
+            return f"s:{sessionid}", sessionid
+        muid = get(record, 'muid')
+        if muid:
+            return f"m:{muid}", None
+        username = get(record, 'userName')
+        if username:
+            return f"u:{username.lower()}", None
+        return f"ip:{get(record, 'ipAddress') or ''}", None
+
+    def _expire(self, closed):
+        """Close sessions the stream has moved past; append them to closed."""
+        horizon = self.watermark - self.gap - self.lateness
+        while self.open:
+            key, session = next(iter(self.open.items()))
+            if session.last >= horizon:
+                break
+            del self.open[key]
+            closed.append(session.close())
+        while len(self.open) > self.max_open:
+            _, session = self.open.popitem(last=False)
+            closed.append(session.close())
+            self.evicted += 1
+
+    def add(self, record, closed=None):
+        """
+        Add one record.
+
+        Args:
+            record: fraudmonitor record (namedtuple, TimelineEvent or dict)
+            closed: Optional list to append closed sessions to
+
+        Returns:
+            list of SessionRecord closed by this record (usually empty)
+        """
+        if closed is None:
+            closed = []
+        already_closed = len(closed)
+        if self._get is None:
+            self._get = _accessor(record)
+        get = self._get
+
+        moment = get(record, 'activityDate')
+        if moment is None:
+            return closed
+        if not isinstance(moment, datetime):
+            moment = to_datetime(moment)
+        self.events += 1
+
+        key, sessionid = self._session_key(record)
+        session = self.open.get(key)
+        detached = False
+        if session is not None and session.start - moment > self.gap:
+            # Late event from before the key's open session: it belongs to an
+            # earlier session, so it must not stretch this one back across the gap
+            self.late_events += 1
+            session = _OpenSession(key, sessionid, moment)
+            detached = True
+        elif session is not None and moment - session.last > self.gap:
+            closed.append(session.close())
+            del self.open[key]
+            session = None
+        if session is None:
+            if self.watermark is not None and moment < self.watermark - self.gap - self.lateness:
+                self.late_events += 1
+            session = _OpenSession(key, sessionid, moment)
+            self.open[key] = session
+        else:
+            self.open.move_to_end(key)
+            if moment < session.start:
+                session.start = moment
+            elif moment > session.last:
+                session.last = moment
+
+        session.events += 1
+        category = get(record, 'eventCategory') or ''
+        session.categories[category] = session.categories.get(category, 0) + 1
+        if category == _LOGIN_OK:
+            session.logins_ok += 1
+        elif category == _LOGIN_FAILED:
+            session.logins_failed += 1
+        elif category == OTP_CATEGORY:
+            session.otps_sent += 1
+            if self.parse_otps:
+                otp = parse_otp(get(record, 'eventData'))
+                method = otp.method if otp else 'unknown'
+                session.otp_methods[method] = session.otp_methods.get(method, 0) + 1
+        elif _is_contact_change(category):
+            session.contact_changes += 1
+
+        ip = get(record, 'ipAddress')
+        if ip and ip not in session.ips and len(session.ips) < MAX_SESSION_IPS:
+            session.ips[ip] = None
+        if session.muid is None:
+            session.muid = get(record, 'muid') or None
+        if session.userName is None:
+            session.userName = get(record, 'userName') or None
+        if session.masterMembership is None:
+            session.masterMembership = get(record, 'masterMembership') or None
+        if session.platform is None:
+            session.platform = get(record, 'platform') or None
+            session.platformOS = get(record, 'platformOS') or None
+            session.browser = get(record, 'browser') or None
+
+        if self.watermark is None or moment > self.watermark:
+            self.watermark = moment
+            self._expire(closed)
+        elif len(self.open) > self.max_open:
+            self._expire(closed)
+        if detached:
+            # Emitted on its own, as a late event with no open session would be
+            closed.append(session.close())
+        self.sessions_closed += len(closed) - already_closed
+        return closed
+
+    def feed(self, records):
+        """Add an iterable of records (e.g. a FraudBatch); return the sessions it closed."""
+        closed = []
+        for record in records:
+            self.add(record, closed)
+        return closed
+
+    def flush(self):
+        """Close every open session (end of stream), oldest activity first."""
+        closed = [session.close() for session in self.open.values()]
+        self.open.clear()
+        self.sessions_closed += len(closed)
+        return closed
+
+    def summary(self):
+        return (f"{self.events:,} events -> {self.sessions_closed:,} sessions closed, "
+                f"{len(self.open):,} open, {self.late_events:,} late events, {self.evicted:,} evicted")
+
+
+def sessionize(records, **kwargs):
+    """Yield SessionRecord for an iterable of records, flushing at the end."""
+    sessionizer = Sessionizer(**kwargs)
+    for record in records:
+        yield from sessionizer.add(record)
+    yield from sessionizer.flush()
+
+
+def _counts_text(counts):
+    return '; '.join(f"{name}: {count}" for name, count in sorted(counts.items(), key=lambda x: (-x[1], x[0])))
+
+
+def sessions_frame(sessions):
+    """DataFrame of sessions ordered by start, with categories / IPs flattened to text."""
+    rows = []
+    for s in sessions:
+        row = s._asdict()
+        row['categories'] = _counts_text(s.categories)
+        row['otp_methods'] = _counts_text(s.otp_methods)
+        row['ips'] = ', '.join(s.ips)
+        rows.append(row)
+    df = pd.DataFrame(rows, columns=SessionRecord._fields)
+    if not df.empty:
+        df = df.sort_values(['start', 'session_key'], ignore_index=True)
+    return df
+
+
+def scan_sessions(days, categories=None, workers=PARALLEL_WORKERS, progress=True):
+    """Sessionize the last `days` of production fraudmonitor in one day-partitioned scan."""
+    scan = FraudmonitorScan(columns=SCAN_COLUMNS, categories=categories, start=days_ago(days),
+                            partition='day', workers=workers, progress=progress, label='sessions')
+    sessionizer = Sessionizer()
+    sessions = []
+    for batch in scan.batches():
+        sessions.extend(sessionizer.feed(batch))
+    sessions.extend(sessionizer.flush())
+    print(f"  {sessionizer.summary()}")
+    return sessions
+
+
+def timeline_sessions(muid):
+    """Sessionize one member's history from the local member timeline store."""
+    from member_timeline import open_timeline_store
+
+    store = open_timeline_store()
+    try:
+        timeline = store.timeline(muid=muid, link=('muid', 'userName'))
+    finally:
+        store.close()
+    print(f"  {timeline.describe()}")
+    return list(sessionize(timeline))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build session records from fraudmonitor events")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--days', type=int, help="scan this many days of production fraudmonitor")
+    source.add_argument('--muid', help="one member, from the local member timeline store")
+    parser.add_argument('--categories', nargs='+', help="only these eventCategory values")
+    parser.add_argument('--csv', help="write the sessions to this CSV file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.days is not None:
+        sessions = scan_sessions(args.days, categories=args.categories)
+    else:
+        sessions = timeline_sessions(args.muid)
+    df = sessions_frame(sessions)
+    print(f"{len(df):,} sessions in {time.perf_counter() - started:.1f}s")
+
+    if not df.empty:
+        print(f"  events per session: median {df['events'].median():.0f}, max {df['events'].max():,}")
+        print(f"  sessions with failed logins: {(df['logins_failed'] > 0).sum():,}")
+        print(f"  sessions with OTPs sent: {(df['otps_sent'] > 0).sum():,}")
+        print(f"  sessions with contact changes: {(df['contact_changes'] > 0).sum():,}")
+        print(f"  sessions with more than one IP: {(df['ip_count'] > 1).sum():,}")
+        if args.muid:
+            for s in df.itertuples():
+                print(f"{s.start:%Y-%m-%d %H:%M:%S}  {s.duration_s / 60:6.1f} min  {s.events:4} events  "
+                      f"{s.ips[:40]:40} {s.categories}")
+
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+        print(f"Wrote {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,8 @@ Step 3: Check if those emails exist in profiles
 """
 
 from db_connection import get_connection
-import re
+from event_data import parse_otp_email
+from profile_snapshot import open_profile_snapshot
 
 conn = get_connection()
 cursor = conn.cursor()
@@ -38,18 +39,10 @@ cursor.execute(query)
 otp_events = cursor.fetchall()
 print(f"Found {len(otp_events)} OTP events to suspicious domains:\n")
 
-# Extract email from eventData
-def extract_otp_email(event_data):
-    # Pattern: ["email", "actual@email.com", ...
-    match = re.search(r'"email",\s*"([^"]+)"', str(event_data))
-    if match:
-        return match.group(1)
-    return None
-
 suspicious_cases = []
 for row in otp_events:
     muid, username, event_data, activity_date = row
-    otp_email = extract_otp_email(event_data)
+    otp_email = parse_otp_email(event_data)
     if otp_email:
         suspicious_cases.append((muid, username, otp_email, activity_date))
     print(f"  MUID: {muid}")
@@ -63,33 +56,31 @@ print("\n")
 print("STEP 3 - Check if OTP emails exist in member profiles")
 print("-" * 60)
 
-# Get unique MUIDs
+# Get unique MUIDs (with the username seen on their OTP events)
 unique_muids = list(set([c[0] for c in suspicious_cases]))
+usernames_by_muid = {c[0]: c[1] for c in suspicious_cases if c[1]}
+profile_snapshot = open_profile_snapshot()
 
 for muid in unique_muids:
     print(f"\nMUID: {muid}")
 
-    # Get all emails from this member's profile
-    cursor.execute("""
-        SELECT Value, Type_id, isPrimary, Description
-        FROM customercommunication
-        WHERE Customer_id = %s
-        AND (Type_id LIKE '%%EMAIL%%' OR type LIKE '%%email%%' OR Value LIKE '%%@%%')
-    """, (muid,))
-    profile_emails = cursor.fetchall()
+    # Get all emails from this member's profile (customercommunication is keyed
+    # by customer.id, not muid, so go through the username)
+    username = usernames_by_muid.get(muid)
+    profile_emails = profile_snapshot.contacts(username=username, kind='email') if username else []
 
     print(f"  Profile emails:")
     if not profile_emails:
         print("    (none found)")
     for pe in profile_emails:
-        print(f"    - {pe[0]} (Type: {pe[1]}, Primary: {pe[2]})")
+        print(f"    - {pe.value} (Type: {pe.type_id}, Primary: {pe.is_primary})")
 
     # Get OTP emails for this MUID
     otp_emails_for_muid = [c[2] for c in suspicious_cases if c[0] == muid]
     print(f"  OTP sent to: {otp_emails_for_muid}")
 
     # Check if OTP email is in profile
-    profile_email_values = [pe[0].lower() if pe[0] else '' for pe in profile_emails]
+    profile_email_values = [pe.email or '' for pe in profile_emails]
     for otp_email in otp_emails_for_muid:
         if otp_email.lower() in profile_email_values:
             print(f"    -> {otp_email} IS in profile")
@@ -113,6 +104,7 @@ for muid in unique_muids:
 
 cursor.close()
 conn.close()
+profile_snapshot.close()
 
 print("\n")
 print("=" * 60)
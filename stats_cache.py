@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Stat History Cache - local SQLite copy of DigitalChannelsMemberStatsSummary
+
+Rows for closed months never change, so they are stored locally, keyed by
+(digitalstat, AsOfDate), and never fetched again. Each refresh only pulls
+rows newer than the cache's high-water mark (the newest closed-month AsOfDate
+DWHA has returned for that stat), plus the still-open current month.
+
+Board reruns and ad-hoc what-if exports then read from the cache in
+milliseconds, and keep working offline when DWHA is unreachable.
+
+Restated months are handled explicitly:
+
+    py stats_cache.py --status
+    py stats_cache.py --refresh
+    py stats_cache.py --invalidate 2025-11     (drop Nov 2025 onward, refetch next run)
+    py stats_cache.py --rebuild                (drop everything)
+"""
+
+import argparse
+import os
+import sqlite3
+from datetime import date, timedelta
+from decimal import Decimal
+
+from stats_frame import StatsFrame, build_stats_query, to_date
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stats_history_cache.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stat_history (
+    digitalstat TEXT NOT NULL,
+    as_of       TEXT NOT NULL,
+    count       NUMERIC,
+    PRIMARY KEY (digitalstat, as_of)
+);
+CREATE TABLE IF NOT EXISTS stat_coverage (
+    digitalstat    TEXT PRIMARY KEY,
+    loaded_from    TEXT NOT NULL,   -- earliest AsOfDate the cache holds for this stat
+    closed_through TEXT NOT NULL    -- high-water mark: newest AsOfDate fetched, up to last closed month end
+);
+"""
+
+
+def _first_of_current_month(today=None):
+    today = today or date.today()
+    return today.replace(day=1)
+
+
+def _to_sqlite_number(value):
+    """pyodbc returns Decimal for numeric columns; SQLite cannot bind Decimal."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+class StatsHistoryCache:
+    """
+    On-disk cache of summary-table rows with incremental refresh.
+
+    Args:
+        path: SQLite file (default: stats_history_cache.db next to this script)
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # ------------------------------------------------------------------
+    # Refresh from DWHA
+    # ------------------------------------------------------------------
+
+    def _coverage(self, stat_codes):
+        placeholders = ", ".join("?" for _ in stat_codes)
+        rows = self.conn.execute(
+            f"SELECT digitalstat, loaded_from, closed_through FROM stat_coverage "
+            f"WHERE digitalstat IN ({placeholders})", stat_codes
+        ).fetchall()
+        return {r[0]: (to_date(r[1]), to_date(r[2])) for r in rows}
+
+    def fetch_start(self, stat_codes, start_date):
+        """
+        First AsOfDate that still has to come from DWHA for these stats.
+
+        Stats already covered from start_date only need rows after their
+        high-water mark; anything uncovered is fetched from start_date.
+        """
+        start = to_date(start_date)
+        coverage = self._coverage(stat_codes)
+        candidates = []
+        for code in stat_codes:
+            if code not in coverage or coverage[code][0] > start:
+                candidates.append(start)
+            else:
+                candidates.append(max(start, coverage[code][1] + timedelta(days=1)))
+        return min(candidates) if candidates else start
+
+    def refresh(self, cursor, stat_codes, start_date, today=None):
+        """
+        Pull only the rows the cache is missing, in one open-ended range query.
+
+        Args:
+            cursor: DWHA cursor
+            stat_codes: Stat codes to keep current
+            start_date: Earliest AsOfDate the caller needs
+            today: Override for "now" (closed months are those before today's month)
+
+        Returns:
+            int: Number of rows fetched from DWHA
+        """
+        codes = list(dict.fromkeys(stat_codes))
+        start = to_date(start_date)
+        fetch_from = self.fetch_start(codes, start)
+
+        cursor.execute(build_stats_query(codes, open_ended=True), [fetch_from] + codes)
+        rows = [(r[0], to_date(r[1]).isoformat(), _to_sqlite_number(r[2]))
+                for r in cursor.fetchall()]
+
+        # High-water mark per stat: the newest AsOfDate DWHA actually returned,
+        # never past the last closed month. A month DWHA has not loaded yet
+        # stays above the mark and is fetched again next refresh
+        last_closed = _first_of_current_month(today) - timedelta(days=1)
+        newest = {}
+        for code, as_of, _ in rows:
+            newest[code] = max(newest.get(code, as_of), as_of)
+        placeholders = ", ".join("?" for _ in codes)
+        coverage = self._coverage(codes)
+
+        with self.conn:
+            # Replace everything from fetch_from onward so the cache mirrors DWHA
+            self.conn.execute(
+                f"DELETE FROM stat_history WHERE as_of >= ? AND digitalstat IN ({placeholders})",
+                [fetch_from.isoformat()] + codes
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO stat_history (digitalstat, as_of, count) VALUES (?, ?, ?)",
+                rows
+            )
+            for code in codes:
+                if code in newest:
+                    closed_through = min(to_date(newest[code]), last_closed)
+                elif code in coverage:
+                    closed_through = coverage[code][1]
+                else:
+                    # Nothing cached and nothing returned: leave it uncovered
+                    continue
+                loaded_from = min(start, coverage[code][0]) if code in coverage else start
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO stat_coverage (digitalstat, loaded_from, closed_through) "
+                    "VALUES (?, ?, ?)",
+                    (code, loaded_from.isoformat(), closed_through.isoformat())
+                )
+        return len(rows)
+
+    # ------------------------------------------------------------------
+    # Local reads
+    # ------------------------------------------------------------------
+
+    def frame(self, stat_codes, start_date, end_date=None):
+        """Build a StatsFrame for [start_date, end_date) from the cache only."""
+        codes = list(dict.fromkeys(stat_codes))
+        start = to_date(start_date)
+        end = to_date(end_date)
+        placeholders = ", ".join("?" for _ in codes)
+        query = (f"SELECT digitalstat, as_of, count FROM stat_history "
+                 f"WHERE as_of >= ? {'AND as_of < ?' if end else ''} "
+                 f"AND digitalstat IN ({placeholders})")
+        params = [start.isoformat()] + ([end.isoformat()] if end else []) + codes
+        return StatsFrame(self.conn.execute(query, params).fetchall(), start, end)
+
+    def load_frame(self, cursor, stat_codes, start_date, end_date=None):
+        """
+        Refresh incrementally (when a DWHA cursor is given) and return a frame.
+
+        Pass cursor=None to work offline against whatever the cache holds.
+        """
+        if cursor is not None:
+            fetched = self.refresh(cursor, stat_codes, start_date)
+            print(f"  Stat cache: fetched {fetched:,} new/open-month rows from DWHA")
+        else:
+            print("  Stat cache: offline - using cached rows only")
+        return self.frame(stat_codes, start_date, end_date)
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def invalidate(self, month):
+        """
+        Drop a restated month and everything after it.
+
+        The high-water mark is moved back so the next refresh refetches
+        from the start of that month.
+
+        Args:
+            month: 'YYYY-MM' (or any date inside the month)
+        """
+        month_start = to_date(month if len(str(month)) > 7 else f"{month}-01").replace(day=1)
+        hwm = (month_start - timedelta(days=1)).isoformat()
+        with self.conn:
+            deleted = self.conn.execute(
+                "DELETE FROM stat_history WHERE as_of >= ?", (month_start.isoformat(),)
+            ).rowcount
+            self.conn.execute(
+                "UPDATE stat_coverage SET closed_through = ? WHERE closed_through > ?", (hwm, hwm)
+            )
+        return deleted
+
+    def rebuild(self):
+        """Drop all cached rows; the next refresh reloads full history."""
+        with self.conn:
+            self.conn.execute("DELETE FROM stat_history")
+            self.conn.execute("DELETE FROM stat_coverage")
+
+    def status(self):
+        """Summary of what the cache holds."""
+        rows, stats, first, last = self.conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT digitalstat), MIN(as_of), MAX(as_of) FROM stat_history"
+        ).fetchone()
+        hwm = self.conn.execute("SELECT MIN(closed_through) FROM stat_coverage").fetchone()[0]
+        return {'rows': rows, 'stats': stats, 'first_as_of': first,
+                'last_as_of': last, 'closed_through': hwm}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local DigitalChannelsMemberStatsSummary cache")
+    parser.add_argument('--status', action='store_true', help="show cache contents")
+    parser.add_argument('--refresh', action='store_true', help="fetch new rows for all board report stats")
+    parser.add_argument('--invalidate', metavar='YYYY-MM', help="drop a restated month and everything after it")
+    parser.add_argument('--rebuild', action='store_true', help="drop all cached rows")
+    args = parser.parse_args()
+
+    with StatsHistoryCache() as cache:
+        if args.rebuild:
+            cache.rebuild()
+            print(f"Cache cleared: {cache.path}")
+        if args.invalidate:
+            deleted = cache.invalidate(args.invalidate)
+            print(f"Invalidated {args.invalidate} onward ({deleted:,} rows dropped)")
+        if args.refresh:
+            from dwha_connection import get_dwha_connection
+            from board_report_export import ACTIVE_SECTIONS, LEGACY_SECTIONS, REPORT_START_DATE, collect_stat_codes
+
+            codes = collect_stat_codes(ACTIVE_SECTIONS) + collect_stat_codes(LEGACY_SECTIONS)
+            conn = get_dwha_connection()
+            cursor = conn.cursor()
+            fetched = cache.refresh(cursor, codes, REPORT_START_DATE)
+            cursor.close()
+            conn.close()
+            print(f"Fetched {fetched:,} rows from DWHA")
+
+        s = cache.status()
+        print(f"Cache: {s['rows']:,} rows, {s['stats']} stats, "
+              f"{s['first_as_of']} to {s['last_as_of']}, closed through {s['closed_through']}")
+
+
+if __name__ == "__main__":
+    main()
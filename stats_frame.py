@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+StatsFrame - single-pass loader for History.DigitalChannelsMemberStatsSummary
+
+The board reports used to hit the summary table once per year, once per
+month and once more for MbrCnt, mostly with YEAR()/MONTH() predicates that
+cannot use the AsOfDate index. load_stats_frame() instead pulls every stat
+code the report needs for the whole date window in ONE sargable range query:
+
+    WHERE s.AsOfDate >= ? AND s.AsOfDate < ? AND s.digitalstat IN (...)
+
+and keeps the rows in a small columnar frame. YoY totals, monthly pivots,
+latest/prior month deltas and MbrCnt lookups are all derived locally.
+
+Usage:
+    frame = load_stats_frame(cursor, all_stats, '2024-01-01')
+    monthly_2024 = frame.monthly(2024)
+    totals_2025 = frame.yearly_totals(2025)
+    latest, prior, latest_name, prior_name = frame.latest_two_months()
+    member_count = frame.latest_value('MbrCnt')
+"""
+
+from datetime import date, datetime
+
+
+STATS_TABLE = "SymWarehouse.History.DigitalChannelsMemberStatsSummary"
+
+
+def to_date(value):
+    """Normalize a date/datetime/'YYYY-MM-DD' string to datetime.date."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+class StatsFrame:
+    """
+    Columnar in-memory copy of summary-table rows for a date window.
+
+    Columns are parallel lists (stat, as_of, count). A per-stat index of row
+    positions sorted by AsOfDate backs all lookups.
+
+    Args:
+        rows: Iterable of (digitalstat, AsOfDate, COUNT) tuples
+        start_date: Inclusive window start the rows were loaded for
+        end_date: Exclusive window end (None = open ended)
+    """
+
+    def __init__(self, rows, start_date=None, end_date=None):
+        self.start_date = to_date(start_date)
+        self.end_date = to_date(end_date)
+
+        self.stat = []
+        self.as_of = []
+        self.count = []
+        for stat_code, as_of, count in rows:
+            self.stat.append(stat_code)
+            self.as_of.append(to_date(as_of))
+            self.count.append(count)
+
+        self._by_stat = {}
+        for idx, stat_code in enumerate(self.stat):
+            self._by_stat.setdefault(stat_code, []).append(idx)
+        for positions in self._by_stat.values():
+            positions.sort(key=lambda i: self.as_of[i])
+
+    def __len__(self):
+        return len(self.stat)
+
+    def stat_codes(self):
+        """Stat codes present in the frame."""
+        return list(self._by_stat.keys())
+
+    def rows(self):
+        """Iterate (stat, as_of, count) tuples in load order."""
+        return zip(self.stat, self.as_of, self.count)
+
+    def _month_latest(self, stat_code):
+        """{(year, month): row index of the latest AsOfDate in that month}"""
+        result = {}
+        for idx in self._by_stat.get(stat_code, []):
+            d = self.as_of[idx]
+            result[(d.year, d.month)] = idx     # sorted ascending, so last wins
+        return result
+
+    def _codes(self, stat_codes):
+        return self.stat_codes() if stat_codes is None else stat_codes
+
+    # ------------------------------------------------------------------
+    # Derived views
+    # ------------------------------------------------------------------
+
+    def months(self):
+        """Sorted list of distinct (year, month) pairs in the frame."""
+        return sorted({(d.year, d.month) for d in self.as_of})
+
+    def monthly(self, year, stat_codes=None):
+        """
+        Monthly values for one year.
+
+        Returns:
+            dict: Nested dict where result[stat_code][month] = value
+                  month is 1-12 (latest AsOfDate within the month wins)
+        """
+        results = {}
+        for stat_code in self._codes(stat_codes):
+            for (y, m), idx in self._month_latest(stat_code).items():
+                if y == year:
+                    results.setdefault(stat_code, {})[m] = self.count[idx]
+        return results
+
+    def month_values(self, year, month, stat_codes=None):
+        """{stat_code: value} for a single month."""
+        results = {}
+        for stat_code in self._codes(stat_codes):
+            idx = self._month_latest(stat_code).get((year, month))
+            if idx is not None:
+                results[stat_code] = self.count[idx]
+        return results
+
+    def yearly_totals(self, year, stat_codes=None):
+        """
+        Sum of every row in the year per stat code (NULL counts ignored,
+        matching SQL SUM).
+
+        Returns:
+            dict: Stat code -> total value mapping
+        """
+        results = {}
+        for stat_code in self._codes(stat_codes):
+            values = [self.count[i] for i in self._by_stat.get(stat_code, [])
+                      if self.as_of[i].year == year]
+            if not values:
+                continue
+            present = [v for v in values if v is not None]
+            results[stat_code] = sum(present) if present else None
+        return results
+
+    def latest_value(self, stat_code):
+        """Most recent value for a stat code (e.g. MbrCnt), or None."""
+        positions = self._by_stat.get(stat_code)
+        if not positions:
+            return None
+        return self.count[positions[-1]]
+
+    def latest_two_months(self, stat_codes=None):
+        """
+        Data for the latest two months in the frame.
+
+        Returns:
+            tuple: (latest_month_data, prior_month_data, latest_month_name, prior_month_name)
+        """
+        months = self.months()
+        if len(months) < 2:
+            return {}, {}, "N/A", "N/A"
+
+        (latest_year, latest_month), (prior_year, prior_month) = months[-1], months[-2]
+        latest_month_name = datetime(latest_year, latest_month, 1).strftime('%b %Y')
+        prior_month_name = datetime(prior_year, prior_month, 1).strftime('%b %Y')
+
+        latest_data = self.month_values(latest_year, latest_month, stat_codes)
+        prior_data = self.month_values(prior_year, prior_month, stat_codes)
+        return latest_data, prior_data, latest_month_name, prior_month_name
+
+    def pivot_monthly(self, stat_codes, stat_descriptions, start_date=None, end_date=None):
+        """
+        Monthly pivot: rows = metrics, columns = 'YYYY-MM' months.
+
+        Args:
+            stat_codes: Stat codes to include
+            stat_descriptions: Stat code -> description mapping
+            start_date: Optional inclusive lower bound on AsOfDate
+            end_date: Optional inclusive upper bound on AsOfDate
+
+        Returns:
+            pandas.DataFrame with StatCode, Description and one column per month
+        """
+        import pandas as pd
+
+        start = to_date(start_date)
+        end = to_date(end_date)
+
+        records = []
+        for stat_code in stat_codes:
+            for (y, m), idx in self._month_latest(stat_code).items():
+                d = self.as_of[idx]
+                if (start and d < start) or (end and d > end):
+                    continue
+                records.append((stat_code, f"{y:04d}-{m:02d}", self.count[idx]))
+
+        if not records:
+            return pd.DataFrame()
+
+        df = pd.DataFrame(records, columns=['StatCode', 'Month', 'Count'])
+        df['Description'] = df['StatCode'].map(lambda x: stat_descriptions.get(x, x))
+
+        pivot = df.pivot_table(
+            index=['StatCode', 'Description'],
+            columns='Month',
+            values='Count',
+            aggfunc='first'
+        ).reset_index()
+
+        month_cols = sorted([c for c in pivot.columns if c not in ['StatCode', 'Description']])
+        return pivot[['StatCode', 'Description'] + month_cols]
+
+
+def build_stats_query(stat_codes, open_ended=False):
+    """
+    Build the single sargable range query for the summary table.
+
+    Returns:
+        str: Query with ? placeholders (start, [end], *stat_codes)
+    """
+    placeholders = ", ".join("?" for _ in stat_codes)
+    end_clause = "" if open_ended else "AND s.AsOfDate < ?"
+    return f"""
+    SELECT
+        s.digitalstat,
+        s.AsOfDate,
+        s.[COUNT]
+    FROM {STATS_TABLE} s WITH (NOLOCK)
+    WHERE s.AsOfDate >= ?
+    {end_clause}
+    AND s.digitalstat IN ({placeholders})
+    """
+
+
+def load_stats_frame(cursor, stat_codes, start_date, end_date=None):
+    """
+    Load every requested stat code for [start_date, end_date) in one query.
+
+    Args:
+        cursor: DWHA cursor
+        stat_codes: Stat codes to load (duplicates are ignored)
+        start_date: Inclusive window start (date or 'YYYY-MM-DD')
+        end_date: Exclusive window end, or None for everything since start_date
+
+    Returns:
+        StatsFrame
+    """
+    codes = list(dict.fromkeys(stat_codes))
+    start = to_date(start_date)
+    end = to_date(end_date)
+
+    query = build_stats_query(codes, open_ended=end is None)
+    params = [start] + ([end] if end is not None else []) + codes
+    cursor.execute(query, params)
+    rows = [tuple(row) for row in cursor.fetchall()]
+    return StatsFrame(rows, start, end)
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Stream Join
+Hash joins on member account numbers across DWHA, dbxdb and DataFrames,
+without materializing either side as a merged DataFrame.
+
+Cross-system member reports (wallet_activity_full_report,
+international_members_activity...) pulled every input into pandas and
+chained DataFrame.merge calls on AccountNumber, each copying the whole
+summary again. A HashJoin instead:
+
+    - reads the build side once into a compact index: normalized account
+      key -> tuples of just the needed columns
+    - streams the probe side (a cursor, a FraudmonitorScan, another join...)
+      and yields joined record batches as it goes
+    - supports inner, left and anti joins; joins chain, so a multi-way
+      report join is a pipeline of HashJoins feeding each other
+    - stays under a memory cap: when the build side exceeds max_build_rows
+      both sides are hash-partitioned to temporary spill files and joined
+      one partition at a time (output order then follows the partitions)
+
+Keys are normalized the way the account scripts already do (strip, drop a
+float '.0', zero-pad numeric accounts to 10 digits), so '1008737',
+'0001008737  ' and 1008737.0 all meet.
+
+Usage:
+    from stream_join import HashJoin, cursor_records, frame_records
+    join = HashJoin(build=frame_records(names_df), probe=cursor_records(conn, SQL),
+                    key='AccountNumber', how='left', build_columns=['MemberName'])
+    for batch in join.batches():        # JoinBatch of joined namedtuples
+        ...
+    df = join.to_frame()
+
+    py stream_join.py --bench                       (in-memory join)
+    py stream_join.py --bench --max-build-rows 50000  (forces spill-to-disk)
+"""
+
+import argparse
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+
+JOIN_TYPES = ('inner', 'left', 'anti')
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_MAX_BUILD_ROWS = 2000000   # build rows held in memory before spilling
+DEFAULT_PARTITIONS = 16            # spill partitions per side
+ACCOUNT_DIGITS = 10
+
+
+def normalize_account(value):
+    """Join key for an account number (None for blanks)."""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value:      # NaN
+            return None
+        if value.is_integer():
+            value = int(value)
+    key = str(value).strip()
+    if key.endswith('.0') and key[:-2].isdigit():
+        key = key[:-2]
+    if key.isdigit():
+        return key.zfill(ACCOUNT_DIGITS)
+    return key or None
+
+
+_record_types = {}
+
+
+def record_type(fields, name='JoinedRecord'):
+    """namedtuple class for a field list (one class per field list)."""
+    fields = tuple(fields)
+    if (name, fields) not in _record_types:
+        _record_types[(name, fields)] = namedtuple(name, fields)
+    return _record_types[(name, fields)]
+
+
+# ----------------------------------------------------------------------
+# Inputs
+# ----------------------------------------------------------------------
+
+def cursor_records(conn, sql, params=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Stream a query's rows as namedtuples, fetchmany batch_size at a time.
+
+    Works for DWHA (pyodbc) and dbxdb (pymysql) connections.
+    """
+    cursor = conn.cursor()
+    try:
+        if params:
+            cursor.execute(sql, params)
+        else:
+            cursor.execute(sql)
+        row_type = record_type([d[0] for d in cursor.description], 'Row')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row_type(*row)
+    finally:
+        cursor.close()
+
+
+def frame_records(df):
+    """Stream a DataFrame's rows as namedtuples (column names kept as-is)."""
+    row_type = record_type(df.columns, 'Row')
+    for row in df.itertuples(index=False, name=None):
+        yield row_type(*row)
+
+
+class JoinBatch:
+    """
+    A batch of joined records sharing one field list.
+
+    Attributes:
+        records: list of namedtuple records
+        columns: tuple of column names
+    """
+
+    __slots__ = ('records', 'columns')
+
+    def __init__(self, records, columns):
+        self.records = records
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def column(self, name):
+        """All values of one column, in batch order."""
+        i = self.columns.index(name)
+        return [r[i] for r in self.records]
+
+    def to_frame(self):
+        """pandas DataFrame of the batch."""
+        import pandas as pd
+        return pd.DataFrame.from_records(self.records, columns=list(self.columns))
+
+
+# ----------------------------------------------------------------------
+# Spill files
+# ----------------------------------------------------------------------
+
+class _SpillPartitions:
+    """Hash-partitioned, append-only pickle files of (key, row tuple) pairs."""
+
+    def __init__(self, directory, prefix, partitions, batch_size):
+        self.paths = [os.path.join(directory, f"{prefix}_{p:03d}.pkl") for p in range(partitions)]
+        self._files = [open(path, 'wb') for path in self.paths]
+        self._buffers = [[] for _ in range(partitions)]
+        self.batch_size = batch_size
+        self.rows = 0
+
+    def add(self, key, row):
+        p = hash(key) % len(self.paths)
+        buffer = self._buffers[p]
+        buffer.append((key, row))
+        self.rows += 1
+        if len(buffer) >= self.batch_size:
+            pickle.dump(buffer, self._files[p], protocol=pickle.HIGHEST_PROTOCOL)
+            buffer.clear()
+
+    def close(self):
+        for f, buffer in zip(self._files, self._buffers):
+            if buffer:
+                pickle.dump(buffer, f, protocol=pickle.HIGHEST_PROTOCOL)
+                buffer.clear()
+            f.close()
+
+    @staticmethod
+    def read(path):
+        """Yield (key, row) pairs from one partition file."""
+        with open(path, 'rb') as f:
+            while True:
+                try:
+                    chunk = pickle.load(f)
+                except EOFError:
+                    return
+                yield from chunk
+
+
+# ----------------------------------------------------------------------
+# Join
+# ----------------------------------------------------------------------
+
+class HashJoin:
+    """
+    Streaming hash join of a probe stream against a build side.
+
+    Args:
+        build: Iterable of namedtuple records loaded into the hash index
+               (the smaller side: per-account aggregates, names...)
+        probe: Iterable of namedtuple records streamed through the index
+               (another HashJoin chains: its joined records are the probe)
+        key: Key field of the build side (and of the probe side unless probe_key is given)
+        probe_key: Key field of the probe side
+        how: 'inner', 'left' (every probe row, build fields None when unmatched)
+             or 'anti' (probe rows with no match, probe fields only)
+        build_columns: Build fields to carry into the output (default: all
+                       but the key); pass them when the build side may be empty
+        normalize: Key normalization applied to both sides
+        max_build_rows: Build rows kept in memory before both sides spill to disk
+        partitions: Spill partitions per side
+        spill_dir: Directory for spill files (default: system temp dir)
+        batch_size: Records per yielded JoinBatch
+        suffix: Appended to build field names that clash with probe fields
+    """
+
+    def __init__(self, build, probe, key, probe_key=None, how='inner', build_columns=None,
+                 normalize=normalize_account, max_build_rows=DEFAULT_MAX_BUILD_ROWS,
+                 partitions=DEFAULT_PARTITIONS, spill_dir=None, batch_size=DEFAULT_BATCH_SIZE,
+                 suffix='_build'):
+        if how not in JOIN_TYPES:
+            raise ValueError(f"how must be one of {JOIN_TYPES}, not {how!r}")
+        self.build = build
+        self.probe = probe
+        self.key = key
+        self.probe_key = probe_key or key
+        self.how = how
+        self.build_columns = list(build_columns) if build_columns is not None else None
+        self.normalize = normalize
+        self.max_build_rows = max_build_rows
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+        self.batch_size = batch_size
+        self.suffix = suffix
+
+        self.build_rows = 0
+        self.probe_rows = 0
+        self.output_rows = 0
+        self.spilled = False
+
+    # -- build side ----------------------------------------------------
+
+    def _build_index(self, directory):
+        """Returns (index, None) in memory, or (None, spilled build partitions)."""
+        index = {}
+        spill = None
+        positions = None
+        for record in self.build:
+            if positions is None:
+                fields = record._fields
+                if self.build_columns is None:
+                    self.build_columns = [f for f in fields if f != self.key]
+                key_pos = fields.index(self.key)
+                positions = [fields.index(c) for c in self.build_columns]
+            key = self.normalize(record[key_pos])
+            if key is None:
+                continue
+            row = tuple(record[i] for i in positions)
+            self.build_rows += 1
+            if spill is not None:
+                spill.add(key, row)
+                continue
+            index.setdefault(key, []).append(row)
+            if self.build_rows > self.max_build_rows:
+                print(f"  [join] build side passed {self.max_build_rows:,} rows; "
+                      f"spilling to {self.partitions} partitions")
+                spill = _SpillPartitions(directory(), 'build', self.partitions, self.batch_size)
+                for k, rows in index.items():
+                    for r in rows:
+                        spill.add(k, r)
+                index = None
+        if self.build_columns is None:
+            self.build_columns = []
+        if spill is not None:
+            spill.close()
+            self.spilled = True
+            return None, spill
+        return index, None
+
+    def _output_columns(self, probe_fields):
+        if self.how == 'anti':
+            return tuple(probe_fields)
+        taken = set(probe_fields)
+        out = list(probe_fields)
+        for column in self.build_columns:
+            out.append(column + self.suffix if column in taken else column)
+        return tuple(out)
+
+    # -- probe side ----------------------------------------------------
+
+    def _matches(self, row, key, index, emit, row_type, empty):
+        """Emit the joined output for one probe row (row is a plain tuple)."""
+        matches = index.get(key) if key is not None else None
+        if self.how == 'anti':
+            if not matches:
+                emit(row_type(*row))
+        elif matches:
+            for build_row in matches:
+                emit(row_type(*row, *build_row))
+        elif self.how == 'left':
+            emit(row_type(*row, *empty))
+
+    def batches(self):
+        """Yield JoinBatch objects of joined records."""
+        spill_root = []
+
+        def directory():
+            if not spill_root:
+                spill_root.append(tempfile.mkdtemp(prefix='stream_join_', dir=self.spill_dir))
+            return spill_root[0]
+
+        try:
+            index, build_spill = self._build_index(directory)
+            out = []
+            state = {}
+
+            def emit(record):
+                out.append(record)
+
+            def setup(record):
+                fields = record._fields
+                state['key_pos'] = fields.index(self.probe_key)
+                state['columns'] = self._output_columns(fields)
+                state['probe_fields'] = fields
+                state['row_type'] = record_type(state['columns'])
+                state['empty'] = (None,) * len(self.build_columns)
+
+            if build_spill is None:
+                for record in self.probe:
+                    if not state:
+                        setup(record)
+                    self.probe_rows += 1
+                    self._matches(tuple(record), self.normalize(record[state['key_pos']]),
+                                  index, emit, state['row_type'], state['empty'])
+                    if len(out) >= self.batch_size:
+                        yield self._flush(out, state)
+                if out:
+                    yield self._flush(out, state)
+                return
+
+            # Grace hash join: partition the probe side the same way, then join
+            # partition by partition with only one build partition in memory
+            probe_spill = _SpillPartitions(directory(), 'probe', self.partitions, self.batch_size)
+            for record in self.probe:
+                if not state:
+                    setup(record)
+                self.probe_rows += 1
+                key = self.normalize(record[state['key_pos']])
+                if key is None:
+                    self._matches(tuple(record), None, {}, emit, state['row_type'], state['empty'])
+                    if len(out) >= self.batch_size:
+                        yield self._flush(out, state)
+                else:
+                    probe_spill.add(key, tuple(record))
+            probe_spill.close()
+
+            for build_path, probe_path in zip(build_spill.paths, probe_spill.paths):
+                part = {}
+                for key, row in _SpillPartitions.read(build_path):
+                    part.setdefault(key, []).append(row)
+                for key, row in _SpillPartitions.read(probe_path):
+                    self._matches(row, key, part, emit, state['row_type'], state['empty'])
+                    if len(out) >= self.batch_size:
+                        yield self._flush(out, state)
+            if out:
+                yield self._flush(out, state)
+        finally:
+            if spill_root:
+                shutil.rmtree(spill_root[0], ignore_errors=True)
+
+    def _flush(self, out, state):
+        batch = JoinBatch(list(out), state['columns'])
+        self.output_rows += len(out)
+        out.clear()
+        return batch
+
+    def records(self):
+        """Yield individual joined records."""
+        for batch in self.batches():
+            yield from batch.records
+
+    def __iter__(self):
+        # Lets a join be the probe side of the next one
+        return self.records()
+
+    def to_frame(self, columns=None):
+        """
+        Run the join into one DataFrame.
+
+        Args:
+            columns: Column names to use when the probe side turns out empty
+        """
+        import pandas as pd
+        frames = [batch.to_frame() for batch in self.batches()]
+        if not frames:
+            return pd.DataFrame(columns=list(columns or []))
+        return pd.concat(frames, ignore_index=True)
+
+    def summary(self):
+        """One-line row counts for progress output."""
+        mode = ", spilled to disk" if self.spilled else ""
+        return (f"{self.how} join: {self.build_rows:,} build x {self.probe_rows:,} probe rows "
+                f"-> {self.output_rows:,}{mode}")
+
+
+# ----------------------------------------------------------------------
+# Benchmark
+# ----------------------------------------------------------------------
+
+def _synthetic(members, seed=5):
+    rng = random.Random(seed)
+    Build = record_type(('AccountNumber', 'MemberName', 'DB_Activated'), 'Row')
+    Probe = record_type(('AccountNumber', 'P07_Count', 'P07_Amount'), 'Row')
+    build = [Build(str(n).zfill(10), f"MEMBER {n}", '2024-01-01') for n in range(1000000, 1000000 + members)]
+    probe = [Probe(str(rng.randrange(1000000, 1000000 + members * 2)), rng.randint(1, 50), rng.random() * 500)
+             for _ in range(members * 2)]
+    return build, probe
+
+
+def benchmark(members=500000, max_build_rows=DEFAULT_MAX_BUILD_ROWS):
+    """Left-join a probe stream of 2x members against members build rows."""
+    build, probe = _synthetic(members)
+    for how in JOIN_TYPES:
+        start = time.perf_counter()
+        join = HashJoin(iter(build), iter(probe), 'AccountNumber', how=how, max_build_rows=max_build_rows)
+        rows = sum(len(b) for b in join.batches())
+        print(f"{join.summary()} ({rows:,} rows) in {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming account-number hash join")
+    parser.add_argument('--bench', action='store_true', help="run the join benchmark")
+    parser.add_argument('--members', type=int, default=500000, help="build side rows for --bench")
+    parser.add_argument('--max-build-rows', type=int, default=DEFAULT_MAX_BUILD_ROWS,
+                        help="memory cap before spilling (lower it to exercise spill-to-disk)")
+    args = parser.parse_args()
+    benchmark(args.members, args.max_build_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,11 @@ Filter for truly suspicious domains only
 """
 
 from db_connection import get_connection
-import re
+from event_data import parse_otp_email
 
 conn = get_connection()
 cursor = conn.cursor()
 
-def extract_otp_email(event_data):
-    match = re.search(r'"email",\s*"([^"]+)"', str(event_data))
-    if match:
-        return match.group(1)
-    return None
-
 def get_domain(email):
     if '@' in email:
         return email.split('@')[1].lower()
@@ -86,7 +80,7 @@ suspicious_cases = []
 
 seen = set()
 for muid, username, event_data, activity_date in otp_events:
-    otp_email = extract_otp_email(event_data)
+    otp_email = parse_otp_email(event_data)
     if not otp_email or not is_suspicious_domain(otp_email):
         continue
 
@@ -4,43 +4,12 @@ Manually verify ALL 429 phone anomalies
 """
 
 from db_connection import get_connection
-import re
+from phone_index import PhoneIndex, normalize_phone
 import csv
 
 conn = get_connection()
 cursor = conn.cursor()
 
-def normalize_phone(phone):
-    """Extract just digits, return last 10"""
-    if not phone:
-        return None
-    digits = re.sub(r'\D', '', str(phone))
-    if len(digits) >= 10:
-        return digits[-10:]
-    return digits if len(digits) > 0 else None
-
-def format_phone(digits):
-    """Format 10 digits as xxx-xxx-xxxx"""
-    if digits and len(digits) == 10:
-        return f"{digits[:3]}-{digits[3:6]}-{digits[6:]}"
-    return digits
-
-def phones_match(p1, p2):
-    """Check if two phones match (normalized)"""
-    n1 = normalize_phone(p1)
-    n2 = normalize_phone(p2)
-    if not n1 or not n2:
-        return False
-    return n1 == n2
-
-def digits_different(p1, p2):
-    """Count how many digits are different"""
-    n1 = normalize_phone(p1)
-    n2 = normalize_phone(p2)
-    if not n1 or not n2 or len(n1) != len(n2):
-        return 10
-    return sum(1 for a, b in zip(n1, n2) if a != b)
-
 # Get all anomalies from CSV
 print("Loading anomalies from CSV...")
 anomalies = []
@@ -58,58 +27,48 @@ results = {
     'ACTUALLY_MATCHES': [],    # False positive - phone IS in profile
 }
 
+# Two bulk pulls instead of two SELECTs per anomaly
+print("Pulling customers and profile phones...")
+cursor.execute("SELECT id, UserName FROM customer")
+customer_ids = {}
+for cust_id, uname in cursor.fetchall():
+    if uname:
+        # Exact username wins over a case-insensitive match
+        customer_ids.setdefault(uname, cust_id)
+        customer_ids.setdefault(uname.lower(), cust_id)
+
+cursor.execute("""
+    SELECT Customer_id, Value FROM customercommunication
+    WHERE Type_id LIKE '%PHONE%'
+""")
+comm_rows = cursor.fetchall()
+profile_index = PhoneIndex(comm_rows)
+# Email stored in phone field = bad data
+bad_data_customers = {cust_id for cust_id, value in comm_rows
+                      if value and '@' in value and not normalize_phone(value, min_digits=7)}
+
+cursor.close()
+conn.close()
+print(f"  {len(customer_ids)} usernames, {len(profile_index)} profile phones\n")
+
 print("Verifying each anomaly...")
-for i, a in enumerate(anomalies):
-    if (i + 1) % 50 == 0:
-        print(f"  Processed {i+1}/{len(anomalies)}...")
-
-    username = a['Username']
-    otp_phone = a['OTP_Sent_To']
-    muid = a['MUID']
-
-    # Get customer ID
-    cursor.execute("SELECT id FROM customer WHERE UserName = %s", (username,))
-    cust = cursor.fetchone()
-
-    if not cust:
-        # Try case-insensitive
-        cursor.execute("SELECT id FROM customer WHERE LOWER(UserName) = LOWER(%s)", (username,))
-        cust = cursor.fetchone()
-
-    profile_phones = []
-    category = 'TRUE_MISMATCH'
-
-    if cust:
-        cust_id = cust[0]
-
-        # Get ALL communication records
-        cursor.execute("""
-            SELECT Type_id, Value FROM customercommunication
-            WHERE Customer_id = %s
-        """, (cust_id,))
-        comms = cursor.fetchall()
-
-        for type_id, value in comms:
-            if type_id and 'PHONE' in type_id.upper():
-                # Check if value looks like a phone (has digits)
-                digits = normalize_phone(value)
-                if digits and len(digits) >= 7:
-                    profile_phones.append(value)
-                elif value and '@' in value:
-                    # Email stored in phone field = bad data
-                    category = 'BAD_DATA'
-
-        # Check if OTP phone matches any profile phone
-        for pp in profile_phones:
-            if phones_match(otp_phone, pp):
-                category = 'ACTUALLY_MATCHES'
-                break
-            diff = digits_different(otp_phone, pp)
-            if diff <= 2:
-                category = 'CLOSE_MATCH'
-
-        if not profile_phones and category != 'BAD_DATA':
-            category = 'NO_PROFILE_PHONE'
+cust_ids = [customer_ids.get(a['Username']) or customer_ids.get((a['Username'] or '').lower())
+            for a in anomalies]
+distances = profile_index.distance_to_owners([a['OTP_Sent_To'] for a in anomalies], cust_ids)
+
+for a, cust_id, distance in zip(anomalies, cust_ids, distances):
+    profile_phones = profile_index.phones_for(cust_id, raw=True) if cust_id is not None else []
+
+    if cust_id is None:
+        category = 'NO_PROFILE_PHONE'
+    elif distance == 0:
+        category = 'ACTUALLY_MATCHES'
+    elif 0 < distance <= 2:
+        category = 'CLOSE_MATCH'
+    elif cust_id in bad_data_customers:
+        category = 'BAD_DATA'
+    elif profile_phones:
+        category = 'TRUE_MISMATCH'
     else:
         category = 'NO_PROFILE_PHONE'
 
@@ -118,9 +77,6 @@ for i, a in enumerate(anomalies):
     a['Category'] = category
     results[category].append(a)
 
-cursor.close()
-conn.close()
-
 # Print summary
 print("\n" + "=" * 80)
 print("VERIFICATION RESULTS")
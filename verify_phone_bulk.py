@@ -1,66 +1,30 @@
 #!/usr/bin/env python3
 """
-Verify phone anomalies - BULK SQL pulls, Python analysis
+Verify phone anomalies - bulk profile data (profile snapshot), Python analysis
 """
 
-from db_connection import get_connection
-import re
+from phone_index import PhoneIndex, normalize_phone, format_phone
+from profile_snapshot import open_profile_snapshot
 import csv
 
-conn = get_connection()
-cursor = conn.cursor()
-
-def normalize_phone(phone):
-    if not phone:
-        return None
-    digits = re.sub(r'\D', '', str(phone))
-    if len(digits) >= 10:
-        return digits[-10:]
-    return digits if len(digits) >= 7 else None
-
-def format_phone(digits):
-    if digits and len(digits) == 10:
-        return f"{digits[:3]}-{digits[3:6]}-{digits[6:]}"
-    return digits
-
-def digits_different(p1, p2):
-    n1 = normalize_phone(p1)
-    n2 = normalize_phone(p2)
-    if not n1 or not n2 or len(n1) != len(n2):
-        return 10
-    return sum(1 for a, b in zip(n1, n2) if a != b)
-
-# BULK QUERY 1: All customers
-print("QUERY 1: Pulling all customers...")
-cursor.execute("SELECT id, UserName, FirstName, LastName FROM customer")
-customer_rows = cursor.fetchall()
-print(f"  Got {len(customer_rows)} customers")
+# Customers and phone records come from the local profile snapshot
+print("Loading customers and phone records from the profile snapshot...")
+snapshot = open_profile_snapshot()
+customer_rows = snapshot.customers()
+phone_rows = snapshot.phone_rows()
+snapshot.close()
+print(f"  Got {len(customer_rows)} customers, {len(phone_rows)} phone records")
 
 # Build lookup
 customers = {}
-for cid, uname, fname, lname in customer_rows:
-    if uname:
-        customers[uname.lower()] = {'id': cid, 'first': fname, 'last': lname}
-
-# BULK QUERY 2: All phone records from customercommunication
-print("QUERY 2: Pulling all phone records...")
-cursor.execute("""
-    SELECT Customer_id, Type_id, Value
-    FROM customercommunication
-    WHERE Type_id LIKE '%PHONE%'
-""")
-phone_rows = cursor.fetchall()
-print(f"  Got {len(phone_rows)} phone records")
-
-# Build lookup by customer_id
-profile_phones = {}
-for cust_id, type_id, value in phone_rows:
-    if cust_id not in profile_phones:
-        profile_phones[cust_id] = []
-    profile_phones[cust_id].append({'type': type_id, 'value': value})
-
-cursor.close()
-conn.close()
+for cust in customer_rows:
+    if cust.username:
+        customers[cust.username.lower()] = {'id': cust.id, 'first': cust.first_name, 'last': cust.last_name}
+
+# Build packed phone index by customer_id; emails typed into phone fields are bad data
+profile_phones = PhoneIndex(phone_rows)
+bad_data_customers = {cust_id for cust_id, value in phone_rows if value and '@' in value}
+print(f"  Indexed {len(profile_phones)} distinct profile phones")
 
 print("\nLoading anomalies from CSV...")
 anomalies = []
@@ -79,44 +43,35 @@ results = {
     'ACTUALLY_MATCHES': [],
 }
 
+cust_ids = []
 for a in anomalies:
-    username = a['Username']
-    otp_phone = a['OTP_Sent_To']
-    otp_norm = normalize_phone(otp_phone)
-
-    # Find customer
-    cust = customers.get(username.lower()) if username else None
-
-    category = 'TRUE_MISMATCH'
-    verified_phones = []
-
-    if cust:
-        cust_id = cust['id']
-        phones = profile_phones.get(cust_id, [])
-
-        for p in phones:
-            val = p['value']
-            if val and '@' in val:
-                category = 'BAD_DATA'
-                continue
-
-            norm = normalize_phone(val)
-            if norm and len(norm) >= 7:
-                verified_phones.append(format_phone(norm) if len(norm) == 10 else norm)
-
-                # Check match
-                if otp_norm and norm == otp_norm:
-                    category = 'ACTUALLY_MATCHES'
-                elif otp_norm and digits_different(otp_phone, val) <= 2:
-                    if category not in ['ACTUALLY_MATCHES']:
-                        category = 'CLOSE_MATCH'
-
-        if not verified_phones and category not in ['BAD_DATA']:
-            category = 'NO_PROFILE_PHONE'
-    else:
+    cust = customers.get(a['Username'].lower()) if a['Username'] else None
+    cust_ids.append(cust['id'] if cust else None)
+
+# Closest profile phone per anomaly, and other customers one digit off, in one batch each
+otp_phones = [a['OTP_Sent_To'] for a in anomalies]
+distances = profile_phones.distance_to_owners(otp_phones, cust_ids)
+near_others = profile_phones.near_many(otp_phones, k=1, exclude_owners=cust_ids)
+
+for a, cust_id, distance, near in zip(anomalies, cust_ids, distances, near_others):
+    otp_norm = normalize_phone(a['OTP_Sent_To'])
+    verified_phones = [format_phone(p) for p in profile_phones.phones_for(cust_id)] if cust_id is not None else []
+
+    if cust_id is None:
+        category = 'NO_PROFILE_PHONE'
+    elif otp_norm and distance == 0:
+        category = 'ACTUALLY_MATCHES'
+    elif otp_norm and 0 < distance <= 2:
+        category = 'CLOSE_MATCH'
+    elif cust_id in bad_data_customers:
+        category = 'BAD_DATA'
+    elif not verified_phones:
         category = 'NO_PROFILE_PHONE'
+    else:
+        category = 'TRUE_MISMATCH'
 
     a['Profile_Phones_Verified'] = '; '.join(verified_phones) if verified_phones else '(none)'
+    a['Near_Other_Customers'] = '; '.join(f"{owner} ({format_phone(phone)})" for phone, owner, _ in near[:5])
     a['Category'] = category
     results[category].append(a)
 
@@ -138,6 +93,8 @@ for m in results['TRUE_MISMATCH'][:30]:
     print(f"\nUser: {m['Username']} | {m['First_Name']} {m['Last_Name']}")
     print(f"  OTP To: {m['OTP_Sent_To']}")
     print(f"  Profile: {m['Profile_Phones_Verified']}")
+    if m['Near_Other_Customers']:
+        print(f"  Other customers within 1 digit: {m['Near_Other_Customers']}")
     print(f"  Date: {m['OTP_Date']}")
 
 # Export
@@ -148,7 +105,7 @@ for cat, items in results.items():
 
 with open(output, 'w', newline='', encoding='utf-8') as f:
     fields = ['Category', 'MUID', 'Member_Number', 'Username', 'First_Name', 'Last_Name',
-              'OTP_Sent_To', 'OTP_Masked', 'Profile_Phones_Verified', 'Phone_Change_Event',
+              'OTP_Sent_To', 'OTP_Masked', 'Profile_Phones_Verified', 'Near_Other_Customers', 'Phone_Change_Event',
               'OTP_Date', 'IP_Address', 'Raw_Event_Data']
     writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
     writer.writeheader()
@@ -19,6 +19,8 @@ Output: WALLET_ACTIVITY_FULL_REPORT.xlsx with 3 tabs:
 import pandas as pd
 import numpy as np
 from dwha_connection import get_dwha_connection
+from key_list_query import query_by_keys
+from stream_join import HashJoin, cursor_records, frame_records
 
 OUTPUT_FILE = r"C:\Users\kgreeven\Desktop\WALLET_ACTIVITY_FULL_REPORT.xlsx"
 START_DATE = '2024-01-01'
@@ -131,7 +133,12 @@ def query_pan07(conn):
 
 
 def query_digital_banking_enrollment(conn):
-    """Get digital banking enrollment date by account."""
+    """
+    Stream digital banking enrollment dates by account.
+
+    Every enrolled member comes back, so the rows feed the summary join's
+    hash index straight off the cursor instead of becoming a DataFrame.
+    """
     query = """
     SELECT
         RTRIM(ParentAccount) AS AccountNumber,
@@ -140,39 +147,28 @@ def query_digital_banking_enrollment(conn):
     WHERE CREATIONDATE IS NOT NULL
     GROUP BY ParentAccount
     """
-    print("Querying digital banking enrollment dates...")
-    df = pd.read_sql(query, conn)
-    print(f"  {len(df):,} members with digital banking")
-    return df
+    print("Streaming digital banking enrollment dates...")
+    return cursor_records(conn, query)
 
 
 def query_member_names_batch(conn, accounts):
-    """Query member names in batches."""
+    """Query member names for any number of accounts."""
     if not accounts:
         return pd.DataFrame(columns=['AccountNumber', 'MemberName'])
 
     print(f"Querying member names for {len(accounts):,} accounts...")
-    batch_size = 2000
-    results = []
-
-    for i in range(0, len(accounts), batch_size):
-        batch = accounts[i:i+batch_size]
-        in_clause = ",".join([f"'{a}'" for a in batch])
-        query = f"""
-        SELECT DISTINCT
-            RTRIM(ParentAccount) AS AccountNumber,
-            RTRIM(First) + ' ' + RTRIM(Last) AS MemberName
-        FROM History.AccountName
-        WHERE ParentAccount IN ({in_clause}) AND AcctNameType = 0
-        """
-        df = pd.read_sql(query, conn)
-        results.append(df)
-        if (i // batch_size + 1) % 10 == 0:
-            print(f"  Batch {i // batch_size + 1}...")
-
-    if results:
-        return pd.concat(results, ignore_index=True).drop_duplicates('AccountNumber')
-    return pd.DataFrame(columns=['AccountNumber', 'MemberName'])
+    query = """
+    SELECT DISTINCT
+        RTRIM(ParentAccount) AS AccountNumber,
+        RTRIM(First) + ' ' + RTRIM(Last) AS MemberName
+    FROM History.AccountName
+    WHERE ParentAccount IN ({keys}) AND AcctNameType = 0
+    """
+    # Temp table join; if that is refused, IN chunks run in parallel on pooled connections
+    df = query_by_keys(conn, query, accounts, connect=get_dwha_connection)
+    if df.empty:
+        return pd.DataFrame(columns=['AccountNumber', 'MemberName'])
+    return df.drop_duplicates('AccountNumber')
 
 
 def main():
@@ -190,27 +186,33 @@ def main():
     activations = query_wallet_activations(conn)
     wallet_txns = query_wallet_transactions(conn)
     pan07 = query_pan07(conn)
-    db_enrollment = query_digital_banking_enrollment(conn)
 
     # Include members with PAN-07 activity (tap transactions)
-    all_accounts = set()
-    all_accounts.update(pan07['AccountNumber'].tolist())
-    all_accounts = list(all_accounts)
+    all_accounts = pan07['AccountNumber'].unique().tolist()
     print(f"\nTotal unique accounts with PAN-07 taps: {len(all_accounts):,}")
 
     # Get names
     names = query_member_names_batch(conn, all_accounts)
-    conn.close()
 
     print("\nBuilding summary...")
 
-    # Build summary
-    summary = pd.DataFrame({'AccountNumber': all_accounts})
-    summary = summary.merge(names, on='AccountNumber', how='left')
-    summary = summary.merge(activations, on='AccountNumber', how='left')
-    summary = summary.merge(db_enrollment, on='AccountNumber', how='left')
-    summary = summary.merge(wallet_txns, on='AccountNumber', how='left')
-    summary = summary.merge(pan07, on='AccountNumber', how='left')
+    # Build summary: stream the PAN-07 members through one left hash join per
+    # per-account input (each join's output is the next one's probe side)
+    summary = frame_records(pan07)
+    columns = list(pan07.columns)
+    joins = []
+    for name, build, build_columns in (
+            ('names', frame_records(names), ['MemberName']),
+            ('activations', frame_records(activations), ['WalletTypes', 'FirstActivation']),
+            ('enrollment', query_digital_banking_enrollment(conn), ['DB_Activated']),
+            ('wallet', frame_records(wallet_txns), ['MW_Earliest', 'MW_Latest', 'MW_Count', 'MW_Amount'])):
+        summary = HashJoin(build, summary, 'AccountNumber', how='left', build_columns=build_columns)
+        joins.append((name, summary))
+        columns += build_columns
+    summary = summary.to_frame(columns=columns)
+    conn.close()
+    for name, join in joins:
+        print(f"  {name:12} {join.summary()}")
 
     # Fill NaN
     summary['WalletTypes'] = summary['WalletTypes'].fillna('')